@@ -0,0 +1,173 @@
+# admission.py (Control de admisión de descargas según el espacio libre en disco)
+import asyncio
+import inspect
+import logging
+import os
+import shutil
+from collections import deque
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientDiskSpaceError(Exception):
+    """El video no cabe en el disco (ni siquiera esperando) o se agotó el tiempo de espera en cola."""
+
+
+class DiskReservation:
+    """Bytes reservados para una descarga en curso."""
+
+    def __init__(self, controller, job_id, size: int):
+        self.controller = controller
+        self.job_id = job_id
+        self.size = size
+        self.written = 0
+        self.released = False
+
+    @property
+    def remaining(self) -> int:
+        """Bytes reservados que aún no se han escrito en disco."""
+        return max(0, self.size - self.written)
+
+    def update(self, written: int):
+        """Actualiza los bytes ya escritos (llamar desde el callback de progreso de la descarga)."""
+        self.written = max(self.written, written)
+
+    def release(self):
+        self.controller.release(self)
+
+
+class DiskAdmissionController:
+    """
+    Lleva la cuenta de los bytes reservados por las descargas en curso frente al
+    espacio libre del directorio de descargas. Un video solo empieza a descargarse
+    si cabe entero (más el margen de seguridad); si no, espera en una cola FIFO.
+    """
+
+    def __init__(self, directory: str, margin_bytes: int):
+        self.directory = directory
+        self.margin_bytes = margin_bytes
+        self._reservations = {}
+        self._waiters = deque()  # [(future, job_id, size)]
+        self._poll_task = None
+
+    def _disk_usage(self):
+        os.makedirs(self.directory, exist_ok=True)
+        return shutil.disk_usage(self.directory)
+
+    def reserved_bytes(self) -> int:
+        """Bytes comprometidos por descargas en curso que aún no están en disco."""
+        return sum(r.remaining for r in list(self._reservations.values()))
+
+    def available_bytes(self) -> int:
+        """Espacio que se puede comprometer ahora: libre - pendiente de escribir - margen."""
+        return self._disk_usage().free - self.reserved_bytes() - self.margin_bytes
+
+    def _fits(self, size: int) -> bool:
+        return size <= self.available_bytes()
+
+    def status(self) -> dict:
+        usage = self._disk_usage()
+        return {
+            'directory': self.directory,
+            'free_bytes': usage.free,
+            'reserved_bytes': self.reserved_bytes(),
+            'available_bytes': self.available_bytes(),
+            'in_flight': len(self._reservations),
+            'queued': len(self._waiters),
+        }
+
+    def _grant(self, job_id, size: int) -> DiskReservation:
+        reservation = DiskReservation(self, job_id, size)
+        self._reservations[id(reservation)] = reservation
+        return reservation
+
+    async def acquire(self, job_id, size: int, on_wait=None) -> DiskReservation:
+        """
+        Reserva 'size' bytes para el trabajo. Si no caben ahora, espera en cola
+        (llamando a on_wait(posición) al encolarse). Lanza InsufficientDiskSpaceError
+        si el video no cabría nunca o si se supera ADMISSION_MAX_WAIT_SECONDS.
+        """
+        size = int(size or 0)
+        usage = self._disk_usage()
+        if size + self.margin_bytes > usage.total:
+            raise InsufficientDiskSpaceError(
+                f"El video ({size} bytes) no cabe en el disco de descargas ({usage.total} bytes en total)."
+            )
+        # Sin cola delante y con espacio: admitir inmediatamente
+        if not self._waiters and self._fits(size):
+            return self._grant(job_id, size)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        entry = (future, job_id, size)
+        self._waiters.append(entry)
+        logger.info(f"Trabajo {job_id} ({size} bytes) en cola por espacio en disco (posición {len(self._waiters)}).")
+        self._ensure_polling()
+        try:
+            # Dentro del try: si se cancela (o falla) durante on_wait, la entrada sale de la cola
+            if on_wait:
+                result = on_wait(len(self._waiters))
+                if inspect.isawaitable(result):
+                    await result
+            return await asyncio.wait_for(future, timeout=config.ADMISSION_MAX_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            raise InsufficientDiskSpaceError(
+                f"Se agotó la espera por espacio en disco ({config.ADMISSION_MAX_WAIT_SECONDS}s)."
+            )
+        except BaseException:
+            # Si la reserva se concedió justo antes de la cancelación, devolverla
+            if future.done() and not future.cancelled():
+                future.result().release()
+            raise
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                self._admit_waiters()
+
+    def release(self, reservation: DiskReservation):
+        """Libera una reserva (después de borrar el archivo temporal) y admite a los siguientes en cola."""
+        if reservation.released:
+            return
+        reservation.released = True
+        self._reservations.pop(id(reservation), None)
+        self._admit_waiters()
+
+    def _admit_waiters(self):
+        """Admite en orden FIFO a los trabajos en cola que ya caben."""
+        while self._waiters:
+            future, job_id, size = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if not self._fits(size):
+                break
+            self._waiters.popleft()
+            future.set_result(self._grant(job_id, size))
+            logger.info(f"Trabajo {job_id} admitido ({size} bytes).")
+
+    def _ensure_polling(self):
+        """Mientras haya cola, revisa periódicamente el disco (otros procesos pueden liberar espacio)."""
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = asyncio.get_running_loop().create_task(self._poll())
+
+    async def _poll(self):
+        while self._waiters:
+            await asyncio.sleep(config.ADMISSION_POLL_INTERVAL)
+            self._admit_waiters()
+
+
+# Un controlador por directorio de descargas (real path)
+_controllers = {}
+
+
+def get_admission_controller(directory: str = None) -> DiskAdmissionController:
+    """Devuelve el controlador de admisión del directorio (por defecto DOWNLOAD_DIR)."""
+    directory = os.path.realpath(directory or config.DOWNLOAD_DIR)
+    controller = _controllers.get(directory)
+    if controller is None:
+        controller = _controllers[directory] = DiskAdmissionController(
+            directory, config.DISK_SAFETY_MARGIN_MB * 1024 * 1024
+        )
+    return controller
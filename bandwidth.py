@@ -0,0 +1,216 @@
+# bandwidth.py (Límite global de ancho de banda con reparto justo entre trabajos)
+"""
+Un shaper por sentido ('upload' hacia Drive, 'download' desde Telegram) limita los bytes
+por segundo de todos los trabajos juntos (UPLOAD_BANDWIDTH_LIMIT_MB /
+DOWNLOAD_BANDWIDTH_LIMIT_MB, en MB/s; 0 = sin límite) y los reparte con weighted fair
+queuing a nivel de chunk:
+
+- Cada trabajo es un flujo. Antes de enviar (o después de recibir) un chunk, el flujo
+  pide permiso para sus bytes con acquire() (hilos del executor) o acquire_async() (loop).
+- Cada petición recibe una etiqueta de fin virtual: max(V, fin del flujo) + bytes / peso.
+  Con el enlace libre se concede la petición en espera con la etiqueta más baja, así que
+  un trabajo con muchos chunks en cola no acapara el enlace (self-clocked fair queuing:
+  V es la etiqueta de la última petición concedida).
+- Tras cada concesión el enlace queda ocupado bytes / límite segundos.
+
+Si no hay nadie esperando y el enlace está libre, la petición se concede al momento sin
+pasar por el hilo despachador. Los límites se pueden cambiar en caliente (set_limit,
+comando /bandwidth); no se guardan entre reinicios.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+
+import config
+
+MB = 1024 * 1024
+
+
+class _Waiter:
+    __slots__ = ('finish', 'seq', 'flow', 'nbytes', 'granted', 'cancelled', 'wake')
+
+    def __init__(self, finish, seq, flow, nbytes, wake):
+        self.finish = finish
+        self.seq = seq
+        self.flow = flow
+        self.nbytes = nbytes
+        self.granted = False
+        self.cancelled = False
+        self.wake = wake
+
+    def __lt__(self, other):
+        return (self.finish, self.seq) < (other.finish, other.seq)
+
+
+class BandwidthShaper:
+    """Limita a 'rate' bytes/s el total de los flujos y lo reparte entre ellos por WFQ."""
+
+    def __init__(self, name: str, rate: float):
+        self.name = name
+        self.rate = rate
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._virtual = 0.0          # V: etiqueta de fin de la última concesión
+        self._flow_finish = {}       # {flujo: etiqueta de fin de su última petición}
+        self._flow_bytes = {}        # {flujo: bytes concedidos} de los flujos activos
+        self._next_free = 0.0        # Momento (monotonic) en que el enlace vuelve a estar libre
+        self._thread = None
+        self._stats = {'granted_bytes': 0, 'granted_chunks': 0, 'queued_chunks': 0, 'wait_seconds': 0.0}
+
+    # --- Lógica común (siempre con self._cond adquirido) ---
+
+    def _tag(self, flow, nbytes: int, weight: float) -> float:
+        start = max(self._virtual, self._flow_finish.get(flow, 0.0))
+        finish = start + nbytes / max(weight, 1e-6)
+        self._flow_finish[flow] = finish
+        return finish
+
+    def _grant(self, waiter, now: float):
+        waiter.granted = True
+        self._virtual = max(self._virtual, waiter.finish)
+        if self.rate > 0:
+            self._next_free = max(self._next_free, now) + waiter.nbytes / self.rate
+        self._flow_bytes[waiter.flow] = self._flow_bytes.get(waiter.flow, 0) + waiter.nbytes
+        self._stats['granted_bytes'] += waiter.nbytes
+        self._stats['granted_chunks'] += 1
+        if len(self._flow_finish) > 1024:
+            # Un flujo cuya etiqueta quedó por detrás de V equivale a uno nuevo: se puede olvidar
+            self._flow_finish = {flow: tag for flow, tag in self._flow_finish.items() if tag > self._virtual}
+        waiter.wake()
+
+    def _try_fast_path(self, flow, nbytes: int, weight: float) -> bool:
+        now = time.monotonic()
+        if self.rate <= 0 or (not self._heap and self._next_free <= now):
+            waiter = _Waiter(self._tag(flow, nbytes, weight), next(self._seq), flow, nbytes, lambda: None)
+            self._grant(waiter, now)
+            return True
+        return False
+
+    def _enqueue(self, flow, nbytes: int, weight: float, wake) -> _Waiter:
+        waiter = _Waiter(self._tag(flow, nbytes, weight), next(self._seq), flow, nbytes, wake)
+        heapq.heappush(self._heap, waiter)
+        self._stats['queued_chunks'] += 1
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._dispatch_loop, name=f"bandwidth-{self.name}", daemon=True)
+            self._thread.start()
+        self._cond.notify_all()
+        return waiter
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while True:
+                while self._heap and self._heap[0].cancelled:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                if self.rate > 0 and self._next_free > now:
+                    # set_limit() o una nueva petición despiertan antes si hace falta recalcular
+                    self._cond.wait(self._next_free - now)
+                    continue
+                self._grant(heapq.heappop(self._heap), now)
+
+    # --- API ---
+
+    def acquire(self, flow, nbytes: int, weight: float = 1.0):
+        """Espera (bloqueando el hilo) hasta poder transferir 'nbytes' del flujo."""
+        if self.rate <= 0:
+            return
+        started = time.monotonic()
+        event = threading.Event()
+        with self._cond:
+            if self._try_fast_path(flow, nbytes, weight):
+                return
+            self._enqueue(flow, nbytes, weight, event.set)
+        event.wait()
+        self._add_wait(started)
+
+    async def acquire_async(self, flow, nbytes: int, weight: float = 1.0):
+        """Como acquire() pero sin bloquear el event loop."""
+        if self.rate <= 0:
+            return
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+            except RuntimeError:
+                pass  # Loop ya cerrado (apagado)
+
+        with self._cond:
+            if self._try_fast_path(flow, nbytes, weight):
+                return
+            waiter = self._enqueue(flow, nbytes, weight, wake)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._cond:
+                waiter.cancelled = not waiter.granted
+            raise
+        self._add_wait(started)
+
+    def _add_wait(self, started: float):
+        with self._cond:
+            self._stats['wait_seconds'] += time.monotonic() - started
+
+    def finish_flow(self, flow):
+        """Olvida los contadores de un flujo terminado."""
+        with self._cond:
+            self._flow_bytes.pop(flow, None)
+
+    def set_limit(self, rate: float):
+        """Cambia el límite (bytes/s; <= 0 = sin límite). Con 0 se conceden al momento las peticiones en espera."""
+        with self._cond:
+            self.rate = rate
+            if rate <= 0:
+                now = time.monotonic()
+                while self._heap:
+                    waiter = heapq.heappop(self._heap)
+                    if not waiter.cancelled:
+                        self._grant(waiter, now)
+                self._next_free = 0.0
+            else:
+                # El nuevo límite se aplica desde la próxima concesión
+                self._next_free = min(self._next_free, time.monotonic())
+            self._cond.notify_all()
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                'limit_bytes_per_s': self.rate if self.rate > 0 else None,
+                'active_flows': len(self._flow_bytes),
+                'waiting_chunks': sum(1 for waiter in self._heap if not waiter.cancelled),
+                **{key: round(value, 3) if isinstance(value, float) else value for key, value in self._stats.items()},
+            }
+
+
+_shapers = {
+    'upload': BandwidthShaper('upload', config.UPLOAD_BANDWIDTH_LIMIT_MB * MB),
+    'download': BandwidthShaper('download', config.DOWNLOAD_BANDWIDTH_LIMIT_MB * MB),
+}
+
+
+def get_shaper(direction: str) -> BandwidthShaper:
+    """Shaper de un sentido: 'upload' o 'download'."""
+    if direction not in _shapers:
+        raise ValueError(f"Sentido desconocido '{direction}'. Usa 'upload' o 'download'.")
+    return _shapers[direction]
+
+
+def set_limit_mb(direction: str, megabytes_per_s: float):
+    """Cambia en caliente el límite de un sentido, en MB/s (0 = sin límite; negativo es un error)."""
+    if not math.isfinite(megabytes_per_s) or megabytes_per_s < 0:
+        raise ValueError(f"Límite de ancho de banda inválido: {megabytes_per_s}")
+    get_shaper(direction).set_limit(megabytes_per_s * MB)
+
+
+def get_bandwidth_status() -> dict:
+    """Límites y uso de cada sentido (para /metrics y /bandwidth)."""
+    return {direction: shaper.status() for direction, shaper in _shapers.items()}
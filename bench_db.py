@@ -0,0 +1,277 @@
+# bench_db.py (Benchmarks de escala para la capa de persistencia db.py)
+"""
+Llena registros realistas (10k, 100k, 1M...) y mide, para cada operación de db.py
+que está en el camino crítico (try_start_processing, finish_processing,
+record_uploaded_file, get_uploaded_files, remove_uploaded_file_record):
+
+- latencia por operación (p50/p95/p99, media),
+- tamaño de los archivos JSON,
+- amplificación de escritura (bytes escritos por operación / bytes lógicos del registro),
+- comportamiento con acceso concurrente para distintos números de hilos.
+
+Los resultados se guardan en bench_results/db/<fecha>.json para poder comparar
+futuros cambios de almacenamiento (--compare <archivo anterior>).
+
+Uso:
+    python bench_db.py --sizes 10000,100000 --threads 1,4,8
+    python bench_db.py --sizes 10000 --compare bench_results/db/20260101-120000.json
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import threading
+import time
+
+_REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+if _REPO_DIR not in sys.path:
+    sys.path.insert(0, _REPO_DIR)
+
+from bench_fakes import percentiles
+
+DEFAULT_RESULTS_DIR = os.path.join(_REPO_DIR, "bench_results", "db")
+
+_TITLES = [
+    "Shingeki no Kyojin", "Kimetsu no Yaiba", "Jujutsu Kaisen", "Boku no Hero Academia",
+    "One Piece", "Fullmetal Alchemist Brotherhood", "Dr. Stone", "Made in Abyss",
+    "Mushoku Tensei", "Spy x Family", "Chainsaw Man", "Sousou no Frieren",
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de escala de db.py (TinyDB).")
+    parser.add_argument("--sizes", default="10000,100000", help="Tamaños del registro a probar (ej. 10000,100000,1000000)")
+    parser.add_argument("--ops", type=int, default=200,
+                        help="Operaciones medidas por tipo con 10k registros (se reduce proporcionalmente en tamaños mayores)")
+    parser.add_argument("--min-ops", type=int, default=5, help="Mínimo de operaciones medidas por tipo")
+    parser.add_argument("--threads", default="1,2,4,8", help="Números de hilos para la prueba concurrente")
+    parser.add_argument("--concurrent-ops", type=int, default=50, help="Operaciones por hilo en la prueba concurrente")
+    parser.add_argument("--results-dir", default=DEFAULT_RESULTS_DIR, help="Directorio donde guardar los resultados")
+    parser.add_argument("--compare", default=None, help="Resultado anterior con el que comparar")
+    parser.add_argument("--workdir", default=None, help="Directorio de trabajo (por defecto uno temporal)")
+    return parser.parse_args(argv)
+
+
+def _random_file_id() -> str:
+    # Los IDs de Drive tienen 33 caracteres alfanuméricos, '-' y '_'
+    return "1" + "".join(random.choices(string.ascii_letters + string.digits + "-_", k=32))
+
+
+def _random_name(index: int) -> str:
+    title = random.choice(_TITLES)
+    return f"[AbysSub] {title} - {index % 1200 + 1:02d} [1080p].mp4"
+
+
+def _make_records(count: int, now: float) -> list:
+    return [
+        {'file_id': _random_file_id(), 'original_name': _random_name(i), 'upload_timestamp': now - (count - i) * 60.0}
+        for i in range(count)
+    ]
+
+
+def _bytes_written() -> int:
+    """Bytes pasados a write() por el proceso (Linux: /proc/self/io 'wchar'); None si no existe."""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Redirige stdout a /dev/null: los print de db.py se ejecutan igual, pero no inundan la consola."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _load_db_module(workdir: str):
+    """Importa db.py desde cero con sus archivos JSON dentro de 'workdir'."""
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    sys.modules.pop('db', None)
+    return importlib.import_module('db')
+
+
+def _measure(func, args_list: list, logical_bytes: int = None) -> dict:
+    latencies = []
+    written_before = _bytes_written()
+    with _quiet():
+        for args in args_list:
+            started = time.perf_counter()
+            func(*args)
+            latencies.append((time.perf_counter() - started) * 1000.0)
+    written_after = _bytes_written()
+    result = dict(count=len(latencies), mean_ms=sum(latencies) / len(latencies), **percentiles(latencies))
+    if written_before is not None and args_list:
+        per_op = (written_after - written_before) / len(args_list)
+        result['bytes_written_per_op'] = per_op
+        if logical_bytes:
+            result['write_amplification'] = per_op / logical_bytes
+    return result
+
+
+def bench_size(size: int, args, base_workdir: str) -> dict:
+    """Mide todas las operaciones con un registro de 'size' entradas."""
+    workdir = os.path.join(base_workdir, f"size_{size}")
+    shutil.rmtree(workdir, ignore_errors=True)
+    db = _load_db_module(workdir)
+    now = time.time()
+
+    fill_started = time.perf_counter()
+    db.get_uploaded_files_db().insert_multiple(_make_records(size, now))
+    # La DB de procesos crece con cada video recibido ('finished' nunca se purga)
+    db.get_process_db().insert_multiple([{'id': i, 'status': 'finished', 'timestamp': now - 7200, 'end_timestamp': now - 7100}
+                           for i in range(size)])
+    fill_s = time.perf_counter() - fill_started
+
+    ops = args.ops if size <= 10000 else max(args.min_ops, int(args.ops * 10000 / size))
+    sample_record = {'file_id': _random_file_id(), 'original_name': _random_name(0), 'upload_timestamp': now}
+    record_bytes = len(json.dumps(sample_record))
+    process_bytes = len(json.dumps({'id': 10 ** 9, 'status': 'processing', 'timestamp': now}))
+
+    new_ids = [(size + 1 + i,) for i in range(ops)]
+    new_files = [(_random_file_id(), _random_name(i)) for i in range(ops)]
+    print(f"bench_db: {size} registros, {ops} operaciones por tipo...")
+
+    operations = {
+        'try_start_processing': _measure(db.try_start_processing, new_ids, process_bytes),
+        'finish_processing': _measure(db.finish_processing, new_ids, process_bytes),
+        'record_uploaded_file': _measure(db.record_uploaded_file, new_files, record_bytes),
+        'get_uploaded_files': _measure(db.get_uploaded_files, [()] * max(args.min_ops, ops // 10)),
+        'remove_uploaded_file_record': _measure(db.remove_uploaded_file_record, [(fid,) for fid, _ in new_files], record_bytes),
+    }
+    return {
+        'size': size,
+        'fill_s': fill_s,
+        'files': {
+            'bot_db_bytes': os.path.getsize(db.DB_PATH),
+            'uploaded_files_db_bytes': os.path.getsize(db.UPLOADED_FILES_DB_PATH),
+        },
+        'operations': operations,
+    }
+
+
+def bench_concurrency(thread_counts: list, args, base_workdir: str, size: int) -> list:
+    """Varios hilos registrando archivos y procesos a la vez: throughput, errores e integridad."""
+    results = []
+    for threads in thread_counts:
+        workdir = os.path.join(base_workdir, f"concurrent_{threads}")
+        shutil.rmtree(workdir, ignore_errors=True)
+        db = _load_db_module(workdir)
+        db.get_uploaded_files_db().insert_multiple(_make_records(size, time.time()))
+        errors = []
+        latencies = []
+        lock = threading.Lock()
+
+        def worker(worker_index: int):
+            local = []
+            for i in range(args.concurrent_ops):
+                message_id = worker_index * 1_000_000 + i
+                started = time.perf_counter()
+                try:
+                    if db.try_start_processing(message_id):
+                        db.record_uploaded_file(_random_file_id(), _random_name(i))
+                        db.finish_processing(message_id)
+                except Exception as e:
+                    with lock:
+                        errors.append(repr(e))
+                local.append((time.perf_counter() - started) * 1000.0)
+            with lock:
+                latencies.extend(local)
+
+        print(f"bench_db: prueba concurrente con {threads} hilos...")
+        started = time.perf_counter()
+        with _quiet():
+            workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+            for t in workers:
+                t.start()
+            for t in workers:
+                t.join()
+        wall = time.perf_counter() - started
+
+        # Integridad: el archivo debe seguir siendo JSON válido y contener todos los registros
+        expected = size + threads * args.concurrent_ops
+        try:
+            with open(db.UPLOADED_FILES_DB_PATH, 'r', encoding='utf-8') as f:
+                stored = len(json.load(f).get('_default', {}))
+            integrity = {'valid_json': True, 'expected_records': expected, 'stored_records': stored}
+        except ValueError as e:
+            integrity = {'valid_json': False, 'error': str(e), 'expected_records': expected}
+
+        results.append({
+            'threads': threads,
+            'base_size': size,
+            'wall_s': wall,
+            'ops_per_s': (threads * args.concurrent_ops) / wall if wall else 0.0,
+            'latency_ms': dict(mean=sum(latencies) / len(latencies), **percentiles(latencies)),
+            'errors': len(errors),
+            'error_samples': errors[:5],
+            'integrity': integrity,
+        })
+    return results
+
+
+def compare(current: dict, previous: dict) -> dict:
+    """Relación p50/p95 (actual / anterior) por tamaño y operación; < 1 es una mejora."""
+    previous_by_size = {entry['size']: entry for entry in previous.get('sizes', [])}
+    comparison = {}
+    for entry in current.get('sizes', []):
+        old = previous_by_size.get(entry['size'])
+        if not old:
+            continue
+        per_op = {}
+        for op, stats in entry['operations'].items():
+            old_stats = old['operations'].get(op)
+            if not old_stats:
+                continue
+            per_op[op] = {
+                key: (stats[key] / old_stats[key]) if old_stats.get(key) else None
+                for key in ('p50', 'p95')
+            }
+        comparison[str(entry['size'])] = per_op
+    return comparison
+
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    results_dir = os.path.abspath(args.results_dir)
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    base_workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="bench_db_"))
+
+    sizes = [int(x) for x in args.sizes.split(',') if x.strip()]
+    thread_counts = [int(x) for x in args.threads.split(',') if x.strip()]
+    results = {
+        'benchmark': 'db',
+        'timestamp': time.time(),
+        'config': vars(args),
+        'sizes': [bench_size(size, args, base_workdir) for size in sizes],
+        'concurrency': bench_concurrency(thread_counts, args, base_workdir, min(sizes) if sizes else 0),
+    }
+    if compare_path:
+        with open(compare_path, 'r', encoding='utf-8') as f:
+            results['comparison'] = {'against': compare_path, 'ratios': compare(results, json.load(f))}
+
+    os.makedirs(results_dir, exist_ok=True)
+    output = os.path.join(results_dir, time.strftime('%Y%m%d-%H%M%S') + ".json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"bench_db: Resultados guardados en {output}")
+    os.chdir(_REPO_DIR)
+    if not args.workdir:
+        shutil.rmtree(base_workdir, ignore_errors=True)
+    return results
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,615 @@
+# bench_fakes.py (Dobles locales de Telegram, Google Drive y Hydrax para benchmarks)
+"""
+Sustitutos locales para medir el pipeline sin red:
+
+- FakeTelegramClient / FakeMessage / FakeCallbackQuery: imitan la parte de la API
+  de Pyrogram que usa main.py y sirven videos sintéticos a una velocidad configurable.
+- FakeDriveServer: servidor HTTP que habla el protocolo de subida reanudable,
+  permisos, listado, borrado y 'about' de la API v3 de Drive.
+- FakeHydraxServer: endpoint de importación de Hydrax con latencia y tasa de fallos configurables.
+
+prepare_bench_environment() deja las variables de entorno listas para que
+config.py, google_drive.py e hydrax_api.py apunten a estos servidores.
+"""
+import asyncio
+import email.policy
+import hashlib
+import inspect
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+BENCH_USER_ID = 424242
+BENCH_CHAT_ID = 424242
+
+# =============================================================================
+# SERVIDORES HTTP FALSOS
+# =============================================================================
+
+class _FakeServer:
+    """Base común: servidor HTTP con hilos, latencia artificial y contadores."""
+
+    handler_class = None
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self.handler_class)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    """Manejador HTTP/1.1 con keep-alive y respuestas JSON."""
+
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def log_message(self, format, *args):
+        pass  # Silenciar el log de acceso: distorsionaría las mediciones
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, status: int, payload=None, headers=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b""
+        self.send_response(status)
+        if payload is not None:
+            self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _delay(self):
+        if self.fake.latency > 0:
+            time.sleep(self.fake.latency)
+
+
+# --- Google Drive ---
+
+class _DriveHandler(_JsonHandler):
+
+    def do_POST(self):
+        self._delay()
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        body = self._read_body()
+        drive = self.fake
+
+        if parsed.path == '/token':
+            drive.count('token')
+            return self._send_json(200, {'access_token': 'bench-token', 'expires_in': 3600, 'token_type': 'Bearer'})
+
+        if parsed.path.startswith('/upload/drive/v3/files') and params.get('uploadType') == ['resumable']:
+            drive.count('upload_start')
+            metadata = json.loads(body or b"{}")
+            total = int(self.headers.get('X-Upload-Content-Length') or -1)
+            upload_id = drive.start_upload(metadata, total)
+            location = f"{drive.url}/upload/drive/v3/files?uploadType=resumable&upload_id={upload_id}"
+            return self._send_json(200, {}, headers={'Location': location})
+
+        match = re.fullmatch(r'/drive/v3/files/([^/]+)/permissions', parsed.path)
+        if match:
+            drive.count('permissions_create')
+            file_id = unquote(match.group(1))
+            if not drive.add_permission(file_id, json.loads(body or b"{}")):
+                return self._send_json(404, {'error': {'code': 404, 'message': f'File not found: {file_id}'}})
+            return self._send_json(200, {'id': 'anyoneWithLink'})
+
+        if parsed.path == '/drive/v3/files':
+            # Creación de archivos sin contenido (carpetas)
+            drive.count('files_create')
+            metadata = json.loads(body or b"{}")
+            return self._send_json(200, drive.create_file(metadata, size=0, md5=None))
+
+        if parsed.path.startswith('/batch'):
+            drive.count('batch')
+            return self._handle_batch(body)
+
+        self._send_json(404, {'error': {'code': 404, 'message': 'Not found'}})
+
+    def do_PUT(self):
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        drive = self.fake
+        upload_id = (params.get('upload_id') or [None])[0]
+        body = self._read_body()
+        if not upload_id or upload_id not in drive.uploads:
+            return self._send_json(404, {'error': {'code': 404, 'message': 'Upload not found'}})
+        drive.count('upload_chunk')
+        drive.count('upload_bytes', len(body))
+
+        # Content-Range: "bytes 0-1048575/5242880" o "bytes */5242880" (consulta de estado)
+        content_range = self.headers.get('Content-Range', '')
+        match = re.match(r'bytes (\d+)-(\d+)/(\d+|\*)', content_range)
+        status = drive.receive_chunk(upload_id, int(match.group(1)) if match else 0, body,
+                                     int(match.group(3)) if match and match.group(3) != '*' else None)
+        if status['done']:
+            return self._send_json(200, status['file'])
+        headers = {'Range': f"bytes=0-{status['received'] - 1}"} if status['received'] else {}
+        self._send_json(308, None, headers=headers)
+
+    def do_GET(self):
+        self._delay()
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        drive = self.fake
+
+        if parsed.path == '/_bench/stats':
+            return self._send_json(200, drive.counters)
+        if parsed.path == '/drive/v3/about':
+            drive.count('about')
+            return self._send_json(200, drive.about())
+        if parsed.path == '/drive/v3/files':
+            drive.count('files_list')
+            query = (params.get('q') or [''])[0]
+            page_size = int((params.get('pageSize') or ['100'])[0])
+            return self._send_json(200, drive.list_files(query, page_size))
+        match = re.fullmatch(r'/drive/v3/files/([^/]+)', parsed.path)
+        if match:
+            drive.count('files_get')
+            item = drive.files.get(unquote(match.group(1)))
+            if item is None:
+                return self._send_json(404, {'error': {'code': 404, 'message': 'File not found'}})
+            return self._send_json(200, {k: v for k, v in item.items() if k not in ('size_int', 'permissions')})
+        self._send_json(404, {'error': {'code': 404, 'message': 'Not found'}})
+
+    def do_DELETE(self):
+        self._delay()
+        parsed = urlparse(self.path)
+        match = re.fullmatch(r'/drive/v3/files/([^/]+)', parsed.path)
+        self.fake.count('files_delete')
+        if match and self.fake.delete_file(unquote(match.group(1))):
+            return self._send_json(204, None)
+        self._send_json(404, {'error': {'code': 404, 'message': 'File not found'}})
+
+    def _handle_batch(self, body: bytes):
+        """Procesa una petición batch multipart/mixed (permisos, lecturas de metadatos y borrados)."""
+        boundary_match = re.search(r'boundary="?([^";]+)"?', self.headers.get('Content-Type', ''))
+        if not boundary_match:
+            return self._send_json(400, {'error': {'code': 400, 'message': 'Missing boundary'}})
+        boundary = boundary_match.group(1).encode()
+        out_boundary = "batch_" + uuid.uuid4().hex
+        parts = []
+        for raw_part in body.split(b"--" + boundary):
+            raw_part = raw_part.strip()
+            if not raw_part or raw_part == b"--":
+                continue
+            # googleapiclient separa las líneas con '\n' y pliega los Content-ID largos:
+            # el parser de email acepta ambos finales de línea y despliega las cabeceras
+            part = BytesParser(policy=email.policy.HTTP).parsebytes(raw_part)
+            content_id = (part['Content-ID'] or '').strip('<>')
+            request_line, _, rest = part.get_payload(decode=True).partition(b"\n")
+            inner_body = BytesParser(policy=email.policy.HTTP).parsebytes(rest).get_payload(decode=True) or b""
+            method, url = request_line.decode().split(' ')[:2]
+            status, payload = self._dispatch_batch_item(method, urlparse(url).path, inner_body.strip())
+            response_id = f"response-{content_id}" if content_id else ""
+            parts.append(
+                f"--{out_boundary}\r\nContent-Type: application/http\r\nContent-ID: <{response_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n\r\n{json.dumps(payload or {})}\r\n"
+            )
+        body_out = ("".join(parts) + f"--{out_boundary}--\r\n").encode()
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/mixed; boundary={out_boundary}')
+        self.send_header('Content-Length', str(len(body_out)))
+        self.end_headers()
+        self.wfile.write(body_out)
+
+    def _dispatch_batch_item(self, method: str, path: str, body: bytes):
+        drive = self.fake
+        match = re.fullmatch(r'/drive/v3/files/([^/]+)/permissions', path)
+        if method == 'POST' and match:
+            drive.count('permissions_create')
+            ok = drive.add_permission(unquote(match.group(1)), json.loads(body or b"{}"))
+            return (200, {'id': 'anyoneWithLink'}) if ok else (404, {'error': {'code': 404}})
+        match = re.fullmatch(r'/drive/v3/files/([^/]+)', path)
+        if method == 'DELETE' and match:
+            drive.count('files_delete')
+            return (204, None) if drive.delete_file(unquote(match.group(1))) else (404, {'error': {'code': 404}})
+        if method == 'GET' and match:
+            drive.count('files_get')
+            item = drive.files.get(unquote(match.group(1)))
+            if item is None:
+                return 404, {'error': {'code': 404}}
+            return 200, {k: v for k, v in item.items() if k not in ('size_int', 'permissions')}
+        return 404, {'error': {'code': 404, 'message': 'Not found'}}
+
+
+class FakeDriveServer(_FakeServer):
+    """Imitación en memoria de la API v3 de Drive (solo metadatos y MD5, no guarda contenido)."""
+
+    handler_class = _DriveHandler
+
+    def __init__(self, *args, storage_limit: int = 15 * 1024 ** 4, email: str = "bench@example.com", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.storage_limit = storage_limit
+        self.email = email
+        self.files = {}
+        self.uploads = {}
+
+    def about(self) -> dict:
+        used = sum(item.get('size_int', 0) for item in self.files.values())
+        return {
+            'user': {'emailAddress': self.email},
+            'storageQuota': {'limit': str(self.storage_limit), 'usage': str(used), 'usageInDrive': str(used)},
+        }
+
+    def create_file(self, metadata: dict, size: int, md5) -> dict:
+        file_id = "bench" + uuid.uuid4().hex[:28]
+        now = time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime())
+        item = {
+            'id': file_id,
+            'name': metadata.get('name', 'sin_nombre'),
+            'mimeType': metadata.get('mimeType', 'video/mp4'),
+            'parents': metadata.get('parents', ['root']),
+            'size': str(size),
+            'size_int': size,
+            'createdTime': now,
+            'modifiedTime': now,
+            'permissions': [],
+        }
+        if md5:
+            item['md5Checksum'] = md5
+        with self._lock:
+            self.files[file_id] = item
+        return {k: v for k, v in item.items() if k not in ('size_int', 'permissions')}
+
+    def start_upload(self, metadata: dict, total: int) -> str:
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self.uploads[upload_id] = {'metadata': metadata, 'total': total, 'received': 0, 'md5': hashlib.md5()}
+        return upload_id
+
+    def receive_chunk(self, upload_id: str, offset: int, data: bytes, total) -> dict:
+        upload = self.uploads[upload_id]
+        if total is not None:
+            upload['total'] = total
+        # Solo se acepta lo que continúa exactamente donde quedó la subida
+        if data and offset == upload['received']:
+            upload['md5'].update(data)
+            upload['received'] += len(data)
+        if upload['total'] >= 0 and upload['received'] >= upload['total']:
+            with self._lock:
+                self.uploads.pop(upload_id, None)
+            item = self.create_file(upload['metadata'], size=upload['received'], md5=upload['md5'].hexdigest())
+            return {'done': True, 'file': item, 'received': upload['received']}
+        return {'done': False, 'received': upload['received']}
+
+    def add_permission(self, file_id: str, permission: dict) -> bool:
+        with self._lock:
+            item = self.files.get(file_id)
+            if item is None:
+                return False
+            item['permissions'].append(permission)
+        return True
+
+    def delete_file(self, file_id: str) -> bool:
+        with self._lock:
+            return self.files.pop(file_id, None) is not None
+
+    def list_files(self, query: str, page_size: int) -> dict:
+        """Interpreta el subconjunto de 'q' que usa el bot: ids, padres, nombre y mimeType."""
+        with self._lock:
+            items = list(self.files.values())
+        if query.strip().startswith('id'):
+            wanted = set(re.findall(r"'([^']+)'", query))
+            items = [item for item in items if item['id'] in wanted]
+        parent = re.search(r"'([^']+)' in parents", query)
+        if parent:
+            items = [item for item in items if parent.group(1) in item['parents']]
+        name = re.search(r"name = '((?:[^'\\]|\\.)*)'", query)
+        if name:
+            items = [item for item in items if item['name'] == name.group(1).replace("\\'", "'")]
+        mime = re.search(r"mimeType = '([^']+)'", query)
+        if mime:
+            items = [item for item in items if item['mimeType'] == mime.group(1)]
+        visible = [{k: v for k, v in item.items() if k not in ('size_int', 'permissions')} for item in items[:page_size]]
+        return {'files': visible}
+
+
+# --- Hydrax ---
+
+class _HydraxHandler(_JsonHandler):
+
+    def do_GET(self):
+        hydrax = self.fake
+        parsed = urlparse(self.path)
+        if parsed.path == '/_bench/stats':
+            return self._send_json(200, hydrax.counters)
+        match = re.fullmatch(r'/([^/]+)/drive/([^/]+)', parsed.path)
+        if not match:
+            return self._send_json(404, {'status': False, 'msg': 'Not found'})
+        self._delay()
+        hydrax.count('import')
+        if random.random() < hydrax.failure_rate:
+            hydrax.count('import_failed')
+            return self._send_json(503, {'status': False, 'msg': 'Servicio no disponible (simulado)'})
+        drive_id = match.group(2)
+        hydrax.count('import_ok')
+        self._send_json(200, {'status': True, 'slug': f"slug{drive_id[-10:]}", 'status_video': 'Queued'})
+
+
+class FakeHydraxServer(_FakeServer):
+    """Endpoint de importación de Hydrax con latencia y tasa de fallos (HTTP 503) configurables."""
+
+    handler_class = _HydraxHandler
+
+    def __init__(self, *args, failure_rate: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failure_rate = failure_rate
+
+
+# =============================================================================
+# CLIENTE DE TELEGRAM FALSO
+# =============================================================================
+
+class _Obj:
+    """Contenedor simple de atributos (chat, from_user, video...)."""
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeMessage:
+    """Imita pyrogram.types.Message en lo que usa main.py."""
+
+    _next_id = 1000
+    _id_lock = threading.Lock()
+
+    def __init__(self, client, text: str = None, video=None, message_id: int = None,
+                 chat_id: int = BENCH_CHAT_ID, user_id: int = BENCH_USER_ID, media_group_id=None):
+        self._client = client
+        self.id = message_id if message_id is not None else FakeMessage.new_id()
+        self.chat = _Obj(id=chat_id)
+        self.from_user = _Obj(id=user_id, first_name="Bench")
+        self.text = text
+        self.video = video
+        self.media_group_id = media_group_id
+        self.reply_markup = None
+
+    @classmethod
+    def new_id(cls) -> int:
+        with cls._id_lock:
+            cls._next_id += 1
+            return cls._next_id
+
+    @classmethod
+    def video_message(cls, client, size: int, user_id: int = BENCH_USER_ID, media_group_id=None, message_id: int = None):
+        message_id = message_id if message_id is not None else cls.new_id()
+        video = _Obj(file_name=f"bench_{message_id}.mp4", file_size=size, file_id=f"video{message_id}")
+        return cls(client, video=video, message_id=message_id, user_id=user_id, chat_id=user_id, media_group_id=media_group_id)
+
+    async def reply_text(self, text: str, **kwargs):
+        return await self._client.send_message(self.chat.id, text, **kwargs)
+
+    async def edit_text(self, text: str, **kwargs):
+        await self._client._api_call("edit_message_text")
+        self.text = text
+        self.reply_markup = kwargs.get('reply_markup')
+        return self
+
+    async def delete(self):
+        await self._client._api_call("delete_messages")
+        return True
+
+
+class FakeCallbackQuery:
+    """Imita pyrogram.types.CallbackQuery."""
+
+    def __init__(self, client, data: str, message: FakeMessage, user_id: int = BENCH_USER_ID):
+        self._client = client
+        self.data = data
+        self.message = message
+        self.from_user = _Obj(id=user_id, first_name="Bench")
+        self.answered_at = None
+
+    async def answer(self, text: str = None, show_alert: bool = False, **kwargs):
+        await self._client._api_call("answer_callback_query")
+        if self.answered_at is None:
+            self.answered_at = time.perf_counter()
+        return True
+
+
+class FakeTelegramClient:
+    """
+    Imita el cliente de Pyrogram: sirve videos sintéticos a 'download_rate' bytes/s
+    y puede simular FloodWait en las llamadas a la API con probabilidad 'flood_wait_rate'.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, download_dir: str = "downloads", download_rate: float = 0.0,
+                 api_latency: float = 0.0, flood_wait_rate: float = 0.0, flood_wait_seconds: int = 1):
+        self.download_dir = download_dir
+        self.download_rate = download_rate
+        self.api_latency = api_latency
+        self.flood_wait_rate = flood_wait_rate
+        self.flood_wait_seconds = flood_wait_seconds
+        self.counters = {}
+        self.messages = {}
+        self._chunk = os.urandom(self.CHUNK_SIZE)
+
+    def _count(self, key: str, amount: int = 1):
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    async def _api_call(self, name: str):
+        """Simula la latencia de la API de Telegram y, opcionalmente, un FloodWait."""
+        self._count(name)
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+        if self.flood_wait_rate and random.random() < self.flood_wait_rate:
+            from pyrogram.errors import FloodWait
+            self._count("flood_wait_raised")
+            raise FloodWait(value=self.flood_wait_seconds)
+
+    async def send_message(self, chat_id, text: str, **kwargs):
+        await self._api_call("send_message")
+        message = FakeMessage(self, text=text, chat_id=chat_id)
+        message.reply_markup = kwargs.get('reply_markup')
+        self.messages[(chat_id, message.id)] = message
+        return message
+
+    async def edit_message_text(self, chat_id, message_id: int, text: str, **kwargs):
+        message = self.messages.get((chat_id, message_id)) or FakeMessage(self, chat_id=chat_id, message_id=message_id)
+        return await message.edit_text(text, **kwargs)
+
+    async def get_messages(self, chat_id, message_ids):
+        await self._api_call("get_messages")
+        return self.messages.get((chat_id, message_ids))
+
+    async def set_bot_commands(self, commands):
+        await self._api_call("set_bot_commands")
+        return True
+
+    async def _iter_synthetic_chunks(self, total: int):
+        sent = 0
+        started = time.perf_counter()
+        while sent < total:
+            size = min(self.CHUNK_SIZE, total - sent)
+            chunk = self._chunk if size == self.CHUNK_SIZE else self._chunk[:size]
+            sent += size
+            if self.download_rate:
+                # Ritmo constante: esperar hasta el instante en que el chunk "habría llegado"
+                delay = started + sent / self.download_rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                await asyncio.sleep(0)
+            yield chunk
+
+    async def stream_media(self, message, limit: int = 0, offset: int = 0):
+        """Genera el contenido sintético del video en chunks de 1 MB."""
+        self._count("stream_media")
+        total = message.video.file_size
+        skip = offset * self.CHUNK_SIZE
+        emitted = 0
+        async for chunk in self._iter_synthetic_chunks(total - skip):
+            yield chunk
+            emitted += 1
+            if limit and emitted >= limit:
+                break
+
+    async def download_media(self, message, file_name: str = None, progress=None, **kwargs):
+        """Escribe el video sintético en disco llamando a 'progress(current, total)' como Pyrogram."""
+        self._count("download_media")
+        total = message.video.file_size
+        directory = self.download_dir
+        name = message.video.file_name
+        if file_name:
+            if file_name.endswith('/'):
+                directory = file_name
+            else:
+                directory, name = os.path.split(file_name)
+        os.makedirs(directory or ".", exist_ok=True)
+        path = os.path.abspath(os.path.join(directory, name))
+        current = 0
+        with open(path + ".temp", 'wb') as f:
+            async for chunk in self._iter_synthetic_chunks(total):
+                f.write(chunk)
+                current += len(chunk)
+                if progress:
+                    result = progress(current, total)
+                    if inspect.isawaitable(result):
+                        await result
+        os.replace(path + ".temp", path)
+        return path
+
+
+# =============================================================================
+# PREPARACIÓN DEL ENTORNO
+# =============================================================================
+
+def prepare_bench_environment(workdir: str, drive_url: str, hydrax_url: str, extra_env: dict = None):
+    """
+    Configura variables de entorno y directorio de trabajo para importar main.py
+    contra los servidores falsos. Debe llamarse ANTES de importar config/main.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    # google-auth ignora 'token_uri' y sin 'expiry' da el token por caducado: refrescaría
+    # contra oauth2.googleapis.com. Con una caducidad lejana no se refresca nunca.
+    expiry = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() + 7 * 24 * 3600))
+    token = {
+        'token': 'bench-token',
+        'refresh_token': 'bench-refresh',
+        'client_id': 'bench-client',
+        'client_secret': 'bench-secret',
+        'token_uri': f"{drive_url}/token",
+        'expiry': expiry,
+    }
+    env = {
+        'API_ID': '1',
+        'API_HASH': 'bench',
+        'BOT_TOKEN': '1:bench',
+        'HYDRAX_API_KEY': 'benchkey',
+        'HYDRAX_API_URL': hydrax_url,
+        'TOKEN_JSON_DATA': json.dumps(token),
+        'DRIVE_API_ENDPOINT': f"{drive_url}/drive/v3/",
+        'WHITELISTED_USERS': '',
+        'TRACE_LOG_PATH': os.path.join(workdir, 'traces.jsonl'),
+    }
+    env.update(extra_env or {})
+    os.environ.update(env)
+
+
+async def run_video_handler(handle_video, client, message):
+    """
+    Entrega el video a handle_video y espera a que termine su trabajo: el manejador solo
+    lo encola en el planificador y devuelve la tarea que lo procesa.
+    """
+    task = await handle_video(client, message)
+    if task is not None:
+        await task
+
+
+def fetch_json(url: str) -> dict:
+    """Descarga un JSON (contadores de los servidores falsos) sin dependencias externas."""
+    from urllib.request import urlopen
+    with urlopen(url, timeout=10) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def percentiles(values: list, pcts=(50, 95, 99)) -> dict:
+    """Percentiles exactos (método nearest-rank) de una lista de valores."""
+    if not values:
+        return {f"p{p}": None for p in pcts}
+    ordered = sorted(values)
+    result = {}
+    for p in pcts:
+        rank = max(1, int(-(-len(ordered) * p // 100)))
+        result[f"p{p}"] = ordered[rank - 1]
+    return result
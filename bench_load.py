@@ -0,0 +1,249 @@
+# bench_load.py (Generador de carga concurrente para los manejadores de mensajes)
+"""
+Envía objetos Message y CallbackQuery sintéticos a handle_video, list_command y
+callback_handler con distintos niveles de concurrencia, contra los dobles locales
+de bench_fakes.py (Pyrogram, Drive y Hydrax).
+
+Por cada nivel informa: distribución de latencias por manejador y del trabajo
+completo de cada video (con su espera de turno en el planificador), FloodWaits
+simulados, conflictos de lease (try_start_processing rechazado), crecimiento de
+memoria y throughput, e indica a partir de qué nivel el bot se degrada.
+
+Uso:
+    python bench_load.py --levels 1,10,50 --size-mb 5 --refresh-rate 2 --flood-wait-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+_REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+if _REPO_DIR not in sys.path:
+    sys.path.insert(0, _REPO_DIR)
+
+from bench_fakes import (
+    FakeDriveServer, FakeHydraxServer, FakeTelegramClient, FakeMessage, FakeCallbackQuery,
+    prepare_bench_environment, percentiles,
+)
+
+MB = 1024 * 1024
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de los manejadores de Telegram.")
+    parser.add_argument("--levels", default="1,10,50", help="Niveles de videos simultáneos, separados por comas")
+    parser.add_argument("--size-mb", type=float, default=5.0, help="Tamaño de cada video (MB)")
+    parser.add_argument("--download-mbps", type=float, default=20.0, help="Velocidad de descarga simulada por video (MB/s)")
+    parser.add_argument("--list-rate", type=float, default=0.5, help="Comandos /list por segundo durante la prueba")
+    parser.add_argument("--refresh-rate", type=float, default=2.0, help="Clics en 'Refrescar' por segundo durante la prueba")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05,
+                        help="Probabilidad de reenviar la misma actualización de video (provoca conflictos de lease)")
+    parser.add_argument("--flood-wait-rate", type=float, default=0.0, help="Probabilidad de FloodWait por llamada a Telegram")
+    parser.add_argument("--flood-wait-seconds", type=int, default=1, help="Duración de cada FloodWait simulado (s)")
+    parser.add_argument("--telegram-latency", type=float, default=0.02, help="Latencia por llamada a la API de Telegram (s)")
+    parser.add_argument("--drive-latency", type=float, default=0.01, help="Latencia por petición al Drive falso (s)")
+    parser.add_argument("--hydrax-latency", type=float, default=0.05, help="Latencia por petición al Hydrax falso (s)")
+    parser.add_argument("--hydrax-failure-rate", type=float, default=0.0, help="Probabilidad de HTTP 503 en Hydrax")
+    parser.add_argument("--degradation-factor", type=float, default=2.0,
+                        help="Un nivel se considera degradado si su p95 supera este múltiplo del p95 del primer nivel")
+    parser.add_argument("--scheduler-concurrency", type=int, default=4,
+                        help="Videos procesados a la vez (SCHEDULER_CONCURRENCY del bot; 0 = sin límite)")
+    parser.add_argument("--workdir", default=None, help="Directorio de trabajo (por defecto uno temporal)")
+    parser.add_argument("--output", default=None, help="Archivo donde guardar el JSON de resultados")
+    return parser.parse_args(argv)
+
+
+def _current_rss_bytes() -> int:
+    """RSS actual del proceso (Linux: /proc/self/statm); si no está disponible, el pico."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _LeaseCounter:
+    """Envuelve try_start_processing para contar los rechazos (conflictos de lease)."""
+
+    def __init__(self, func):
+        self.func = func
+        self.granted = 0
+        self.conflicts = 0
+
+    def __call__(self, message_id):
+        ok = self.func(message_id)
+        if ok:
+            self.granted += 1
+        else:
+            self.conflicts += 1
+        return ok
+
+
+async def _timed(latencies: dict, name: str, coro, errors: dict):
+    started = time.perf_counter()
+    try:
+        await coro
+    except Exception as e:
+        errors[name] = errors.get(name, 0) + 1
+        print(f"bench_load: Error en {name}: {e}")
+    finally:
+        latencies.setdefault(name, []).append((time.perf_counter() - started) * 1000.0)
+
+
+async def run_level(main, args, videos: int) -> dict:
+    """Ejecuta un nivel de carga: 'videos' simultáneos más /list y refrescos constantes."""
+    client = FakeTelegramClient(
+        download_dir=os.path.abspath("downloads"),
+        download_rate=args.download_mbps * MB,
+        api_latency=args.telegram_latency,
+        flood_wait_rate=args.flood_wait_rate,
+        flood_wait_seconds=args.flood_wait_seconds,
+    )
+    lease = _LeaseCounter(main.try_start_processing)
+    main.try_start_processing = lease
+    latencies = {}
+    errors = {}
+    answer_latencies = []
+    size = int(args.size_mb * MB)
+
+    tracemalloc.start()
+    rss_before = _current_rss_bytes()
+    started = time.perf_counter()
+
+    async def deliver_video(message):
+        # handle_video solo encola el trabajo en el planificador: su latencia se mide aparte
+        # de la del trabajo completo ("video_job"), que incluye la espera de turno
+        handled = {}
+
+        async def handle():
+            handled['task'] = await main.handle_video(client, message)
+
+        await _timed(latencies, "handle_video", handle(), errors)
+        if handled.get('task') is not None:
+            await _timed(latencies, "video_job", handled['task'], errors)
+
+    video_tasks = []
+    for _ in range(videos):
+        message = FakeMessage.video_message(client, size)
+        video_tasks.append(asyncio.create_task(deliver_video(message)))
+        if random.random() < args.duplicate_rate:
+            # Misma actualización entregada dos veces (reintento de Telegram / doble reenvío)
+            duplicate = FakeMessage.video_message(client, size, message_id=message.id)
+            video_tasks.append(asyncio.create_task(deliver_video(duplicate)))
+    videos_done = asyncio.gather(*video_tasks)
+
+    # Mensaje de lista sobre el que se pulsará "Refrescar"
+    list_message = await client.send_message(FakeMessage(client).chat.id, "📋 lista")
+
+    async def steady(rate: float, make_coro, name: str):
+        if rate <= 0:
+            return
+        background = []
+        while not videos_done.done():
+            background.append(asyncio.create_task(_timed(latencies, name, make_coro(), errors)))
+            await asyncio.sleep(1.0 / rate)
+        await asyncio.gather(*background)
+
+    async def refresh_click():
+        query = FakeCallbackQuery(client, "list_1", list_message)
+        clicked = time.perf_counter()
+        await main.callback_handler(client, query)
+        if query.answered_at is not None:
+            answer_latencies.append((query.answered_at - clicked) * 1000.0)
+
+    await asyncio.gather(
+        videos_done,
+        steady(args.list_rate, lambda: main.list_command(client, FakeMessage(client, text="/list")), "list_command"),
+        steady(args.refresh_rate, refresh_click, "callback_handler"),
+    )
+    wall = time.perf_counter() - started
+    rss_after = _current_rss_bytes()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    main.try_start_processing = lease.func
+
+    return {
+        'videos': videos,
+        'wall_s': wall,
+        'videos_per_s': lease.granted / wall if wall else 0.0,
+        'handlers': {
+            name: dict(count=len(values), mean_ms=sum(values) / len(values), max_ms=max(values), **percentiles(values))
+            for name, values in latencies.items()
+        },
+        'callback_answer_ms': percentiles(answer_latencies),
+        'handler_errors': errors,
+        'flood_waits_simulated': client.counters.get('flood_wait_raised', 0),
+        'lease_granted': lease.granted,
+        'lease_conflicts': lease.conflicts,
+        'rss_growth_bytes': rss_after - rss_before,
+        'python_heap_peak_bytes': traced_peak,
+        'telegram_calls': client.counters,
+    }
+
+
+def _find_degradation(levels: list, factor: float):
+    """Primer nivel cuyo p95 de handle_video o de callbacks supera 'factor' veces el del primer nivel."""
+    if not levels:
+        return None
+    base = levels[0]['handlers']
+    for level in levels[1:]:
+        for name in ("handle_video", "callback_handler"):
+            base_p95 = (base.get(name) or {}).get('p95')
+            p95 = (level['handlers'].get(name) or {}).get('p95')
+            if base_p95 and p95 and p95 > base_p95 * factor:
+                return {'videos': level['videos'], 'handler': name, 'p95_ms': p95, 'baseline_p95_ms': base_p95}
+    return None
+
+
+async def run_all(args) -> list:
+    import main
+    from loop_monitor import start_loop_monitor, get_loop_metrics
+    start_loop_monitor()
+    results = []
+    for level in [int(x) for x in args.levels.split(',') if x.strip()]:
+        print(f"bench_load: === Nivel {level} videos simultáneos ===")
+        result = await run_level(main, args, level)
+        result['event_loop'] = get_loop_metrics()
+        results.append(result)
+    return results
+
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="bench_load_"))
+    output = os.path.abspath(args.output) if args.output else None
+
+    drive = FakeDriveServer(latency=args.drive_latency).start()
+    hydrax = FakeHydraxServer(latency=args.hydrax_latency, failure_rate=args.hydrax_failure_rate).start()
+    prepare_bench_environment(workdir, drive.url, hydrax.url,
+                              {'SCHEDULER_CONCURRENCY': str(args.scheduler_concurrency)})
+    try:
+        levels = asyncio.run(run_all(args))
+    finally:
+        drive.stop()
+        hydrax.stop()
+
+    results = {
+        'benchmark': 'load',
+        'timestamp': time.time(),
+        'config': vars(args),
+        'workdir': workdir,
+        'levels': levels,
+        'degrades_at': _find_degradation(levels, args.degradation_factor),
+    }
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+    return results
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,168 @@
+# bench_pipeline.py (Benchmark de extremo a extremo: handle_video -> Drive -> Hydrax contra dobles locales)
+"""
+Ejecuta el flujo real handle_video -> upload_to_drive_async_with_progress -> import_to_hydrax
+contra los servidores falsos de bench_fakes.py y emite resultados en JSON.
+
+Uso:
+    python bench_pipeline.py --videos 20 --size-mb 50 --download-mbps 40 --output resultados.json
+
+Requiere las dependencias de requirements.txt (pyrogram, google-api-python-client, ...).
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+_REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+if _REPO_DIR not in sys.path:
+    sys.path.insert(0, _REPO_DIR)
+
+from bench_fakes import (
+    FakeDriveServer, FakeHydraxServer, FakeTelegramClient, FakeMessage,
+    prepare_bench_environment, run_video_handler, fetch_json, percentiles,
+)
+
+MB = 1024 * 1024
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo del pipeline de videos.")
+    parser.add_argument("--videos", type=int, default=10, help="Número de videos sintéticos a procesar")
+    parser.add_argument("--size-mb", type=float, default=20.0, help="Tamaño de cada video (MB)")
+    parser.add_argument("--arrival-interval", type=float, default=0.0,
+                        help="Segundos entre la llegada de un video y el siguiente (0 = todos a la vez)")
+    parser.add_argument("--download-mbps", type=float, default=0.0,
+                        help="Velocidad de descarga simulada de Telegram por video (MB/s, 0 = sin límite)")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="Latencia de cada llamada a la API de Telegram (s)")
+    parser.add_argument("--drive-latency", type=float, default=0.0, help="Latencia por petición al Drive falso (s)")
+    parser.add_argument("--hydrax-latency", type=float, default=0.0, help="Latencia por petición al Hydrax falso (s)")
+    parser.add_argument("--hydrax-failure-rate", type=float, default=0.0, help="Probabilidad de HTTP 503 en Hydrax (0-1)")
+    parser.add_argument("--scheduler-concurrency", type=int, default=4,
+                        help="Videos procesados a la vez (SCHEDULER_CONCURRENCY del bot; 0 = sin límite)")
+    parser.add_argument("--workdir", default=None, help="Directorio de trabajo (por defecto uno temporal)")
+    parser.add_argument("--output", default=None, help="Archivo donde guardar el JSON de resultados")
+    return parser.parse_args(argv)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+async def _sample_disk(path: str, peak: dict, stop: asyncio.Event, interval: float = 0.05):
+    """Muestrea periódicamente el uso del directorio de descargas y guarda el pico."""
+    while not stop.is_set():
+        peak['bytes'] = max(peak['bytes'], _dir_size(path))
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def _stage_latencies(trace_path: str) -> dict:
+    """Calcula percentiles exactos por etapa a partir del log de trazas del benchmark."""
+    durations = {}
+    if not os.path.exists(trace_path):
+        return {}
+    with open(trace_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get('ok', True):
+                durations.setdefault(record['stage'], []).append(record['duration_ms'])
+    return {
+        stage: dict(count=len(values), mean_ms=sum(values) / len(values), **percentiles(values))
+        for stage, values in durations.items()
+    }
+
+
+async def run_benchmark(args) -> dict:
+    import main
+    from loop_monitor import start_loop_monitor, get_loop_metrics
+
+    start_loop_monitor()
+    download_dir = os.path.abspath("downloads")
+    client = FakeTelegramClient(
+        download_dir=download_dir,
+        download_rate=args.download_mbps * MB,
+        api_latency=args.telegram_latency,
+    )
+    size = int(args.size_mb * MB)
+
+    disk_peak = {'bytes': 0}
+    stop_sampler = asyncio.Event()
+    sampler = asyncio.create_task(_sample_disk(download_dir, disk_peak, stop_sampler))
+
+    async def one_video(delay: float):
+        if delay:
+            await asyncio.sleep(delay)
+        message = FakeMessage.video_message(client, size)
+        await run_video_handler(main.handle_video, client, message)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_video(i * args.arrival_interval) for i in range(args.videos)))
+    wall = time.perf_counter() - started
+
+    stop_sampler.set()
+    await sampler
+    return {'wall_s': wall, 'disk_peak_bytes': disk_peak['bytes'], 'telegram_calls': client.counters,
+            'event_loop': get_loop_metrics()}
+
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="bench_pipeline_"))
+    output = os.path.abspath(args.output) if args.output else None
+
+    drive = FakeDriveServer(latency=args.drive_latency).start()
+    hydrax = FakeHydraxServer(latency=args.hydrax_latency, failure_rate=args.hydrax_failure_rate).start()
+    prepare_bench_environment(workdir, drive.url, hydrax.url,
+                              {'SCHEDULER_CONCURRENCY': str(args.scheduler_concurrency)})
+
+    try:
+        run = asyncio.run(run_benchmark(args))
+        stages = _stage_latencies(os.path.join(workdir, 'traces.jsonl'))
+        completed = stages.get('total', {}).get('count', 0)
+        total_bytes = int(args.size_mb * MB) * completed
+        results = {
+            'benchmark': 'pipeline',
+            'timestamp': time.time(),
+            'config': vars(args),
+            'workdir': workdir,
+            'wall_s': run['wall_s'],
+            'videos_ok': completed,
+            'videos_failed': args.videos - completed,
+            'throughput_videos_per_s': completed / run['wall_s'] if run['wall_s'] else 0.0,
+            'throughput_bytes_per_s': total_bytes / run['wall_s'] if run['wall_s'] else 0.0,
+            'stages': stages,
+            # ru_maxrss está en KB en Linux; incluye los servidores falsos (mismo proceso)
+            'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            'peak_disk_bytes': run['disk_peak_bytes'],
+            'event_loop': run['event_loop'],
+            'telegram_calls': run['telegram_calls'],
+            'drive_calls': fetch_json(f"{drive.url}/_bench/stats"),
+            'hydrax_calls': fetch_json(f"{hydrax.url}/_bench/stats"),
+        }
+    finally:
+        drive.stop()
+        hydrax.stop()
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+    return results
+
+
+if __name__ == "__main__":
+    main_cli()
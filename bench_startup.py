@@ -0,0 +1,120 @@
+# bench_startup.py (Benchmark de arranque: importaciones, primer update y pre-calentamiento)
+"""
+Lanza el bot en procesos nuevos (arranque en frío) contra los dobles locales de
+bench_fakes.py y mide, desde el lanzamiento del proceso:
+
+- import_ms: tiempo hasta terminar de importar main.py,
+- first_update_ms: tiempo hasta que el primer update (/start) se ha procesado,
+- prewarm_ms: tiempo hasta que el pre-calentamiento en segundo plano termina.
+
+Uso:
+    python bench_startup.py --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+_REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+if _REPO_DIR not in sys.path:
+    sys.path.insert(0, _REPO_DIR)
+
+_RESULT_PREFIX = "BENCH_STARTUP_RESULT "
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del tiempo de arranque del bot.")
+    parser.add_argument("--runs", type=int, default=5, help="Número de arranques en frío a medir")
+    parser.add_argument("--drive-latency", type=float, default=0.05, help="Latencia por petición al Drive falso (s)")
+    parser.add_argument("--hydrax-latency", type=float, default=0.05, help="Latencia por petición al Hydrax falso (s)")
+    parser.add_argument("--output", default=None, help="Archivo donde guardar el JSON de resultados")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--drive-url", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--hydrax-url", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def run_child(args):
+    """Proceso hijo: arranca el bot y envía el primer update en cuanto el loop está listo."""
+    spawned_at = float(os.environ["BENCH_SPAWN_TIME"])
+    from bench_fakes import FakeTelegramClient, FakeMessage, prepare_bench_environment
+    prepare_bench_environment(args.workdir, args.drive_url, args.hydrax_url)
+
+    marks = {'interpreter_ms': (time.time() - spawned_at) * 1000.0}
+    import main
+    marks['import_ms'] = (time.time() - spawned_at) * 1000.0
+
+    import asyncio
+
+    async def child_main():
+        import warmup
+        main.start_background_services()
+        client = FakeTelegramClient()
+        await main.start_command(client, FakeMessage(client, text="/start"))
+        marks['first_update_ms'] = (time.time() - spawned_at) * 1000.0
+        await warmup.start_prewarm()
+        marks['prewarm_ms'] = (time.time() - spawned_at) * 1000.0
+        marks['prewarm_components'] = warmup.get_readiness()
+
+    asyncio.run(child_main())
+    sys.stdout.write(_RESULT_PREFIX + json.dumps(marks) + "\n")
+    sys.stdout.flush()
+
+
+def _summary(values: list) -> dict:
+    ordered = sorted(values)
+    return {'min': ordered[0], 'median': ordered[len(ordered) // 2], 'max': ordered[-1]}
+
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        return run_child(args)
+
+    from bench_fakes import FakeDriveServer, FakeHydraxServer
+    drive = FakeDriveServer(latency=args.drive_latency).start()
+    hydrax = FakeHydraxServer(latency=args.hydrax_latency).start()
+    runs = []
+    try:
+        for i in range(args.runs):
+            workdir = tempfile.mkdtemp(prefix="bench_startup_")
+            env = dict(os.environ, BENCH_SPAWN_TIME=repr(time.time()))
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child",
+                 "--drive-url", drive.url, "--hydrax-url", hydrax.url, "--workdir", workdir],
+                env=env, capture_output=True, text=True, timeout=300,
+            )
+            lines = [line for line in completed.stdout.splitlines() if line.startswith(_RESULT_PREFIX)]
+            if completed.returncode != 0 or not lines:
+                print(f"bench_startup: El arranque {i + 1} falló (código {completed.returncode}):\n{completed.stderr[-2000:]}")
+                continue
+            runs.append(json.loads(lines[-1][len(_RESULT_PREFIX):]))
+            print(f"bench_startup: Arranque {i + 1}/{args.runs}: primer update en {runs[-1]['first_update_ms']:.0f}ms")
+    finally:
+        drive.stop()
+        hydrax.stop()
+
+    results = {
+        'benchmark': 'startup',
+        'timestamp': time.time(),
+        'config': {k: v for k, v in vars(args).items() if k in ('runs', 'drive_latency', 'hydrax_latency')},
+        'runs': runs,
+        'summary': {
+            key: _summary([run[key] for run in runs])
+            for key in ('interpreter_ms', 'import_ms', 'first_update_ms', 'prewarm_ms') if runs
+        },
+    }
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+    return results
+
+
+if __name__ == "__main__":
+    main_cli()
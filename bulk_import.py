@@ -0,0 +1,168 @@
+# bulk_import.py (Re-importación masiva a Hydrax de archivos ya subidos a Drive)
+"""
+Importa (o re-importa) a Hydrax archivos que ya están en Google Drive, sin volver a
+enviarlos por Telegram: tras una caída de Hydrax o un cambio de cuenta.
+
+Selecciones del registro (uploaded_files_db.json):
+- missing: entradas sin slug de Hydrax (nunca importadas o solo con fallos),
+- failed: entradas cuyo último intento de importación falló,
+- all: todas las entradas.
+
+También se pueden pasar IDs de Drive arbitrarios. El resultado de cada importación
+se guarda en el registro (solo para IDs registrados).
+
+Uso:
+    python bulk_import.py --select missing --concurrency 4 --rate 2
+    python bulk_import.py --ids ID1 ID2 ID3
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+SELECTIONS = ('missing', 'failed', 'all')
+
+
+def select_registry_entries(selection: str = 'missing') -> list:
+    """Devuelve los IDs de Drive del registro que corresponden a la selección."""
+    from db import get_uploaded_file_entries
+    if selection not in SELECTIONS:
+        raise ValueError(f"Selección desconocida '{selection}'. Usa una de: {', '.join(SELECTIONS)}.")
+    entries = get_uploaded_file_entries()
+    if selection == 'missing':
+        entries = [entry for entry in entries if not entry.get('hydrax_slug')]
+    elif selection == 'failed':
+        entries = [entry for entry in entries if entry.get('hydrax_success') is False]
+    return [entry['file_id'] for entry in entries]
+
+
+class BulkImportProgress:
+    """Contadores agregados de una re-importación masiva."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.ok = 0
+        self.failed = 0
+        self.failures = []  # [(drive_id, error)]
+        self.started_at = time.monotonic()
+        self.finished = False
+
+    @property
+    def done(self) -> int:
+        return self.ok + self.failed
+
+    def rate(self) -> float:
+        """Importaciones terminadas por segundo desde el inicio."""
+        elapsed = time.monotonic() - self.started_at
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def eta_seconds(self):
+        rate = self.rate()
+        if not rate:
+            return None
+        return (self.total - self.done) / rate
+
+    def summary(self) -> str:
+        """Resumen de una línea (para logs, la CLI y el mensaje de progreso)."""
+        text = f"{self.done}/{self.total} (✅ {self.ok}, ❌ {self.failed}) — {self.rate():.2f}/s"
+        eta = self.eta_seconds()
+        if not self.finished and eta is not None:
+            text += f", quedan ~{int(eta)}s"
+        return text
+
+
+async def bulk_import_to_hydrax(drive_ids, concurrency: int = None, rate: float = None,
+                                on_progress=None, record: bool = True) -> BulkImportProgress:
+    """
+    Importa los IDs a Hydrax con como máximo 'concurrency' importaciones simultáneas y
+    'rate' importaciones iniciadas por segundo. Llama a on_progress(progress) tras cada
+    archivo. Con record=True guarda cada resultado en el registro: las escrituras van de
+    una en una y cada una incluye todos los resultados acumulados mientras esperaba.
+    """
+    from db import set_hydrax_results
+    from hydrax_api import import_to_hydrax_async
+    from rate_limit import AsyncRateLimiter
+
+    concurrency = concurrency or config.HYDRAX_BATCH_CONCURRENCY
+    rate = config.HYDRAX_RATE_LIMIT if rate is None else rate
+    # Quitar duplicados conservando el orden
+    drive_ids = list(dict.fromkeys(drive_ids))
+    progress = BulkImportProgress(len(drive_ids))
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    limiter = AsyncRateLimiter(rate)
+    loop = asyncio.get_running_loop()
+    unrecorded = {}   # {drive_id: resultado} aún sin guardar en el registro
+    record_lock = asyncio.Lock()
+    logger.info(f"Importando {len(drive_ids)} archivos a Hydrax (concurrencia {concurrency}, {rate}/s).")
+
+    async def import_one(drive_id):
+        async with semaphore:
+            await limiter.acquire()
+            try:
+                result = await import_to_hydrax_async(drive_id)
+            except Exception as e:
+                result = {"success": False, "error": f"Error interno: {e}"}
+        if result.get("success"):
+            progress.ok += 1
+        else:
+            progress.failed += 1
+            progress.failures.append((drive_id, result.get("error")))
+        if record:
+            unrecorded[drive_id] = result
+            async with record_lock:
+                if unrecorded:
+                    batch = dict(unrecorded)
+                    unrecorded.clear()
+                    await loop.run_in_executor(None, set_hydrax_results, batch)
+        if on_progress:
+            on_progress(progress)
+
+    await asyncio.gather(*(import_one(drive_id) for drive_id in drive_ids))
+    progress.finished = True
+    logger.info(f"Terminado: {progress.summary()}")
+    return progress
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Re-importación masiva a Hydrax de archivos ya subidos a Drive.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--select", choices=SELECTIONS, default='missing', help="Entradas del registro a importar")
+    source.add_argument("--ids", nargs='+', help="IDs de Drive arbitrarios a importar")
+    parser.add_argument("--concurrency", type=int, default=None, help="Importaciones simultáneas (HYDRAX_BATCH_CONCURRENCY)")
+    parser.add_argument("--rate", type=float, default=None, help="Importaciones por segundo (HYDRAX_RATE_LIMIT; 0 = sin límite)")
+    parser.add_argument("--no-record", action="store_true", help="No guardar los resultados en el registro")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None):
+    import logging_config
+    logging_config.setup_logging()
+    args = parse_args(argv)
+    drive_ids = args.ids or select_registry_entries(args.select)
+    if not drive_ids:
+        print("bulk_import: No hay archivos que importar.")
+        return None
+
+    last_print = [0.0]
+
+    def print_progress(progress):
+        now = time.monotonic()
+        if now - last_print[0] >= 1.0 or progress.done == progress.total:
+            last_print[0] = now
+            print(f"bulk_import: {progress.summary()}")
+
+    progress = asyncio.run(bulk_import_to_hydrax(
+        drive_ids, concurrency=args.concurrency, rate=args.rate,
+        on_progress=print_progress, record=not args.no_record,
+    ))
+    for drive_id, error in progress.failures:
+        print(f"bulk_import: ❌ {drive_id}: {error}")
+    return progress
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,193 @@
+# circuit_breaker.py (Circuit breakers para las dependencias externas: Hydrax y Google Drive)
+"""
+Cada dependencia tiene un breaker que mira la tasa de error de las últimas llamadas:
+
+- closed: todo normal; si en CIRCUIT_WINDOW_SECONDS hay al menos CIRCUIT_MIN_CALLS
+  llamadas y la fracción de fallos llega a CIRCUIT_FAILURE_RATE, se abre.
+- open: las llamadas fallan al instante (CircuitOpenError) durante CIRCUIT_OPEN_SECONDS.
+- half_open: pasado ese tiempo se dejan pasar CIRCUIT_HALF_OPEN_PROBES llamadas de prueba;
+  si salen bien se cierra, si fallan vuelve a abrirse.
+
+Es thread-safe: las llamadas a Drive e Hydrax se hacen desde hilos del executor.
+"""
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from collections import deque
+
+import config
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """La dependencia está marcada como caída: no se intenta la llamada."""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} no está disponible (circuito abierto); reintento posible en {int(retry_after)}s.")
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_rate: float, min_calls: int, window_seconds: float,
+                 open_seconds: float, half_open_probes: int = 1):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self._outcomes = deque()  # [(timestamp, ok)]
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+        self._last_change = time.time()
+        self._times_opened = 0
+
+    def _set_state(self, state: str):
+        if state != self._state:
+            logger.info(f"'{self.name}' {self._state} -> {state}")
+            self._state = state
+            self._last_change = time.time()
+            if state == OPEN:
+                self._opened_at = time.monotonic()
+                self._times_opened += 1
+            if state != HALF_OPEN:
+                self._probes_in_flight = 0
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._set_state(HALF_OPEN)
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def retry_after(self) -> float:
+        """Segundos hasta que el breaker deje pasar una llamada de prueba (0 si ya deja pasar)."""
+        with self._lock:
+            if self._current_state() != OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> bool:
+        """¿Se puede hacer la llamada ahora? En half_open reserva una de las llamadas de prueba."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def check(self):
+        """Como allow(), pero lanza CircuitOpenError si no se puede llamar."""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def record_success(self):
+        with self._lock:
+            if self._current_state() == HALF_OPEN:
+                self._outcomes.clear()
+                self._set_state(CLOSED)
+                return
+            self._record(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self._current_state() == HALF_OPEN:
+                self._set_state(OPEN)
+                return
+            self._record(False)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._set_state(OPEN)
+
+    def _record(self, ok: bool):
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+
+    def status(self) -> dict:
+        with self._lock:
+            state = self._current_state()
+            calls = len(self._outcomes)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            return {
+                'state': state,
+                'recent_calls': calls,
+                'recent_failures': failures,
+                'retry_after_s': round(max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)), 1) if state == OPEN else 0.0,
+                'since': self._last_change,
+                'times_opened': self._times_opened,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Devuelve el breaker de la dependencia ('hydrax', 'drive'), creándolo con la configuración global."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(
+                name,
+                failure_rate=config.CIRCUIT_FAILURE_RATE,
+                min_calls=config.CIRCUIT_MIN_CALLS,
+                window_seconds=config.CIRCUIT_WINDOW_SECONDS,
+                open_seconds=config.CIRCUIT_OPEN_SECONDS,
+                half_open_probes=config.CIRCUIT_HALF_OPEN_PROBES,
+            )
+        return breaker
+
+
+def get_breaker_status() -> dict:
+    """Estado de todos los breakers (para /metrics, /ready y /ping)."""
+    return {name: get_breaker(name).status() for name in ('drive', 'hydrax')}
+
+
+def open_breakers(names=('drive', 'hydrax')) -> list:
+    """Nombres de los breakers que ahora mismo están abiertos."""
+    return [name for name in names if get_breaker(name).state == OPEN]
+
+
+async def wait_for_dependencies(names=('drive', 'hydrax'), on_hold=None):
+    """
+    Antes de empezar una descarga: si alguna dependencia tiene el circuito abierto,
+    según CIRCUIT_OPEN_POLICY falla al instante ('fail') o espera a que pase a half_open
+    ('hold', como mucho CIRCUIT_HOLD_MAX_SECONDS). Lanza CircuitOpenError si no se recupera.
+    on_hold(nombres_abiertos) se llama una vez al empezar a esperar.
+    """
+    blocked = open_breakers(names)
+    if not blocked:
+        return
+    breaker = get_breaker(blocked[0])
+    if config.CIRCUIT_OPEN_POLICY != "hold":
+        raise CircuitOpenError(breaker.name, breaker.retry_after())
+    if on_hold:
+        result = on_hold(blocked)
+        if inspect.isawaitable(result):
+            await result
+    deadline = time.monotonic() + config.CIRCUIT_HOLD_MAX_SECONDS
+    while blocked:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            breaker = get_breaker(blocked[0])
+            raise CircuitOpenError(breaker.name, breaker.retry_after())
+        wait = max(get_breaker(name).retry_after() for name in blocked)
+        await asyncio.sleep(min(remaining, max(1.0, wait)))
+        blocked = open_breakers(names)
@@ -12,10 +12,27 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 
 # --- Credenciales de Hydrax ---
 HYDRAX_API_KEY = os.getenv("HYDRAX_API_KEY")
+# URL base de la API de Hydrax (se puede apuntar a un servidor local para benchmarks)
+HYDRAX_API_URL = os.getenv("HYDRAX_API_URL", "https://api.hydrax.net").rstrip("/")
 
 # --- Configuración para OAuth de Google Drive ---
 TOKEN_JSON_DATA = os.getenv("TOKEN_JSON_DATA")
 TOKEN_JSON_PATH = os.getenv("TOKEN_JSON_PATH", "token.json") # Valor por defecto
+# Dónde guardar el token refrescado cuando viene de TOKEN_JSON_DATA (vacío = no guardarlo)
+TOKEN_REFRESHED_PATH = os.getenv("TOKEN_REFRESHED_PATH", "token.refreshed.json")
+# Refrescar el access token en segundo plano cuando le queden menos de estos segundos (0 = solo al caducar)
+CREDENTIAL_REFRESH_MARGIN = float(os.getenv("CREDENTIAL_REFRESH_MARGIN", "300"))
+# Cada cuánto revisar como mucho la caducidad de las credenciales cargadas
+CREDENTIAL_CHECK_INTERVAL = float(os.getenv("CREDENTIAL_CHECK_INTERVAL", "600"))
+# Cuentas de Drive adicionales para repartir las subidas. Formato: "cuenta2=tokens/c2.json,cuenta3=tokens/c3.json"
+DRIVE_ACCOUNT_TOKENS = dict(
+    (account_id.strip(), path.strip())
+    for account_id, path in (item.split("=", 1) for item in os.getenv("DRIVE_ACCOUNT_TOKENS", "").split(",") if "=" in item)
+)
+# Límite diario de subida de Google por cuenta, en GB (0 = sin límite)
+DRIVE_DAILY_UPLOAD_LIMIT_GB = float(os.getenv("DRIVE_DAILY_UPLOAD_LIMIT_GB", "750"))
+# Endpoint alternativo de la API de Drive (vacío = Google). Ej.: "http://127.0.0.1:8081/drive/v3/"
+DRIVE_API_ENDPOINT = os.getenv("DRIVE_API_ENDPOINT", "")
 
 # --- Lista Blanca de Usuarios ---
 # Leer la variable de entorno. Formato: "ID1,ID2,ID3"
@@ -33,6 +50,159 @@ if WHITELISTED_USERS_STR:
 else:
     print("No se configuró WHITELISTED_USERS. Todos los usuarios pueden acceder (modo abierto).")
 
+# --- Monitor del event loop ---
+# Intervalo (segundos) entre mediciones de retraso del loop
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.5"))
+# Modo debug: captura el stack de cualquier callback que bloquee el loop más del umbral
+LOOP_MONITOR_DEBUG = os.getenv("LOOP_MONITOR_DEBUG", "false").strip().lower() in ("1", "true", "yes")
+# Umbral (segundos) a partir del cual se considera que el loop está bloqueado
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.25"))
+
+# --- Trazas por trabajo y comando /stats ---
+# Log local (append-only) con los spans de cada trabajo; se rota al superar el tamaño máximo
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "traces.jsonl")
+TRACE_LOG_MAX_BYTES = int(os.getenv("TRACE_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_LOG_BACKUPS = int(os.getenv("TRACE_LOG_BACKUPS", "3"))
+# Ventanas de tiempo para /stats. Formato: "15m,1h,24h" (sufijos s, m, h, d)
+STATS_WINDOWS = os.getenv("STATS_WINDOWS", "15m,1h,24h")
+
+# --- Control de admisión por espacio en disco ---
+# Directorio donde se descargan los videos de Telegram
+DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR", "downloads")
+# Margen de seguridad (MB) que siempre debe quedar libre en el disco de descargas
+DISK_SAFETY_MARGIN_MB = int(os.getenv("DISK_SAFETY_MARGIN_MB", "200"))
+# Tiempo máximo (segundos) que un video puede esperar en cola por espacio en disco
+ADMISSION_MAX_WAIT_SECONDS = int(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "7200"))
+# Cada cuánto (segundos) se vuelve a comprobar el espacio libre mientras hay videos en cola
+ADMISSION_POLL_INTERVAL = float(os.getenv("ADMISSION_POLL_INTERVAL", "5"))
+
+# --- Almacenamiento temporal por niveles ---
+# Directorio por clase de tamaño. Formato: "TAMAÑO_MAX:DIRECTORIO,..." donde '*' es el nivel por defecto.
+# Ej.: "104857600:/dev/shm/abys-bot,*:downloads" (tmpfs para archivos de hasta 100 MB, disco para el resto)
+TEMP_STORAGE_TIERS = os.getenv("TEMP_STORAGE_TIERS", f"*:{DOWNLOAD_DIR}")
+# Reservar en disco el tamaño esperado antes de descargar (posix_fallocate) para evitar fragmentación
+TEMP_PREALLOCATE = os.getenv("TEMP_PREALLOCATE", "true").strip().lower() in ("1", "true", "yes")
+# Usar posix_fadvise (lectura secuencial al subir y liberar la caché de páginas después)
+TEMP_FADVISE = os.getenv("TEMP_FADVISE", "true").strip().lower() in ("1", "true", "yes")
+
+# --- Álbumes (media groups) ---
+# Segundos que se espera desde el último video de un álbum antes de procesarlo como lote
+MEDIA_GROUP_WINDOW = float(os.getenv("MEDIA_GROUP_WINDOW", "2.0"))
+# Videos de un mismo álbum que se descargan/suben en paralelo
+MEDIA_GROUP_PARALLELISM = int(os.getenv("MEDIA_GROUP_PARALLELISM", "2"))
+# Cada cuántos segundos se refresca el mensaje de progreso único del álbum
+MEDIA_GROUP_PROGRESS_INTERVAL = float(os.getenv("MEDIA_GROUP_PROGRESS_INTERVAL", "3"))
+# Importaciones simultáneas a Hydrax cuando se importa un álbum o una re-importación masiva
+HYDRAX_BATCH_CONCURRENCY = int(os.getenv("HYDRAX_BATCH_CONCURRENCY", "4"))
+
+# --- Re-importación masiva a Hydrax (/reimport y bulk_import.py) ---
+# Máximo de importaciones iniciadas por segundo (0 = sin límite)
+HYDRAX_RATE_LIMIT = float(os.getenv("HYDRAX_RATE_LIMIT", "2"))
+# Cada cuántos segundos se refresca el mensaje de progreso agregado
+BULK_IMPORT_PROGRESS_INTERVAL = float(os.getenv("BULK_IMPORT_PROGRESS_INTERVAL", "5"))
+
+# --- Carpeta de subida pública ---
+# "none": se sube a la raíz y se comparte cada archivo (una llamada extra por video).
+# "public": se sube a una carpeta compartida con "cualquiera con el enlace"; los archivos heredan el permiso.
+# "dated": como "public", pero en subcarpetas por fecha dentro de la carpeta compartida.
+DRIVE_UPLOAD_FOLDER_MODE = os.getenv("DRIVE_UPLOAD_FOLDER_MODE", "none").strip().lower()
+# ID de una carpeta ya compartida (si está vacío se busca/crea una con DRIVE_PUBLIC_FOLDER_NAME en la raíz)
+DRIVE_PUBLIC_FOLDER_ID = os.getenv("DRIVE_PUBLIC_FOLDER_ID", "").strip()
+DRIVE_PUBLIC_FOLDER_NAME = os.getenv("DRIVE_PUBLIC_FOLDER_NAME", "Abys Uploads")
+# Formato (strftime) de las subcarpetas en modo "dated"; cada '/' es un nivel de carpetas
+DRIVE_DATED_FOLDER_FORMAT = os.getenv("DRIVE_DATED_FOLDER_FORMAT", "%Y/%m/%d")
+
+# --- Diario de trabajos (reanudación tras un crash o reinicio) ---
+# Horas que se conservan los trabajos terminados en jobs_db.json
+JOB_JOURNAL_RETENTION_HOURS = float(os.getenv("JOB_JOURNAL_RETENTION_HOURS", "24"))
+# Reanudar automáticamente al arrancar los trabajos que quedaron a medias
+JOB_RECOVERY_ENABLED = os.getenv("JOB_RECOVERY_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+
+# --- Reintentos de trabajos fallidos (cola persistente + dead-letter) ---
+# Intentos automáticos antes de mover un trabajo a la lista dead-letter
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "8"))
+# Espera antes del primer reintento (segundos); se duplica en cada intento hasta RETRY_MAX_DELAY
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "60"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", str(4 * 3600)))
+# Reintentos que se ejecutan a la vez
+RETRY_CONCURRENCY = int(os.getenv("RETRY_CONCURRENCY", "2"))
+# Cada cuántos segundos revisa el planificador si hay reintentos pendientes
+RETRY_POLL_INTERVAL = float(os.getenv("RETRY_POLL_INTERVAL", "30"))
+
+# --- Circuit breakers (Hydrax y Google Drive) ---
+# Fracción de fallos en la ventana a partir de la cual se abre el circuito
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+# Llamadas mínimas en la ventana para poder abrirlo (evita abrir por un fallo aislado)
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "4"))
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "120"))
+# Tiempo abierto antes de dejar pasar llamadas de prueba (half-open)
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "60"))
+CIRCUIT_HALF_OPEN_PROBES = int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "1"))
+# Con un circuito abierto, los trabajos nuevos esperan antes de descargar ("hold") o fallan al instante ("fail")
+CIRCUIT_OPEN_POLICY = os.getenv("CIRCUIT_OPEN_POLICY", "hold").strip().lower()
+# Espera máxima (segundos) en modo "hold"; después el trabajo pasa a la cola de reintentos
+CIRCUIT_HOLD_MAX_SECONDS = float(os.getenv("CIRCUIT_HOLD_MAX_SECONDS", "1800"))
+
+# --- Cuota de Google Drive (desalojo automático de subidas antiguas) ---
+# Desactivado por defecto: al activarlo se BORRAN de Drive subidas antiguas para hacer sitio
+QUOTA_MANAGER_ENABLED = os.getenv("QUOTA_MANAGER_ENABLED", "false").strip().lower() in ("1", "true", "yes")
+# Fracción del límite a partir de la cual se desaloja antes de subir, y hasta dónde se baja
+QUOTA_EVICT_THRESHOLD = float(os.getenv("QUOTA_EVICT_THRESHOLD", "0.9"))
+QUOTA_EVICT_TARGET = float(os.getenv("QUOTA_EVICT_TARGET", "0.8"))
+# Solo desalojar archivos ya importados a Hydrax
+QUOTA_EVICT_ONLY_IMPORTED = os.getenv("QUOTA_EVICT_ONLY_IMPORTED", "true").strip().lower() in ("1", "true", "yes")
+# Máximo de archivos borrados por ronda (un batch de Drive)
+QUOTA_EVICT_BATCH = int(os.getenv("QUOTA_EVICT_BATCH", "50"))
+# Cada cuánto se vuelve a pedir about().storageQuota (segundos)
+QUOTA_REFRESH_INTERVAL = float(os.getenv("QUOTA_REFRESH_INTERVAL", "300"))
+
+# --- Retención en Drive tras la importación a Hydrax ---
+# Horas que se conserva la copia en Drive después de que Hydrax la importó (0 = no borrar nunca)
+DRIVE_RETENTION_HOURS = float(os.getenv("DRIVE_RETENTION_HOURS", "0"))
+# status_video de Hydrax exigidos para borrar, separados por comas (vacío = cualquiera)
+DRIVE_RETENTION_STATUSES = os.getenv("DRIVE_RETENTION_STATUSES", "")
+# Cada cuánto se revisa el registro (segundos), archivos por lote y lotes por segundo
+DRIVE_RETENTION_INTERVAL = float(os.getenv("DRIVE_RETENTION_INTERVAL", "600"))
+DRIVE_RETENTION_BATCH_SIZE = int(os.getenv("DRIVE_RETENTION_BATCH_SIZE", "50"))
+DRIVE_RETENTION_BATCH_RATE = float(os.getenv("DRIVE_RETENTION_BATCH_RATE", "0.2"))
+
+# --- Botones inline ---
+# Segundos durante los que se ignora el mismo botón pulsado otra vez sobre el mismo mensaje
+CALLBACK_DEBOUNCE_SECONDS = float(os.getenv("CALLBACK_DEBOUNCE_SECONDS", "2"))
+
+# --- Verificación de integridad de las subidas ---
+# Comparar el MD5 local (calculado al descargar o al subir) con el md5Checksum de Drive
+UPLOAD_VERIFY_CHECKSUM = os.getenv("UPLOAD_VERIFY_CHECKSUM", "true").strip().lower() in ("1", "true", "yes")
+# Intentos de subida (incluido el primero) antes de dar la copia por corrupta
+UPLOAD_VERIFY_MAX_ATTEMPTS = int(os.getenv("UPLOAD_VERIFY_MAX_ATTEMPTS", "3"))
+
+# --- Ancho de banda ---
+# Límite global en MB/s de todas las subidas a Drive / descargas de Telegram juntas (0 = sin límite).
+# Se reparte de forma justa entre los trabajos activos y se puede cambiar en caliente con /bandwidth.
+UPLOAD_BANDWIDTH_LIMIT_MB = float(os.getenv("UPLOAD_BANDWIDTH_LIMIT_MB", "0"))
+DOWNLOAD_BANDWIDTH_LIMIT_MB = float(os.getenv("DOWNLOAD_BANDWIDTH_LIMIT_MB", "0"))
+
+# --- Planificador de trabajos ---
+# Videos que se procesan a la vez (turnos generales, para cualquier tamaño; 0 = sin límite,
+# sin orden justo ni carril rápido)
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", "4"))
+# Turnos extra reservados a videos pequeños (carril rápido) y tamaño máximo para usarlos
+SCHEDULER_FAST_LANE_SLOTS = int(os.getenv("SCHEDULER_FAST_LANE_SLOTS", "2"))
+SCHEDULER_FAST_LANE_MB = float(os.getenv("SCHEDULER_FAST_LANE_MB", "200"))
+# Un trabajo que lleva esperando más que esto pasa por delante del reparto justo
+SCHEDULER_AGING_SECONDS = float(os.getenv("SCHEDULER_AGING_SECONDS", "600"))
+
+# --- Logging ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Niveles por módulo, p. ej. "google_drive=WARNING,db=DEBUG"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "%(asctime)s %(levelname)s [%(name)s] %(message)s")
+# Como mucho LOG_SAMPLE_BURST mensajes similares por ventana de LOG_SAMPLE_WINDOW segundos (0 = sin muestreo)
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "20"))
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", "60"))
+# Volcar payloads grandes (datos de la DB, respuestas) en DEBUG
+LOG_DEBUG_PAYLOADS = os.getenv("LOG_DEBUG_PAYLOADS", "false").strip().lower() in ("1", "true", "yes")
+
 # --- Validaciones iniciales ---
 # Nota: La validación de usuarios se hace en tiempo de ejecución, no aquí.
 if not all([API_ID, API_HASH, BOT_TOKEN, HYDRAX_API_KEY]):
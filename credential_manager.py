@@ -0,0 +1,261 @@
+# credential_manager.py (Credenciales OAuth de Drive: carga única, refresco anticipado y persistencia)
+"""
+Las credenciales de cada cuenta se leen una sola vez (TOKEN_JSON_DATA, TOKEN_JSON_PATH o
+el archivo de DRIVE_ACCOUNT_TOKENS) y se reutilizan en todas las llamadas a Drive.
+
+Un proceso de fondo refresca el access token CREDENTIAL_REFRESH_MARGIN segundos antes de
+que caduque, así que ninguna petición de usuario paga la latencia del refresco. Si aun
+así una llamada encuentra el token caducado (p. ej. el proceso estaba detenido), lo
+refresca ella misma por la misma ruta.
+
+Nunca se refresca dos veces a la vez la misma cuenta: los hilos del executor comparten
+un lock por cuenta con doble comprobación, y en el loop las pasadas de fondo se
+coalescen con single_flight.
+
+Cada token refrescado se guarda de forma atómica en su archivo de origen. El de
+TOKEN_JSON_DATA (una variable de entorno, no se puede reescribir) va a
+TOKEN_REFRESHED_PATH y se usa al arrancar mientras su refresh_token coincida con el de
+la variable.
+"""
+import asyncio
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Cuenta principal (TOKEN_JSON_DATA / TOKEN_JSON_PATH). Las adicionales vienen de DRIVE_ACCOUNT_TOKENS.
+DEFAULT_ACCOUNT = "default"
+SCOPES = ['https://www.googleapis.com/auth/drive']
+# Espera mínima antes de reintentar tras un refresco fallido (evita martillear el endpoint de OAuth)
+RETRY_AFTER_ERROR = 30.0
+
+_credentials = {}   # {account_id: Credentials}
+_locks = {}         # {account_id: threading.Lock}
+_locks_guard = threading.Lock()
+_stats = {}         # {account_id: {'refreshes', 'failures', 'last_refresh_at', 'last_error', 'persisted_to'}}
+_task = None
+
+
+def _lock_for(account_id: str) -> threading.Lock:
+    with _locks_guard:
+        if account_id not in _locks:
+            _locks[account_id] = threading.Lock()
+        return _locks[account_id]
+
+
+def _stats_for(account_id: str) -> dict:
+    if account_id not in _stats:
+        _stats[account_id] = {'refreshes': 0, 'failures': 0, 'last_refresh_at': None, 'last_error': None, 'persisted_to': None}
+    return _stats[account_id]
+
+
+def _utcnow() -> datetime.datetime:
+    # google-auth guarda 'expiry' como datetime UTC sin zona horaria
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _expires_in(creds):
+    """Segundos hasta que caduca el access token (None si se desconoce)."""
+    if creds is None or creds.expiry is None:
+        return None
+    return (creds.expiry - _utcnow()).total_seconds()
+
+
+def _needs_refresh(creds, margin: float) -> bool:
+    if creds is None or not creds.refresh_token:
+        return False
+    if not creds.token or not creds.valid:
+        return True
+    expires_in = _expires_in(creds)
+    return expires_in is not None and expires_in <= margin
+
+
+def _token_path(account_id: str):
+    """Archivo donde se guarda el token refrescado de la cuenta (None si no se guarda)."""
+    if account_id != DEFAULT_ACCOUNT:
+        return config.DRIVE_ACCOUNT_TOKENS.get(account_id)
+    if config.TOKEN_JSON_DATA:
+        return config.TOKEN_REFRESHED_PATH or None
+    return config.TOKEN_JSON_PATH
+
+
+def _refreshed_token_data(token_data: dict):
+    """Token guardado en TOKEN_REFRESHED_PATH si pertenece al mismo refresh_token que TOKEN_JSON_DATA."""
+    path = config.TOKEN_REFRESHED_PATH
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            saved = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"No se pudo leer el token refrescado de {path}: {e}")
+        return None
+    # Si se cambió el token de la variable, el guardado ya no vale
+    if saved.get('refresh_token') != token_data.get('refresh_token'):
+        return None
+    return saved
+
+
+def _parse(account_id: str):
+    """Lee las credenciales de la cuenta de su origen (sin refrescarlas)."""
+    from google.oauth2.credentials import Credentials
+
+    if account_id != DEFAULT_ACCOUNT:
+        token_path = config.DRIVE_ACCOUNT_TOKENS.get(account_id)
+        if not token_path:
+            raise KeyError(f"La cuenta de Drive '{account_id}' no está configurada en DRIVE_ACCOUNT_TOKENS.")
+        logger.info(f"Cargando token OAuth de la cuenta '{account_id}' desde el archivo: {token_path}")
+        return Credentials.from_authorized_user_file(token_path, scopes=SCOPES)
+    if config.TOKEN_JSON_DATA:
+        logger.info("Cargando token OAuth desde la variable de entorno TOKEN_JSON_DATA.")
+        try:
+            token_data = json.loads(config.TOKEN_JSON_DATA)
+            refreshed = _refreshed_token_data(token_data)
+            if refreshed:
+                logger.info(f"Usando el token refrescado guardado en {config.TOKEN_REFRESHED_PATH}.")
+                token_data = refreshed
+            return Credentials.from_authorized_user_info(token_data, scopes=SCOPES)
+        except json.JSONDecodeError as e:
+            logger.error(f"Error al decodificar JSON desde TOKEN_JSON_DATA: {e}")
+            raise ValueError("El contenido de TOKEN_JSON_DATA no es un JSON válido.") from e
+        except Exception as e:
+            logger.error(f"Error al crear credenciales desde TOKEN_JSON_DATA: {e}")
+            raise
+    if os.path.exists(config.TOKEN_JSON_PATH):
+        logger.info(f"Cargando token OAuth desde el archivo: {config.TOKEN_JSON_PATH}")
+        try:
+            return Credentials.from_authorized_user_file(config.TOKEN_JSON_PATH, scopes=SCOPES)
+        except Exception as e:
+            logger.error(f"Error al cargar credenciales desde el archivo {config.TOKEN_JSON_PATH}: {e}")
+            raise
+    raise FileNotFoundError(
+        "No se encontró el token de autenticación de Google Drive. "
+        "Debes proporcionar el contenido del archivo 'token.json' en la variable de entorno TOKEN_JSON_DATA "
+        "o asegurarte de que el archivo 'token.json' exista en la ruta especificada por TOKEN_JSON_PATH."
+    )
+
+
+def _persist(account_id: str, creds):
+    """Guarda el token refrescado (escritura atómica, solo legible por el usuario)."""
+    path = _token_path(account_id)
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(creds.to_json())
+        os.replace(tmp_path, path)
+        _stats_for(account_id)['persisted_to'] = path
+    except OSError as e:
+        logger.warning(f"No se pudo guardar el token refrescado de la cuenta '{account_id}' en {path}: {e}")
+
+
+def _refresh(account_id: str, margin: float):
+    """Refresca las credenciales si les quedan menos de 'margin' segundos. Devuelve las credenciales."""
+    from google.auth.transport.requests import Request
+    with _lock_for(account_id):
+        creds = _credentials[account_id]
+        # Doble comprobación: otro hilo pudo refrescarlas mientras se esperaba el lock
+        if not _needs_refresh(creds, margin):
+            return creds
+        stats = _stats_for(account_id)
+        logger.info(f"Refrescando el token OAuth de la cuenta '{account_id}'...")
+        try:
+            creds.refresh(Request())
+        except Exception as e:
+            stats['failures'] += 1
+            stats['last_error'] = str(e)
+            logger.error(f"Error al refrescar el token de la cuenta '{account_id}': {e}")
+            raise
+        stats['refreshes'] += 1
+        stats['last_refresh_at'] = time.time()
+        stats['last_error'] = None
+        logger.info(f"Token de la cuenta '{account_id}' refrescado (caduca en {_expires_in(creds) or 0:.0f}s).")
+        _persist(account_id, creds)
+        return creds
+
+
+def get_credentials(account_id: str = DEFAULT_ACCOUNT):
+    """
+    Devuelve credenciales válidas de la cuenta. Se leen de su origen solo la primera vez;
+    el refresco aquí es solo el recurso si el proceso de fondo no llegó a tiempo.
+    """
+    creds = _credentials.get(account_id)
+    if creds is None:
+        with _lock_for(account_id):
+            creds = _credentials.get(account_id)
+            if creds is None:
+                creds = _credentials[account_id] = _parse(account_id)
+    if _needs_refresh(creds, 0):
+        creds = _refresh(account_id, 0)
+    return creds
+
+
+def get_credential_status() -> dict:
+    """Caducidad y refrescos de las credenciales cargadas (para /metrics)."""
+    accounts = {}
+    for account_id, creds in list(_credentials.items()):
+        expires_in = _expires_in(creds)
+        accounts[account_id] = {
+            'expires_in_s': round(expires_in, 1) if expires_in is not None else None,
+            **_stats_for(account_id),
+        }
+    return {'refresh_margin_s': config.CREDENTIAL_REFRESH_MARGIN, 'accounts': accounts}
+
+
+async def refresh_due_credentials() -> tuple:
+    """
+    Una pasada del proceso de fondo: refresca las credenciales cargadas que caducan dentro
+    del margen. Devuelve (cuentas_refrescadas, cuentas_fallidas).
+    """
+    from singleflight import single_flight
+    loop = asyncio.get_running_loop()
+    refreshed, failed = [], []
+    for account_id, creds in list(_credentials.items()):
+        if not _needs_refresh(creds, config.CREDENTIAL_REFRESH_MARGIN):
+            continue
+        try:
+            await single_flight(
+                ('drive_credentials', account_id),
+                lambda account_id=account_id: loop.run_in_executor(None, _refresh, account_id, config.CREDENTIAL_REFRESH_MARGIN),
+            )
+            refreshed.append(account_id)
+        except Exception:
+            failed.append(account_id)
+    return refreshed, failed
+
+
+def _next_check_in() -> float:
+    """Segundos hasta que la primera credencial cargada entre en el margen de refresco (acotado por CREDENTIAL_CHECK_INTERVAL)."""
+    delay = config.CREDENTIAL_CHECK_INTERVAL
+    for creds in list(_credentials.values()):
+        expires_in = _expires_in(creds)
+        if expires_in is not None:
+            delay = min(delay, expires_in - config.CREDENTIAL_REFRESH_MARGIN)
+    return max(1.0, delay)
+
+
+async def _refresh_loop():
+    while True:
+        failed = []
+        try:
+            _, failed = await refresh_due_credentials()
+        except Exception as e:
+            logger.error(f"Error en el refresco de credenciales de Drive: {e}")
+        delay = _next_check_in()
+        await asyncio.sleep(max(delay, RETRY_AFTER_ERROR) if failed else delay)
+
+
+def start_credential_refresher():
+    """Lanza el refresco anticipado en el loop actual (idempotente). No hace nada con CREDENTIAL_REFRESH_MARGIN <= 0."""
+    global _task
+    if _task is None and config.CREDENTIAL_REFRESH_MARGIN > 0:
+        _task = asyncio.get_running_loop().create_task(_refresh_loop())
+    return _task
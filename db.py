@@ -1,31 +1,84 @@
 # db.py (Versión corregida y optimizada para diagnóstico y robustez)
-from tinydb import TinyDB, Query
+# TinyDB se importa y abre de forma perezosa (primer uso o pre-calentamiento),
+# para no pagar su coste al importar el módulo durante el arranque.
+import logging
 import time
 import threading
-import traceback # Para imprimir stack traces detallados
+import search_index # Índice de /search, actualizado en cada alta y baja del registro
+from logging_config import log_payload
+
+logger = logging.getLogger(__name__)
 
 # --- DB para procesos antispam ---
 DB_PATH = 'bot_db.json'
-db = TinyDB(DB_PATH)
-Message = Query()
+_db = None
 
 # --- DB para archivos subidos por el bot ---
 UPLOADED_FILES_DB_PATH = 'uploaded_files_db.json'
-uploaded_files_db = TinyDB(UPLOADED_FILES_DB_PATH)
-UploadedFile = Query()
+_uploaded_files_db = None
+
+# --- DB del diario de trabajos (etapas completadas por video) ---
+JOBS_DB_PATH = 'jobs_db.json'
+_jobs_db = None
+
+# Lock para la apertura perezosa de las bases de datos
+_open_lock = threading.Lock()
 
 # Un lock para operaciones críticas en la DB de procesos (ayuda con concurrencia básica)
 _db_lock = threading.Lock()
 
+# Lock del registro de archivos subidos: TinyDB no es thread-safe y varios hilos del executor
+# lo leen y escriben a la vez (subidas, importaciones a Hydrax, borrados por lotes). Cubre
+# también la actualización de search_index; es reentrante para que el índice pueda leer el
+# registro al construirse sin soltarlo.
+_registry_lock = threading.RLock()
+
+def get_process_db():
+    """Devuelve la DB de procesos antispam, abriéndola en el primer uso."""
+    global _db
+    if _db is None:
+        with _open_lock:
+            if _db is None:
+                from tinydb import TinyDB
+                _db = TinyDB(DB_PATH)
+    return _db
+
+def get_uploaded_files_db():
+    """Devuelve la DB de archivos subidos, abriéndola en el primer uso."""
+    global _uploaded_files_db
+    if _uploaded_files_db is None:
+        with _open_lock:
+            if _uploaded_files_db is None:
+                from tinydb import TinyDB
+                _uploaded_files_db = TinyDB(UPLOADED_FILES_DB_PATH)
+    return _uploaded_files_db
+
+def get_jobs_db():
+    """Devuelve la DB del diario de trabajos, abriéndola en el primer uso."""
+    global _jobs_db
+    if _jobs_db is None:
+        with _open_lock:
+            if _jobs_db is None:
+                from tinydb import TinyDB
+                _jobs_db = TinyDB(JOBS_DB_PATH)
+    return _jobs_db
+
+def _query():
+    """Crea un objeto Query de TinyDB (import perezoso)."""
+    from tinydb import Query
+    return Query()
+
 # --- Funciones para procesos antispam ---
 def _cleanup_old_processing():
     """Función auxiliar para limpiar entradas antiguas."""
     current_time = time.time()
     one_hour_ago = current_time - 3600 # 3600 segundos = 1 hora
+    db = get_process_db()
+    Message = _query()
     with _db_lock:
         removed = db.remove((Message.status == 'processing') & (Message.timestamp < one_hour_ago))
     if removed: # Solo imprimir si se eliminó algo
-        print(f"Limpieza: Se eliminaron {len(removed)} registros de procesos antiguos.")
+        logger.info(f"Limpieza: Se eliminaron {len(removed)} registros de procesos antiguos.")
 
 def try_start_processing(message_id: int) -> bool:
     """
@@ -36,72 +89,83 @@ def try_start_processing(message_id: int) -> bool:
     """
     current_time = time.time()
     _cleanup_old_processing()
+    db = get_process_db()
+    Message = _query()
 
     with _db_lock: # Adquirir el lock para la operación crítica
         existing_entry = db.get((Message.id == message_id) & (Message.status == 'processing'))
         if existing_entry:
-            print(f"try_start_processing: [BLOQUEADO] Mensaje {message_id} ya está en proceso (registrado en DB).")
+            logger.warning(f"try_start_processing: [BLOQUEADO] Mensaje {message_id} ya está en proceso (registrado en DB).")
             return False # Ya está en proceso, no se puede iniciar
         db.upsert({'id': message_id, 'status': 'processing', 'timestamp': current_time}, Message.id == message_id)
-        print(f"try_start_processing: [OK] Mensaje {message_id} marcado como en proceso.")
+        logger.info(f"try_start_processing: [OK] Mensaje {message_id} marcado como en proceso.")
         return True # Se inició el procesamiento
 
 def finish_processing(message_id: int):
     """Marca un mensaje como 'finalizado'."""
     current_time = time.time()
+    db = get_process_db()
+    Message = _query()
     with _db_lock:
         updated = db.update({'status': 'finished', 'end_timestamp': current_time}, Message.id == message_id)
     if updated: # updated es una lista de IDs actualizados
-         print(f"finish_processing: Mensaje {message_id} marcado como finalizado.")
+         logger.info(f"finish_processing: Mensaje {message_id} marcado como finalizado.")
     else:
-         print(f"finish_processing: Mensaje {message_id} no encontrado para finalizar (quizás ya fue limpiado o no se inició).")
+         logger.info(f"finish_processing: Mensaje {message_id} no encontrado para finalizar (quizás ya fue limpiado o no se inició).")
 
 # --- Funciones para archivos subidos por el bot ---
 
-def record_uploaded_file(file_id: str, original_name: str):
+def record_uploaded_file(file_id: str, original_name: str, size: int = None, account_id: str = None, md5: str = None):
     """
     Registra un archivo subido en la base de datos.
     Esta función ahora incluye logs detallados y manejo explícito de errores para diagnóstico.
     """
-    print(f"record_uploaded_file: INICIANDO registro para ID={file_id}, Nombre='{original_name}'")
+    logger.debug(f"record_uploaded_file: INICIANDO registro para ID={file_id}, Nombre='{original_name}'")
     timestamp = time.time()
     try:
-        # Verificar si el archivo ya existe en la DB (opcional, para diagnóstico)
-        existing_entry = uploaded_files_db.get(UploadedFile.file_id == file_id)
-        if existing_entry:
-            print(f"record_uploaded_file: AVISO - ID={file_id} ya existe en DB. Actualizando entrada existente.")
-        
+        uploaded_files_db = get_uploaded_files_db()
+        UploadedFile = _query()
         # Datos a insertar/actualizar
         data_to_upsert = {
             'file_id': file_id,
             'original_name': original_name,
-            'upload_timestamp': timestamp
+            'upload_timestamp': timestamp,
+            'size': size,
+            'account_id': account_id,
+            'md5': md5
         }
-        print(f"record_uploaded_file: Preparando datos para upsert: {data_to_upsert}")
+        log_payload(logger, "record_uploaded_file: Datos para upsert", data_to_upsert)
+
+        with _registry_lock:
+            # Verificar si el archivo ya existe en la DB (opcional, para diagnóstico)
+            existing_entry = uploaded_files_db.get(UploadedFile.file_id == file_id)
+            if existing_entry:
+                logger.warning(f"record_uploaded_file: AVISO - ID={file_id} ya existe en DB. Actualizando entrada existente.")
 
-        # --- Operación de escritura en la base de datos ---
-        print(f"record_uploaded_file: Intentando operación upsert en uploaded_files_db.json...")
-        uploaded_files_db.upsert(data_to_upsert, UploadedFile.file_id == file_id)
-        print(f"record_uploaded_file: ✅ ÉXITO - Archivo {file_id} ('{original_name}') REGISTRADO/ACTUALIZADO en uploaded_files_db.json.")
+            # --- Operación de escritura en la base de datos ---
+            logger.debug(f"record_uploaded_file: Intentando operación upsert en uploaded_files_db.json...")
+            uploaded_files_db.upsert(data_to_upsert, UploadedFile.file_id == file_id)
+            search_index.index_file(data_to_upsert)
+        logger.info(f"record_uploaded_file: ✅ ÉXITO - Archivo {file_id} ('{original_name}') REGISTRADO/ACTUALIZADO en uploaded_files_db.json.")
         
     except Exception as e:
         # --- Manejo de errores crítico ---
         error_msg = f"record_uploaded_file: ❌ ERROR CRÍTICO al registrar archivo {file_id} ('{original_name}') en uploaded_files_db.json: {e}"
-        print(error_msg)
-        traceback.print_exc() # Imprimir el stack trace completo para diagnóstico
+        logger.exception(error_msg)
         # Relanzar la excepción como RuntimeError para que la función llamadora (en main.py) la capture
         raise RuntimeError(error_msg) from e
 
 def get_uploaded_files():
     """
     Obtiene la lista de todos los file_ids registrados.
-    Devuelve siempre una lista de diccionarios [{'file_id': ..., 'original_name': ...}, ...].
+    Devuelve siempre una lista de diccionarios [{'file_id': ..., 'original_name': ..., 'account_id': ...}, ...].
     Devuelve una lista vacía [] si no hay archivos o si ocurre un error.
     """
-    print("get_uploaded_files: INICIANDO obtención de lista de archivos registrados...")
+    logger.debug("get_uploaded_files: INICIANDO obtención de lista de archivos registrados...")
     try:
-        entries = uploaded_files_db.all()
-        print(f"get_uploaded_files: Obtenidos {len(entries)} archivos brutos de uploaded_files_db.json.")
+        with _registry_lock:
+            entries = get_uploaded_files_db().all()
+        logger.debug(f"get_uploaded_files: Obtenidos {len(entries)} archivos brutos de uploaded_files_db.json.")
         
         # Transformar las entradas en el formato esperado
         # Asegurar que 'file_id' y 'original_name' existan en cada entrada
@@ -111,44 +175,116 @@ def get_uploaded_files():
             original_name = entry.get('original_name', 'Nombre_Desconocido')
             # Solo añadir entradas válidas (con file_id)
             if file_id:
-                processed_entries.append({'file_id': file_id, 'original_name': original_name})
+                processed_entries.append({'file_id': file_id, 'original_name': original_name, 'account_id': entry.get('account_id')})
             else:
-                 print(f"get_uploaded_files: AVISO - Entrada inválida omitida: {entry}")
+                 logger.warning(f"get_uploaded_files: AVISO - Entrada inválida omitida: {entry}")
 
-        print(f"get_uploaded_files: ✅ ÉXITO - Lista procesada de archivos: {processed_entries}")
+        logger.info(f"get_uploaded_files: ✅ ÉXITO - {len(processed_entries)} archivos registrados.")
         return processed_entries # Devolver la lista procesada (puede estar vacía)
         
     except Exception as e:
         error_msg = f"get_uploaded_files: ❌ ERROR al obtener archivos de uploaded_files_db.json: {e}"
-        print(error_msg)
-        traceback.print_exc()
+        logger.exception(error_msg)
         # Devolver una lista vacía en caso de error para evitar romper la lógica del llamador
         return []
 
+def get_uploaded_file_entries() -> list:
+    """Devuelve las entradas completas del registro (incluidos los campos de Hydrax), sin logs por entrada."""
+    with _registry_lock:
+        return [dict(entry) for entry in get_uploaded_files_db().all() if entry.get('file_id')]
+
+def get_uploaded_file_entry(file_id: str):
+    """Devuelve la entrada completa del registro de un archivo (None si no está registrado)."""
+    with _registry_lock:
+        found = get_uploaded_files_db().get(_query().file_id == file_id)
+    return dict(found) if found else None
+
+def _hydrax_fields(result: dict) -> dict:
+    """Campos del registro con el resultado de una importación a Hydrax."""
+    fields = {
+        'hydrax_success': bool(result.get('success')),
+        'hydrax_imported_at': time.time(),
+    }
+    if result.get('success'):
+        fields.update({'hydrax_slug': result.get('slug'), 'hydrax_status': result.get('status_video'), 'hydrax_error': None})
+    else:
+        fields['hydrax_error'] = result.get('error')
+    return fields
+
+def set_hydrax_result(file_id: str, result: dict) -> bool:
+    """
+    Guarda en el registro el resultado de importar el archivo a Hydrax.
+    Un fallo no borra el slug de una importación anterior correcta.
+    Devuelve False si el archivo no está registrado.
+    """
+    try:
+        with _registry_lock:
+            updated = get_uploaded_files_db().update(_hydrax_fields(result), _query().file_id == file_id)
+    except Exception as e:
+        logger.exception(f"set_hydrax_result: ❌ ERROR al guardar el resultado de Hydrax de {file_id}: {e}")
+        return False
+    return bool(updated)
+
+def set_hydrax_results(results: dict) -> int:
+    """
+    Como set_hydrax_result, pero para varios archivos {file_id: resultado} con una sola
+    escritura del registro. Devuelve cuántos estaban registrados.
+    """
+    if not results:
+        return 0
+    UploadedFile = _query()
+    try:
+        with _registry_lock:
+            updated = get_uploaded_files_db().update_multiple(
+                [(_hydrax_fields(result), UploadedFile.file_id == file_id) for file_id, result in results.items()]
+            )
+    except Exception as e:
+        logger.exception(f"set_hydrax_results: ❌ ERROR al guardar {len(results)} resultados de Hydrax: {e}")
+        return 0
+    return len(updated)
+
 def remove_uploaded_file_record(file_id: str):
     """Elimina el registro de un archivo subido."""
     try:
-        removed = uploaded_files_db.remove(UploadedFile.file_id == file_id)
+        with _registry_lock:
+            removed = get_uploaded_files_db().remove(_query().file_id == file_id)
+            search_index.unindex_files([file_id])
         if removed:
-            print(f"remove_uploaded_file_record: Registro de archivo {file_id} eliminado.")
+            logger.info(f"remove_uploaded_file_record: Registro de archivo {file_id} eliminado.")
         else:
-            print(f"remove_uploaded_file_record: Registro de archivo {file_id} no encontrado.")
+            logger.info(f"remove_uploaded_file_record: Registro de archivo {file_id} no encontrado.")
     except Exception as e:
          error_msg = f"remove_uploaded_file_record: ❌ ERROR al eliminar registro de archivo {file_id}: {e}"
-         print(error_msg)
-         traceback.print_exc()
+         logger.exception(error_msg)
          # No relanzamos la excepción aquí, ya que la eliminación fallida es menos crítica
 
+def remove_uploaded_file_records(file_ids) -> int:
+    """Elimina de una vez los registros de varios archivos (una sola escritura). Devuelve cuántos se borraron."""
+    file_ids = list(file_ids)
+    if not file_ids:
+        return 0
+    try:
+        with _registry_lock:
+            removed = get_uploaded_files_db().remove(_query().file_id.one_of(file_ids))
+            search_index.unindex_files(file_ids)
+        logger.info(f"remove_uploaded_file_records: {len(removed)} registros eliminados.")
+        return len(removed)
+    except Exception as e:
+        logger.exception(f"remove_uploaded_file_records: ❌ ERROR al eliminar {len(file_ids)} registros: {e}")
+        return 0
+
 def clear_all_uploaded_file_records():
     """Elimina todos los registros de archivos subidos."""
     try:
-        count = len(uploaded_files_db.all())
-        uploaded_files_db.truncate() # Elimina todos los documentos
-        print(f"clear_all_uploaded_file_records: {count} registros eliminados.")
+        uploaded_files_db = get_uploaded_files_db()
+        with _registry_lock:
+            count = len(uploaded_files_db)
+            uploaded_files_db.truncate() # Elimina todos los documentos
+            search_index.clear_index()
+        logger.info(f"clear_all_uploaded_file_records: {count} registros eliminados.")
     except Exception as e:
          error_msg = f"clear_all_uploaded_file_records: ❌ ERROR al limpiar todos los registros: {e}"
-         print(error_msg)
-         traceback.print_exc()
+         logger.exception(error_msg)
          # No relanzamos la excepción aquí
 
 # --- Limpieza inicial al importar el módulo ---
@@ -1,137 +1,485 @@
 #google_drive.py (Versión completa con todas las funciones y correcciones)
+# Las librerías de Google (google-auth, googleapiclient) se importan de forma perezosa
+# dentro de las funciones: su carga es costosa y no debe retrasar el arranque del bot.
 import asyncio
+import logging
 import os
-import json
 import time
 import tempfile
 import math
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from googleapiclient.errors import HttpError
+import threading
+import hashlib
 import config
-from db import get_uploaded_files, remove_uploaded_file_record, clear_all_uploaded_file_records
-
-# Variable global para almacenar las credenciales cargadas
-_credentials = None
-
-def load_credentials():
-    """Carga las credenciales OAuth."""
-    global _credentials
-    creds = None
-    
-    if config.TOKEN_JSON_DATA:
-        print("Cargando token OAuth desde la variable de entorno TOKEN_JSON_DATA.")
-        try:
-            token_data = json.loads(config.TOKEN_JSON_DATA)
-            creds = Credentials.from_authorized_user_info(token_data, scopes=['https://www.googleapis.com/auth/drive'])
-        except json.JSONDecodeError as e:
-            print(f"Error al decodificar JSON desde TOKEN_JSON_DATA: {e}")
-            raise ValueError("El contenido de TOKEN_JSON_DATA no es un JSON válido.") from e
-        except Exception as e:
-            print(f"Error al crear credenciales desde TOKEN_JSON_DATA: {e}")
-            raise
-    elif os.path.exists(config.TOKEN_JSON_PATH):
-        print(f"Cargando token OAuth desde el archivo: {config.TOKEN_JSON_PATH}")
+from db import (
+    get_uploaded_files, get_uploaded_file_entry, remove_uploaded_file_record,
+    remove_uploaded_file_records, clear_all_uploaded_file_records
+)
+from tracing import span_or_null
+from temp_storage import open_for_upload, drop_page_cache
+from circuit_breaker import get_breaker
+from credential_manager import DEFAULT_ACCOUNT, get_credentials
+from bandwidth import get_shaper
+
+logger = logging.getLogger(__name__)
+
+# Servicios de Drive cacheados por hilo y cuenta (los objetos de googleapiclient/httplib2 no son thread-safe)
+_thread_local = threading.local()
+# Documento de descubrimiento de Drive v3, leído una sola vez
+_discovery_doc = None
+# Correo de cada cuenta de Drive (se obtiene una vez y se reutiliza): {account_id: email}
+_account_emails = {}
+
+def get_account_ids() -> list:
+    """IDs de las cuentas de Drive configuradas; la principal siempre es la primera."""
+    return [DEFAULT_ACCOUNT] + [account_id for account_id in config.DRIVE_ACCOUNT_TOKENS if account_id != DEFAULT_ACCOUNT]
+
+def account_of(entry) -> str:
+    """Cuenta propietaria de una entrada del registro (o de un trabajo); las antiguas son de la principal."""
+    return (entry or {}).get('account_id') or DEFAULT_ACCOUNT
+
+def load_credentials(account_id: str = DEFAULT_ACCOUNT):
+    """Credenciales OAuth válidas de una cuenta (por defecto, la principal); ver credential_manager."""
+    return get_credentials(account_id)
+
+def load_all_credentials() -> dict:
+    """Carga las credenciales de todas las cuentas. Solo falla si no se pudo cargar ninguna."""
+    errors = {}
+    for account_id in get_account_ids():
         try:
-            creds = Credentials.from_authorized_user_file(config.TOKEN_JSON_PATH, scopes=['https://www.googleapis.com/auth/drive'])
+            load_credentials(account_id)
         except Exception as e:
-            print(f"Error al cargar credenciales desde el archivo {config.TOKEN_JSON_PATH}: {e}")
-            raise
+            errors[account_id] = str(e)
+            logger.warning(f"No se pudieron cargar las credenciales de la cuenta de Drive '{account_id}': {e}")
+    if len(errors) == len(get_account_ids()):
+        raise RuntimeError(f"Ninguna cuenta de Drive tiene credenciales válidas: {errors}")
+    return errors
+
+def _get_discovery_doc():
+    """Devuelve el documento de descubrimiento estático de Drive v3 (cacheado en memoria)."""
+    global _discovery_doc
+    if _discovery_doc is None:
+        from googleapiclient.discovery_cache import get_static_doc
+        _discovery_doc = get_static_doc('drive', 'v3')
+    return _discovery_doc
+
+def _build_service(credentials):
+    """Construye el cliente de la API de Drive (respetando DRIVE_API_ENDPOINT si está definido)."""
+    from googleapiclient.discovery import build, build_from_document
+    client_options = {'api_endpoint': config.DRIVE_API_ENDPOINT} if config.DRIVE_API_ENDPOINT else None
+    doc = _get_discovery_doc()
+    if doc and config.DRIVE_API_ENDPOINT:
+        # La URL de subida sale de rootUrl: solo se cambia el host y se conservaría https
+        # aunque el endpoint sea http (p. ej. los servidores falsos de los benchmarks)
+        import json
+        from urllib.parse import urlsplit
+        endpoint = urlsplit(config.DRIVE_API_ENDPOINT)
+        doc = json.loads(doc)
+        doc['rootUrl'] = f"{endpoint.scheme}://{endpoint.netloc}/"
+    if doc:
+        return build_from_document(doc, credentials=credentials, client_options=client_options)
+    return build('drive', 'v3', credentials=credentials, client_options=client_options)
+
+def get_drive_service(account_id: str = None):
+    """
+    Obtiene el servicio de la API de Google Drive de una cuenta (por defecto, la principal).
+    El servicio se cachea por hilo y cuenta, y se reconstruye solo si cambian las credenciales.
+    Su conexión HTTP no es thread-safe: hay que obtenerlo en el mismo hilo que lo usa
+    (dentro de la tarea del executor), nunca pasarlo de una llamada del executor a otra.
+    """
+    account_id = account_id or DEFAULT_ACCOUNT
+    credentials = get_credentials(account_id)
+
+    services = getattr(_thread_local, 'services', None)
+    if services is None:
+        services = _thread_local.services = {}
+    cached = services.get(account_id)
+    if cached is not None and cached[0] is credentials:
+        return cached[1]
+    try:
+        service = _build_service(credentials)
+    except Exception as build_error:
+        logger.error(f"Error al construir el servicio de Drive: {build_error}")
+        raise
+    services[account_id] = (credentials, service)
+    return service
+
+def get_drive_account_email(refresh: bool = False, account_id: str = None) -> str:
+    """Devuelve el correo de una cuenta de Drive (consulta 'about' solo la primera vez)."""
+    account_id = account_id or DEFAULT_ACCOUNT
+    if account_id not in _account_emails or refresh:
+        about = get_drive_service(account_id).about().get(fields="user").execute()
+        _account_emails[account_id] = about.get('user', {}).get('emailAddress', 'Desconocido')
+        logger.info(f"Usando cuenta de Google Drive ({account_id}): {_account_emails[account_id]}")
+    return _account_emails[account_id]
+
+def get_cached_drive_account_email(account_id: str = None):
+    """Devuelve el correo de la cuenta si ya se obtuvo (None si aún no), sin hacer llamadas."""
+    return _account_emails.get(account_id or DEFAULT_ACCOUNT)
+
+def _is_outage(error) -> bool:
+    """¿El error indica que Drive está caído o saturado (red, timeout, 5xx, 429) y no un error de la petición?"""
+    import ssl
+    from googleapiclient.errors import HttpError
+    if isinstance(error, HttpError):
+        status = getattr(error.resp, 'status', 0)
+        return status >= 500 or status == 429
+    if isinstance(error, (ConnectionError, TimeoutError, ssl.SSLError)):
+        return True
+    # httplib2.HttpLib2Error (ServerNotFoundError...) y google.auth TransportError
+    return any(cls.__name__ in ('HttpLib2Error', 'TransportError') for cls in type(error).__mro__)
+
+def _call_drive(func, *args, **kwargs):
+    """Ejecuta una operación contra Drive a través de su circuit breaker (falla al instante si está abierto)."""
+    breaker = get_breaker("drive")
+    breaker.check()
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        if _is_outage(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success() # Drive respondió: el problema es la petición
+        raise
+    breaker.record_success()
+    return result
+
+# Permiso con el que se comparten los videos (cualquiera con el enlace puede verlos)
+PUBLIC_PERMISSION = {
+    'type': 'anyone',
+    'role': 'reader',
+    'allowFileDiscovery': False
+}
+
+# Máximo de llamadas por petición batch de la API de Drive
+DRIVE_BATCH_LIMIT = 100
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+# IDs de carpetas ya resueltas: {(cuenta, id_padre, nombre): id_carpeta}
+_folder_cache = {}
+# Carpeta raíz compartida públicamente de cada cuenta (resuelta una vez por proceso): {cuenta: id}
+_public_root_ids = {}
+# Serializa la resolución/creación de carpetas (las subidas corren en varios hilos)
+_folder_lock = threading.Lock()
+
+def _escape_query_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+def _get_or_create_folder(service, name: str, parent_id: str, account_id: str = DEFAULT_ACCOUNT) -> str:
+    """Devuelve el ID de la carpeta 'name' dentro de 'parent_id', creándola si no existe (cacheado)."""
+    key = (account_id, parent_id, name)
+    folder_id = _folder_cache.get(key)
+    if folder_id:
+        return folder_id
+    query = (
+        f"name = '{_escape_query_value(name)}' and mimeType = '{FOLDER_MIME_TYPE}' "
+        f"and '{parent_id}' in parents and trashed = false"
+    )
+    found = service.files().list(q=query, pageSize=1, fields="files(id)").execute().get('files', [])
+    if found:
+        folder_id = found[0]['id']
     else:
-        raise FileNotFoundError(
-            "No se encontró el token de autenticación de Google Drive. "
-            "Debes proporcionar el contenido del archivo 'token.json' en la variable de entorno TOKEN_JSON_DATA "
-            "o asegurarte de que el archivo 'token.json' exista en la ruta especificada por TOKEN_JSON_PATH."
-        )
-
-    if creds and creds.expired and creds.refresh_token:
-        print("Token expirado, intentando refrescar...")
-        try:
-            creds.refresh(Request())
-            print("Token refrescado exitosamente.")
-        except Exception as e:
-            print(f"Error al refrescar el token: {e}")
-            raise
+        folder = service.files().create(
+            body={'name': name, 'mimeType': FOLDER_MIME_TYPE, 'parents': [parent_id]},
+            fields='id'
+        ).execute()
+        folder_id = folder['id']
+        logger.info(f"Carpeta de Drive creada: '{name}' ({folder_id})")
+    _folder_cache[key] = folder_id
+    return folder_id
+
+def _get_public_root_folder(service, account_id: str = DEFAULT_ACCOUNT) -> str:
+    """
+    Resuelve la carpeta compartida con "cualquiera con el enlace" de la cuenta y se asegura de que lo esté.
+    DRIVE_PUBLIC_FOLDER_ID solo se aplica a la cuenta principal; las demás usan DRIVE_PUBLIC_FOLDER_NAME.
+    """
+    if account_id not in _public_root_ids:
+        folder_id = (config.DRIVE_PUBLIC_FOLDER_ID if account_id == DEFAULT_ACCOUNT else None) \
+            or _get_or_create_folder(service, config.DRIVE_PUBLIC_FOLDER_NAME, 'root', account_id)
+        # Un único permiso en la carpeta sustituye al permiso por archivo
+        service.permissions().create(fileId=folder_id, body=PUBLIC_PERMISSION, fields='id').execute()
+        logger.info(f"Carpeta pública de subida lista ({account_id}): {folder_id}")
+        _public_root_ids[account_id] = folder_id
+    return _public_root_ids[account_id]
+
+def get_upload_folder_id(service=None, account_id: str = None):
+    """
+    Devuelve la carpeta donde subir según DRIVE_UPLOAD_FOLDER_MODE (None = raíz, sin herencia).
+    En modo "dated" crea/reutiliza las subcarpetas de la fecha actual, que heredan el permiso público.
+    """
+    mode = config.DRIVE_UPLOAD_FOLDER_MODE
+    if mode not in ("public", "dated"):
+        return None
+    account_id = account_id or DEFAULT_ACCOUNT
+    service = service or get_drive_service(account_id)
+    with _folder_lock:
+        folder_id = _get_public_root_folder(service, account_id)
+        if mode == "dated":
+            for name in time.strftime(config.DRIVE_DATED_FOLDER_FORMAT).split('/'):
+                if name:
+                    folder_id = _get_or_create_folder(service, name, folder_id, account_id)
+    return folder_id
+
+def _public_folder_ids(service, account_id: str = DEFAULT_ACCOUNT) -> set:
+    """
+    Carpetas de la cuenta cuyo contenido ya es público: la carpeta compartida (su permiso se
+    comprueba una vez por cuenta en _get_public_root_folder) y las subcarpetas ya resueltas
+    dentro de ella. Vacío si DRIVE_UPLOAD_FOLDER_MODE no usa la carpeta pública.
+    """
+    if config.DRIVE_UPLOAD_FOLDER_MODE not in ("public", "dated"):
+        return set()
+    with _folder_lock:
+        public = {_get_public_root_folder(service, account_id)}
+        while True:
+            children = {
+                folder_id for (account, parent_id, _), folder_id in _folder_cache.items()
+                if account == account_id and parent_id in public
+            }
+            if children <= public:
+                return public
+            public |= children
+
+def _get_parents(service, file_ids) -> dict:
+    """Carpetas padre de varios archivos con peticiones batch. {file_id: [ids]}; los que fallan no aparecen."""
+    parents = {}
+
+    def callback(request_id, response, exception):
+        if not exception:
+            parents[request_id] = response.get('parents', [])
+
+    for i in range(0, len(file_ids), DRIVE_BATCH_LIMIT):
+        batch = _new_batch_request(service, callback=callback)
+        for file_id in file_ids[i:i + DRIVE_BATCH_LIMIT]:
+            batch.add(service.files().get(fileId=file_id, fields='id, parents'), request_id=file_id)
+        batch.execute()
+    return parents
+
+def _new_batch_request(service, callback=None):
+    """
+    Crea una petición batch. Con DRIVE_API_ENDPOINT definido hay que indicar el batch_uri,
+    porque googleapiclient lo deriva de rootUrl e ignora el api_endpoint.
+    """
+    if config.DRIVE_API_ENDPOINT:
+        from urllib.parse import urljoin
+        from googleapiclient.http import BatchHttpRequest
+        batch_uri = urljoin(config.DRIVE_API_ENDPOINT, '/batch/drive/v3')
+        return BatchHttpRequest(callback=callback, batch_uri=batch_uri)
+    return service.new_batch_http_request(callback=callback)
+
+def share_files_public(file_ids, account_id: str = None) -> dict:
+    """
+    Comparte públicamente varios archivos de una cuenta con una petición batch por cada
+    DRIVE_BATCH_LIMIT (en lugar de una llamada HTTP por archivo). Los que están en la carpeta
+    pública (según sus carpetas padre en Drive) la heredan y se omiten.
+    Devuelve {file_id: None | mensaje de error}.
+    """
+    service = get_drive_service(account_id)
+    results = {}
 
-    _credentials = creds
-    return creds
+    def callback(request_id, response, exception):
+        results[request_id] = str(exception) if exception else None
 
-def get_drive_service():
-    """Obtiene el servicio de la API de Google Drive e imprime la cuenta usada."""
-    global _credentials
-    if _credentials is None or not _credentials.valid:
-        _credentials = load_credentials()
-    
+    # Los archivos de la carpeta pública ya son accesibles: no necesitan permiso propio
+    file_ids = list(file_ids)
     try:
-        service = build('drive', 'v3', credentials=_credentials)
-        about = service.about().get(fields="user").execute()
-        user_email = about.get('user', {}).get('emailAddress', 'Desconocido')
-        print(f"Usando cuenta de Google Drive: {user_email}")
-        return service
+        public_folders = _public_folder_ids(service, account_id or DEFAULT_ACCOUNT)
+        if public_folders:
+            for file_id, parents in _get_parents(service, file_ids).items():
+                if public_folders.intersection(parents):
+                    results[file_id] = None
     except Exception as e:
-        print(f"Error al obtener información del usuario de Drive o crear el servicio: {e}")
-        try:
-            return build('drive', 'v3', credentials=_credentials)
-        except Exception as build_error:
-            print(f"Error al construir el servicio de Drive: {build_error}")
-            raise build_error
+        logger.warning(f"No se pudo comprobar la carpeta pública de la cuenta {account_id or DEFAULT_ACCOUNT}, se comparte cada archivo: {e}")
+    file_ids = [fid for fid in file_ids if fid not in results]
+    for i in range(0, len(file_ids), DRIVE_BATCH_LIMIT):
+        batch = _new_batch_request(service, callback=callback)
+        for file_id in file_ids[i:i + DRIVE_BATCH_LIMIT]:
+            batch.add(
+                service.permissions().create(fileId=file_id, body=PUBLIC_PERMISSION, fields='id'),
+                request_id=file_id
+            )
+        batch.execute()
+    failed = [fid for fid, error in results.items() if error]
+    logger.info(f"Compartidos públicamente {len(results) - len(failed)}/{len(results)} archivos en lote.")
+    return results
+
+async def share_files_public_async(file_ids, account_id: str = None) -> dict:
+    """Versión asíncrona de share_files_public (se ejecuta en el executor)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _call_drive, share_files_public, list(file_ids), account_id)
+
+def get_storage_quota(account_id: str = None) -> dict:
+    """
+    Devuelve la cuota de almacenamiento de la cuenta en bytes: {'limit', 'usage', ...}.
+    'limit' es None si la cuenta no tiene límite.
+    """
+    def fetch():
+        about = get_drive_service(account_id).about().get(fields='storageQuota').execute()
+        return about.get('storageQuota', {})
+    quota = _call_drive(fetch)
+    return {
+        key: (int(quota[key]) if quota.get(key) is not None else None)
+        for key in ('limit', 'usage', 'usageInDrive', 'usageInDriveTrash')
+    }
+
+def delete_files_batch(file_ids, account_id: str = None) -> dict:
+    """
+    Borra varios archivos de una cuenta con una petición batch por cada DRIVE_BATCH_LIMIT.
+    Un 404 cuenta como borrado (ya no existe). Devuelve {file_id: None | mensaje de error}.
+    """
+    from googleapiclient.errors import HttpError
+    service = get_drive_service(account_id)
+    results = {}
+
+    def callback(request_id, response, exception):
+        if exception is None or (isinstance(exception, HttpError) and getattr(exception.resp, 'status', 0) == 404):
+            results[request_id] = None
+        else:
+            results[request_id] = str(exception)
+
+    file_ids = list(file_ids)
+    for i in range(0, len(file_ids), DRIVE_BATCH_LIMIT):
+        batch = _new_batch_request(service, callback=callback)
+        for file_id in file_ids[i:i + DRIVE_BATCH_LIMIT]:
+            batch.add(service.files().delete(fileId=file_id), request_id=file_id)
+        _call_drive(batch.execute)
+    failed = [fid for fid, error in results.items() if error]
+    logger.info(f"Borrados de Drive {len(results) - len(failed)}/{len(results)} archivos en lote.")
+    return results
+
+def delete_uploaded_entries(entries) -> set:
+    """
+    Borra de Drive (en lote, agrupando por cuenta) y del registro las entradas dadas.
+    Devuelve los file_id borrados; los que fallan se quedan en el registro.
+    """
+    by_account = {}
+    for entry in entries:
+        by_account.setdefault(account_of(entry), []).append(entry['file_id'])
+    deleted = set()
+    for account_id, file_ids in by_account.items():
+        results = delete_files_batch(file_ids, account_id)
+        deleted.update(file_id for file_id, error in results.items() if not error)
+    remove_uploaded_file_records(deleted)
+    return deleted
 
 # =============================================================================
 # FUNCIÓN DE SUBIDA CON PROGRESO
 # =============================================================================
 
-async def upload_to_drive_async_with_progress(file_path: str, file_name: str, progress_callback=None):
+class UploadChecksumError(RuntimeError):
+    """El archivo subido no coincide con el local (md5Checksum de Drive distinto) tras agotar los reintentos."""
+
+# Tamaño de chunk de la subida reanudable (también la unidad del reparto de ancho de banda)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# MD5 verificado de cada archivo recién subido (lo recoge quien lo registra con pop_verified_checksum)
+_verified_checksums = {}
+
+def pop_verified_checksum(file_id: str):
+    """Devuelve (y olvida) el MD5 verificado de un archivo subido en este proceso, o None."""
+    return _verified_checksums.pop(file_id, None)
+
+async def upload_to_drive_async_with_progress(file_path: str, file_name: str, progress_callback=None, trace=None, share=True,
+                                             account_id: str = None, md5: str = None):
     """
     Sube un archivo a Google Drive usando OAuth de forma asíncrona y lo comparte públicamente.
+    'account_id' elige la cuenta del pool (por defecto, la principal).
+    Con UPLOAD_VERIFY_CHECKSUM compara el md5Checksum que devuelve Drive con 'md5' (calculado
+    en la descarga) o, si no se pasa, con el MD5 calculado durante la propia subida; si no
+    coinciden borra la copia y vuelve a subir (hasta UPLOAD_VERIFY_MAX_ATTEMPTS intentos).
     Incluye un callback de progreso que se llama con poca frecuencia.
+    Si se pasa 'trace' (tracing.JobTrace), registra los spans 'upload' y 'share'.
+    Con share=False no se comparte (útil para compartir varios a la vez con share_files_public_async).
+    Si DRIVE_UPLOAD_FOLDER_MODE usa la carpeta pública, el archivo hereda su permiso y no se comparte.
     """
-    print(f"Iniciando subida asíncrona (CON PROGRESO LIMITADO) de '{file_name}' a Google Drive (OAuth)...")
-    load_credentials()
+    logger.info(f"Iniciando subida asíncrona (CON PROGRESO LIMITADO) de '{file_name}' a Google Drive (OAuth, cuenta {account_id or DEFAULT_ACCOUNT})...")
     loop = asyncio.get_event_loop()
-    service = await loop.run_in_executor(None, get_drive_service)
     
+    def upload_once(service, file_metadata):
+        """Sube el archivo una vez. Devuelve (respuesta de Drive, MD5 local o None)."""
+        from googleapiclient.http import MediaIoBaseUpload
+        # Si no hay MD5 de la descarga, se calcula sobre los bytes que ya lee la subida
+        hasher = hashlib.md5() if config.UPLOAD_VERIFY_CHECKSUM and not md5 else None
+        with span_or_null(trace, "upload", nbytes=os.path.getsize(file_path)):
+            # Lectura secuencial con pista al kernel; al terminar se libera la caché de páginas
+            with open_for_upload(file_path, hasher=hasher) as fh:
+                media = MediaIoBaseUpload(fh, mimetype='video/mp4', resumable=True, chunksize=UPLOAD_CHUNK_SIZE)
+                request = service.files().create(body=file_metadata, media_body=media, fields='id, size, md5Checksum')
+
+                # El ancho de banda de subida se reparte entre los trabajos chunk a chunk (el archivo es el flujo)
+                shaper = get_shaper('upload')
+                try:
+                    response = None
+                    while response is None:
+                        shaper.acquire(file_path, max(1, min(UPLOAD_CHUNK_SIZE, media.size() - request.resumable_progress)))
+                        status, response = request.next_chunk()
+                finally:
+                    shaper.finish_flow(file_path)
+                drop_page_cache(fh)
+                local_md5 = md5 or (fh.hexdigest() if hasher is not None else None)
+        return response, local_md5
+
     def upload_and_share_task():
-        print("Ejecutando tarea de subida y compartir en thread (CON PROGRESO LIMITADO)...")
+        logger.debug("Ejecutando tarea de subida y compartir en thread (CON PROGRESO LIMITADO)...")
         try:
+            service = get_drive_service(account_id)
             file_metadata = {'name': file_name}
-            media = MediaFileUpload(file_path, mimetype='video/mp4', resumable=True, chunksize=1024*1024)
-            request = service.files().create(body=file_metadata, media_body=media)
-
-            response = None
-            while response is None:
-                status, response = request.next_chunk()
-
-            file_id = response.get('id')
-            print(f"Subida a Google Drive completada. ID del archivo: {file_id}")
-
-            print(f"Compartiendo archivo {file_id} públicamente...")
-            permission = {
-                'type': 'anyone',
-                'role': 'reader',
-                'allowFileDiscovery': False
-            }
-            service.permissions().create(
-                fileId=file_id,
-                body=permission,
-                fields='id'
-            ).execute()
-            print(f"Archivo {file_id} compartido públicamente con éxito.")
+            try:
+                folder_id = get_upload_folder_id(service, account_id)
+            except Exception as folder_error:
+                # Sin carpeta pública: se sube a la raíz y se comparte el archivo individualmente
+                logger.warning(f"No se pudo resolver la carpeta pública de subida, se compartirá por archivo: {folder_error}")
+                folder_id = None
+            if folder_id:
+                file_metadata['parents'] = [folder_id]
+
+            attempts = max(1, config.UPLOAD_VERIFY_MAX_ATTEMPTS) if config.UPLOAD_VERIFY_CHECKSUM else 1
+            for attempt in range(1, attempts + 1):
+                response, local_md5 = upload_once(service, file_metadata)
+                file_id = response.get('id')
+                logger.info(f"Subida a Google Drive completada. ID del archivo: {file_id}")
+                remote_md5 = response.get('md5Checksum')
+                if not config.UPLOAD_VERIFY_CHECKSUM or not local_md5 or not remote_md5:
+                    if config.UPLOAD_VERIFY_CHECKSUM:
+                        logger.warning(f"No se pudo verificar el MD5 de {file_id} (local: {local_md5}, Drive: {remote_md5}).")
+                    break
+                if remote_md5 == local_md5:
+                    logger.info(f"MD5 de {file_id} verificado: {remote_md5}")
+                    _verified_checksums[file_id] = local_md5
+                    break
+                logger.error(f"❌ MD5 de {file_id} no coincide (local {local_md5}, Drive {remote_md5}); intento {attempt}/{attempts}.")
+                try:
+                    service.files().delete(fileId=file_id).execute()
+                except Exception as delete_error:
+                    logger.warning(f"No se pudo borrar la copia defectuosa {file_id}: {delete_error}")
+                if attempt == attempts:
+                    raise UploadChecksumError(
+                        f"La copia en Drive de '{file_name}' no coincide con el archivo local tras {attempts} intentos."
+                    )
+
+            if folder_id:
+                # Hereda el permiso "cualquiera con el enlace" de la carpeta
+                logger.info(f"Archivo {file_id} subido a la carpeta pública {folder_id}: no hace falta compartirlo.")
+            elif share:
+                logger.info(f"Compartiendo archivo {file_id} públicamente...")
+                with span_or_null(trace, "share"):
+                    service.permissions().create(
+                        fileId=file_id,
+                        body=PUBLIC_PERMISSION,
+                        fields='id'
+                    ).execute()
+                logger.info(f"Archivo {file_id} compartido públicamente con éxito.")
 
             return file_id
         except Exception as e:
-            print(f"Error interno en la tarea de subida y compartir: {e}")
+            logger.error(f"Error interno en la tarea de subida y compartir: {e}")
             raise
 
     try:
-        drive_id = await loop.run_in_executor(None, upload_and_share_task)
-        print(f"ID de archivo en Google Drive (compartido) obtenido: {drive_id}")
+        drive_id = await loop.run_in_executor(None, _call_drive, upload_and_share_task)
+        logger.info(f"ID de archivo en Google Drive (compartido) obtenido: {drive_id}")
         return drive_id
     except Exception as e:
-        print(f"Error durante la subida/compartir a Google Drive (OAuth): {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error durante la subida/compartir a Google Drive (OAuth): {e}")
         raise
 
 # =============================================================================
@@ -143,316 +491,307 @@ ITEMS_PER_PAGE = 10
 # FUNCIONES PARA GESTIONAR ARCHIVOS SUBIDOS POR EL BOT
 # =============================================================================
 
-async def list_uploaded_files_async(page_number: int = 1):
+async def list_uploaded_files_async(page_number: int = 1, sort: str = 'time', descending: bool = True):
     """
-    Lista SOLO los archivos que el bot ha subido, obteniendo detalles de la API de Drive.
+    Lista una página de los archivos que el bot ha subido, ordenada por 'sort' ('time',
+    'name' o 'size'). La página sale de los índices ordenados del registro (search_index)
+    y solo se consultan en Drive los ITEMS_PER_PAGE archivos de esa página.
     """
-    print(f"Iniciando listado asíncrono de archivos SUBIDOS POR EL BOT (pagina {page_number})...")
-    load_credentials()
+    logger.info(f"Iniciando listado asíncrono de archivos SUBIDOS POR EL BOT (pagina {page_number}, orden {sort})...")
     loop = asyncio.get_event_loop()
-    service = await loop.run_in_executor(None, get_drive_service)
     
     def list_task():
-        print("Ejecutando tarea de listado de archivos subidos en thread...")
+        from googleapiclient.errors import HttpError
+        import search_index
         try:
-            uploaded_entries = get_uploaded_files()
-            
-            if not uploaded_entries:
-                print("No hay archivos registrados como subidos por el bot.")
-                return {
-                    'files': [],
-                    'total_files': 0,
-                    'pages': 1,
-                    'current_page': page_number
-                }
-            
-            file_ids = [entry['file_id'] for entry in uploaded_entries]
-            file_id_to_name = {entry['file_id']: entry['original_name'] for entry in uploaded_entries}
-
-            if not file_ids:
-                items = []
-            else:
-                items = []
-                batch_size = 50
-                for i in range(0, len(file_ids), batch_size):
-                    batch_file_ids = file_ids[i:i + batch_size]
-                    print(f"Procesando lote de IDs: {batch_file_ids[:3]}... (total {len(batch_file_ids)})")
-
-                    if len(batch_file_ids) == 1:
-                        single_id = batch_file_ids[0]
-                        ids_query = f"id = '{single_id}'"
-                        print(f"  Consulta para 1 archivo (lote): {ids_query}")
-                    else:
-                        escaped_ids = [fid.replace("'", "\\'") for fid in batch_file_ids]
-                        ids_query = f"id in ({', '.join(repr(fid) for fid in escaped_ids)})"
-                        print(f"  Consulta para {len(batch_file_ids)} archivos (lote): {ids_query[:100]}...")
-
-                    try:
-                        results = service.files().list(
-                            q=ids_query,
-                            fields="files(id, name, size, mimeType)",
-                            orderBy="name"
-                        ).execute()
-                        batch_items = results.get('files', [])
-                        items.extend(batch_items)
-                        print(f"  Lote procesado, obtenidos {len(batch_items)} archivos.")
-                    except HttpError as http_err:
-                        print(f"  Error HTTP al listar lote {i//batch_size + 1}: {http_err}")
-                        print(f"  Consulta fallida: {ids_query}")
-                        continue
-                    except Exception as batch_err:
-                        print(f"  Error inesperado al listar lote {i//batch_size + 1}: {batch_err}")
-                        print(f"  Consulta fallida: {ids_query}")
-                        continue
-
-            processed_items = []
-            for item in items:
-                file_id = item['id']
-                original_name = file_id_to_name.get(file_id, item.get('name', 'Nombre_Desconocido'))
-                item['original_name'] = original_name
+            total_files, rows = search_index.page(sort, descending, page_number, ITEMS_PER_PAGE)
+            pages = math.ceil(total_files / ITEMS_PER_PAGE) if total_files > 0 else 1
+            if not rows:
+                logger.info("No hay archivos registrados como subidos por el bot en esta página.")
+                return {'files': [], 'total_files': total_files, 'pages': pages, 'current_page': page_number}
+
+            # Detalles actuales de Drive solo para los archivos de la página, en la cuenta de cada uno
+            details = {}
+            unreachable = set()  # Cuentas que no respondieron: sus archivos no se marcan como desaparecidos
+            ids_by_account = {}
+            for row in rows:
+                ids_by_account.setdefault(account_of(row), []).append(row['file_id'])
+            for account_id, file_ids in ids_by_account.items():
+                ids_query = " or ".join(f"id = '{_escape_query_value(file_id)}'" for file_id in file_ids)
+                try:
+                    results = get_drive_service(account_id).files().list(
+                        q=ids_query,
+                        pageSize=len(file_ids),
+                        fields="files(id, name, size, mimeType)"
+                    ).execute()
+                    details.update({item['id']: item for item in results.get('files', [])})
+                except HttpError as http_err:
+                    logger.error(f"  Error HTTP al consultar la página en la cuenta '{account_id}': {http_err}")
+                    unreachable.add(account_id)
+
+            files = []
+            for row in rows:
+                item = details.get(row['file_id'], {})
                 try:
-                    size_bytes = int(item.get('size', 0))
+                    size_bytes = int(item.get('size') or row.get('size') or 0)
                 except (ValueError, TypeError):
                     size_bytes = 0
-                item['size'] = size_bytes
-                processed_items.append(item)
-
-            total_files = len(processed_items)
-            pages = math.ceil(total_files / ITEMS_PER_PAGE) if total_files > 0 else 1
-            start_index = (page_number - 1) * ITEMS_PER_PAGE
-            end_index = start_index + ITEMS_PER_PAGE
-            paginated_items = processed_items[start_index:end_index]
-
-            print(f"Listado de archivos subidos completado. Pagina {page_number}/{pages}, {len(paginated_items)} archivos encontrados en Drive.")
+                files.append({
+                    'id': row['file_id'],
+                    'name': item.get('name', row.get('original_name')),
+                    'original_name': row.get('original_name') or item.get('name', 'Nombre_Desconocido'),
+                    'size': size_bytes,
+                    'mimeType': item.get('mimeType'),
+                    'account_id': account_of(row),
+                    'missing': row['file_id'] not in details and account_of(row) not in unreachable,
+                })
+
+            logger.info(f"Listado de archivos subidos completado. Pagina {page_number}/{pages}, {len(files)} archivos.")
             return {
-                'files': paginated_items,
+                'files': files,
                 'total_files': total_files,
                 'pages': pages,
                 'current_page': page_number
             }
         except Exception as e:
-            print(f"Error interno en la tarea de listado de archivos subidos: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error interno en la tarea de listado de archivos subidos: {e}")
             raise
 
     try:
         result = await loop.run_in_executor(None, list_task)
         return result
     except Exception as e:
-        print(f"Error durante el listado de archivos subidos de Google Drive (OAuth): {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error durante el listado de archivos subidos de Google Drive (OAuth): {e}")
         raise
 
 async def delete_uploaded_file_async(file_id: str):
     """
     Borra un archivo subido por el bot de Google Drive y de la base de datos local.
     """
-    print(f"Iniciando borrado asíncrono del archivo SUBIDO POR EL BOT {file_id} en Google Drive (OAuth)...")
-    load_credentials()
+    logger.info(f"Iniciando borrado asíncrono del archivo SUBIDO POR EL BOT {file_id} en Google Drive (OAuth)...")
     loop = asyncio.get_event_loop()
-    service = await loop.run_in_executor(None, get_drive_service)
+    # Se borra en la cuenta que lo tiene según el registro
+    entry = await loop.run_in_executor(None, get_uploaded_file_entry, file_id)
     
     def delete_task():
-        print(f"Ejecutando tarea de borrado para {file_id} en thread...")
+        logger.debug(f"Ejecutando tarea de borrado para {file_id} en thread...")
         try:
-            service.files().delete(fileId=file_id).execute()
-            print(f"Archivo {file_id} borrado exitosamente de Google Drive.")
+            get_drive_service(account_of(entry)).files().delete(fileId=file_id).execute()
+            logger.info(f"Archivo {file_id} borrado exitosamente de Google Drive.")
             remove_uploaded_file_record(file_id)
         except Exception as e:
-            print(f"Error interno en la tarea de borrado para {file_id}: {e}")
+            logger.error(f"Error interno en la tarea de borrado para {file_id}: {e}")
             remove_uploaded_file_record(file_id)
             raise
 
     try:
         await loop.run_in_executor(None, delete_task)
     except Exception as e:
-        print(f"Error durante el borrado del archivo {file_id} de Google Drive (OAuth): {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error durante el borrado del archivo {file_id} de Google Drive (OAuth): {e}")
         raise
 
 async def delete_all_uploaded_files_async():
     """
     Borra todos los archivos que el bot ha subido, tanto de Drive como de la DB local.
     """
-    print("Iniciando borrado MASIVO de archivos SUBIDOS POR EL BOT en Google Drive (OAuth)...")
-    load_credentials()
+    logger.info("Iniciando borrado MASIVO de archivos SUBIDOS POR EL BOT en Google Drive (OAuth)...")
     loop = asyncio.get_event_loop()
-    service = await loop.run_in_executor(None, get_drive_service)
     
     def delete_all_task():
-        print("Ejecutando tarea de borrado MASIVO de archivos subidos en thread...")
+        logger.debug("Ejecutando tarea de borrado MASIVO de archivos subidos en thread...")
         try:
             uploaded_entries = get_uploaded_files()
 
             if not uploaded_entries:
-                print("No hay archivos registrados como subidos por el bot para borrar.")
+                logger.info("No hay archivos registrados como subidos por el bot para borrar.")
                 return
 
-            print(f"Se encontraron {len(uploaded_entries)} archivos registrados para borrar.")
+            logger.info(f"Se encontraron {len(uploaded_entries)} archivos registrados para borrar.")
 
             for entry in uploaded_entries:
                 file_id = entry['file_id']
                 try:
-                    service.files().delete(fileId=file_id).execute()
-                    print(f"Archivo {file_id} borrado de Google Drive.")
+                    get_drive_service(account_of(entry)).files().delete(fileId=file_id).execute()
+                    logger.info(f"Archivo {file_id} borrado de Google Drive.")
                 except Exception as e:
-                    print(f"Error borrando archivo {file_id} de Drive: {e}")
+                    logger.error(f"Error borrando archivo {file_id} de Drive: {e}")
 
             clear_all_uploaded_file_records()
-            print("Borrado MASIVO de archivos subidos completado.")
+            logger.info("Borrado MASIVO de archivos subidos completado.")
         except Exception as e:
-            print(f"Error interno en la tarea de borrado MASIVO de archivos subidos: {e}")
+            logger.error(f"Error interno en la tarea de borrado MASIVO de archivos subidos: {e}")
             raise
 
     try:
         await loop.run_in_executor(None, delete_all_task)
     except Exception as e:
-        print(f"Error durante el borrado MASIVO de archivos subidos de Google Drive (OAuth): {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error durante el borrado MASIVO de archivos subidos de Google Drive (OAuth): {e}")
         raise
 
 # =============================================================================
 # FUNCIONES PARA GESTIONAR TODO EL CONTENIDO DE GOOGLE DRIVE (No solo subidos)
 # =============================================================================
 
-async def list_drive_contents_async(page_number: int = 1, folder_id: str = 'root'):
+async def list_drive_contents_async(page_number: int = 1, folder_id: str = 'root', account_id: str = None):
     """
     Lista el contenido de una carpeta de Google Drive (por defecto 'root' = Mi Unidad).
+    Sin account_id se listan todas las cuentas del pool, mezcladas por fecha de
+    modificación; cada archivo lleva su 'account_id'.
     """
-    print(f"Iniciando listado asíncrono de Google Drive (carpeta: {folder_id}, página {page_number})...")
-    load_credentials()
+    logger.info(f"Iniciando listado asíncrono de Google Drive (carpeta: {folder_id}, página {page_number})...")
     loop = asyncio.get_event_loop()
-    service = await loop.run_in_executor(None, get_drive_service)
+    accounts = [account_id] if account_id else get_account_ids()
+    page_size = 10
     
     def list_task():
-        print(f"Ejecutando tarea de listado de Drive para carpeta: {folder_id}")
+        from googleapiclient.errors import HttpError
+        logger.debug(f"Ejecutando tarea de listado de Drive para carpeta: {folder_id}")
         try:
-            query = f"'{folder_id}' in parents and trashed = false"
-            
-            results = service.files().list(
-                q=query,
-                pageSize=10,
-                pageToken=None,
-                fields="nextPageToken, files(id, name, size, mimeType, modifiedTime)",
-                orderBy="modifiedTime desc"
-            ).execute()
-            
-            files = results.get('files', [])
-            next_page_token = results.get('nextPageToken')
-            has_more = next_page_token is not None
-            
+            # Cada cuenta devuelve sus primeros page_number * page_size archivos por fecha:
+            # mezclados, la página pedida sale de ahí
+            wanted = page_number * page_size
+            files = []
+            has_more = False
+            failed = []
+            for account in accounts:
+                try:
+                    results = get_drive_service(account).files().list(
+                        q=f"'{folder_id}' in parents and trashed = false",
+                        pageSize=min(wanted, 1000),
+                        fields="nextPageToken, files(id, name, size, mimeType, modifiedTime)",
+                        orderBy="modifiedTime desc"
+                    ).execute()
+                except HttpError as http_err:
+                    logger.error(f"  Error HTTP al listar la cuenta '{account}': {http_err}")
+                    failed.append(http_err)
+                    continue
+                for item in results.get('files', []):
+                    item['account_id'] = account
+                    files.append(item)
+                has_more = has_more or results.get('nextPageToken') is not None
+            if failed and len(failed) == len(accounts):
+                raise failed[-1]
+
+            files.sort(key=lambda item: item.get('modifiedTime') or '', reverse=True)
+            has_more = has_more or len(files) > wanted
+            files = files[wanted - page_size:wanted]
             for item in files:
                 try:
                     item['size'] = int(item.get('size', 0))
                 except (ValueError, TypeError):
                     item['size'] = 0
             
-            print(f"Listado de Drive completado. Página {page_number}, {len(files)} archivos encontrados.")
+            logger.info(f"Listado de Drive completado. Página {page_number}, {len(files)} archivos encontrados.")
             
             return {
                 'files': files,
                 'current_page': page_number,
                 'has_more': has_more,
-                'next_page_token': next_page_token
             }
         except Exception as e:
-            print(f"Error interno en la tarea de listado de Drive: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error interno en la tarea de listado de Drive: {e}")
             raise
 
     try:
         result = await loop.run_in_executor(None, list_task)
         return result
     except Exception as e:
-        print(f"Error durante el listado de Google Drive: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error durante el listado de Google Drive: {e}")
         raise
 
-async def delete_drive_file_async(file_id: str):
+async def delete_drive_file_async(file_id: str, account_id: str = None):
     """
     Borra un archivo de Google Drive por su ID (cualquier archivo, no solo subidos por el bot).
+    Sin account_id se borra en la cuenta que lo tiene según el registro; si no está
+    registrado, se prueba en cada cuenta del pool hasta dar con él.
     """
-    print(f"Iniciando borrado asíncrono del archivo {file_id} en Google Drive...")
-    load_credentials()
+    logger.info(f"Iniciando borrado asíncrono del archivo {file_id} en Google Drive...")
     loop = asyncio.get_event_loop()
-    service = await loop.run_in_executor(None, get_drive_service)
+    if account_id:
+        accounts = [account_id]
+    else:
+        entry = await loop.run_in_executor(None, get_uploaded_file_entry, file_id)
+        accounts = [account_of(entry)] if entry else get_account_ids()
     
     def delete_task():
-        print(f"Ejecutando tarea de borrado para {file_id}")
-        try:
-            service.files().delete(fileId=file_id).execute()
-            print(f"Archivo {file_id} borrado exitosamente de Google Drive.")
-        except Exception as e:
-            print(f"Error interno en la tarea de borrado para {file_id}: {e}")
-            raise
+        from googleapiclient.errors import HttpError
+        logger.debug(f"Ejecutando tarea de borrado para {file_id}")
+        for index, account in enumerate(accounts):
+            try:
+                get_drive_service(account).files().delete(fileId=file_id).execute()
+                logger.info(f"Archivo {file_id} borrado exitosamente de Google Drive (cuenta '{account}').")
+                return account
+            except HttpError as http_err:
+                # No es de esta cuenta: probar la siguiente
+                if getattr(http_err.resp, 'status', 0) == 404 and index < len(accounts) - 1:
+                    continue
+                logger.error(f"Error interno en la tarea de borrado para {file_id}: {http_err}")
+                raise
+            except Exception as e:
+                logger.error(f"Error interno en la tarea de borrado para {file_id}: {e}")
+                raise
 
     try:
-        await loop.run_in_executor(None, delete_task)
+        return await loop.run_in_executor(None, delete_task)
     except Exception as e:
-        print(f"Error durante el borrado del archivo {file_id} de Google Drive: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error durante el borrado del archivo {file_id} de Google Drive: {e}")
         raise
 
-async def delete_all_drive_files_async(folder_id: str = 'root'):
+async def delete_all_drive_files_async(folder_id: str = 'root', account_id: str = None):
     """
-    Borra todos los archivos de una carpeta de Google Drive (por defecto 'root').
+    Borra todos los archivos de una carpeta de Google Drive (por defecto 'root') de la
+    cuenta indicada o, sin account_id, de todas las cuentas del pool.
     ⚠️ Acción destructiva: úsala con precaución.
     """
-    print(f"Iniciando borrado MASIVO de archivos en carpeta: {folder_id}")
-    load_credentials()
+    logger.info(f"Iniciando borrado MASIVO de archivos en carpeta: {folder_id}")
     loop = asyncio.get_event_loop()
-    service = await loop.run_in_executor(None, get_drive_service)
+    accounts = [account_id] if account_id else get_account_ids()
     
     def delete_all_task():
-        print(f"Ejecutando tarea de borrado masivo en carpeta: {folder_id}")
+        logger.debug(f"Ejecutando tarea de borrado masivo en carpeta: {folder_id}")
         try:
-            all_files = []
-            page_token = None
-            while True:
-                results = service.files().list(
-                    q=f"'{folder_id}' in parents and trashed = false",
-                    pageSize=100,
-                    pageToken=page_token,
-                    fields="nextPageToken, files(id, name)"
-                ).execute()
+            total = 0
+            for account in accounts:
+                service = get_drive_service(account)
+                all_files = []
+                page_token = None
+                while True:
+                    results = service.files().list(
+                        q=f"'{folder_id}' in parents and trashed = false",
+                        pageSize=100,
+                        pageToken=page_token,
+                        fields="nextPageToken, files(id, name)"
+                    ).execute()
+                    
+                    files = results.get('files', [])
+                    all_files.extend(files)
+                    page_token = results.get('nextPageToken')
+                    
+                    if not page_token:
+                        break
                 
-                files = results.get('files', [])
-                all_files.extend(files)
-                page_token = results.get('nextPageToken')
+                logger.info(f"Se encontraron {len(all_files)} archivos para borrar en la cuenta '{account}'.")
                 
-                if not page_token:
-                    break
-            
-            print(f"Se encontraron {len(all_files)} archivos para borrar.")
-            
-            for file in all_files:
-                file_id = file['id']
-                file_name = file['name']
-                try:
-                    service.files().delete(fileId=file_id).execute()
-                    print(f"✅ Borrado: {file_name} ({file_id})")
-                except Exception as e:
-                    print(f"❌ Error borrando {file_name} ({file_id}): {e}")
+                for file in all_files:
+                    file_id = file['id']
+                    file_name = file['name']
+                    try:
+                        service.files().delete(fileId=file_id).execute()
+                        logger.info(f"✅ Borrado: {file_name} ({file_id})")
+                    except Exception as e:
+                        logger.error(f"❌ Error borrando {file_name} ({file_id}): {e}")
+                total += len(all_files)
             
-            print(f"Borrado masivo completado. {len(all_files)} archivos procesados.")
+            logger.info(f"Borrado masivo completado. {total} archivos procesados.")
             
         except Exception as e:
-            print(f"Error interno en la tarea de borrado masivo: {e}")
+            logger.error(f"Error interno en la tarea de borrado masivo: {e}")
             raise
 
     try:
         await loop.run_in_executor(None, delete_all_task)
     except Exception as e:
-        print(f"Error durante el borrado masivo de Google Drive: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error durante el borrado masivo de Google Drive: {e}")
         raise
 
 # =============================================================================
@@ -467,8 +806,8 @@ def cleanup_temp_token_file():
     if _temp_token_file and os.path.exists(_temp_token_file):
         try:
             os.unlink(_temp_token_file)
-            print(f"Archivo temporal de token eliminado al finalizar: {_temp_token_file}")
+            logger.info(f"Archivo temporal de token eliminado al finalizar: {_temp_token_file}")
         except Exception as e:
-            print(f"Advertencia: Error al eliminar archivo temporal de token al finalizar: {e}")
+            logger.warning(f"Advertencia: Error al eliminar archivo temporal de token al finalizar: {e}")
 
 atexit.register(cleanup_temp_token_file)
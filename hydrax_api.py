@@ -1,18 +1,70 @@
-import requests
+import asyncio
+import logging
 import time
+import threading
 
 # Importa la clave desde config
-from config import HYDRAX_API_KEY
+from config import HYDRAX_API_KEY, HYDRAX_API_URL
+from circuit_breaker import get_breaker, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+# Sesión HTTP compartida (keep-alive): evita repetir DNS + TLS en cada importación.
+# 'requests' se importa de forma perezosa para no retrasar el arranque.
+_session = None
+_session_lock = threading.Lock()
+
+def _get_session():
+    """Devuelve la sesión HTTP compartida con Hydrax, creándola en el primer uso."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def warm_up_connection():
+    """Abre (y deja en el pool) una conexión con Hydrax para que la primera importación no pague el TLS."""
+    _get_session().head(HYDRAX_API_URL, timeout=10)
+
+def _is_outage(error) -> bool:
+    """¿El error indica que Hydrax está caído (red, timeout, 5xx, 429) y no un error de la petición?"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return True
+    return response.status_code >= 500 or response.status_code == 429
 
 def import_to_hydrax(drive_id: str):
-    """Importa un archivo de Google Drive a Hydrax usando su API."""
-    url = f"https://api.hydrax.net/{HYDRAX_API_KEY}/drive/{drive_id}"
+    """
+    Importa un archivo de Google Drive a Hydrax usando su API.
+    Si el circuit breaker de Hydrax está abierto falla al instante, sin gastar reintentos.
+    """
+    import requests
+    url = f"{HYDRAX_API_URL}/{HYDRAX_API_KEY}/drive/{drive_id}"
+    session = _get_session()
+    breaker = get_breaker("hydrax")
 
     max_retries = 5
     for attempt in range(max_retries):
+        if not breaker.allow():
+            error = CircuitOpenError("Hydrax", breaker.retry_after())
+            return {"success": False, "error": str(error), "circuit_open": True}
         try:
-            response = requests.get(url, timeout=30) # Timeout de 30 segundos
-            response.raise_for_status() # Lanza excepción para códigos 4xx/5xx
+            try:
+                response = session.get(url, timeout=30) # Timeout de 30 segundos
+                response.raise_for_status() # Lanza excepción para códigos 4xx/5xx
+            except requests.exceptions.RequestException as e:
+                if _is_outage(e):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success() # Hydrax respondió: el problema es la petición
+                raise
+            breaker.record_success()
             data = response.json()
 
             if data.get("status") == True:
@@ -21,11 +73,16 @@ def import_to_hydrax(drive_id: str):
                 return {"success": False, "error": data.get("msg", "Error desconocido de Hydrax")}
 
         except requests.exceptions.RequestException as e:
-            print(f"Intento {attempt+1} fallido al llamar a Hydrax: {e}")
+            logger.warning(f"Intento {attempt+1} fallido al llamar a Hydrax: {e}")
             if attempt < max_retries - 1:
                 time.sleep(2 ** attempt) # Espera exponencial
             else:
                 return {"success": False, "error": f"Error de red al contactar Hydrax: {e}"}
         except Exception as e:
-             print(f"Error inesperado al llamar a Hydrax: {e}")
+             logger.error(f"Error inesperado al llamar a Hydrax: {e}")
              return {"success": False, "error": f"Error interno al procesar respuesta de Hydrax: {e}"}
+
+async def import_to_hydrax_async(drive_id: str):
+    """Versión asíncrona de import_to_hydrax: se ejecuta en un hilo para no bloquear el loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, import_to_hydrax, drive_id)
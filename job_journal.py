@@ -0,0 +1,313 @@
+# job_journal.py (Diario persistente de trabajos: etapa alcanzada y artefactos de cada video)
+"""
+Cada video procesado tiene una entrada en jobs_db.json con la última etapa completada
+y sus artefactos (ruta temporal, drive_id, slug). Si el proceso muere a mitad, al
+arrancar se reanudan los trabajos 'active' desde esa etapa en lugar de empezar de cero.
+
+Los trabajos que fallan pasan a 'retry_wait' con espera exponencial (los reintenta
+retry_queue.py) y, al agotar RETRY_MAX_ATTEMPTS, a la lista dead-letter ('dead').
+
+Cada cambio reescribe jobs_db.json entero (TinyDB), así que no se escribe desde el event
+loop: _save() deja una copia del trabajo en _pending y un hilo escritor la guarda. Si un
+trabajo cambia varias veces antes de escribirse, solo se guarda la última versión. Las
+lecturas combinan la DB con lo pendiente, así que ven siempre el último estado. Al salir
+del proceso se vacía lo pendiente (atexit).
+"""
+import atexit
+import copy
+import logging
+import random
+import threading
+import time
+
+import config
+from db import get_jobs_db
+
+logger = logging.getLogger(__name__)
+
+# Etapas en orden: cada una implica que las anteriores están completas
+STAGES = ("queued", "downloaded", "uploaded", "shared", "recorded", "imported")
+
+# Estados del trabajo. Solo los 'active' se reanudan al arrancar.
+ACTIVE = "active"
+DONE = "done"
+FAILED = "failed"          # Fallo definitivo (no se reintenta)
+CANCELLED = "cancelled"
+RETRY_WAIT = "retry_wait"  # En la cola de reintentos, esperando next_retry_at
+DEAD = "dead"              # Reintentos agotados (dead-letter)
+
+# Estados que la purga automática nunca borra
+_KEPT_STATUSES = (ACTIVE, RETRY_WAIT, DEAD)
+
+_journal_lock = threading.Lock()          # Acceso a jobs_db (hilo escritor, lecturas y purgas)
+_pending_cond = threading.Condition()     # Protege _pending; solo se retiene un instante
+_pending = {}                             # {job_id: copia del trabajo aún no escrita}
+_writer = None
+_last_prune = 0.0
+
+
+def _query():
+    from tinydb import Query
+    return Query()
+
+
+def _save(job: dict):
+    """Encola la escritura del trabajo (no toca el disco: se puede llamar desde el loop)."""
+    global _writer
+    job['updated_at'] = time.time()
+    snapshot = copy.deepcopy(job)
+    with _pending_cond:
+        _pending[job['job_id']] = snapshot
+        if _writer is None:
+            _writer = threading.Thread(target=_writer_loop, name="job-journal-writer", daemon=True)
+            _writer.start()
+        _pending_cond.notify()
+
+
+def _write_pending() -> int:
+    """Guarda en la DB los trabajos pendientes. Devuelve cuántos se escribieron."""
+    # Con _journal_lock retenido desde que se sacan de _pending hasta que están en la DB,
+    # ninguna lectura puede ver el hueco entre ambos
+    with _journal_lock:
+        with _pending_cond:
+            batch = list(_pending.values())
+            _pending.clear()
+        for job in batch:
+            try:
+                get_jobs_db().upsert(job, _query().job_id == job['job_id'])
+            except Exception as e:
+                logger.error(f"No se pudo guardar el trabajo {job['job_id']} en el diario: {e}")
+        return len(batch)
+
+
+def _writer_loop():
+    global _last_prune
+    while True:
+        with _pending_cond:
+            while not _pending:
+                _pending_cond.wait()
+        try:
+            _write_pending()
+            # Purgar de vez en cuando los terminados antiguos para que el archivo no crezca
+            if time.time() - _last_prune > 3600:
+                _last_prune = time.time()
+                prune_finished()
+        except Exception as e:
+            logger.error(f"Error en el escritor del diario de trabajos: {e}")
+
+
+def flush():
+    """Escribe ya los cambios pendientes (al salir y en pruebas)."""
+    _write_pending()
+
+
+atexit.register(flush)
+
+
+def _search(condition) -> list:
+    """Trabajos que cumplen 'condition' (consulta de TinyDB), incluidos los cambios aún sin escribir."""
+    with _journal_lock:
+        found = {job['job_id']: dict(job) for job in get_jobs_db().search(condition)}
+        with _pending_cond:
+            pending = [copy.deepcopy(job) for job in _pending.values()]
+    for job in pending:
+        if condition(job):
+            found[job['job_id']] = job
+        else:
+            found.pop(job['job_id'], None)
+    return list(found.values())
+
+
+def _remove(condition) -> int:
+    """
+    Borra del diario los trabajos que cumplen 'condition', con sus cambios pendientes.
+    Cuenta el estado más reciente: con un cambio pendiente, la fila ya escrita (desfasada)
+    se borra si el pendiente cumple la condición y se conserva si no. Devuelve cuántos
+    trabajos se borraron.
+    """
+    Job = _query()
+    with _journal_lock:
+        with _pending_cond:
+            discarded = [job_id for job_id, job in _pending.items() if condition(job)]
+            kept = [job_id for job_id in _pending if job_id not in discarded]
+            for job_id in discarded:
+                del _pending[job_id]
+        if discarded:
+            condition = condition | Job.job_id.one_of(discarded)
+        if kept:
+            condition = condition & ~Job.job_id.one_of(kept)
+        jobs_db = get_jobs_db()
+        removed = {job['job_id'] for job in jobs_db.search(condition)} | set(discarded)
+        jobs_db.remove(condition)
+    return len(removed)
+
+
+def start_job(job_id, chat_id: int, message_id: int, user_id: int, file_name: str, file_size: int,
+              progress_message=None, media_group_id=None) -> dict:
+    """Registra un trabajo nuevo en la etapa 'queued' y lo devuelve."""
+    now = time.time()
+    job = {
+        'job_id': job_id,
+        'chat_id': chat_id,
+        'message_id': message_id,
+        'user_id': user_id,
+        'file_name': file_name,
+        'file_size': file_size,
+        'media_group_id': media_group_id,
+        'progress_chat_id': progress_message.chat.id if progress_message else None,
+        'progress_message_id': progress_message.id if progress_message else None,
+        'stage': STAGES[0],
+        'status': ACTIVE,
+        'history': [{'stage': STAGES[0], 'at': now}],
+        'temp_path': None,
+        'drive_id': None,
+        'slug': None,
+        'error': None,
+        'attempts': 0,
+        'next_retry_at': None,
+        'created_at': now,
+    }
+    _save(job)
+    return job
+
+
+def reached(job, stage: str) -> bool:
+    """True si el trabajo ya completó 'stage' (siempre False sin trabajo)."""
+    if not job:
+        return False
+    return STAGES.index(job['stage']) >= STAGES.index(stage)
+
+
+def advance(job, stage: str, **artifacts):
+    """Marca 'stage' como completada, guardando sus artefactos (temp_path, drive_id, slug...)."""
+    if not job:
+        return
+    job.update(artifacts)
+    if STAGES.index(stage) > STAGES.index(job['stage']):
+        job['stage'] = stage
+        job['history'].append({'stage': stage, 'at': time.time()})
+    _save(job)
+
+
+def set_progress_message(job, progress_message):
+    """Actualiza el mensaje de progreso asociado (p. ej. si hubo que enviar uno nuevo al reanudar)."""
+    if not job or progress_message is None:
+        return
+    job['progress_chat_id'] = progress_message.chat.id
+    job['progress_message_id'] = progress_message.id
+    _save(job)
+
+
+def finish_job(job, status: str, error: str = None):
+    """Cierra el trabajo (done/failed/cancelled): ya no se reanudará."""
+    if not job:
+        return
+    job['status'] = status
+    job['error'] = error
+    _save(job)
+
+
+def retry_delay(attempts: int) -> float:
+    """Espera antes del reintento número 'attempts' (exponencial con tope y ±10% de jitter)."""
+    delay = min(config.RETRY_MAX_DELAY, config.RETRY_BASE_DELAY * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.9, 1.1)
+
+
+def schedule_retry(job, error: str):
+    """
+    Mete el trabajo fallido en la cola de reintentos (o en dead-letter si ya agotó
+    RETRY_MAX_ATTEMPTS). Devuelve el estado resultante (RETRY_WAIT o DEAD).
+    """
+    if not job:
+        return None
+    job['attempts'] = job.get('attempts', 0) + 1
+    job['error'] = error
+    if job['attempts'] > config.RETRY_MAX_ATTEMPTS:
+        job['status'] = DEAD
+        job['next_retry_at'] = None
+        logger.error(f"Trabajo {job['job_id']} movido a dead-letter tras {job['attempts'] - 1} reintentos: {error}")
+    else:
+        job['status'] = RETRY_WAIT
+        job['next_retry_at'] = time.time() + retry_delay(job['attempts'])
+        logger.info(f"Trabajo {job['job_id']} en cola de reintentos (intento {job['attempts']}, etapa '{job['stage']}').")
+    _save(job)
+    return job['status']
+
+
+def reactivate(job):
+    """Pasa un trabajo de la cola de reintentos a 'active' justo antes de reintentarlo."""
+    job['status'] = ACTIVE
+    job['next_retry_at'] = None
+    _save(job)
+
+
+def requeue(job_id, reset_attempts: bool = True):
+    """Programa un trabajo (en espera o dead-letter) para reintentarse ya. Devuelve el trabajo o None."""
+    job = get_job(job_id)
+    if not job or job['status'] not in (RETRY_WAIT, DEAD, FAILED):
+        return None
+    job['status'] = RETRY_WAIT
+    job['next_retry_at'] = time.time()
+    if reset_attempts:
+        job['attempts'] = 0
+    _save(job)
+    return job
+
+
+def get_job(job_id):
+    with _journal_lock:
+        with _pending_cond:
+            pending = _pending.get(job_id)
+            if pending is not None:
+                return copy.deepcopy(pending)
+        found = get_jobs_db().get(_query().job_id == job_id)
+    return dict(found) if found else None
+
+
+def get_jobs_by_status(*statuses) -> list:
+    jobs = _search(_query().status.one_of(list(statuses)))
+    return sorted(jobs, key=lambda job: job.get('created_at', 0))
+
+
+def get_due_retries(now: float = None) -> list:
+    """Trabajos de la cola de reintentos cuyo momento ya llegó, del más atrasado al más reciente."""
+    now = time.time() if now is None else now
+    due = [job for job in get_jobs_by_status(RETRY_WAIT) if (job.get('next_retry_at') or 0) <= now]
+    return sorted(due, key=lambda job: job['next_retry_at'] or 0)
+
+
+def purge_jobs(job_ids=None, statuses=(DEAD,)) -> int:
+    """Borra del diario los trabajos indicados (o todos los de 'statuses'). Nunca borra los 'active'."""
+    Job = _query()
+    if job_ids is not None:
+        condition = Job.job_id.one_of(list(job_ids)) & (Job.status != ACTIVE)
+    else:
+        condition = Job.status.one_of([status for status in statuses if status != ACTIVE])
+    return _remove(condition)
+
+
+def get_unfinished_jobs() -> list:
+    """Trabajos que quedaron a medias (status 'active'), del más antiguo al más reciente."""
+    jobs = _search(_query().status == ACTIVE)
+    return sorted(jobs, key=lambda job: job.get('created_at', 0))
+
+
+def referenced_temp_paths() -> list:
+    """Temporales ya descargados de trabajos pendientes (la limpieza de arranque debe conservarlos)."""
+    return [
+        job['temp_path'] for job in get_unfinished_jobs()
+        if job.get('temp_path') and job['stage'] == "downloaded"
+    ]
+
+
+def prune_finished(max_age_seconds: float = None) -> int:
+    """Elimina los trabajos terminados hace más de JOB_JOURNAL_RETENTION_HOURS (no los de reintentos ni dead-letter)."""
+    if max_age_seconds is None:
+        max_age_seconds = config.JOB_JOURNAL_RETENTION_HOURS * 3600
+    Job = _query()
+    cutoff = time.time() - max_age_seconds
+    condition = ~Job.status.one_of(list(_KEPT_STATUSES)) & (Job.updated_at < cutoff)
+    removed = _remove(condition)
+    if removed:
+        logger.info(f"{removed} trabajos terminados purgados del diario.")
+    return removed
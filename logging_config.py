@@ -0,0 +1,124 @@
+# logging_config.py (Logging asíncrono por niveles, configurable por módulo y con muestreo de repetidos)
+"""
+Sustituye a los print() síncronos: los módulos usan logging.getLogger(__name__) y
+setup_logging() (llamado una vez al arrancar main.py) instala en el logger raíz un
+QueueHandler. Quien registra solo encola el mensaje; un QueueListener en su propio
+hilo es el único que escribe en stdout, así que ni el event loop ni los hilos del
+executor esperan a la consola.
+
+- LOG_LEVEL: nivel global (INFO por defecto).
+- LOG_LEVELS: niveles por módulo, p. ej. "google_drive=WARNING,db=DEBUG".
+- LOG_SAMPLE_BURST / LOG_SAMPLE_WINDOW: como mucho LOG_SAMPLE_BURST mensajes iguales
+  (ignorando los números) por ventana; el resto se descarta y se resume al cerrarla.
+  Los errores nunca se descartan.
+- LOG_DEBUG_PAYLOADS: los volcados de payloads grandes (log_payload) solo se emiten
+  si está activo; por defecto no se formatean siquiera.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import threading
+import time
+
+import config
+
+_listener = None
+_DIGITS = re.compile(r"\d+")
+
+
+class SamplingFilter(logging.Filter):
+    """Deja pasar como mucho 'burst' mensajes similares por ventana; resume los descartados."""
+
+    def __init__(self, burst: int, window: float):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._counts = {}      # {clave: mensajes vistos en la ventana}
+        self._samples = {}     # {clave: registro de ejemplo para el resumen}
+
+    def _key(self, record) -> tuple:
+        # Los números (porcentajes, IDs de mensaje, tamaños) no distinguen un mensaje de otro
+        return record.name, record.levelno, _DIGITS.sub("#", str(record.msg))
+
+    def _flush_suppressed(self) -> list:
+        summaries = []
+        for key, count in self._counts.items():
+            if count > self.burst:
+                sample = self._samples[key]
+                summaries.append(logging.LogRecord(
+                    sample.name, logging.WARNING, sample.pathname, sample.lineno,
+                    "%d mensajes similares suprimidos en %.0fs (último: %s)",
+                    (count - self.burst, self.window, sample.getMessage()[:200]), None,
+                ))
+        self._counts.clear()
+        self._samples.clear()
+        return summaries
+
+    def filter(self, record) -> bool:
+        if self.burst <= 0 or record.levelno >= logging.ERROR or getattr(record, 'sampling_summary', False):
+            return True
+        with self._lock:
+            now = time.monotonic()
+            summaries = []
+            if now - self._window_start >= self.window:
+                summaries = self._flush_suppressed()
+                self._window_start = now
+            key = self._key(record)
+            count = self._counts.get(key, 0) + 1
+            self._counts[key] = count
+            if count > self.burst:
+                self._samples[key] = record
+        for summary in summaries:
+            summary.sampling_summary = True
+            logging.getLogger(summary.name).handle(summary)
+        return count <= self.burst
+
+
+def _parse_levels(spec: str) -> dict:
+    levels = {}
+    for part in (spec or "").split(","):
+        if "=" not in part:
+            continue
+        name, level = (item.strip() for item in part.split("=", 1))
+        levels[name] = level.upper()
+    return levels
+
+
+def setup_logging():
+    """Configura el logging del proceso (idempotente). Debe llamarse antes de importar el resto de módulos."""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter(config.LOG_FORMAT))
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(config.LOG_SAMPLE_BURST, config.LOG_SAMPLE_WINDOW))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(config.LOG_LEVEL.upper())
+    for name, level in _parse_levels(config.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, console, respect_handler_level=True)
+    _listener.start()
+    # Vaciar la cola al salir para no perder los últimos mensajes
+    atexit.register(_listener.stop)
+    return _listener
+
+
+def log_payload(logger, label: str, payload, limit: int = 2000):
+    """Vuelca un payload grande a DEBUG solo si LOG_DEBUG_PAYLOADS está activo (recortado a 'limit')."""
+    if not config.LOG_DEBUG_PAYLOADS or not logger.isEnabledFor(logging.DEBUG):
+        return
+    text = repr(payload)
+    if len(text) > limit:
+        text = f"{text[:limit]}... ({len(text)} caracteres)"
+    logger.debug("%s: %s", label, text)
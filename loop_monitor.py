@@ -0,0 +1,163 @@
+# loop_monitor.py (Monitor de retraso del event loop y detector de llamadas bloqueantes)
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Directorio del proyecto: se usa para identificar qué frames del stack son código del bot
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Directorio de asyncio: sus frames separan el arranque del loop del callback en curso
+_ASYNCIO_DIR = os.path.dirname(os.path.abspath(asyncio.__file__))
+
+# Métricas de retraso del loop (en milisegundos)
+_lag_stats = {
+    "current_ms": 0.0,
+    "max_ms": 0.0,
+    "avg_ms": 0.0,  # Media móvil exponencial
+    "samples": 0,
+    "blocked_events": 0,  # Veces que el retraso superó LOOP_BLOCK_THRESHOLD
+}
+# Muestras recientes (timestamp, lag_ms) para calcular el máximo del último minuto
+_recent_samples = deque()
+_RECENT_WINDOW = 60.0
+_EWMA_ALPHA = 0.1
+
+_stats_lock = threading.Lock()
+_monitor_task = None
+_watchdog_thread = None
+_loop_thread_id = None
+# Último instante (time.monotonic) en que el loop ejecutó el latido del monitor
+_last_heartbeat = 0.0
+
+
+def _record_lag(lag_seconds: float):
+    """Registra una muestra de retraso del loop."""
+    lag_ms = lag_seconds * 1000.0
+    now = time.time()
+    with _stats_lock:
+        _lag_stats["current_ms"] = lag_ms
+        _lag_stats["max_ms"] = max(_lag_stats["max_ms"], lag_ms)
+        if _lag_stats["samples"] == 0:
+            _lag_stats["avg_ms"] = lag_ms
+        else:
+            _lag_stats["avg_ms"] += _EWMA_ALPHA * (lag_ms - _lag_stats["avg_ms"])
+        _lag_stats["samples"] += 1
+        if lag_seconds >= config.LOOP_BLOCK_THRESHOLD:
+            _lag_stats["blocked_events"] += 1
+        _recent_samples.append((now, lag_ms))
+        while _recent_samples and _recent_samples[0][0] < now - _RECENT_WINDOW:
+            _recent_samples.popleft()
+
+
+def get_loop_metrics() -> dict:
+    """Devuelve una copia de las métricas de retraso del loop (para /metrics y /stats)."""
+    with _stats_lock:
+        metrics = {key: round(value, 3) if isinstance(value, float) else value for key, value in _lag_stats.items()}
+        metrics["max_last_minute_ms"] = round(max((lag for _, lag in _recent_samples), default=0.0), 3)
+    metrics["interval_s"] = config.LOOP_MONITOR_INTERVAL
+    metrics["block_threshold_s"] = config.LOOP_BLOCK_THRESHOLD
+    metrics["debug"] = config.LOOP_MONITOR_DEBUG
+    return metrics
+
+
+async def _lag_monitor_loop(interval: float):
+    """Mide continuamente cuánto tarda el loop en despertar respecto a lo esperado."""
+    global _last_heartbeat
+    loop = asyncio.get_running_loop()
+    while True:
+        _last_heartbeat = time.monotonic()
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        _record_lag(max(0.0, loop.time() - expected))
+
+
+def _is_project_frame(frame_summary) -> bool:
+    """Indica si un frame pertenece al código del bot (y no al propio monitor)."""
+    filename = os.path.abspath(frame_summary.filename)
+    return filename.startswith(_PROJECT_DIR + os.sep) and os.path.basename(filename) != "loop_monitor.py"
+
+
+def _is_asyncio_frame(frame_summary) -> bool:
+    return os.path.abspath(frame_summary.filename).startswith(_ASYNCIO_DIR + os.sep)
+
+
+def _handler_names_from_stack(stack) -> tuple:
+    """
+    Devuelve (manejador, función bloqueante) del stack del loop, como 'módulo.función'.
+    El manejador es el frame más externo del código del bot dentro del callback que
+    ejecuta el loop ahora (p. ej. 'main.handle_video', llamado por el dispatcher de
+    Pyrogram); el '<module>' de main.py que arranca el loop queda fuera porque está por
+    debajo de asyncio. La función bloqueante es el frame más interno del bot (p. ej.
+    'hydrax_api.import_to_hydrax').
+    """
+    def name(frame_summary):
+        module = os.path.splitext(os.path.basename(frame_summary.filename))[0]
+        return f"{module}.{frame_summary.name}"
+
+    # Frames del callback actual: los que hay por encima de la última llamada de asyncio
+    start = max((index + 1 for index, frame_summary in enumerate(stack) if _is_asyncio_frame(frame_summary)), default=0)
+    project = [frame_summary for frame_summary in stack[start:] if _is_project_frame(frame_summary)]
+    if not project:
+        return "desconocido", "desconocido"
+    return name(project[0]), name(project[-1])
+
+
+def _watchdog(interval: float, threshold: float):
+    """
+    Hilo que vigila el latido del loop. Si el loop deja de latir durante más de
+    'threshold' segundos, captura el stack del hilo del loop y lo registra una
+    sola vez por episodio de bloqueo.
+    """
+    reported_heartbeat = None
+    check_every = max(threshold / 2.0, 0.01)
+    while True:
+        time.sleep(check_every)
+        heartbeat = _last_heartbeat
+        blocked_for = time.monotonic() - heartbeat - interval
+        if blocked_for < threshold or reported_heartbeat == heartbeat:
+            continue
+        frame = sys._current_frames().get(_loop_thread_id)
+        if frame is None:
+            continue
+        reported_heartbeat = heartbeat
+        stack = traceback.extract_stack(frame)
+        handler_name, blocking_name = _handler_names_from_stack(stack)
+        logger.warning(
+            f"⚠️ Event loop BLOQUEADO más de {blocked_for:.3f}s "
+            f"(umbral {threshold}s) en el manejador '{handler_name}' (en '{blocking_name}'). Stack del loop:\n"
+            + "".join(traceback.format_list(stack))
+        )
+
+
+def start_loop_monitor():
+    """
+    Inicia el monitor de retraso en el loop actual (debe llamarse desde el loop).
+    En modo debug también inicia el hilo vigilante que captura stacks bloqueantes.
+    """
+    global _monitor_task, _watchdog_thread, _loop_thread_id
+    if _monitor_task is not None and not _monitor_task.done():
+        return _monitor_task
+
+    interval = config.LOOP_MONITOR_INTERVAL
+    _loop_thread_id = threading.get_ident()
+    _monitor_task = asyncio.get_running_loop().create_task(_lag_monitor_loop(interval))
+    logger.info(f"Monitor del event loop iniciado (intervalo {interval}s, debug={config.LOOP_MONITOR_DEBUG}).")
+
+    if config.LOOP_MONITOR_DEBUG and _watchdog_thread is None:
+        _watchdog_thread = threading.Thread(
+            target=_watchdog,
+            args=(interval, config.LOOP_BLOCK_THRESHOLD),
+            name="loop-watchdog",
+            daemon=True,
+        )
+        _watchdog_thread.start()
+        logger.info(f"Detector de llamadas bloqueantes activo (umbral {config.LOOP_BLOCK_THRESHOLD}s).")
+    return _monitor_task
@@ -1,37 +1,92 @@
 # main.py (Versión completa y actualizada)
 import asyncio
+import hashlib
+import logging
 import os
 import threading
 import time
 import math
-from pyrogram import Client, filters, enums
+from pyrogram import Client, filters, enums, idle
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, BotCommand
-# Importaciones para Flask
-from flask import Flask
 
 # --- Importar la lista blanca desde config ---
 from config import WHITELISTED_USERS
 
-# --- Configuración de Flask ---
-flask_app = Flask(__name__)
+# --- Logging ---
+# Se configura antes de las importaciones locales para que sus mensajes ya pasen por la cola.
+import logging_config
+logging_config.setup_logging()
+logger = logging.getLogger("main")
 
-@flask_app.route('/')
-def health_check():
-    """Punto de entrada simple para que Render detecte un puerto abierto."""
-    return "✅ Bot is running!", 200
+# --- Configuración de Flask ---
+# Flask se importa dentro del hilo del servidor para no retrasar el arranque del bot.
+flask_app = None
+
+def create_flask_app():
+    """Crea la aplicación Flask con los endpoints de salud y métricas."""
+    from flask import Flask, jsonify
+    app = Flask(__name__)
+
+    @app.route('/')
+    def health_check():
+        """Punto de entrada simple para que Render detecte un puerto abierto."""
+        return "✅ Bot is running!", 200
+
+    @app.route('/ready')
+    def readiness_check():
+        """Devuelve 200 cuando el pre-calentamiento terminó correctamente, 503 mientras no."""
+        from circuit_breaker import get_breaker_status
+        from warmup import get_readiness
+        readiness = get_readiness()
+        # Informativo: con un circuito abierto el bot sigue aceptando videos (los retiene)
+        readiness['circuit_breakers'] = get_breaker_status()
+        return jsonify(readiness), (200 if readiness['ready'] else 503)
+
+    @app.route('/metrics')
+    def metrics():
+        """Expone las métricas internas del bot (retraso del event loop, etc.) en JSON."""
+        from admission import get_admission_controller
+        from circuit_breaker import get_breaker_status
+        from credential_manager import get_credential_status
+        from bandwidth import get_bandwidth_status
+        from scheduler import get_scheduler_status
+        from temp_storage import get_tiers
+        from loop_monitor import get_loop_metrics
+        from quota_manager import get_quota_status
+        from retention import get_retention_status
+        from singleflight import get_singleflight_status
+        from retry_queue import get_retry_status
+        from warmup import get_readiness
+        return jsonify({
+            "event_loop": get_loop_metrics(),
+            "warmup": get_readiness(),
+            "retry_queue": get_retry_status(),
+            "circuit_breakers": get_breaker_status(),
+            "drive_quota": get_quota_status(),
+            "drive_retention": get_retention_status(),
+            "drive_credentials": get_credential_status(),
+            "bandwidth": get_bandwidth_status(),
+            "scheduler": get_scheduler_status(),
+            "single_flight": get_singleflight_status(),
+            "disk_admission": [get_admission_controller(directory).status() for _, directory in get_tiers()],
+        }), 200
+
+    return app
 
 def run_flask():
     """Inicia el servidor Flask en un hilo separado."""
+    global flask_app
+    flask_app = create_flask_app()
     port = int(os.environ.get('PORT', 8000))
     flask_app.run(host='0.0.0.0', port=port)
 
 # --- Logs de diagnóstico iniciales ---
-print("Iniciando configuracion del bot...")
+logger.info("Iniciando configuracion del bot...")
 
 # Importaciones locales
 try:
     from config import API_ID, API_HASH, BOT_TOKEN # WHITELISTED_USERS ya importado arriba
-    from db import try_start_processing, finish_processing, record_uploaded_file
+    from db import try_start_processing, finish_processing, record_uploaded_file, set_hydrax_result
     # Importar las nuevas funciones de google_drive
     from google_drive import (
         upload_to_drive_async_with_progress,
@@ -41,17 +96,45 @@ try:
         # --- NUEVAS FUNCIONES ---
         list_drive_contents_async,
         delete_drive_file_async,
-        delete_all_drive_files_async
+        delete_all_drive_files_async,
+        get_drive_account_email,
+        get_cached_drive_account_email,
+        get_account_ids,
+        pop_verified_checksum,
+        share_files_public_async
     )
-    from hydrax_api import import_to_hydrax
+    from hydrax_api import import_to_hydrax_async
+    from config import MEDIA_GROUP_WINDOW, MEDIA_GROUP_PARALLELISM, MEDIA_GROUP_PROGRESS_INTERVAL, HYDRAX_BATCH_CONCURRENCY
+    from config import BULK_IMPORT_PROGRESS_INTERVAL, JOB_RECOVERY_ENABLED
+    from bulk_import import SELECTIONS, select_registry_entries, bulk_import_to_hydrax
+    from job_journal import (
+        start_job, advance, reached, finish_job, set_progress_message, get_unfinished_jobs, referenced_temp_paths,
+        schedule_retry, requeue, purge_jobs, get_jobs_by_status,
+        ACTIVE as JOB_ACTIVE, DONE as JOB_DONE, FAILED as JOB_FAILED, CANCELLED as JOB_CANCELLED,
+        RETRY_WAIT as JOB_RETRY_WAIT, DEAD as JOB_DEAD
+    )
+    from retry_queue import start_retry_scheduler, wake_retry_scheduler
+    from search_index import search as search_files
+    from singleflight import single_flight, Debouncer
+    from config import CALLBACK_DEBOUNCE_SECONDS
+    from circuit_breaker import wait_for_dependencies, get_breaker_status, OPEN as CIRCUIT_OPEN, HALF_OPEN as CIRCUIT_HALF_OPEN
+    from config import RETRY_MAX_ATTEMPTS
+    from quota_manager import reserve_drive_space, start_quota_manager
+    from retention import start_retention_reaper
+    from credential_manager import start_credential_refresher
+    from bandwidth import get_bandwidth_status, set_limit_mb as set_bandwidth_limit
     from utils import safe_edit_message, safe_reply_message, safe_send_message, safe_delete_file
-    print("Importaciones locales completadas.")
+    from admission import get_admission_controller
+    from scheduler import get_scheduler
+    from temp_storage import choose_directory, allocate_temp_file_async, stream_media_to_file, cleanup_orphans
+    from tracing import JobTrace, STAGES, configured_windows, parse_window, max_window_seconds, get_stage_stats, record_span
+    logger.info("Importaciones locales completadas.")
 except ImportError as e:
-    print(f"Error al importar módulos: {e}")
+    logger.error(f"Error al importar módulos: {e}")
     raise
 
-print("Credenciales cargadas desde config.py.")
-print(f"Usuarios en lista blanca: {WHITELISTED_USERS}")
+logger.info("Credenciales cargadas desde config.py.")
+logger.info(f"Usuarios en lista blanca: {WHITELISTED_USERS}")
 
 # --- Función para verificar usuarios ---
 def is_user_whitelisted(user_id: int) -> bool:
@@ -64,13 +147,13 @@ def is_user_whitelisted(user_id: int) -> bool:
     return user_id in WHITELISTED_USERS
 
 # --- Logs de diagnóstico: Creación del cliente ---
-print("Creando cliente de Pyrogram...")
+logger.info("Creando cliente de Pyrogram...")
 try:
     # Renombrar la instancia de Client para evitar conflictos con Flask
     pyrogram_app = Client("my_bot", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN)
-    print("Cliente de Pyrogram creado exitosamente.")
+    logger.info("Cliente de Pyrogram creado exitosamente.")
 except Exception as e:
-    print(f"Error al crear el cliente de Pyrogram: {e}")
+    logger.error(f"Error al crear el cliente de Pyrogram: {e}")
     raise
 
 # --- Diccionario para rastrear procesos cancelables ---
@@ -87,7 +170,7 @@ async def update_progress(message: Message, status: str, reply_markup=None):
         # Pasar reply_markup a safe_edit_message
         await safe_edit_message(message, status, reply_markup=reply_markup)
     except Exception as e:
-        print(f"Error al actualizar progreso: {e}")
+        logger.error(f"Error al actualizar progreso: {e}")
 
 # --- Función auxiliar para verificar hitos de progreso ---
 def _should_update_progress(current_percent, last_percent, milestones=[25, 50, 75, 100]):
@@ -127,12 +210,33 @@ def get_file_icon(mime_type: str) -> str:
     else:
         return "📄" # Icono por defecto
 
-async def send_file_list(client: Client, chat_id: int, page: int = 1, message_to_edit: Message = None):
-    """Envía o edita el mensaje con la lista de archivos SUBIDOS POR EL BOT paginada y botones."""
+# Criterios de orden de /list: (etiqueta del botón, descendente por defecto)
+LIST_SORTS = {
+    'time': ("🕒 Fecha", True),
+    'name': ("🔤 Nombre", False),
+    'size': ("📦 Tamaño", True),
+}
+
+def _list_callback(page: int, sort: str, order: str) -> str:
+    return f"list_{page}_{sort}_{order}"
+
+async def send_file_list(client: Client, chat_id: int, page: int = 1, message_to_edit: Message = None,
+                         sort: str = 'time', order: str = None):
+    """
+    Envía o edita el mensaje con la lista de archivos SUBIDOS POR EL BOT paginada y botones.
+    'sort' es 'time', 'name' o 'size'; 'order' es 'asc' o 'desc' (por defecto, el del criterio).
+    """
+    if sort not in LIST_SORTS:
+        sort = 'time'
+    if order not in ('asc', 'desc'):
+        order = 'desc' if LIST_SORTS[sort][1] else 'asc'
     try:
-        print(f"Obteniendo lista de archivos SUBIDOS POR EL BOT, pagina {page}...")
-        # --- Cambio aquí: usar la nueva función ---
-        file_data = await list_uploaded_files_async(page_number=page)
+        logger.info(f"Obteniendo lista de archivos SUBIDOS POR EL BOT, pagina {page}, orden {sort} {order}...")
+        # Varios refrescos idénticos a la vez comparten una única consulta a Drive
+        file_data = await single_flight(
+            ("list", page, sort, order),
+            lambda: list_uploaded_files_async(page_number=page, sort=sort, descending=(order == 'desc'))
+        )
         files = file_data['files']
         total_files = file_data['total_files']
         pages = file_data['pages']
@@ -154,23 +258,35 @@ async def send_file_list(client: Client, chat_id: int, page: int = 1, message_to
             size = format_size(file.get('size', 0))
             file_id = file.get('id', '')
             display_name = (name[:30] + '...') if len(name) > 33 else name
-            text += f"{index}. `{display_name}` ({size})\n"
+            missing = " ⚠️ no está en Drive" if file.get('missing') else ""
+            text += f"{index}. `{display_name}` ({size}){missing}\n"
 
         # Crear botones inline
         buttons = []
 
+        # Botones de orden: el activo muestra la dirección y al pulsarlo la invierte
+        sort_buttons = []
+        for sort_key, (label, default_desc) in LIST_SORTS.items():
+            if sort_key == sort:
+                label = f"{label} {'⬇️' if order == 'desc' else '⬆️'}"
+                next_order = 'asc' if order == 'desc' else 'desc'
+            else:
+                next_order = 'desc' if default_desc else 'asc'
+            sort_buttons.append(InlineKeyboardButton(label, callback_data=_list_callback(1, sort_key, next_order)))
+        buttons.append(sort_buttons)
+
         # Botones de navegación de página
         nav_buttons = []
         if pages > 1:
             if current_page > 1:
-                nav_buttons.append(InlineKeyboardButton("⬅️ Anterior", callback_data=f"list_{current_page - 1}"))
+                nav_buttons.append(InlineKeyboardButton("⬅️ Anterior", callback_data=_list_callback(current_page - 1, sort, order)))
             if current_page < pages:
-                nav_buttons.append(InlineKeyboardButton("Siguiente ➡️", callback_data=f"list_{current_page + 1}"))
+                nav_buttons.append(InlineKeyboardButton("Siguiente ➡️", callback_data=_list_callback(current_page + 1, sort, order)))
             if nav_buttons:
                 buttons.append(nav_buttons)
 
         # Botón de Refrescar
-        buttons.append([InlineKeyboardButton("🔄 Refrescar", callback_data=f"list_{current_page}")])
+        buttons.append([InlineKeyboardButton("🔄 Refrescar", callback_data=_list_callback(current_page, sort, order))])
 
         # Botón de Borrar Todo (colocado aparte para evitar accidentes)
         # Aclarar que es solo para archivos subidos
@@ -185,9 +301,7 @@ async def send_file_list(client: Client, chat_id: int, page: int = 1, message_to
 
     except Exception as e:
         error_msg = f"❌ Error al listar archivos subidos por el bot: {e}"
-        print(error_msg)
-        import traceback
-        traceback.print_exc()
+        logger.exception(error_msg)
         if message_to_edit:
             await safe_edit_message(message_to_edit, error_msg)
         else:
@@ -198,11 +312,14 @@ async def send_file_list(client: Client, chat_id: int, page: int = 1, message_to
 async def send_drive_file_list(client: Client, chat_id: int, page: int = 1, message_to_edit: Message = None):
     """Envía o edita el mensaje con la lista de archivos de Google Drive paginada."""
     try:
-        print(f"Obteniendo lista de archivos de Google Drive, pagina {page}...")
+        logger.info(f"Obteniendo lista de archivos de Google Drive, pagina {page}...")
         # --- Llamar a la nueva función ---
         # Asume que usas 'root' para My Drive. Si usas una unidad compartida,
-        # reemplaza 'root' con el ID de tu unidad compartida.
-        file_data = await list_drive_contents_async(page_number=page, folder_id='root') # <<< AJUSTA 'root' SI ES NECESARIO
+        # reemplaza 'root' con el ID de tu unidad compartida. Se listan todas las cuentas del pool.
+        file_data = await single_flight(
+            ("drivelist", page, 'root'),
+            lambda: list_drive_contents_async(page_number=page, folder_id='root') # <<< AJUSTA 'root' SI ES NECESARIO
+        )
         files = file_data['files']
         # total_files = file_data['total_files'] # No es preciso con la implementación básica
         # pages = file_data['pages'] # No es preciso con la implementación básica
@@ -218,6 +335,7 @@ async def send_drive_file_list(client: Client, chat_id: int, page: int = 1, mess
             return
 
         text = f"📋 **Contenido de Google Drive** (Página {current_page}):\n\n"
+        multiple_accounts = len(get_account_ids()) > 1
         # Crear botones inline
         buttons = []
         for i, file in enumerate(files):
@@ -231,7 +349,8 @@ async def send_drive_file_list(client: Client, chat_id: int, page: int = 1, mess
             
             # Limitar longitud del nombre para que el mensaje no sea demasiado largo
             display_name = (name[:35] + '...') if len(name) > 38 else name
-            text += f"{index}. {icon} `{display_name}` ({size})\n   `ID: {file_id}`\n\n"
+            account = f" · cuenta '{file['account_id']}'" if multiple_accounts and file.get('account_id') else ""
+            text += f"{index}. {icon} `{display_name}` ({size})\n   `ID: {file_id}`{account}\n\n"
             
             # --- NUEVO: Botón de Borrar para cada archivo ---
             buttons.append([InlineKeyboardButton(f"🗑️ Borrar {display_name[:20]}...", callback_data=f"drive_delete_single_{file_id}")])
@@ -261,9 +380,7 @@ async def send_drive_file_list(client: Client, chat_id: int, page: int = 1, mess
 
     except Exception as e:
         error_msg = f"❌ Error al listar contenido de Google Drive: {e}"
-        print(error_msg)
-        import traceback
-        traceback.print_exc()
+        logger.exception(error_msg)
         if message_to_edit:
             await safe_edit_message(message_to_edit, error_msg)
         else:
@@ -277,16 +394,21 @@ async def set_bot_commands(client: Client):
         BotCommand("start", "Mostrar mensaje de inicio"),
         BotCommand("ping", "Verificar si el bot está activo"),
         BotCommand("list", "Listar archivos subidos por el bot (gestionables)"),
+        BotCommand("search", "Buscar archivos subidos por nombre (/search <términos>)"),
         BotCommand("listdrive", "Listar todo el contenido de Google Drive"),
         BotCommand("deletedrive", "Borrar un archivo de Drive por ID (/deletedrive <ID>)"),
         BotCommand("deletedriveall", "Borrar todos los archivos de Drive (con confirmación)"),
+        BotCommand("stats", "Latencias p50/p95/p99 por etapa y throughput (/stats [ventana])"),
+        BotCommand("reimport", "Re-importar a Hydrax (/reimport [missing|failed|all] o IDs)"),
+        BotCommand("retries", "Cola de reintentos y dead-letter (/retries [retry|purge] ...)"),
+        BotCommand("bandwidth", "Límites de ancho de banda (/bandwidth [upload|download] [MB/s])"),
         # Añade más comandos aquí si los tienes
     ]
     try:
         await client.set_bot_commands(commands)
-        print("✅ Menú de comandos del bot establecido.")
+        logger.info("✅ Menú de comandos del bot establecido.")
     except Exception as e:
-        print(f"❌ Error al establecer el menú de comandos del bot: {e}")
+        logger.error(f"❌ Error al establecer el menú de comandos del bot: {e}")
 
 # --- Comandos para verificar el estado del bot ---
 
@@ -295,7 +417,7 @@ async def start_command(client: Client, message: Message):
     """Responde al comando /start indicando que el bot está activo."""
     global _bot_commands_set, _bot_commands_lock
     user_id = message.from_user.id
-    print(f"Comando /start recibido de {user_id} ({message.from_user.first_name}).")
+    logger.info(f"Comando /start recibido de {user_id} ({message.from_user.first_name}).")
     
     # --- Inicialización de comandos (solo una vez) ---
     if not _bot_commands_set:
@@ -303,29 +425,32 @@ async def start_command(client: Client, message: Message):
             if not _bot_commands_set: # Doble verificación dentro del lock
                 try:
                     await set_bot_commands(client)
-                    print("✅ Menú de comandos del bot establecido en /start.")
+                    logger.info("✅ Menú de comandos del bot establecido en /start.")
                 except Exception as e:
-                    print(f"❌ Error al establecer comandos en /start: {e}")
+                    logger.error(f"❌ Error al establecer comandos en /start: {e}")
                 _bot_commands_set = True # Marcar como establecido
 
     # Verificar lista blanca
     if not is_user_whitelisted(user_id):
-        print(f"Acceso denegado a {user_id}. No está en la lista blanca.")
+        logger.warning(f"Acceso denegado a {user_id}. No está en la lista blanca.")
         try:
             await message.reply_text("❌ Acceso denegado. No estás en la lista de usuarios permitidos.")
         except Exception as e:
-            print(f"Error al enviar mensaje de denegación: {e}")
+            logger.error(f"Error al enviar mensaje de denegación: {e}")
         return # Salir si no está autorizado
 
-    # Obtener información de la cuenta de Drive (opcional, solo para mostrar en logs)
+    # Obtener información de la cuenta de Drive (cacheada por el pre-calentamiento;
+    # si aún no está disponible se consulta en un hilo para no bloquear el loop)
     try:
-        from google_drive import get_drive_service
-        drive_service = get_drive_service()
-        about = drive_service.about().get(fields="user").execute()
-        user_email = about.get('user', {}).get('emailAddress', 'Desconocido')
+        user_email = get_cached_drive_account_email()
+        if user_email is None:
+            user_email = await asyncio.get_running_loop().run_in_executor(None, get_drive_account_email)
         drive_info = f"\n📁 Cuenta de Google Drive: `{user_email}`"
+        extra_accounts = len(get_account_ids()) - 1
+        if extra_accounts:
+            drive_info += f" (+{extra_accounts} cuentas en el pool de subida)"
     except Exception as e:
-        print(f"Error al obtener info de Drive para /start: {e}")
+        logger.error(f"Error al obtener info de Drive para /start: {e}")
         drive_info = "\n📁 Cuenta de Google Drive: (Error al obtener)"
 
     welcome_text = (
@@ -334,47 +459,324 @@ async def start_command(client: Client, message: Message):
         "Envíame un video (de hasta 2GB) y lo procesaré automáticamente.\n"
         "Usa /ping para verificar nuevamente si estoy activo.\n"
         "Usa /list para ver y gestionar archivos subidos por el bot en Google Drive.\n"
+        "Usa /search <términos> para buscar archivos subidos por nombre.\n"
         "Usa /listdrive para ver el contenido completo de tu unidad de Google Drive.\n"
         "Usa /deletedrive <ID> para borrar un archivo de Drive.\n"
-        "Usa /deletedriveall para borrar todos los archivos de Drive."
+        "Usa /deletedriveall para borrar todos los archivos de Drive.\n"
+        "Usa /stats para ver latencias por etapa y throughput.\n"
+        "Usa /reimport para re-importar a Hydrax archivos ya subidos a Drive.\n"
+        "Usa /retries para ver, reintentar o purgar trabajos fallidos.\n"
+        "Usa /bandwidth para ver o cambiar los límites de ancho de banda."
         f"{drive_info}"
     )
     await safe_reply_message(message, welcome_text)
-    print(f"Mensaje de bienvenida enviado a {user_id}.")
+    logger.info(f"Mensaje de bienvenida enviado a {user_id}.")
 
 @pyrogram_app.on_message(filters.command("ping") & filters.private)
 async def ping_command(client: Client, message: Message):
     """Responde al comando /ping indicando que el bot está activo."""
     user_id = message.from_user.id
-    print(f"Comando /ping recibido de {user_id} ({message.from_user.first_name}).")
+    logger.info(f"Comando /ping recibido de {user_id} ({message.from_user.first_name}).")
     
     # Verificar lista blanca
     if not is_user_whitelisted(user_id):
-        print(f"Acceso denegado a {user_id}. No está en la lista blanca.")
+        logger.warning(f"Acceso denegado a {user_id}. No está en la lista blanca.")
         try:
             await message.reply_text("❌ Acceso denegado. No estás en la lista de usuarios permitidos.")
         except Exception as e:
-            print(f"Error al enviar mensaje de denegación: {e}")
+            logger.error(f"Error al enviar mensaje de denegación: {e}")
         return # Salir si no está autorizado
 
+    from warmup import get_readiness
+    readiness = get_readiness()
     pong_text = "✅ ¡Pong! El bot está activo y funcionando correctamente."
+    if not readiness['ready']:
+        pending = ", ".join(f"{name}: {state}" for name, state in readiness['components'].items() if state != 'ready')
+        pong_text += f"\n⏳ Pre-calentamiento en curso ({pending})."
+    for name, breaker in get_breaker_status().items():
+        if breaker['state'] == CIRCUIT_OPEN:
+            pong_text += f"\n🔴 {name}: no disponible, se reintentará en {int(breaker['retry_after_s'])}s (los videos nuevos esperan)."
+        elif breaker['state'] == CIRCUIT_HALF_OPEN:
+            pong_text += f"\n🟡 {name}: recuperándose (probando la conexión)."
     await safe_reply_message(message, pong_text)
-    print(f"Pong enviado a {user_id}.")
+    logger.info(f"Pong enviado a {user_id}.")
+
+# --- Comando /stats ---
+def format_duration_ms(duration_ms: float) -> str:
+    """Formatea una duración en milisegundos de forma legible."""
+    if duration_ms < 1000:
+        return f"{duration_ms:.0f}ms"
+    if duration_ms < 60000:
+        return f"{duration_ms / 1000:.1f}s"
+    return f"{duration_ms / 60000:.1f}min"
+
+def build_stats_text(windows) -> str:
+    """Construye el texto de /stats para las ventanas indicadas [(etiqueta, segundos), ...]."""
+    from loop_monitor import get_loop_metrics
+    text = "📊 **Estadísticas del pipeline**\n"
+    for label, seconds in windows:
+        stats = get_stage_stats(seconds)
+        text += f"\n🕒 **Ventana {label}**\n"
+        if not stats:
+            text += "Sin datos en esta ventana.\n"
+            continue
+        for stage in STAGES:
+            stage_stats = stats.get(stage)
+            if not stage_stats:
+                continue
+            line = (
+                f"`{stage}`: n={stage_stats['count']} · "
+                f"p50 {format_duration_ms(stage_stats['p50_ms'])} · "
+                f"p95 {format_duration_ms(stage_stats['p95_ms'])} · "
+                f"p99 {format_duration_ms(stage_stats['p99_ms'])}"
+            )
+            if stage_stats['errors']:
+                line += f" · errores {stage_stats['errors']}"
+            if stage in ("download", "upload") and stage_stats['bytes_per_s']:
+                line += f" · {format_size(int(stage_stats['bytes_per_s']))}/s"
+            text += line + "\n"
+        total = stats.get("total")
+        if total:
+            jobs_per_hour = total['count'] * 3600.0 / seconds
+            text += f"Throughput: {total['count']} videos ({jobs_per_hour:.1f}/h), {format_size(total['bytes'])} procesados\n"
+    loop_metrics = get_loop_metrics()
+    text += (
+        f"\n⏱️ Retraso del event loop: actual {loop_metrics['current_ms']:.1f}ms · "
+        f"máx último minuto {loop_metrics['max_last_minute_ms']:.1f}ms"
+    )
+    return text
+
+@pyrogram_app.on_message(filters.command("stats") & filters.private)
+async def stats_command(client: Client, message: Message):
+    """Muestra p50/p95/p99 por etapa y throughput en las ventanas configuradas (o la indicada)."""
+    user_id = message.from_user.id
+    logger.info(f"Comando /stats recibido de {user_id} ({message.from_user.first_name}).")
+
+    if not is_user_whitelisted(user_id):
+        logger.warning(f"Acceso denegado a {user_id} para /stats.")
+        try:
+            await message.reply_text("❌ Acceso denegado.")
+        except Exception as e:
+            logger.error(f"Error al enviar mensaje de denegación: {e}")
+        return
+
+    command_parts = message.text.split()
+    if len(command_parts) > 1:
+        try:
+            windows = [(command_parts[1], parse_window(command_parts[1]))]
+        except ValueError:
+            await message.reply_text("❌ Uso: `/stats [ventana]` (ej. `/stats 30m`, `/stats 6h`, `/stats 1d`); la ventana debe ser positiva.")
+            return
+        # Solo se conservan las estadísticas de la mayor ventana de STATS_WINDOWS
+        if windows[0][1] > max_window_seconds():
+            longest = max(configured_windows(), key=lambda window: window[1])[0]
+            await message.reply_text(
+                f"❌ Solo se conserva el historial de la ventana más larga de STATS_WINDOWS ({longest}): usa una ventana menor."
+            )
+            return
+    else:
+        windows = configured_windows()
+
+    await safe_reply_message(message, build_stats_text(windows))
+
+# --- Comando /reimport ---
+@pyrogram_app.on_message(filters.command("reimport") & filters.private)
+async def reimport_command(client: Client, message: Message):
+    """
+    Re-importa a Hydrax archivos que ya están en Drive, sin reenviarlos por Telegram.
+    /reimport [missing|failed|all]  -> entradas del registro (por defecto 'missing')
+    /reimport <ID> [<ID> ...]       -> IDs de Drive concretos
+    """
+    user_id = message.from_user.id
+    logger.info(f"Comando /reimport recibido de {user_id} ({message.from_user.first_name}).")
+
+    if not is_user_whitelisted(user_id):
+        logger.warning(f"Acceso denegado a {user_id} para /reimport.")
+        try:
+            await message.reply_text("❌ Acceso denegado.")
+        except Exception as e:
+            logger.error(f"Error al enviar mensaje de denegación: {e}")
+        return
+
+    args = message.text.split()[1:]
+    try:
+        if not args or (len(args) == 1 and args[0].lower() in SELECTIONS):
+            selection = args[0].lower() if args else 'missing'
+            drive_ids = await asyncio.get_running_loop().run_in_executor(None, select_registry_entries, selection)
+            source = f"registro ({selection})"
+        else:
+            drive_ids = args
+            source = "IDs indicados"
+    except Exception as e:
+        await safe_reply_message(message, f"❌ Error al leer el registro: `{e}`")
+        return
+
+    if not drive_ids:
+        await safe_reply_message(message, f"✅ No hay archivos que re-importar en el {source}.")
+        return
+
+    title = f"🔁 Re-importación a Hydrax: {len(drive_ids)} archivos del {source}"
+    status_message = await safe_reply_message(message, f"{title}\nIniciando...")
+    progress = None
+    done = asyncio.Event()
+
+    def track(current):
+        nonlocal progress
+        progress = current
+
+    async def progress_loop():
+        # Un único mensaje agregado, refrescado cada BULK_IMPORT_PROGRESS_INTERVAL segundos
+        while not done.is_set():
+            try:
+                await asyncio.wait_for(done.wait(), timeout=BULK_IMPORT_PROGRESS_INTERVAL)
+            except asyncio.TimeoutError:
+                if progress:
+                    await update_progress(status_message, f"{title}\n{progress.summary()}")
+
+    progress_task = asyncio.create_task(progress_loop())
+    try:
+        result = await bulk_import_to_hydrax(drive_ids, on_progress=track)
+    except Exception as e:
+        logger.error(f"Error en la re-importación masiva: {e}")
+        await safe_edit_message(status_message, f"{title}\n❌ Error: `{e}`")
+        return
+    finally:
+        done.set()
+        await progress_task
+
+    lines = [title, f"Terminado: {result.summary()}"]
+    for drive_id, error in result.failures[:10]:
+        lines.append(f"❌ `{drive_id}`: {error}")
+    if len(result.failures) > 10:
+        lines.append(f"... y {len(result.failures) - 10} fallos más.")
+    await safe_edit_message(status_message, "\n".join(lines))
+
+# --- Comando /retries ---
+def _format_retry_entry(job: dict) -> str:
+    line = f"• `{job['job_id']}` {job['file_name']} — etapa `{job['stage']}`, {job.get('attempts', 0)} intentos"
+    if job['status'] == JOB_RETRY_WAIT and job.get('next_retry_at'):
+        line += f", próximo en {format_duration_ms(max(0, job['next_retry_at'] - time.time()) * 1000)}"
+    if job.get('error'):
+        line += f"\n  └ {str(job['error'])[:120]}"
+    return line
+
+@pyrogram_app.on_message(filters.command("retries") & filters.private)
+async def retries_command(client: Client, message: Message):
+    """
+    Gestiona la cola de reintentos y la lista dead-letter.
+    /retries                      -> lista los trabajos en espera y los dead-letter
+    /retries retry <ID>|dead|all  -> reintenta ya (reinicia el contador de intentos)
+    /retries purge <ID>|dead      -> borra del diario
+    """
+    user_id = message.from_user.id
+    logger.info(f"Comando /retries recibido de {user_id} ({message.from_user.first_name}).")
+
+    if not is_user_whitelisted(user_id):
+        logger.warning(f"Acceso denegado a {user_id} para /retries.")
+        try:
+            await message.reply_text("❌ Acceso denegado.")
+        except Exception as e:
+            logger.error(f"Error al enviar mensaje de denegación: {e}")
+        return
+
+    loop = asyncio.get_running_loop()
+    args = message.text.split()[1:]
+    usage = "❌ Uso: `/retries`, `/retries retry <ID>|dead|all` o `/retries purge <ID>|dead`."
+
+    if not args:
+        waiting = await loop.run_in_executor(None, get_jobs_by_status, JOB_RETRY_WAIT)
+        dead = await loop.run_in_executor(None, get_jobs_by_status, JOB_DEAD)
+        lines = [f"🔁 **En cola de reintentos ({len(waiting)}):**"]
+        lines += [_format_retry_entry(job) for job in waiting[:15]] or ["(vacía)"]
+        lines.append(f"\n☠️ **Dead-letter ({len(dead)}):**")
+        lines += [_format_retry_entry(job) for job in dead[:15]] or ["(vacía)"]
+        await safe_reply_message(message, "\n".join(lines))
+        return
+
+    if len(args) != 2 or args[0] not in ("retry", "purge"):
+        await safe_reply_message(message, usage)
+        return
+    action, target = args[0], args[1].lower()
+
+    if action == "retry":
+        if target in ("dead", "all"):
+            statuses = (JOB_DEAD,) if target == "dead" else (JOB_DEAD, JOB_RETRY_WAIT)
+            jobs = await loop.run_in_executor(None, get_jobs_by_status, *statuses)
+            job_ids = [job['job_id'] for job in jobs]
+        elif target.isdigit():
+            job_ids = [int(target)]
+        else:
+            await safe_reply_message(message, usage)
+            return
+        requeued = [job_id for job_id in job_ids if await loop.run_in_executor(None, requeue, job_id)]
+        wake_retry_scheduler()
+        await safe_reply_message(message, f"🔁 {len(requeued)} trabajos programados para reintentarse ahora.")
+    else:
+        if target == "dead":
+            removed = await loop.run_in_executor(None, purge_jobs)
+        elif target.isdigit():
+            removed = await loop.run_in_executor(None, purge_jobs, [int(target)])
+        else:
+            await safe_reply_message(message, usage)
+            return
+        await safe_reply_message(message, f"🗑️ {removed} trabajos eliminados del diario.")
+
+# --- Comando /bandwidth ---
+def _format_rate(rate) -> str:
+    return f"{format_size(rate)}/s" if rate else "sin límite"
+
+@pyrogram_app.on_message(filters.command("bandwidth") & filters.private)
+async def bandwidth_command(client: Client, message: Message):
+    """
+    Muestra o cambia en caliente los límites globales de ancho de banda.
+    /bandwidth                          -> límites y uso actuales
+    /bandwidth upload|download <MB/s>   -> cambia el límite (0 = sin límite)
+    """
+    user_id = message.from_user.id
+    logger.info(f"Comando /bandwidth recibido de {user_id} ({message.from_user.first_name}).")
+
+    if not is_user_whitelisted(user_id):
+        logger.warning(f"Acceso denegado a {user_id} para /bandwidth.")
+        try:
+            await message.reply_text("❌ Acceso denegado.")
+        except Exception as e:
+            logger.error(f"Error al enviar mensaje de denegación: {e}")
+        return
+
+    args = message.text.split()[1:]
+    if args:
+        try:
+            if len(args) != 2:
+                raise ValueError
+            set_bandwidth_limit(args[0].lower(), float(args[1].replace(",", ".")))
+        except ValueError:
+            await safe_reply_message(message, "❌ Uso: `/bandwidth` o `/bandwidth upload|download <MB/s>` (un número >= 0; 0 = sin límite).")
+            return
+        logger.info(f"Límite de ancho de banda de '{args[0].lower()}' cambiado a {args[1]} MB/s por {user_id}.")
+
+    lines = ["📶 **Ancho de banda:**"]
+    for direction, label in (("upload", "☁️ Subida a Drive"), ("download", "⬇️ Descarga de Telegram")):
+        status = get_bandwidth_status()[direction]
+        lines.append(
+            f"{label}: {_format_rate(status['limit_bytes_per_s'])} · {status['active_flows']} trabajos activos · "
+            f"{status['waiting_chunks']} chunks en espera"
+        )
+    await safe_reply_message(message, "\n".join(lines))
 
 # --- Comando /list ---
 @pyrogram_app.on_message(filters.command("list") & filters.private)
 async def list_command(client: Client, message: Message):
     """Muestra la lista de archivos en Google Drive."""
     user_id = message.from_user.id
-    print(f"Comando /list recibido de {user_id} ({message.from_user.first_name}).")
+    logger.info(f"Comando /list recibido de {user_id} ({message.from_user.first_name}).")
     
     # Verificar lista blanca
     if not is_user_whitelisted(user_id):
-        print(f"Acceso denegado a {user_id} para /list. No está en la lista blanca.")
+        logger.warning(f"Acceso denegado a {user_id} para /list. No está en la lista blanca.")
         try:
             await message.reply_text("❌ Acceso denegado. No estás en la lista de usuarios permitidos.")
         except Exception as e:
-            print(f"Error al enviar mensaje de denegación: {e}")
+            logger.error(f"Error al enviar mensaje de denegación: {e}")
         return
 
     try:
@@ -382,23 +784,61 @@ async def list_command(client: Client, message: Message):
         await send_file_list(client, message.chat.id, page=1)
     except Exception as e:
         error_msg = f"❌ Error al iniciar el listado: {e}"
-        print(error_msg)
+        logger.error(error_msg)
         await message.reply_text(error_msg)
 
+# --- Comando /search <términos> ---
+SEARCH_RESULTS_LIMIT = 10
+
+@pyrogram_app.on_message(filters.command("search") & filters.private)
+async def search_command(client: Client, message: Message):
+    """Busca en el registro local de archivos subidos por nombre (sin consultar Drive)."""
+    user_id = message.from_user.id
+    logger.info(f"Comando /search recibido de {user_id} ({message.from_user.first_name}).")
+
+    if not is_user_whitelisted(user_id):
+        await safe_reply_message(message, "❌ Acceso denegado. No estás en la lista de usuarios permitidos.")
+        return
+
+    query = " ".join(message.command[1:]).strip()
+    if not query:
+        await safe_reply_message(message, "Uso: `/search <términos>` (ej.: `/search one piece 1050`).")
+        return
+
+    started = time.perf_counter()
+    total, results = await asyncio.get_running_loop().run_in_executor(None, search_files, query, SEARCH_RESULTS_LIMIT)
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    if not results:
+        await safe_reply_message(message, f"🔍 Sin resultados para `{query}`.")
+        return
+
+    text = f"🔍 **{total} resultados para** `{query}`"
+    if total > len(results):
+        text += f" (mostrando los {len(results)} más recientes)"
+    text += f" — {elapsed_ms:.1f} ms\n\n"
+    buttons = []
+    for index, entry in enumerate(results, 1):
+        name = entry.get('original_name') or 'Sin_nombre'
+        display_name = (name[:30] + '...') if len(name) > 33 else name
+        size = format_size(entry['size']) if entry.get('size') else "?"
+        text += f"{index}. `{display_name}` ({size})\n"
+        buttons.append([InlineKeyboardButton(f"🗑️ {index}. {display_name[:20]}", callback_data=f"srch_del_{entry['file_id']}")])
+    await safe_reply_message(message, text, reply_markup=InlineKeyboardMarkup(buttons))
+
 # --- NUEVO: Comando /listdrive ---
 @pyrogram_app.on_message(filters.command("listdrive") & filters.private)
 async def list_drive_command(client: Client, message: Message):
     """Muestra el contenido de Google Drive."""
     user_id = message.from_user.id
-    print(f"Comando /listdrive recibido de {user_id} ({message.from_user.first_name}).")
+    logger.info(f"Comando /listdrive recibido de {user_id} ({message.from_user.first_name}).")
     
     # Verificar lista blanca (si la tienes activa)
     if not is_user_whitelisted(user_id):
-        print(f"Acceso denegado a {user_id} para /listdrive. No está en la lista blanca.")
+        logger.warning(f"Acceso denegado a {user_id} para /listdrive. No está en la lista blanca.")
         try:
             await message.reply_text("❌ Acceso denegado. No estás en la lista de usuarios permitidos.")
         except Exception as e:
-            print(f"Error al enviar mensaje de denegación: {e}")
+            logger.error(f"Error al enviar mensaje de denegación: {e}")
         return
 
     try:
@@ -406,7 +846,7 @@ async def list_drive_command(client: Client, message: Message):
         await send_drive_file_list(client, message.chat.id, page=1)
     except Exception as e:
         error_msg = f"❌ Error al iniciar el listado de Drive: {e}"
-        print(error_msg)
+        logger.error(error_msg)
         await message.reply_text(error_msg)
 
 # --- NUEVO: Comando /deletedrive <file_id> ---
@@ -414,14 +854,14 @@ async def list_drive_command(client: Client, message: Message):
 async def delete_drive_command(client: Client, message: Message):
     """Borra un archivo de Google Drive usando su ID."""
     user_id = message.from_user.id
-    print(f"Comando /deletedrive recibido de {user_id} ({message.from_user.first_name}).")
+    logger.info(f"Comando /deletedrive recibido de {user_id} ({message.from_user.first_name}).")
     
     if not is_user_whitelisted(user_id):
-        print(f"Acceso denegado a {user_id} para /deletedrive.")
+        logger.warning(f"Acceso denegado a {user_id} para /deletedrive.")
         try:
             await message.reply_text("❌ Acceso denegado.")
         except Exception as e:
-            print(f"Error al enviar mensaje de denegación: {e}")
+            logger.error(f"Error al enviar mensaje de denegación: {e}")
         return
 
     command_parts = message.text.split()
@@ -447,14 +887,14 @@ async def delete_drive_command(client: Client, message: Message):
 async def delete_all_drive_command(client: Client, message: Message):
     """Borra todos los archivos de Google Drive (con confirmación)."""
     user_id = message.from_user.id
-    print(f"Comando /deletedriveall recibido de {user_id} ({message.from_user.first_name}).")
+    logger.info(f"Comando /deletedriveall recibido de {user_id} ({message.from_user.first_name}).")
     
     if not is_user_whitelisted(user_id):
-        print(f"Acceso denegado a {user_id} para /deletedriveall.")
+        logger.warning(f"Acceso denegado a {user_id} para /deletedriveall.")
         try:
             await message.reply_text("❌ Acceso denegado.")
         except Exception as e:
-            print(f"Error al enviar mensaje de denegación: {e}")
+            logger.error(f"Error al enviar mensaje de denegación: {e}")
         return
 
     # Pedir confirmación
@@ -469,29 +909,323 @@ async def delete_all_drive_command(client: Client, message: Message):
     )
 
 
+# --- Cola de reintentos ---
+def _schedule_retry(job: dict, error: str) -> str:
+    """Mete el trabajo fallido en la cola de reintentos y devuelve una nota para el usuario."""
+    status = schedule_retry(job, error)
+    if status == JOB_RETRY_WAIT:
+        minutes = max(1, round((job['next_retry_at'] - time.time()) / 60))
+        return f"🔁 Se reintentará automáticamente en ~{minutes} min (intento {job['attempts']}/{RETRY_MAX_ATTEMPTS})."
+    if status == JOB_DEAD:
+        return "☠️ Se agotaron los reintentos automáticos: usa /retries para reintentarlo."
+    return ""
+
+# --- Álbumes (media groups): se procesan como un único trabajo ---
+# {media_group_id: {'messages': [Message], 'last_seen': float, 'task': asyncio.Task}}
+_media_group_buffers = {}
+
+def buffer_media_group_video(client: Client, message: Message):
+    """
+    Acumula un video de un álbum. Telegram entrega cada video como un update separado:
+    el lote se procesa cuando pasan MEDIA_GROUP_WINDOW segundos sin recibir más.
+    """
+    group_id = message.media_group_id
+    buffer = _media_group_buffers.get(group_id)
+    if buffer is None:
+        buffer = _media_group_buffers[group_id] = {'messages': [], 'last_seen': 0.0, 'task': None}
+        buffer['task'] = asyncio.get_running_loop().create_task(_flush_media_group(client, group_id))
+    buffer['messages'].append(message)
+    buffer['last_seen'] = time.monotonic()
+    logger.info(f"Video {message.id} añadido al álbum {group_id} ({len(buffer['messages'])} hasta ahora).")
+
+async def _flush_media_group(client: Client, group_id):
+    """Espera a que el álbum esté completo y lo procesa."""
+    buffer = _media_group_buffers[group_id]
+    while True:
+        remaining = buffer['last_seen'] + MEDIA_GROUP_WINDOW - time.monotonic()
+        if remaining <= 0:
+            break
+        await asyncio.sleep(remaining)
+    _media_group_buffers.pop(group_id, None)
+    messages = sorted(buffer['messages'], key=lambda m: m.id)
+    try:
+        await process_media_group(client, messages)
+    except Exception as e:
+        logger.exception(f"Error general al procesar el álbum {group_id}: {e}")
+
+async def _transfer_group_item(client: Client, item: dict, semaphore: asyncio.Semaphore):
+    """Descarga un video del álbum y lo sube a Drive sin compartirlo (se comparte en lote después)."""
+    message, trace, size, job = item['message'], item['trace'], item['size'], item['job']
+    disk_reservation = None
+    job_slot = None
+    temp_file_path = job.get('temp_path') if reached(job, "downloaded") else None
+    async with semaphore:
+        try:
+            if not reached(job, "uploaded"):
+                def notify_scheduler_queue(waiting):
+                    item['state'] = f"⏳ En cola ({waiting} videos esperando turno)"
+                job_slot = await get_scheduler().acquire(message.id, job.get('user_id'), size, on_wait=notify_scheduler_queue)
+
+            if not reached(job, "downloaded"):
+                def notify_circuit_hold(names):
+                    item['state'] = f"⏸️ En espera: {', '.join(names)} no está disponible"
+                await wait_for_dependencies(on_hold=notify_circuit_hold)
+
+                def notify_disk_queue(position):
+                    item['state'] = f"⏳ Esperando espacio en disco (posición {position})"
+                temp_dir = choose_directory(size)
+                disk_reservation = await get_admission_controller(temp_dir).acquire(
+                    message.id, size, on_wait=notify_disk_queue
+                )
+                temp_file_path = await allocate_temp_file_async(message.id, item['name'], size, reservation=disk_reservation)
+
+                def download_progress(current, total):
+                    disk_reservation.update(current)
+                    item['state'] = f"⬇️ Descargando ({int(current * 100 / total)}%)"
+                item['state'] = "⬇️ Descargando"
+                # MD5 calculado sobre los chunks de la descarga, para verificar la copia en Drive
+                download_md5 = hashlib.md5()
+                with trace.span("download", nbytes=size) as download_span:
+                    download_span['bytes'] = await stream_media_to_file(
+                        client, message, temp_file_path, size, progress=download_progress, hasher=download_md5
+                    )
+                advance(job, "downloaded", temp_path=temp_file_path, md5=download_md5.hexdigest())
+
+            if not reached(job, "uploaded"):
+                item['state'] = "☁️ Subiendo a Google Drive"
+                async with reserve_drive_space(size) as account_id:
+                    item['drive_id'] = await upload_to_drive_async_with_progress(
+                        temp_file_path, item['name'], trace=trace, share=False, account_id=account_id,
+                        md5=job.get('md5')
+                    )
+                item['account_id'] = account_id
+                advance(job, "uploaded", drive_id=item['drive_id'], account_id=account_id,
+                        md5=pop_verified_checksum(item['drive_id']) or job.get('md5'))
+            item['state'] = "✅ Subido"
+        except asyncio.CancelledError:
+            # Cierre del bot: conservar el temporal ya descargado para reanudar al arrancar
+            if reached(job, "downloaded") and not reached(job, "uploaded"):
+                temp_file_path = None
+            raise
+        except Exception as e:
+            logger.error(f"Error al procesar el video {message.id} del álbum: {e}")
+            item['error'] = str(e)
+            item['state'] = f"❌ {e} — {_schedule_retry(job, str(e))}"
+        finally:
+            if temp_file_path:
+                await safe_delete_file(temp_file_path)
+            if disk_reservation:
+                disk_reservation.release()
+            if job_slot:
+                job_slot.release()
+
+def _render_media_group(title: str, items: list) -> str:
+    lines = [f"📦 **{title}**"]
+    for index, item in enumerate(items, 1):
+        lines.append(f"{index}. `{item['name']}` — {item['state']}")
+    return "\n".join(lines)
+
+async def process_media_group(client: Client, messages: list, processing_message: Message = None, jobs: dict = None):
+    """
+    Procesa un álbum como un único trabajo: un solo mensaje de progreso, descargas y
+    subidas con paralelismo limitado (MEDIA_GROUP_PARALLELISM), permisos de Drive en
+    una petición batch, importaciones a Hydrax concurrentes y un resultado con todos los slugs.
+    Con 'jobs' ({message_id: trabajo del diario}) reanuda cada video desde su última etapa.
+    """
+    items = []
+    for message in messages:
+        job = jobs.get(message.id) if jobs else None
+        if job is None and not try_start_processing(message.id):
+            logger.warning(f"Mensaje {message.id} ya está en proceso o no se pudo iniciar. Ignorando.")
+            continue
+        items.append({
+            'message': message,
+            'name': job['file_name'] if job else (message.video.file_name or f"video_{message.id}.mp4"),
+            'size': job['file_size'] if job else getattr(message.video, 'file_size', None),
+            'trace': JobTrace(message.id, user_id=job['user_id'] if job else message.from_user.id,
+                              media_group=job['media_group_id'] if job else message.media_group_id,
+                              resumed=bool(job)),
+            'job': job,
+            'state': f"🔁 Reanudando (etapa: {job['stage']})" if job else "⏳ En cola",
+            'drive_id': job.get('drive_id') if job else None,
+            'account_id': job.get('account_id') if job else None,
+            'slug': job.get('slug') if job else None,
+            'error': None,
+        })
+    if not items:
+        return
+
+    title = f"Álbum de {len(items)} videos"
+    logger.info(f"Procesando {title.lower()} ({'reanudado' if jobs else 'nuevo'}).")
+    done = asyncio.Event()
+    interrupted = False
+
+    async def progress_loop():
+        # Un único mensaje para todo el lote, refrescado cada cierto tiempo (no en cada chunk)
+        while not done.is_set():
+            await update_progress(processing_message, _render_media_group(title, items))
+            try:
+                await asyncio.wait_for(done.wait(), timeout=MEDIA_GROUP_PROGRESS_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    progress_task = None
+    try:
+        if processing_message is None:
+            processing_message = await safe_reply_message(items[0]['message'], _render_media_group(title, items))
+        for item in items:
+            if item['job'] is None:
+                message = item['message']
+                item['job'] = start_job(
+                    message.id, message.chat.id, message.id, message.from_user.id, item['name'], item['size'],
+                    progress_message=processing_message, media_group_id=message.media_group_id
+                )
+        progress_task = asyncio.create_task(progress_loop())
+
+        semaphore = asyncio.Semaphore(max(1, MEDIA_GROUP_PARALLELISM))
+        await asyncio.gather(*(_transfer_group_item(client, item, semaphore) for item in items))
+
+        # Compartir todos los archivos subidos con una sola petición batch por cuenta de Drive
+        to_share = [item for item in items if item['drive_id'] and not item['error'] and not reached(item['job'], "shared")]
+        if to_share:
+            for item in to_share:
+                item['state'] = "🔗 Compartiendo"
+            share_start = time.time()
+            try:
+                share_errors = {}
+                for account_id in {item['account_id'] for item in to_share}:
+                    share_errors.update(await share_files_public_async(
+                        [item['drive_id'] for item in to_share if item['account_id'] == account_id], account_id
+                    ))
+            except Exception as e:
+                logger.error(f"Error al compartir el álbum en lote: {e}")
+                share_errors = {item['drive_id']: str(e) for item in to_share}
+            share_end = time.time()
+            for item in to_share:
+                error = share_errors.get(item['drive_id'])
+                record_span(item['trace'].job_id, "share", share_start, share_end, ok=not error, **item['trace'].attrs)
+                if error:
+                    item['error'] = f"No se pudo compartir: {error}"
+                    item['state'] = f"❌ {item['error']} — {_schedule_retry(item['job'], item['error'])}"
+                else:
+                    advance(item['job'], "shared")
+
+        # Registrar en la DB local los archivos ya compartidos
+        for item in items:
+            if item['drive_id'] and not item['error'] and not reached(item['job'], "recorded"):
+                try:
+                    with item['trace'].span("db_record"):
+                        await asyncio.get_running_loop().run_in_executor(
+                            None, record_uploaded_file, item['drive_id'], item['name'], item['size'], item['account_id'],
+                            item['job'].get('md5')
+                        )
+                except Exception as record_err:
+                    logger.warning(f"⚠️ Error al registrar {item['drive_id']} en DB local: {record_err}")
+                advance(item['job'], "recorded")
+
+        # Importar a Hydrax de forma concurrente (la API no admite lotes)
+        hydrax_semaphore = asyncio.Semaphore(max(1, HYDRAX_BATCH_CONCURRENCY))
+
+        async def import_item(item):
+            async with hydrax_semaphore:
+                item['state'] = "🚀 Importando a Hydrax"
+                with item['trace'].span("hydrax_import"):
+                    result = await import_to_hydrax_async(item['drive_id'])
+                await asyncio.get_running_loop().run_in_executor(None, set_hydrax_result, item['drive_id'], result)
+            if result["success"]:
+                item['slug'] = result["slug"]
+                item['state'] = f"✅ Slug: `{item['slug']}`"
+                advance(item['job'], "imported", slug=item['slug'])
+                finish_job(item['job'], JOB_DONE)
+            else:
+                item['error'] = result["error"]
+                item['state'] = f"❌ Hydrax: `{item['error']}` — {_schedule_retry(item['job'], item['error'])}"
+
+        for item in items:
+            # Importado justo antes del reinicio: solo faltaba cerrar el trabajo
+            if reached(item['job'], "imported"):
+                item['state'] = f"✅ Slug: `{item['slug']}`"
+                finish_job(item['job'], JOB_DONE)
+        await asyncio.gather(*(
+            import_item(item) for item in items
+            if item['drive_id'] and not item['error'] and not reached(item['job'], "imported")
+        ))
+
+        done.set()
+        await progress_task
+        completed = sum(1 for item in items if item['slug'])
+        await safe_edit_message(
+            processing_message,
+            _render_media_group(f"{title}: {completed}/{len(items)} completados", items)
+        )
+    except asyncio.CancelledError:
+        # Cierre del bot: los trabajos siguen 'active' en el diario y se reanudarán al arrancar
+        interrupted = True
+        await update_progress(processing_message, "⏸️ El bot se está reiniciando: el álbum se reanudará automáticamente.")
+        raise
+    except Exception as e:
+        for item in items:
+            if item['job'] and item['job']['status'] == JOB_ACTIVE:
+                _schedule_retry(item['job'], str(e))
+        raise
+    finally:
+        done.set()
+        if progress_task and not progress_task.done():
+            progress_task.cancel()
+        for item in items:
+            status = "ok" if item['slug'] else ("interrupted" if interrupted else "error")
+            item['trace'].finish(status, nbytes=item['size'])
+            finish_processing(item['message'].id)
+        logger.info(f"Finalizado el procesamiento del álbum ({len(items)} videos).")
+
 # Aplicar el filtro de lista blanca al manejador de videos
 @pyrogram_app.on_message(filters.private & filters.video)
 async def handle_video(client: Client, message: Message):
-    """Maneja los videos recibidos, evitando duplicados de forma más robusta."""
+    """
+    Maneja los videos recibidos, evitando duplicados de forma más robusta.
+    Devuelve la tarea que procesa el video (None si no se procesa o va en un álbum).
+    """
     user_id = message.from_user.id
-    print(f"Video recibido de {user_id} (Message ID: {message.id}).")
+    logger.info(f"Video recibido de {user_id} (Message ID: {message.id}).")
     
     # Verificar lista blanca
     if not is_user_whitelisted(user_id):
-        print(f"Acceso denegado a {user_id} para enviar video. No está en la lista blanca.")
+        logger.warning(f"Acceso denegado a {user_id} para enviar video. No está en la lista blanca.")
         return # Salir inmediatamente si no está autorizado
 
+    # Los videos de un álbum se acumulan y se procesan juntos como un único lote
+    if message.media_group_id:
+        buffer_media_group_video(client, message)
+        return
+
     # --- El resto de tu lógica de handle_video sigue aquí ---
-    print(f"Video recibido. Message ID: {message.id}")
+    logger.info(f"Video recibido. Message ID: {message.id}")
 
     # --- Verificación y bloqueo atómico ---
     if not try_start_processing(message.id):
-        print(f"Mensaje {message.id} ya está en proceso o no se pudo iniciar. Ignorando.")
+        logger.warning(f"Mensaje {message.id} ya está en proceso o no se pudo iniciar. Ignorando.")
         return
 
+    # En una tarea aparte: la espera de turno en el planificador no debe ocupar un worker
+    # de Pyrogram (con todos ocupados por videos en cola el bot dejaría de atender comandos)
+    task = asyncio.get_running_loop().create_task(process_video(client, message))
+    _video_tasks.add(task)
+    task.add_done_callback(_video_tasks.discard)
+    return task
+
+# Tareas de videos en curso o esperando turno (referencia fuerte para que no se recolecten)
+_video_tasks = set()
+
+async def process_video(client: Client, message: Message, processing_message: Message = None, job: dict = None):
+    """
+    Descarga, sube, comparte, registra e importa un video, anotando cada etapa en el
+    diario de trabajos. Con 'job' (reanudación tras un reinicio) se salta las etapas ya
+    completadas, reutiliza sus artefactos y edita el mensaje de progreso original.
+    """
+    user_id = message.from_user.id if message.from_user else (job or {}).get('user_id')
+
     # --- Variables para el manejo del proceso ---
-    processing_message = None
-    temp_file_path = None
+    temp_file_path = job.get('temp_path') if reached(job, "downloaded") else None
     # Variables para controlar la actualización de progreso por hitos
     last_download_percent = -1
     last_upload_percent = -1
@@ -504,167 +1238,278 @@ async def handle_video(client: Client, message: Message):
     # Almacenar la referencia del proceso cancelable
     cancelable_processes[message.id] = {'cancel_flag': cancel_event, 'process_task': None} # Se actualizará más tarde
     # Variable para almacenar el nombre del archivo original
-    original_file_name = None
+    original_file_name = job['file_name'] if job else None
+    # Traza del trabajo: spans por etapa (descarga, subida, compartir, registro, Hydrax)
+    trace = JobTrace(message.id, user_id=user_id, resumed=bool(job))
+    trace_status = "error"
+    video_size = job['file_size'] if job else getattr(message.video, 'file_size', None)
+    # Reserva de espacio en disco para la descarga (se libera al borrar el archivo temporal)
+    disk_reservation = None
+    # Turno del planificador para la descarga y la subida (se devuelve al terminar la subida)
+    job_slot = None
 
     try:
         # 2. Enviar mensaje inicial de procesamiento
-        print("Enviando mensaje inicial de procesamiento...")
-        processing_message = await safe_reply_message(message, "🔄 Preparando para procesar el video...")
+        if processing_message is None:
+            logger.info("Enviando mensaje inicial de procesamiento...")
+            processing_message = await safe_reply_message(message, "🔄 Preparando para procesar el video...")
+            set_progress_message(job, processing_message)
+        else:
+            await update_progress(processing_message, f"🔁 Reanudando el proceso (etapa: {job['stage']})...")
 
         # 3. Descargar archivo - CON callback de progreso limitado por hitos y botón de cancelar
-        video = message.video
-        original_file_name = video.file_name or f"video_{message.id}.mp4"
+        if original_file_name is None:
+            original_file_name = message.video.file_name or f"video_{message.id}.mp4"
         file_name = original_file_name # Usar el nombre original
-        print(f"Iniciando descarga de video: {file_name}")
+        if job is None:
+            job = start_job(
+                message.id, message.chat.id, message.id, user_id, file_name, video_size,
+                progress_message=processing_message
+            )
         
         # Crear el teclado inline con el botón de cancelar
         cancel_button = InlineKeyboardButton("❌ Cancelar", callback_data=f"cancel_{message.id}")
         reply_markup = InlineKeyboardMarkup([[cancel_button]])
+
+        # Esperar turno: reparto justo entre usuarios y carril rápido para videos pequeños
+        if not reached(job, "uploaded"):
+            async def notify_scheduler_queue(waiting):
+                await update_progress(
+                    processing_message,
+                    f"⏳ En cola: {waiting} videos esperando turno. Se reparte por turnos entre usuarios...",
+                    reply_markup=reply_markup
+                )
+            job_slot = await get_scheduler().acquire(message.id, user_id, video_size, on_wait=notify_scheduler_queue)
         
-        # Actualizar mensaje con el botón de cancelar (sin porcentaje aún)
-        await update_progress(processing_message, "⬇️ Descargando video...", reply_markup=reply_markup)
-        
-        # Función de callback para progreso de descarga (limitada a hitos 25, 50, 75, 100)
-        async def download_progress_milestones(current, total):
-            # Verificar si se solicitó cancelación
-            if cancel_event.is_set():
-                raise asyncio.CancelledError("Descarga cancelada por el usuario.")
-            nonlocal last_download_percent
-            current_percent = int((current / total) * 100)
+        if not reached(job, "downloaded"):
+            # Con Drive o Hydrax caídos no se empieza a descargar: esperar (o fallar) antes
+            async def notify_circuit_hold(names):
+                await update_progress(
+                    processing_message,
+                    f"⏸️ En espera: {', '.join(names)} no está disponible. El proceso continuará cuando se recupere...",
+                    reply_markup=reply_markup
+                )
+            await wait_for_dependencies(on_hold=notify_circuit_hold)
+            logger.info(f"Iniciando descarga de video: {file_name}")
+            # Reservar espacio en disco ANTES de empezar: nunca iniciar una descarga que no puede terminar
+            async def notify_disk_queue(position):
+                await update_progress(
+                    processing_message,
+                    f"⏳ En cola: esperando espacio libre en disco (posición {position})...",
+                    reply_markup=reply_markup
+                )
+            # El nivel de almacenamiento temporal (tmpfs/disco) depende del tamaño del video
+            temp_dir = choose_directory(video_size)
+            disk_reservation = await get_admission_controller(temp_dir).acquire(
+                message.id, video_size, on_wait=notify_disk_queue
+            )
+            # Crear el temporal con el tamaño esperado ya reservado en disco
+            temp_file_path = await allocate_temp_file_async(message.id, file_name, video_size, reservation=disk_reservation)
+
+            # Actualizar mensaje con el botón de cancelar (sin porcentaje aún)
+            await update_progress(processing_message, "⬇️ Descargando video...", reply_markup=reply_markup)
             
-            # Verificar si se debe actualizar basado en hitos
-            if _should_update_progress(current_percent, last_download_percent):
-                 await update_progress(processing_message, f"⬇️ Descargando video ({current_percent}%)...", reply_markup=reply_markup)
-                 print(f"Progreso descarga actualizado por hito: {current_percent}%")
-                 last_download_percent = current_percent
-
-        # Descargar el archivo con callback limitado
-        # Envolver la descarga en una tarea para poder cancelarla
-        async def download_task_func():
-            return await client.download_media(message, progress=download_progress_milestones)
-        
-        download_task = asyncio.create_task(download_task_func())
-        cancelable_processes[message.id]['process_task'] = download_task # Actualizar referencia
-        
-        try:
-            temp_file_path = await download_task
-            print(f"Video descargado exitosamente a: {temp_file_path}")
-            # Asegurarse de mostrar 100% al finalizar la descarga si no se mostró
-            if last_download_percent < 100:
-                 await update_progress(processing_message, "⬇️ Descargando video (100%)...", reply_markup=reply_markup)
-        except asyncio.CancelledError:
-            raise # Relanzar para ser capturado por el handler exterior
-        finally:
-            # Limpiar la referencia de la tarea de descarga
-            if message.id in cancelable_processes:
-                cancelable_processes[message.id]['process_task'] = None
-
-        # 4. Subir a Google Drive (y compartir) - CON callback de progreso limitado por hitos y botón de cancelar
-        # Actualizar mensaje con el botón de cancelar para la subida (sin porcentaje aún)
-        await update_progress(processing_message, "☁️ Subiendo a Google Drive...", reply_markup=reply_markup)
-        print("Iniciando subida a Google Drive...")
-
-        # Función de callback para progreso de subida (limitada a hitos 25, 50, 75, 100)
-        async def upload_progress_milestones(percent):
-             # Verificar si se solicitó cancelación
-             if cancel_event.is_set():
-                 raise asyncio.CancelledError("Subida cancelada por el usuario.")
-             nonlocal last_upload_percent
-             current_percent = percent
-             
-             # Verificar si se debe actualizar basado en hitos
-             if _should_update_progress(current_percent, last_upload_percent):
-                 await update_progress(processing_message, f"☁️ Subiendo a Google Drive ({current_percent}%)...", reply_markup=reply_markup)
-                 print(f"Progreso subida actualizado por hito: {current_percent}%")
-                 last_upload_percent = current_percent
-
-        # --- Llamada modificada CON progress_callback limitado y control de cancelación ---
-        async def upload_task_func():
-            return await upload_to_drive_async_with_progress(temp_file_path, file_name, progress_callback=upload_progress_milestones)
-        
-        upload_task = asyncio.create_task(upload_task_func())
-        cancelable_processes[message.id]['process_task'] = upload_task # Actualizar referencia
-        
-        drive_id = None
-        try:
-            drive_id = await upload_task
-            print(f"✅ ÉXITO: Archivo subido y compartido en Google Drive. ID OBTENIDO: {drive_id}")
-            # Asegurarse de mostrar 100% al finalizar la subida si no se mostró
-            if last_upload_percent < 100:
-                 await update_progress(processing_message, "☁️ Subiendo a Google Drive (100%)...", reply_markup=reply_markup)
+            # Función de callback para progreso de descarga (limitada a hitos 25, 50, 75, 100)
+            async def download_progress_milestones(current, total):
+                # Verificar si se solicitó cancelación
+                if cancel_event.is_set():
+                    raise asyncio.CancelledError("Descarga cancelada por el usuario.")
+                nonlocal last_download_percent
+                disk_reservation.update(current)
+                current_percent = int((current / total) * 100)
+                
+                # Verificar si se debe actualizar basado en hitos
+                if _should_update_progress(current_percent, last_download_percent):
+                     await update_progress(processing_message, f"⬇️ Descargando video ({current_percent}%)...", reply_markup=reply_markup)
+                     logger.debug(f"Progreso descarga actualizado por hito: {current_percent}%")
+                     last_download_percent = current_percent
+
+            # Descargar el archivo con callback limitado
+            # Envolver la descarga en una tarea para poder cancelarla
+            # MD5 calculado sobre los chunks de la descarga, para verificar la copia en Drive
+            download_md5 = hashlib.md5()
+            async def download_task_func():
+                return await stream_media_to_file(
+                    client, message, temp_file_path, video_size, progress=download_progress_milestones, hasher=download_md5
+                )
             
-            # --- NUEVO: Registrar el archivo subido en la DB local ---
-            if drive_id and original_file_name:
-                print(f"Intentando registrar archivo subido: ID={drive_id}, Nombre={original_file_name}")
-                try:
-                    record_uploaded_file(drive_id, original_file_name)
-                    print(f"✅ CONFIRMACIÓN: Archivo {drive_id} ('{original_file_name}') REGISTRADO en uploaded_files_db.json.")
-                except Exception as record_err:
-                    error_msg = f"⚠️ Error al registrar archivo en DB local después de la subida: {record_err}"
-                    print(error_msg)
-                    # Opcional: Enviar mensaje al usuario
-                    # await safe_edit_message(processing_message, f"{processing_message.text.markdown}\n{error_msg}")
-
-        except asyncio.CancelledError:
-            raise # Relanzar para ser capturado por el handler exterior
-        finally:
-            # Limpiar la referencia de la tarea de subida
-            if message.id in cancelable_processes:
-                cancelable_processes[message.id]['process_task'] = None
-
-        # 5. Eliminar archivo local INMEDIATAMENTE
-        print("Eliminando archivo temporal local...")
-        await safe_delete_file(temp_file_path)
-        temp_file_path = None
-
-        # 6. Importar a Hydrax (Sin botón de cancelar en esta etapa)
+            download_task = asyncio.create_task(download_task_func())
+            cancelable_processes[message.id]['process_task'] = download_task # Actualizar referencia
+            
+            try:
+                with trace.span("download", nbytes=video_size) as download_span:
+                    download_span['bytes'] = await download_task
+                logger.info(f"Video descargado exitosamente a: {temp_file_path}")
+                advance(job, "downloaded", temp_path=temp_file_path, md5=download_md5.hexdigest())
+                # Asegurarse de mostrar 100% al finalizar la descarga si no se mostró
+                if last_download_percent < 100:
+                     await update_progress(processing_message, "⬇️ Descargando video (100%)...", reply_markup=reply_markup)
+            except asyncio.CancelledError:
+                raise # Relanzar para ser capturado por el handler exterior
+            finally:
+                # Limpiar la referencia de la tarea de descarga
+                if message.id in cancelable_processes:
+                    cancelable_processes[message.id]['process_task'] = None
+
+        # 4. Subir a Google Drive - CON callback de progreso limitado por hitos y botón de cancelar
+        drive_id = job.get('drive_id')
+        account_id = job.get('account_id')
+        if not reached(job, "uploaded"):
+            # Actualizar mensaje con el botón de cancelar para la subida (sin porcentaje aún)
+            await update_progress(processing_message, "☁️ Subiendo a Google Drive...", reply_markup=reply_markup)
+            logger.info("Iniciando subida a Google Drive...")
+
+            # Función de callback para progreso de subida (limitada a hitos 25, 50, 75, 100)
+            async def upload_progress_milestones(percent):
+                 # Verificar si se solicitó cancelación
+                 if cancel_event.is_set():
+                     raise asyncio.CancelledError("Subida cancelada por el usuario.")
+                 nonlocal last_upload_percent
+                 current_percent = percent
+                 
+                 # Verificar si se debe actualizar basado en hitos
+                 if _should_update_progress(current_percent, last_upload_percent):
+                     await update_progress(processing_message, f"☁️ Subiendo a Google Drive ({current_percent}%)...", reply_markup=reply_markup)
+                     logger.debug(f"Progreso subida actualizado por hito: {current_percent}%")
+                     last_upload_percent = current_percent
+
+            # --- Llamada CON progress_callback limitado y control de cancelación ---
+            # Se comparte en un paso aparte para que el diario distinga 'uploaded' de 'shared'
+            # Se reserva el espacio en Drive antes de subir (desalojando archivos antiguos si hace falta)
+            # (y se elige la cuenta del pool con más presupuesto diario y espacio libre)
+            async def upload_task_func():
+                nonlocal account_id
+                async with reserve_drive_space(video_size) as account_id:
+                    return await upload_to_drive_async_with_progress(
+                        temp_file_path, file_name, progress_callback=upload_progress_milestones, trace=trace, share=False,
+                        account_id=account_id, md5=job.get('md5')
+                    )
+            
+            upload_task = asyncio.create_task(upload_task_func())
+            cancelable_processes[message.id]['process_task'] = upload_task # Actualizar referencia
+            
+            try:
+                drive_id = await upload_task
+                logger.info(f"✅ ÉXITO: Archivo subido a Google Drive. ID OBTENIDO: {drive_id}")
+                advance(job, "uploaded", drive_id=drive_id, account_id=account_id,
+                        md5=pop_verified_checksum(drive_id) or job.get('md5'))
+                # Asegurarse de mostrar 100% al finalizar la subida si no se mostró
+                if last_upload_percent < 100:
+                     await update_progress(processing_message, "☁️ Subiendo a Google Drive (100%)...", reply_markup=reply_markup)
+            except asyncio.CancelledError:
+                raise # Relanzar para ser capturado por el handler exterior
+            finally:
+                # Limpiar la referencia de la tarea de subida
+                if message.id in cancelable_processes:
+                    cancelable_processes[message.id]['process_task'] = None
+
+        # 5. Eliminar archivo local INMEDIATAMENTE (ya está en Drive)
+        if temp_file_path:
+            logger.info("Eliminando archivo temporal local...")
+            await safe_delete_file(temp_file_path)
+            temp_file_path = None
+        if disk_reservation:
+            disk_reservation.release()
+        if job_slot:
+            job_slot.release()
+
+        # 6. Compartir públicamente (no hace nada si el archivo hereda el permiso de la carpeta)
+        if not reached(job, "shared"):
+            with trace.span("share"):
+                share_errors = await share_files_public_async([drive_id], account_id)
+            if share_errors.get(drive_id):
+                raise RuntimeError(f"No se pudo compartir el archivo {drive_id}: {share_errors[drive_id]}")
+            advance(job, "shared")
+
+        # --- Registrar el archivo subido en la DB local ---
+        if not reached(job, "recorded"):
+            logger.debug(f"Intentando registrar archivo subido: ID={drive_id}, Nombre={original_file_name}")
+            try:
+                with trace.span("db_record"):
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, record_uploaded_file, drive_id, original_file_name, video_size, account_id, job.get('md5')
+                    )
+                logger.info(f"✅ CONFIRMACIÓN: Archivo {drive_id} ('{original_file_name}') REGISTRADO en uploaded_files_db.json.")
+            except Exception as record_err:
+                error_msg = f"⚠️ Error al registrar archivo en DB local después de la subida: {record_err}"
+                logger.error(error_msg)
+            advance(job, "recorded")
+
+        # 7. Importar a Hydrax (Sin botón de cancelar en esta etapa)
         # Eliminar el botón de cancelar antes de la importación
         await update_progress(processing_message, "🚀 Importando a Hydrax...")
-        print("Importando a Hydrax...")
-        hydrax_result = import_to_hydrax(drive_id)
+        logger.info("Importando a Hydrax...")
+        with trace.span("hydrax_import"):
+            hydrax_result = await import_to_hydrax_async(drive_id)
+        await asyncio.get_running_loop().run_in_executor(None, set_hydrax_result, drive_id, hydrax_result)
 
-        # 7. Mostrar resultado final
-        print(f"Resultado de Hydrax: {hydrax_result}")
+        # 8. Mostrar resultado final
+        logger.info(f"Resultado de Hydrax: {hydrax_result}")
         if hydrax_result["success"]:
             slug = hydrax_result["slug"]
             final_message = f"✅ **Proceso completado con éxito!**\nSlug: `{slug}`"
+            trace_status = "ok"
+            advance(job, "imported", slug=slug)
+            finish_job(job, JOB_DONE)
         else:
             error_msg = hydrax_result["error"]
-            final_message = f"❌ **Error al importar a Hydrax:**\n`{error_msg}`"
+            final_message = f"❌ **Error al importar a Hydrax:**\n`{error_msg}`\n{_schedule_retry(job, error_msg)}"
         
         # Eliminar el botón de cancelar del mensaje final
         await safe_edit_message(processing_message, final_message)
 
     except asyncio.CancelledError:
+        if not cancel_event.is_set():
+            # Cancelado por el cierre del bot: el trabajo queda 'active' en el diario
+            # (con su temporal si ya se descargó) y se reanudará al arrancar.
+            logger.info(f"Proceso para el mensaje {message.id} interrumpido por el cierre del bot.")
+            trace_status = "interrupted"
+            await update_progress(processing_message, "⏸️ El bot se está reiniciando: el proceso se reanudará automáticamente.")
+            if temp_file_path and not reached(job, "downloaded"):
+                await safe_delete_file(temp_file_path)
+            raise
         # Manejar la cancelación del proceso
-        print(f"Proceso para el mensaje {message.id} cancelado por el usuario.")
+        logger.info(f"Proceso para el mensaje {message.id} cancelado por el usuario.")
+        trace_status = "cancelled"
+        finish_job(job, JOB_CANCELLED)
         cancel_message = "⚠️ **Proceso cancelado por el usuario.**"
         # Eliminar el botón de cancelar del mensaje de cancelación
         await safe_edit_message(processing_message, cancel_message)
+        # El archivo ocupa disco fuera de la reserva una vez liberada: borrarlo aquí también
+        if temp_file_path:
+            await safe_delete_file(temp_file_path)
         
     except Exception as e:
-        print(f"Error general en el manejo del video (Message ID: {message.id}): {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error general en el manejo del video (Message ID: {message.id}): {e}")
         error_message = f"⚠️ **Ocurrió un error inesperado:**\n`{str(e)}`"
+        if job:
+            error_message += f"\n{_schedule_retry(job, str(e))}"
         
         if processing_message:
             try:
                 # Eliminar el botón de cancelar del mensaje de error
                 await safe_edit_message(processing_message, error_message)
             except Exception as edit_error:
-                print(f"Error al editar el mensaje con el error: {edit_error}")
+                logger.error(f"Error al editar el mensaje con el error: {edit_error}")
         
         if temp_file_path:
             await safe_delete_file(temp_file_path)
     
     finally:
-        print(f"Finalizando procesamiento para Message ID: {message.id}")
+        if disk_reservation:
+            disk_reservation.release()
+        if job_slot:
+            job_slot.release()
+        logger.info(f"Finalizando procesamiento para Message ID: {message.id}")
+        trace.finish(trace_status, nbytes=video_size)
         finish_processing(message.id)
         # Limpiar el proceso cancelable del diccionario
         cancelable_processes.pop(message.id, None) # Usar pop con default para evitar KeyError
 
 # --- Manejador para CallbackQuery (para botones de /list, /listdrive, cancelar y acciones) ---
+# Repeticiones del mismo botón sobre el mismo mensaje dentro de esta ventana se ignoran
+_callback_debouncer = Debouncer(CALLBACK_DEBOUNCE_SECONDS)
+
 @pyrogram_app.on_callback_query()
 async def callback_handler(client: Client, callback_query):
     """Maneja las solicitudes de los botones inline."""
@@ -673,33 +1518,46 @@ async def callback_handler(client: Client, callback_query):
     message = callback_query.message
     chat_id = message.chat.id
 
-    print(f"Callback recibido: {data} de User ID: {user_id}")
+    logger.info(f"Callback recibido: {data} de User ID: {user_id}")
 
     # --- Verificar lista blanca para acciones sensibles ---
     if not is_user_whitelisted(user_id):
          await callback_query.answer("❌ Acceso denegado.", show_alert=True)
          return
 
+    # --- Antirrebote: el mismo botón del mismo mensaje pulsado otra vez enseguida ---
+    if _callback_debouncer.should_skip((chat_id, message.id, data)):
+        logger.debug(f"Callback {data} repetido sobre el mensaje {message.id}; ignorado.")
+        await callback_query.answer("⏳ Ya se está procesando...")
+        return
+
     try:
         # --- Manejar callbacks de /list (archivos subidos por el bot) ---
         if data.startswith("list_"):
             # Navegación o refresco de lista
             try:
-                page = int(data.split("_")[1])
-                await send_file_list(client, chat_id, page=page, message_to_edit=message)
-                await callback_query.answer() # Acknowledge silently
+                # list_<página>[_<orden>_<asc|desc>]
+                parts = data.split("_")
+                page = int(parts[1])
+                sort = parts[2] if len(parts) > 2 else 'time'
+                order = parts[3] if len(parts) > 3 else None
             except ValueError:
                  await callback_query.answer("Error: Número de página inválido.", show_alert=True)
+                 return
+            # Responder ya: la consulta a Drive puede tardar y Telegram reintenta si no hay respuesta
+            await callback_query.answer()
+            await send_file_list(client, chat_id, page=page, message_to_edit=message, sort=sort, order=order)
 
         # --- Manejar callbacks de /listdrive (contenido de Drive) ---
         elif data.startswith("drivelist_"):
              try:
                  page_str = data.split("_")[1]
                  page = int(page_str)
-                 await send_drive_file_list(client, chat_id, page=page, message_to_edit=message)
-                 await callback_query.answer()
              except (ValueError, IndexError):
                   await callback_query.answer("Error: Número de página inválido.", show_alert=True)
+                  return
+             await callback_query.answer()
+             await send_drive_file_list(client, chat_id, page=page, message_to_edit=message)
         
         # --- Manejar confirmación de borrado individual de Drive (desde comando) ---
         elif data.startswith("drive_delete_confirm_"):
@@ -713,7 +1571,7 @@ async def callback_handler(client: Client, callback_query):
                  # await send_drive_file_list(client, chat_id, page=1, message_to_edit=message)
              except Exception as e:
                  error_msg = f"❌ Error al borrar archivo: {e}"
-                 print(error_msg)
+                 logger.error(error_msg)
                  await safe_edit_message(message, error_msg)
         
         # --- Manejar solicitud de confirmación para borrar todo de Drive ---
@@ -744,7 +1602,7 @@ async def callback_handler(client: Client, callback_query):
                  # await send_drive_file_list(client, chat_id, page=1, message_to_edit=message)
              except Exception as e:
                  error_msg = f"❌ Error al borrar todos los archivos: {e}"
-                 print(error_msg)
+                 logger.error(error_msg)
                  await safe_edit_message(message, error_msg)
         
         # --- NUEVO: Manejar borrado individual desde /listdrive (botón) ---
@@ -763,6 +1621,32 @@ async def callback_handler(client: Client, callback_query):
              )
              await callback_query.answer("Confirmando borrado...")
 
+        # --- Borrado de un archivo subido desde los resultados de /search ---
+        elif data.startswith("srch_del_"):
+             file_id = data[len("srch_del_"):]
+             confirm_markup = InlineKeyboardMarkup([
+                 [InlineKeyboardButton("✅ Sí, borrar", callback_data=f"srch_delok_{file_id}")],
+                 [InlineKeyboardButton("❌ Cancelar", callback_data="drive_cancel")]
+             ])
+             await safe_edit_message(
+                 message,
+                 f"⚠️ **¿Confirmas el borrado del archivo con ID `{file_id}`?**\n"
+                 "Se borrará de Google Drive y del registro del bot.",
+                 reply_markup=confirm_markup
+             )
+             await callback_query.answer("Confirmando borrado...")
+
+        elif data.startswith("srch_delok_"):
+             file_id = data[len("srch_delok_"):]
+             await callback_query.answer("🗑️ Borrando archivo...")
+             try:
+                 await delete_uploaded_file_async(file_id)
+                 await safe_edit_message(message, f"✅ Archivo con ID `{file_id}` borrado de Google Drive y del registro.")
+             except Exception as e:
+                 error_msg = f"❌ Error al borrar archivo: {e}"
+                 logger.error(error_msg)
+                 await safe_edit_message(message, error_msg)
+
         # --- Manejar cancelación general ---
         elif data == "drive_cancel":
              await callback_query.answer("❌ Operación cancelada.")
@@ -780,10 +1664,12 @@ async def callback_handler(client: Client, callback_query):
 
     except Exception as e:
         error_msg = f"❌ Error en callback: {e}"
-        print(error_msg)
-        import traceback
-        traceback.print_exc()
-        await callback_query.answer(error_msg, show_alert=True)
+        logger.exception(error_msg)
+        try:
+            await callback_query.answer(error_msg[:200], show_alert=True)
+        except Exception:
+            # Ya se respondió al callback: mostrar el error en el propio mensaje
+            await safe_edit_message(message, error_msg)
 
 
 # --- Comando para configurar el menú de comandos del bot ---
@@ -797,32 +1683,146 @@ async def set_menu_command(client: Client, message: Message):
     await set_bot_commands(client)
     await message.reply_text("✅ Menú de comandos actualizado (si tienes permisos de admin del bot).")
 
+# --- Recuperación de trabajos tras un crash o reinicio ---
+async def _fetch_job_messages(client: Client, job: dict):
+    """Recupera el mensaje original del video y el mensaje de progreso de un trabajo del diario."""
+    message = await client.get_messages(job['chat_id'], job['message_id'])
+    processing_message = None
+    if job.get('progress_message_id'):
+        processing_message = await client.get_messages(job['progress_chat_id'], job['progress_message_id'])
+        if getattr(processing_message, 'empty', False):
+            processing_message = None
+    return message, processing_message
+
+def _can_resume(job: dict, message) -> bool:
+    """Sin el video original solo se puede reanudar si ya se descargó."""
+    return reached(job, "downloaded") or (message is not None and not getattr(message, 'empty', False) and message.video)
+
+def _reset_missing_download(job: dict):
+    """Si el trabajo estaba descargado pero el temporal ya no existe, hay que volver a descargar."""
+    if job['stage'] == "downloaded" and not (job.get('temp_path') and os.path.exists(job['temp_path'])):
+        job['stage'], job['temp_path'] = "queued", None
+
+async def _resume_single_job(client: Client, job: dict, edit_original: bool = True):
+    _reset_missing_download(job)
+    try:
+        message, processing_message = await _fetch_job_messages(client, job)
+        if not edit_original:
+            processing_message = None
+    except Exception as e:
+        logger.warning(f"Recuperación: No se pudieron obtener los mensajes del trabajo {job['job_id']}: {e}")
+        _schedule_retry(job, f"No se pudo recuperar el trabajo: {e}")
+        return
+    if not _can_resume(job, message):
+        finish_job(job, JOB_FAILED, "El video original ya no está disponible.")
+        await update_progress(processing_message, "❌ No se pudo reanudar el proceso: el video original ya no está disponible.")
+        return
+    logger.info(f"Recuperación: Reanudando el trabajo {job['job_id']} desde la etapa '{job['stage']}'.")
+    await process_video(client, message, processing_message=processing_message, job=job)
+
+async def _resume_album(client: Client, jobs: list):
+    messages, jobs_by_message, processing_message = [], {}, None
+    for job in jobs:
+        try:
+            message, progress = await _fetch_job_messages(client, job)
+        except Exception as e:
+            logger.warning(f"Recuperación: No se pudieron obtener los mensajes del trabajo {job['job_id']}: {e}")
+            _schedule_retry(job, f"No se pudo recuperar el trabajo: {e}")
+            continue
+        if not _can_resume(job, message):
+            finish_job(job, JOB_FAILED, "El video original ya no está disponible.")
+            continue
+        processing_message = processing_message or progress
+        messages.append(message)
+        jobs_by_message[message.id] = job
+    if messages:
+        logger.info(f"Recuperación: Reanudando un álbum de {len(messages)} videos.")
+        await process_media_group(
+            client, sorted(messages, key=lambda m: m.id), processing_message=processing_message, jobs=jobs_by_message
+        )
+
+async def recover_unfinished_jobs(client: Client):
+    """
+    Reanuda los trabajos del diario que quedaron a medias desde su última etapa
+    completada (sin volver a descargar ni subir lo que ya estaba hecho).
+    """
+    jobs = await asyncio.get_running_loop().run_in_executor(None, get_unfinished_jobs)
+    if not jobs:
+        return
+    logger.info(f"Recuperación: {len(jobs)} trabajos pendientes en el diario.")
+    singles, albums = [], {}
+    for job in jobs:
+        _reset_missing_download(job)
+        if job.get('media_group_id'):
+            albums.setdefault((job['chat_id'], job['media_group_id']), []).append(job)
+        else:
+            singles.append(job)
+    await asyncio.gather(
+        *(_resume_single_job(client, job) for job in singles),
+        *(_resume_album(client, album_jobs) for album_jobs in albums.values()),
+        return_exceptions=True
+    )
+
+async def _retry_job(job: dict):
+    """Reintento desde la cola: los videos de álbum responden con un mensaje propio."""
+    await _resume_single_job(pyrogram_app, job, edit_original=not job.get('media_group_id'))
+
+# --- Servicios en segundo plano ---
+def start_background_services():
+    """Inicia las tareas de fondo que deben vivir en el loop de Pyrogram."""
+    from loop_monitor import start_loop_monitor
+    from tracing import load_recent_history
+    from warmup import start_prewarm
+    start_loop_monitor()
+    # Credenciales, servicio de Drive, cuenta, DB y conexión con Hydrax en paralelo
+    start_prewarm()
+    # Cargar el historial reciente de trazas sin bloquear el loop
+    asyncio.get_running_loop().run_in_executor(None, load_recent_history)
+
+async def main():
+    """Inicia el cliente, lanza los servicios de fondo y espera hasta recibir una señal de cierre."""
+    loop = asyncio.get_running_loop()
+    # Borrar temporales huérfanos de un crash anterior ANTES de aceptar updates nuevos,
+    # conservando los ya descargados de trabajos que se van a reanudar
+    keep = await loop.run_in_executor(None, referenced_temp_paths)
+    removed = await loop.run_in_executor(None, cleanup_orphans, keep)
+    logger.info(f"Limpieza de temporales al arrancar: {removed} archivos huérfanos eliminados.")
+    await pyrogram_app.start()
+    logger.info("Cliente de Pyrogram iniciado.")
+    start_background_services()
+    if JOB_RECOVERY_ENABLED:
+        loop.create_task(recover_unfinished_jobs(pyrogram_app))
+    start_retry_scheduler(_retry_job)
+    start_quota_manager()
+    start_retention_reaper()
+    start_credential_refresher()
+    await idle()
+    await pyrogram_app.stop()
+
 # --- Punto de entrada principal ---
 if __name__ == "__main__":
-    print("Iniciando servidor Flask en un hilo separado...")
+    logger.info("Iniciando servidor Flask en un hilo separado...")
     # Iniciar Flask en un hilo separado para que no bloquee pyrogram_app.run()
     flask_thread = threading.Thread(target=run_flask)
     flask_thread.daemon = True # El hilo se detendrá cuando el proceso principal termine
     flask_thread.start()
-    print("Servidor Flask iniciado.")
+    logger.info("Servidor Flask iniciado.")
 
-    print("Entrando en pyrogram_app.run()...")
-    print("Bot deberia estar escuchando...")
-    # --- Corrección para Pyrogram v2.x: Usar pyrogram_app.run() directamente ---
-    # pyrogram_app.run() se encarga internamente de:
+    logger.info("Entrando en pyrogram_app.run()...")
+    logger.info("Bot deberia estar escuchando...")
+    # --- Pyrogram v2.x: pyrogram_app.run(main()) ejecuta main() en el loop del cliente ---
+    # main() se encarga de:
     # 1. Iniciar el cliente de Pyrogram (app.start())
-    # 2. Mantener el bucle de eventos corriendo para escuchar actualizaciones
-    # 3. Ejecutar los manejadores definidos (@app.on_message, etc.)
-    # 4. Mantener el proceso vivo hasta que se reciba una señal de cierre (Ctrl+C)
+    # 2. Lanzar los servicios de fondo (monitor del event loop, etc.)
+    # 3. Mantener el proceso vivo con idle() hasta recibir una señal de cierre (Ctrl+C)
+    # 4. Detener el cliente limpiamente
     try:
-        # pyrogram_app.run() bloquea el hilo principal hasta que se detiene.
-        pyrogram_app.run()
+        # pyrogram_app.run() bloquea el hilo principal hasta que main() termina.
+        pyrogram_app.run(main())
     except KeyboardInterrupt:
-        print("🛑 Bot detenido por el usuario (Ctrl+C).")
+        logger.info("🛑 Bot detenido por el usuario (Ctrl+C).")
     except Exception as e:
-        print(f"❌ Error fatal en pyrogram_app.run(): {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Error fatal en pyrogram_app.run(): {e}")
     
-    print("pyrogram_app.run() ha terminado.")
+    logger.info("pyrogram_app.run() ha terminado.")
 
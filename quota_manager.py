@@ -0,0 +1,319 @@
+# quota_manager.py (Cuota de Google Drive por cuenta, reparto de subidas y desalojo de subidas antiguas)
+"""
+Para cada cuenta del pool (google_drive.get_account_ids) mantiene en caché
+about().storageQuota (se refresca cada QUOTA_REFRESH_INTERVAL y tras cada desalojo)
+y los bytes subidos en las últimas 24 h, que cuentan contra el límite diario de
+subida de Google (DRIVE_DAILY_UPLOAD_LIMIT_GB).
+
+Cada subida nueva va a la cuenta con más presupuesto diario restante y espacio libre.
+Antes de subir se comprueba que el archivo cabe en esa cuenta:
+
+    uso + subidas en curso + tamaño <= límite * QUOTA_EVICT_THRESHOLD
+
+Si no cabe, se borran de esa cuenta las entradas más antiguas del registro (por
+upload_timestamp), opcionalmente solo las ya importadas a Hydrax
+(QUOTA_EVICT_ONLY_IMPORTED), con borrados en lote, hasta bajar a QUOTA_EVICT_TARGET.
+Nunca se desalojan archivos de trabajos activos o en la cola de reintentos. Si aun
+así no hay espacio (o ninguna cuenta tiene presupuesto diario), la subida falla antes
+de empezar con DriveQuotaExceededError y el trabajo pasa a la cola de reintentos.
+
+Como borra archivos de Drive, está desactivado salvo con QUOTA_MANAGER_ENABLED=true.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import config
+
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 24 * 3600
+
+_quotas = {}          # Última respuesta de get_storage_quota() por cuenta
+_fetched_at = {}
+_pending_bytes = {}   # Bytes de subidas en curso por cuenta (aún no reflejados en 'usage')
+_uploads = None       # {cuenta: deque[(timestamp, bytes)]} de las últimas 24 h (se siembra del registro)
+_uploads_lock = threading.Lock()  # Los deques se leen también desde /metrics (hilo de Flask)
+_evict_locks = {}
+_task = None
+_stats = {'evictions': 0, 'evicted_files': 0, 'evicted_bytes': 0, 'last_eviction_at': None, 'last_error': None}
+
+
+class DriveQuotaExceededError(RuntimeError):
+    """No hay espacio (o presupuesto diario) en Drive para la subida ni se pudo liberar desalojando."""
+
+
+def _account_ids() -> list:
+    from google_drive import get_account_ids
+    return get_account_ids()
+
+
+def _get_evict_lock(account_id: str) -> asyncio.Lock:
+    if account_id not in _evict_locks:
+        _evict_locks[account_id] = asyncio.Lock()
+    return _evict_locks[account_id]
+
+
+def _get_uploads() -> dict:
+    """
+    Historial de subidas de las últimas 24 h por cuenta, sembrado desde el registro la
+    primera vez (lee la DB: desde el loop, hacerlo antes con _load_uploads()).
+    """
+    global _uploads
+    if _uploads is None:
+        from db import get_uploaded_file_entries
+        from google_drive import account_of
+        with _uploads_lock:
+            if _uploads is None:
+                cutoff = time.time() - DAY_SECONDS
+                uploads = {}
+                entries = sorted(get_uploaded_file_entries(), key=lambda entry: entry.get('upload_timestamp') or 0)
+                for entry in entries:
+                    if (entry.get('upload_timestamp') or 0) > cutoff and entry.get('size'):
+                        uploads.setdefault(account_of(entry), deque()).append((entry['upload_timestamp'], entry['size']))
+                _uploads = uploads
+    return _uploads
+
+
+async def _load_uploads():
+    """Siembra el historial de subidas en el executor para no leer la DB en el loop."""
+    if _uploads is None:
+        await asyncio.get_running_loop().run_in_executor(None, _get_uploads)
+
+
+def _record_upload(account_id: str, nbytes: int):
+    uploads = _get_uploads()
+    with _uploads_lock:
+        uploads.setdefault(account_id, deque()).append((time.time(), nbytes))
+
+
+def uploaded_last_day(account_id: str) -> int:
+    """Bytes subidos a la cuenta en las últimas 24 h."""
+    uploads = _get_uploads()
+    cutoff = time.time() - DAY_SECONDS
+    with _uploads_lock:
+        history = uploads.setdefault(account_id, deque())
+        while history and history[0][0] <= cutoff:
+            history.popleft()
+        return sum(nbytes for _, nbytes in history)
+
+
+def daily_budget_left(account_id: str) -> float:
+    """Bytes que aún se pueden subir hoy a la cuenta (infinito si DRIVE_DAILY_UPLOAD_LIMIT_GB <= 0)."""
+    if config.DRIVE_DAILY_UPLOAD_LIMIT_GB <= 0:
+        return float('inf')
+    limit = config.DRIVE_DAILY_UPLOAD_LIMIT_GB * 1024 ** 3
+    return limit - uploaded_last_day(account_id) - _pending_bytes.get(account_id, 0)
+
+
+def free_space(account_id: str) -> float:
+    """Bytes libres en la cuenta hasta QUOTA_EVICT_THRESHOLD según la caché (infinito sin límite o sin datos)."""
+    quota = _quotas.get(account_id) or {}
+    if not quota.get('limit'):
+        return float('inf')
+    return quota['limit'] * config.QUOTA_EVICT_THRESHOLD - (quota.get('usage') or 0) - _pending_bytes.get(account_id, 0)
+
+
+def get_quota_status() -> dict:
+    """Estado de la cuota de cada cuenta en caché (para /metrics); no llama a Drive."""
+    accounts = {}
+    for account_id in _account_ids():
+        quota = _quotas.get(account_id) or {}
+        limit, usage = quota.get('limit'), quota.get('usage')
+        accounts[account_id] = {
+            'limit': limit,
+            'usage': usage,
+            'pending_bytes': _pending_bytes.get(account_id, 0),
+            'used_fraction': round(usage / limit, 4) if limit and usage is not None else None,
+            'uploaded_last_24h': uploaded_last_day(account_id) if _uploads is not None else None,
+            'age_s': round(time.time() - _fetched_at[account_id], 1) if account_id in _fetched_at else None,
+        }
+    return {'enabled': config.QUOTA_MANAGER_ENABLED, 'accounts': accounts, **_stats}
+
+
+async def refresh_quota(account_id: str = None, force: bool = False) -> dict:
+    """Devuelve la cuota en caché de la cuenta, pidiéndola a Drive si caducó (o si force=True)."""
+    from google_drive import DEFAULT_ACCOUNT, get_storage_quota
+    account_id = account_id or DEFAULT_ACCOUNT
+    if force or account_id not in _quotas or time.time() - _fetched_at.get(account_id, 0) >= config.QUOTA_REFRESH_INTERVAL:
+        _quotas[account_id] = await asyncio.get_running_loop().run_in_executor(None, get_storage_quota, account_id)
+        _fetched_at[account_id] = time.time()
+    return _quotas[account_id]
+
+
+async def choose_upload_account(size: int) -> str:
+    """
+    Elige la cuenta para una subida nueva: la que más margen tenga entre presupuesto
+    diario restante y espacio libre. Si en ninguna cabe sin desalojar, la de más
+    presupuesto diario (ensure_drive_space desalojará en ella).
+    """
+    reachable = []
+    for account_id in _account_ids():
+        try:
+            if config.QUOTA_MANAGER_ENABLED:
+                await refresh_quota(account_id)
+        except Exception as e:
+            logger.warning(f"No se pudo consultar la cuota de la cuenta '{account_id}': {e}")
+            continue
+        reachable.append(account_id)
+    await _load_uploads()
+    # Sin esperas desde aquí hasta que reserve_drive_space cuente los bytes como en curso:
+    # otra subida simultánea no puede elegir con el mismo presupuesto
+    candidates = []
+    for account_id in reachable:
+        budget = daily_budget_left(account_id)
+        if budget >= size:
+            candidates.append((min(budget, free_space(account_id)), budget, account_id))
+    if not candidates:
+        raise DriveQuotaExceededError(
+            f"Ninguna cuenta de Drive tiene presupuesto diario de subida para {size} bytes."
+        )
+    fitting = [candidate for candidate in candidates if candidate[0] >= size]
+    if fitting:
+        return max(fitting)[2]
+    return max(candidates, key=lambda candidate: candidate[1])[2]
+
+
+def _bytes_over(account_id: str, limit: int, usage: int, extra: int, fraction: float) -> int:
+    """Cuántos bytes sobran respecto a 'fraction' del límite contando 'extra' (0 si cabe)."""
+    return max(0, int(usage + _pending_bytes.get(account_id, 0) + extra - limit * fraction))
+
+
+def _eviction_candidates(account_id: str) -> list:
+    """Entradas del registro de la cuenta que se pueden desalojar, de la más antigua a la más reciente."""
+    from db import get_uploaded_file_entries
+    from google_drive import account_of
+    from job_journal import ACTIVE, RETRY_WAIT, get_jobs_by_status
+    in_use = {job.get('drive_id') for job in get_jobs_by_status(ACTIVE, RETRY_WAIT) if job.get('drive_id')}
+    entries = [
+        entry for entry in get_uploaded_file_entries()
+        if account_of(entry) == account_id and entry.get('file_id') not in in_use
+    ]
+    if config.QUOTA_EVICT_ONLY_IMPORTED:
+        entries = [entry for entry in entries if entry.get('hydrax_slug')]
+    return sorted(entries, key=lambda entry: entry.get('upload_timestamp') or 0)
+
+
+def _evict_entries(entries: list) -> tuple:
+    """Borra de Drive (en lote) y del registro las entradas dadas. Devuelve (borradas, bytes conocidos)."""
+    from google_drive import delete_uploaded_entries
+    deleted = delete_uploaded_entries(entries)
+    return len(deleted), sum(entry.get('size') or 0 for entry in entries if entry['file_id'] in deleted)
+
+
+async def evict_until(account_id: str, needed_bytes: int) -> int:
+    """
+    Desaloja los archivos más antiguos de la cuenta hasta liberar 'needed_bytes' (según
+    los tamaños guardados en el registro; las entradas sin tamaño se borran en rondas de
+    QUOTA_EVICT_BATCH y se vuelve a consultar la cuota). Devuelve los bytes liberados.
+    """
+    loop = asyncio.get_running_loop()
+    freed = 0
+    candidates = await loop.run_in_executor(None, _eviction_candidates, account_id)
+    while needed_bytes > 0 and candidates:
+        selected, known = [], 0
+        while candidates and known < needed_bytes and len(selected) < config.QUOTA_EVICT_BATCH:
+            entry = candidates.pop(0)
+            selected.append(entry)
+            known += entry.get('size') or 0
+        count, known_freed = await loop.run_in_executor(None, _evict_entries, selected)
+        if not count:
+            break
+        _stats['evictions'] += 1
+        _stats['evicted_files'] += count
+        _stats['last_eviction_at'] = time.time()
+        before = _quotas[account_id].get('usage') or 0
+        quota = await refresh_quota(account_id, force=True)
+        # Drive puede tardar en descontar lo borrado: usar lo que sabemos si es mayor
+        released = max(before - (quota.get('usage') or 0), known_freed)
+        freed += released
+        needed_bytes -= released
+        _stats['evicted_bytes'] += released
+        logger.info(f"Desalojados {count} archivos antiguos de la cuenta '{account_id}' (~{released} bytes liberados).")
+    return freed
+
+
+async def ensure_drive_space(size: int, account_id: str = None, reserved: bool = False):
+    """
+    Garantiza que una subida de 'size' bytes cabe en la cuenta, desalojando si hace falta.
+    Con reserved=True esos bytes ya están contados en _pending_bytes (reserve_drive_space).
+    """
+    if not config.QUOTA_MANAGER_ENABLED:
+        return
+    from google_drive import DEFAULT_ACCOUNT
+    account_id = account_id or DEFAULT_ACCOUNT
+    quota = await refresh_quota(account_id)
+    limit = quota.get('limit')
+    if not limit:
+        return  # Cuenta sin límite de almacenamiento
+    size = size or 0
+    extra = 0 if reserved else size
+    if not _bytes_over(account_id, limit, quota.get('usage') or 0, extra, config.QUOTA_EVICT_THRESHOLD):
+        return
+    async with _get_evict_lock(account_id):
+        # Otra subida pudo haber desalojado mientras esperábamos el lock
+        quota = await refresh_quota(account_id, force=True)
+        if not _bytes_over(account_id, limit, quota.get('usage') or 0, extra, config.QUOTA_EVICT_THRESHOLD):
+            return
+        needed = _bytes_over(account_id, limit, quota.get('usage') or 0, extra, config.QUOTA_EVICT_TARGET)
+        logger.warning(f"Drive '{account_id}' casi lleno ({quota.get('usage')}/{limit}); hay que liberar {needed} bytes.")
+        await evict_until(account_id, needed)
+        usage = _quotas[account_id].get('usage') or 0
+        if _bytes_over(account_id, limit, usage, extra, 1.0):
+            _stats['last_error'] = f"Sin espacio en '{account_id}' para {size} bytes"
+            raise DriveQuotaExceededError(
+                f"Google Drive '{account_id}' sin espacio: {usage}/{limit} bytes usados y no queda nada que desalojar."
+            )
+
+
+@asynccontextmanager
+async def reserve_drive_space(size: int, account_id: str = None):
+    """
+    Envuelve una subida: elige la cuenta (si no se indica), comprueba (y libera) espacio
+    antes y cuenta los bytes como 'en curso' mientras dura, para que subidas simultáneas
+    no se pisen el hueco ni el presupuesto diario. Devuelve la cuenta elegida.
+    """
+    size = size or 0
+    await _load_uploads()
+    if account_id is None:
+        account_id = await choose_upload_account(size)
+    # Se reservan antes de cualquier espera (y se devuelven si la comprobación falla), así
+    # una subida simultánea ya los ve como ocupados mientras esta desaloja o consulta la cuota
+    _pending_bytes[account_id] = _pending_bytes.get(account_id, 0) + size
+    try:
+        await ensure_drive_space(size, account_id, reserved=True)
+        yield account_id
+        _record_upload(account_id, size)
+        quota = _quotas.get(account_id)
+        if quota and quota.get('usage') is not None:
+            quota['usage'] += size
+    finally:
+        _pending_bytes[account_id] -= size
+
+
+async def _quota_loop():
+    while True:
+        for account_id in _account_ids():
+            try:
+                await ensure_drive_space(0, account_id)
+            except Exception as e:
+                _stats['last_error'] = str(e)
+                logger.error(f"Error al revisar la cuota de la cuenta '{account_id}': {e}")
+        await asyncio.sleep(config.QUOTA_REFRESH_INTERVAL)
+
+
+def start_quota_manager():
+    """Lanza la revisión periódica de la cuota de cada cuenta en el loop actual (idempotente)."""
+    global _task
+    if _task is None and config.QUOTA_MANAGER_ENABLED:
+        imported = " ya importadas a Hydrax" if config.QUOTA_EVICT_ONLY_IMPORTED else ""
+        logger.warning(
+            f"Gestor de cuota activo (QUOTA_MANAGER_ENABLED): al pasar del {config.QUOTA_EVICT_THRESHOLD:.0%} "
+            f"de la cuota se borrarán de Drive las subidas más antiguas{imported} hasta bajar al "
+            f"{config.QUOTA_EVICT_TARGET:.0%}."
+        )
+        _task = asyncio.get_running_loop().create_task(_quota_loop())
+    return _task
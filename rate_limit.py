@@ -0,0 +1,40 @@
+# rate_limit.py (Limitador de tasa tipo token bucket para llamadas a APIs externas)
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket: permite como máximo 'rate' operaciones por segundo, con ráfagas de
+    hasta 'burst'. Con rate <= 0 no limita. Los que esperan se atienden en orden.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    async def acquire(self):
+        """Espera hasta que haya un token disponible y lo consume."""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
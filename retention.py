@@ -0,0 +1,108 @@
+# retention.py (Borrado automático de las copias en Drive ya ingeridas por Hydrax)
+"""
+Una vez Hydrax importó un archivo, la copia de Drive solo ocupa espacio. Este proceso
+de fondo revisa el registro cada DRIVE_RETENTION_INTERVAL y borra de Drive (y del
+registro) los archivos cuya importación correcta a Hydrax fue hace más de
+DRIVE_RETENTION_HOURS. Con DRIVE_RETENTION_STATUSES se puede exigir además un
+status_video concreto de Hydrax.
+
+Los borrados van en lotes de DRIVE_RETENTION_BATCH_SIZE, como mucho
+DRIVE_RETENTION_BATCH_RATE lotes por segundo, y se pausan si el circuito de Drive está
+abierto. Nunca se tocan archivos de trabajos activos o en la cola de reintentos.
+"""
+import asyncio
+import logging
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_task = None
+_stats = {'runs': 0, 'deleted_files': 0, 'deleted_bytes': 0, 'failed_deletes': 0, 'last_run_at': None, 'last_error': None}
+
+
+def get_retention_status() -> dict:
+    """Estado del borrado automático (para /metrics)."""
+    return {'enabled': config.DRIVE_RETENTION_HOURS > 0, 'retention_hours': config.DRIVE_RETENTION_HOURS, **_stats}
+
+
+def _retention_statuses() -> set:
+    return {status.strip().lower() for status in config.DRIVE_RETENTION_STATUSES.split(",") if status.strip()}
+
+
+def select_expired_entries(now: float = None) -> list:
+    """Entradas del registro cuya retención tras la importación a Hydrax ya venció, de la más antigua a la más reciente."""
+    from db import get_uploaded_file_entries
+    from job_journal import ACTIVE, RETRY_WAIT, get_jobs_by_status
+    now = time.time() if now is None else now
+    cutoff = now - config.DRIVE_RETENTION_HOURS * 3600
+    statuses = _retention_statuses()
+    in_use = {job.get('drive_id') for job in get_jobs_by_status(ACTIVE, RETRY_WAIT) if job.get('drive_id')}
+    expired = [
+        entry for entry in get_uploaded_file_entries()
+        if entry.get('hydrax_success') and entry.get('hydrax_slug')
+        and (entry.get('hydrax_imported_at') or now) <= cutoff
+        and (not statuses or str(entry.get('hydrax_status') or '').lower() in statuses)
+        and entry['file_id'] not in in_use
+    ]
+    return sorted(expired, key=lambda entry: entry.get('hydrax_imported_at') or 0)
+
+
+def _delete_batch(entries: list) -> tuple:
+    """Borra un lote de Drive (en la cuenta de cada archivo) y del registro. Devuelve (borrados, fallidos, bytes)."""
+    from google_drive import delete_uploaded_entries
+    deleted = delete_uploaded_entries(entries)
+    freed = sum(entry.get('size') or 0 for entry in entries if entry['file_id'] in deleted)
+    return len(deleted), len(entries) - len(deleted), freed
+
+
+async def reap_expired_files() -> int:
+    """Una pasada del proceso: borra todas las copias vencidas respetando el límite de tasa. Devuelve cuántas borró."""
+    from circuit_breaker import open_breakers
+    from rate_limit import AsyncRateLimiter
+    loop = asyncio.get_running_loop()
+    expired = await loop.run_in_executor(None, select_expired_entries)
+    _stats['runs'] += 1
+    _stats['last_run_at'] = time.time()
+    if not expired:
+        return 0
+    logger.info(f"{len(expired)} copias en Drive ya ingeridas por Hydrax superan la retención; borrando.")
+    limiter = AsyncRateLimiter(config.DRIVE_RETENTION_BATCH_RATE)
+    batch_size = max(1, config.DRIVE_RETENTION_BATCH_SIZE)
+    total = 0
+    for i in range(0, len(expired), batch_size):
+        if open_breakers(('drive',)):
+            logger.info("Drive no está disponible; se deja el resto para la próxima pasada.")
+            break
+        await limiter.acquire()
+        deleted, failed, freed = await loop.run_in_executor(None, _delete_batch, expired[i:i + batch_size])
+        total += deleted
+        _stats['deleted_files'] += deleted
+        _stats['deleted_bytes'] += freed
+        _stats['failed_deletes'] += failed
+    if total and config.QUOTA_MANAGER_ENABLED:
+        from google_drive import account_of
+        from quota_manager import refresh_quota
+        for account_id in {account_of(entry) for entry in expired}:
+            await refresh_quota(account_id, force=True)
+    logger.info(f"{total}/{len(expired)} copias borradas de Drive.")
+    return total
+
+
+async def _retention_loop():
+    while True:
+        try:
+            await reap_expired_files()
+        except Exception as e:
+            _stats['last_error'] = str(e)
+            logger.error(f"Error en el borrado automático de Drive: {e}")
+        await asyncio.sleep(config.DRIVE_RETENTION_INTERVAL)
+
+
+def start_retention_reaper():
+    """Lanza el borrado periódico en el loop actual (idempotente). No hace nada con DRIVE_RETENTION_HOURS <= 0."""
+    global _task
+    if _task is None and config.DRIVE_RETENTION_HOURS > 0:
+        _task = asyncio.get_running_loop().create_task(_retention_loop())
+    return _task
@@ -0,0 +1,83 @@
+# retry_queue.py (Planificador en segundo plano de la cola persistente de reintentos)
+"""
+Los trabajos fallidos quedan en el diario (job_journal) con estado 'retry_wait' y su
+next_retry_at. Este planificador los revisa periódicamente y reintenta los vencidos,
+como máximo RETRY_CONCURRENCY a la vez, llamando a la corrutina 'resume(job)' que
+le pasa main.py (reanuda el trabajo desde su última etapa completada).
+"""
+import asyncio
+import logging
+
+import config
+from circuit_breaker import open_breakers
+from job_journal import RETRY_WAIT, DEAD, get_due_retries, get_jobs_by_status, reactivate
+
+logger = logging.getLogger(__name__)
+
+_resume = None
+_task = None
+_wakeup = None
+_running = set()  # job_ids que se están reintentando
+_counts = {'waiting': 0, 'dead': 0}
+
+
+def get_retry_status() -> dict:
+    """Estado de la cola de reintentos (para /metrics); no toca la DB."""
+    return {'running': len(_running), **_counts}
+
+
+def wake_retry_scheduler():
+    """Fuerza una revisión inmediata de la cola (p. ej. tras /retries retry)."""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def _refresh_counts():
+    _counts['waiting'] = len(get_jobs_by_status(RETRY_WAIT))
+    _counts['dead'] = len(get_jobs_by_status(DEAD))
+
+
+async def _run(job):
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, reactivate, job)
+        logger.info(f"Reintentando el trabajo {job['job_id']} (intento {job.get('attempts', 0)}, etapa '{job['stage']}').")
+        await _resume(job)
+    except Exception as e:
+        logger.error(f"Error al reintentar el trabajo {job['job_id']}: {e}")
+    finally:
+        _running.discard(job['job_id'])
+        wake_retry_scheduler()
+
+
+async def _scheduler_loop():
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            # Con una dependencia caída los reintentos fallarían al instante y gastarían intentos
+            due = [] if open_breakers() else await loop.run_in_executor(None, get_due_retries)
+            for job in due:
+                if len(_running) >= max(1, config.RETRY_CONCURRENCY):
+                    break
+                if job['job_id'] in _running:
+                    continue
+                _running.add(job['job_id'])
+                loop.create_task(_run(job))
+            await loop.run_in_executor(None, _refresh_counts)
+        except Exception as e:
+            logger.error(f"Error al revisar la cola de reintentos: {e}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=config.RETRY_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+
+def start_retry_scheduler(resume):
+    """Lanza el planificador en el loop actual (idempotente). 'resume' es una corrutina(job)."""
+    global _resume, _task, _wakeup
+    if _task is None:
+        _resume = resume
+        _wakeup = asyncio.Event()
+        _task = asyncio.get_running_loop().create_task(_scheduler_loop())
+    return _task
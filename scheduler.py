@@ -0,0 +1,207 @@
+# scheduler.py (Planificador justo de trabajos entre usuarios, con carril rápido para videos pequeños)
+"""
+Cada video (suelto o de un álbum) pide un turno antes de descargarse y lo devuelve al
+terminar. Hay SCHEDULER_CONCURRENCY turnos generales y SCHEDULER_FAST_LANE_SLOTS turnos
+extra que solo pueden usar los videos de hasta SCHEDULER_FAST_LANE_MB (carril rápido), así
+que un clip pequeño no espera detrás de archivos de 2 GB y los grandes no pierden turnos.
+Por defecto hay 4 turnos generales; con SCHEDULER_CONCURRENCY = 0 no hay límite (todo
+trabajo recibe turno al momento y no se aplica ni el orden justo ni el carril rápido).
+
+Al quedar libre un turno se elige al siguiente en espera así:
+
+1. Envejecimiento: si alguno lleva más de SCHEDULER_AGING_SECONDS esperando, el más antiguo.
+2. Si no, round-robin entre usuarios (from_user.id): le toca al usuario que hace más que
+   no recibe turno, de modo que una temporada de 40 episodios de uno no bloquea a los demás.
+3. Dentro del usuario, el video más pequeño primero (shortest job first).
+
+Con el envejecimiento, ni los videos grandes de un usuario (por SJF) ni los que esperan
+un turno general mientras el carril rápido se ocupa pueden quedarse esperando para siempre.
+"""
+import asyncio
+import inspect
+import itertools
+import logging
+import time
+from collections import deque
+
+import config
+
+logger = logging.getLogger(__name__)
+
+GENERAL = 'general'
+FAST = 'fast'
+
+
+class JobSlot:
+    """Turno concedido a un trabajo; hay que devolverlo con release() al terminar."""
+
+    def __init__(self, scheduler, job_id, user_id, size, lane: str, waited: float):
+        self.scheduler = scheduler
+        self.job_id = job_id
+        self.user_id = user_id
+        self.size = size
+        self.lane = lane
+        self.waited = waited
+        self.released = False
+
+    def release(self):
+        self.scheduler.release(self)
+
+
+class _Waiter:
+    __slots__ = ('future', 'job_id', 'user_id', 'size', 'seq', 'enqueued_at')
+
+    def __init__(self, future, job_id, user_id, size, seq):
+        self.future = future
+        self.job_id = job_id
+        self.user_id = user_id
+        self.size = size
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+
+
+class FairScheduler:
+    """Reparte los turnos de procesamiento entre usuarios (round-robin, SJF y envejecimiento)."""
+
+    def __init__(self, slots: int, fast_slots: int, fast_max_bytes: int, aging_seconds: float):
+        self.slots = max(0, slots)   # 0 = turnos generales ilimitados
+        self.fast_slots = max(0, fast_slots)
+        self.fast_max_bytes = fast_max_bytes
+        self.aging_seconds = aging_seconds
+        self._busy = {GENERAL: 0, FAST: 0}
+        self._queues = {}        # {user_id: [_Waiter]}
+        self._users = deque()    # Usuarios con trabajos en espera, el siguiente en recibir turno primero
+        self._seq = itertools.count()
+        self._stats = {'granted': 0, 'granted_fast': 0, 'granted_aged': 0, 'max_wait_s': 0.0}
+
+    def _is_small(self, size) -> bool:
+        return size is not None and size <= self.fast_max_bytes
+
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _choose(self, eligible):
+        """Elige al siguiente en espera entre los que cumplen 'eligible' (ver docstring del módulo)."""
+        now = time.monotonic()
+        aged = [
+            waiter for queue in self._queues.values() for waiter in queue
+            if eligible(waiter) and now - waiter.enqueued_at >= self.aging_seconds
+        ]
+        if aged:
+            return min(aged, key=lambda waiter: waiter.seq), True
+        for user_id in self._users:
+            candidates = [waiter for waiter in self._queues[user_id] if eligible(waiter)]
+            if candidates:
+                return min(candidates, key=lambda waiter: (waiter.size is None, waiter.size or 0, waiter.seq)), False
+        return None, False
+
+    def _remove(self, waiter):
+        queue = self._queues.get(waiter.user_id)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[waiter.user_id]
+                self._users.remove(waiter.user_id)
+
+    def _dispatch(self):
+        """Concede turnos mientras haya libres y alguien que pueda usarlos."""
+        while self._queues:
+            general_free = self.slots == 0 or self._busy[GENERAL] < self.slots
+            fast_free = self._busy[FAST] < self.fast_slots
+            if general_free:
+                waiter, aged = self._choose(lambda waiter: True)
+            elif fast_free:
+                waiter, aged = self._choose(lambda waiter: self._is_small(waiter.size))
+            else:
+                return
+            if waiter is None:
+                return
+            self._remove(waiter)
+            if waiter.future.done():
+                continue
+            # Un video pequeño usa el carril rápido si puede, para dejar libres los turnos generales
+            lane = FAST if self.slots and fast_free and self._is_small(waiter.size) else GENERAL
+            self._busy[lane] += 1
+            # El usuario atendido pasa al final de la ronda
+            if waiter.user_id in self._queues:
+                self._users.remove(waiter.user_id)
+                self._users.append(waiter.user_id)
+            waited = time.monotonic() - waiter.enqueued_at
+            self._stats['granted'] += 1
+            self._stats['granted_fast'] += lane == FAST
+            self._stats['granted_aged'] += aged
+            self._stats['max_wait_s'] = max(self._stats['max_wait_s'], round(waited, 1))
+            waiter.future.set_result(JobSlot(self, waiter.job_id, waiter.user_id, waiter.size, lane, waited))
+            if waited >= 1:
+                logger.info(f"Trabajo {waiter.job_id} del usuario {waiter.user_id} recibe turno ({lane}) tras {waited:.0f}s en cola.")
+
+    async def acquire(self, job_id, user_id, size, on_wait=None) -> JobSlot:
+        """
+        Espera un turno para el trabajo. Si no lo hay al momento, llama a on_wait(en_espera)
+        (puede ser async) con el número de trabajos en cola, incluido este.
+        """
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(future, job_id, user_id, size, next(self._seq))
+        if user_id not in self._queues:
+            self._queues[user_id] = []
+            self._users.append(user_id)
+        self._queues[user_id].append(waiter)
+        self._dispatch()
+        try:
+            # Dentro del try: si se cancela (o falla) durante on_wait, el trabajo sale de la cola
+            if not future.done():
+                logger.info(f"Trabajo {job_id} del usuario {user_id} ({size} bytes) en cola ({self.waiting()} en espera).")
+                if on_wait:
+                    result = on_wait(self.waiting())
+                    if inspect.isawaitable(result):
+                        await result
+            return await future
+        except BaseException:
+            # Si el turno se concedió antes de la cancelación (o del fallo), devolverlo
+            if future.done() and not future.cancelled():
+                future.result().release()
+            raise
+        finally:
+            self._remove(waiter)
+
+    def release(self, slot: JobSlot):
+        """Devuelve un turno y se lo da al siguiente en espera."""
+        if slot.released:
+            return
+        slot.released = True
+        self._busy[slot.lane] -= 1
+        self._dispatch()
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        oldest = min((waiter.enqueued_at for queue in self._queues.values() for waiter in queue), default=None)
+        return {
+            'slots': self.slots or None,
+            'fast_slots': self.fast_slots,
+            'running': dict(self._busy),
+            'waiting': self.waiting(),
+            'waiting_by_user': {str(user_id): len(queue) for user_id, queue in self._queues.items()},
+            'oldest_wait_s': round(now - oldest, 1) if oldest is not None else None,
+            **self._stats,
+        }
+
+
+_scheduler = None
+
+
+def get_scheduler() -> FairScheduler:
+    """Planificador global de trabajos (se crea con la configuración la primera vez)."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = FairScheduler(
+            config.SCHEDULER_CONCURRENCY,
+            config.SCHEDULER_FAST_LANE_SLOTS,
+            int(config.SCHEDULER_FAST_LANE_MB * 1024 * 1024),
+            config.SCHEDULER_AGING_SECONDS,
+        )
+    return _scheduler
+
+
+def get_scheduler_status() -> dict:
+    """Estado del planificador (para /metrics)."""
+    return get_scheduler().status()
@@ -0,0 +1,169 @@
+# search_index.py (Índices en memoria del registro de archivos subidos: búsqueda y orden)
+"""
+Índice de trigramas sobre 'original_name' para /search, insensible a mayúsculas y
+acentos ("Capítulo" encuentra "capitulo"), e índices ordenados por fecha de subida,
+nombre y tamaño para paginar /list. Se construyen desde el registro la primera vez
+que se usan y luego db.py los mantiene al día en cada alta y baja, así que ni una
+búsqueda ni una página leen la DB entera ni llaman a Drive.
+
+Cada término de la búsqueda debe aparecer en el nombre (AND). Los términos de 3 o
+más caracteres se resuelven intersecando los trigramas; los más cortos (números de
+episodio, "ep"...) se comprueban directamente sobre los candidatos o los nombres.
+"""
+import bisect
+import logging
+import threading
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_built = False
+_entries = {}    # {file_id: {'original_name', 'size', 'upload_timestamp', 'account_id', 'normalized'}}
+_trigrams = {}   # {trigrama: set(file_id)}
+
+# Criterios de orden de /list y la clave de cada entrada (con file_id para desempatar)
+SORT_KEYS = {
+    'time': lambda file_id, entry: (entry.get('upload_timestamp') or 0, file_id),
+    'name': lambda file_id, entry: (entry['normalized'], file_id),
+    'size': lambda file_id, entry: (entry.get('size') or 0, file_id),
+}
+_sorted = {sort: [] for sort in SORT_KEYS}  # {criterio: [clave ordenada ascendente]}
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sin acentos y con cualquier signo convertido en espacio."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+    return ' '.join(''.join(char if char.isalnum() else ' ' for char in stripped).split())
+
+
+def _trigrams_of(token: str) -> set:
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+def _add(entry: dict):
+    file_id = entry['file_id']
+    _remove(file_id)
+    normalized = normalize(entry.get('original_name'))
+    _entries[file_id] = {
+        'original_name': entry.get('original_name'),
+        'size': entry.get('size'),
+        'upload_timestamp': entry.get('upload_timestamp'),
+        'account_id': entry.get('account_id'),
+        'normalized': normalized,
+    }
+    for token in normalized.split():
+        for trigram in _trigrams_of(token):
+            _trigrams.setdefault(trigram, set()).add(file_id)
+    for sort, key in SORT_KEYS.items():
+        bisect.insort(_sorted[sort], key(file_id, _entries[file_id]))
+
+
+def _remove(file_id: str):
+    entry = _entries.pop(file_id, None)
+    if entry is None:
+        return
+    for sort, key in SORT_KEYS.items():
+        keys = _sorted[sort]
+        position = bisect.bisect_left(keys, key(file_id, entry))
+        if position < len(keys) and keys[position][-1] == file_id:
+            del keys[position]
+    for token in entry['normalized'].split():
+        for trigram in _trigrams_of(token):
+            postings = _trigrams.get(trigram)
+            if postings is not None:
+                postings.discard(file_id)
+                if not postings:
+                    del _trigrams[trigram]
+
+
+def _ensure_built():
+    global _built
+    if _built:
+        return
+    from db import _registry_lock, get_uploaded_file_entries
+    # Con el lock del registro tomado, ninguna alta o baja puede colarse entre la lectura
+    # y _built = True (index_file y unindex_files la ignorarían y se perdería)
+    with _registry_lock:
+        if _built:
+            return
+        entries = get_uploaded_file_entries()
+        with _lock:
+            for entry in entries:
+                _add(entry)
+            _built = True
+            logger.info(f"Índice construido con {len(_entries)} archivos.")
+
+
+def index_file(entry: dict):
+    """Añade o actualiza un archivo en el índice (si aún no se construyó, ya lo leerá del registro)."""
+    with _lock:
+        if _built:
+            _add(entry)
+
+
+def unindex_files(file_ids):
+    """Quita archivos del índice."""
+    with _lock:
+        if _built:
+            for file_id in file_ids:
+                _remove(file_id)
+
+
+def clear_index():
+    """Vacía el índice (tras borrar todo el registro)."""
+    with _lock:
+        if _built:
+            _entries.clear()
+            _trigrams.clear()
+            for keys in _sorted.values():
+                keys.clear()
+
+
+def search(query: str, limit: int = 10) -> tuple:
+    """
+    Busca archivos cuyo nombre contiene todos los términos de 'query'.
+    Devuelve (total_coincidencias, [entradas]) con las más recientes primero.
+    """
+    _ensure_built()
+    tokens = normalize(query).split()
+    if not tokens:
+        return 0, []
+    with _lock:
+        candidates = None
+        for token in sorted((token for token in tokens if len(token) >= 3), key=len, reverse=True):
+            for trigram in _trigrams_of(token):
+                postings = _trigrams.get(trigram, set())
+                candidates = set(postings) if candidates is None else candidates & postings
+                if not candidates:
+                    return 0, []
+        if candidates is None:
+            candidates = _entries.keys()
+        # Los trigramas pueden coincidir en otro orden: confirmar cada término como subcadena
+        matches = [
+            dict(_entries[file_id], file_id=file_id) for file_id in candidates
+            if all(token in _entries[file_id]['normalized'] for token in tokens)
+        ]
+    matches.sort(key=lambda entry: entry.get('upload_timestamp') or 0, reverse=True)
+    return len(matches), matches[:limit]
+
+
+def page(sort: str = 'time', descending: bool = True, page_number: int = 1, per_page: int = 10) -> tuple:
+    """
+    Devuelve (total, [entradas]) de una página del registro ordenado por 'sort'
+    ('time', 'name' o 'size'). Solo se copian las filas de la página pedida.
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Orden desconocido '{sort}'. Usa uno de: {', '.join(SORT_KEYS)}.")
+    _ensure_built()
+    with _lock:
+        keys = _sorted[sort]
+        total = len(keys)
+        start = max(0, (page_number - 1) * per_page)
+        if descending:
+            window = keys[max(0, total - start - per_page):max(0, total - start)][::-1]
+        else:
+            window = keys[start:start + per_page]
+        rows = [dict(_entries[key[-1]], file_id=key[-1]) for key in window]
+    return total, rows
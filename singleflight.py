@@ -0,0 +1,69 @@
+# singleflight.py (Coalescencia de consultas idénticas en curso y antirrebote de clics)
+"""
+single_flight(key, factory): si ya hay una ejecución en curso con la misma clave, se
+espera su resultado en lugar de lanzar otra; todos los que esperan reciben el mismo
+resultado (o la misma excepción). Útil para que varios "🔄 Refrescar" simultáneos hagan
+una sola consulta a Drive.
+
+Debouncer: descarta repeticiones de la misma clave dentro de una ventana corta
+(dobles toques sobre el mismo botón).
+"""
+import asyncio
+import time
+
+_inflight = {}  # {clave: asyncio.Task}
+_stats = {'executions': 0, 'coalesced': 0}
+
+
+def get_singleflight_status() -> dict:
+    return {'in_flight': len(_inflight), **_stats}
+
+
+async def _run(key, factory):
+    try:
+        return await factory()
+    finally:
+        if _inflight.get(key) is asyncio.current_task():
+            del _inflight[key]
+
+
+def _consume_exception(task: asyncio.Task):
+    # Evitar el aviso "exception was never retrieved" si ya nadie esperaba el resultado
+    if not task.cancelled():
+        task.exception()
+
+
+async def single_flight(key, factory):
+    """
+    Ejecuta 'factory()' (que devuelve una corrutina o un awaitable) una sola vez por clave
+    a la vez. La ejecución va en su propia tarea y todos la esperan con shield: si se
+    cancela quien la lanzó (o cualquier otro), los demás siguen recibiendo el resultado.
+    """
+    task = _inflight.get(key)
+    if task is not None:
+        _stats['coalesced'] += 1
+    else:
+        task = asyncio.get_running_loop().create_task(_run(key, factory))
+        task.add_done_callback(_consume_exception)
+        _inflight[key] = task
+        _stats['executions'] += 1
+    return await asyncio.shield(task)
+
+
+class Debouncer:
+    """Recuerda cuándo se vio cada clave y rechaza las repeticiones dentro de 'window' segundos."""
+
+    def __init__(self, window: float):
+        self.window = window
+        self._seen = {}
+
+    def should_skip(self, key) -> bool:
+        """True si 'key' ya se vio hace menos de 'window' segundos (si no, la registra)."""
+        now = time.monotonic()
+        if len(self._seen) > 1024:
+            self._seen = {k: t for k, t in self._seen.items() if now - t < self.window}
+        last = self._seen.get(key)
+        if last is not None and now - last < self.window:
+            return True
+        self._seen[key] = now
+        return False
@@ -0,0 +1,221 @@
+# temp_storage.py (Almacenamiento temporal por niveles con pre-reserva y pistas para la caché de páginas)
+import asyncio
+import inspect
+import logging
+import os
+import re
+
+import config
+from bandwidth import get_shaper
+
+logger = logging.getLogger(__name__)
+
+# Todos los archivos temporales del bot llevan este prefijo: así la limpieza de
+# arranque sabe cuáles son suyos y no toca nada más del directorio.
+TEMP_PREFIX = "abys_"
+
+
+def get_tiers() -> list:
+    """
+    Devuelve los niveles configurados en TEMP_STORAGE_TIERS como
+    [(tamaño_max_bytes o None, directorio), ...] ordenados de menor a mayor.
+    """
+    tiers = []
+    default_dir = None
+    for part in config.TEMP_STORAGE_TIERS.split(','):
+        part = part.strip()
+        if not part or ':' not in part:
+            continue
+        limit, directory = part.split(':', 1)
+        limit, directory = limit.strip(), directory.strip()
+        if limit == '*':
+            default_dir = directory
+            continue
+        try:
+            tiers.append((int(limit), directory))
+        except ValueError:
+            logger.warning(f"Nivel inválido en TEMP_STORAGE_TIERS ignorado: '{part}'")
+    tiers.sort(key=lambda tier: tier[0])
+    tiers.append((None, default_dir or config.DOWNLOAD_DIR))
+    return tiers
+
+
+def choose_directory(size: int) -> str:
+    """Elige el directorio del nivel más pequeño en el que cabe un archivo de 'size' bytes."""
+    for limit, directory in get_tiers():
+        if limit is None or (size or 0) <= limit:
+            return directory
+    return config.DOWNLOAD_DIR
+
+
+def _safe_name(file_name: str) -> str:
+    name = re.sub(r'[^\w.\- ]+', '_', os.path.basename(file_name or "video.mp4")).strip() or "video.mp4"
+    return name[:120]
+
+
+def allocate_temp_file(job_id, file_name: str, size: int, reservation=None) -> str:
+    """
+    Crea el archivo temporal del trabajo en el nivel adecuado y, si está activado,
+    le reserva 'size' bytes con posix_fallocate (bloques contiguos, sin ENOSPC a mitad).
+    Si la pre-reserva funciona y se pasa 'reservation' (admission.DiskReservation), la
+    marca como escrita: esos bytes ya no están libres en disco y no hay que descontarlos dos veces.
+    Devuelve la ruta absoluta.
+    """
+    directory = choose_directory(size)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.abspath(os.path.join(directory, f"{TEMP_PREFIX}{job_id}_{_safe_name(file_name)}"))
+    fd = os.open(path, os.O_CREAT | os.O_WRONLY | os.O_TRUNC, 0o644)
+    try:
+        if config.TEMP_PREALLOCATE and size and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fd, 0, size)
+                if reservation is not None:
+                    reservation.update(size)
+            except OSError as e:
+                # Sistemas de archivos sin soporte: se continúa sin pre-reserva
+                logger.info(f"posix_fallocate no disponible en {directory}: {e}")
+    finally:
+        os.close(fd)
+    return path
+
+
+
+async def allocate_temp_file_async(job_id, file_name: str, size: int, reservation=None) -> str:
+    """
+    Como allocate_temp_file() pero en el executor: posix_fallocate de varios GB puede
+    tardar (sin soporte nativo, glibc lo emula escribiendo ceros) y no debe parar el loop.
+    Si se cancela mientras tanto, el archivo se borra en cuanto termina de crearse.
+    """
+    future = asyncio.get_running_loop().run_in_executor(None, allocate_temp_file, job_id, file_name, size, reservation)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        future.add_done_callback(_remove_abandoned)
+        raise
+
+
+def _remove_abandoned(future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    try:
+        os.remove(future.result())
+    except OSError as e:
+        logger.warning(f"No se pudo eliminar el temporal abandonado {future.result()}: {e}")
+
+def _advise(fd: int, advice_name: str, offset: int = 0, length: int = 0):
+    if not config.TEMP_FADVISE or not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, getattr(os, advice_name))
+    except (OSError, AttributeError) as e:
+        logger.warning(f"posix_fadvise({advice_name}) falló: {e}")
+
+
+async def stream_media_to_file(client, message, path: str, total: int, progress=None, hasher=None) -> int:
+    """
+    Descarga el media del mensaje con client.stream_media() escribiendo sobre el archivo
+    pre-reservado en 'path'. Llama a progress(actual, total) tras cada chunk (puede ser
+    async y lanzar CancelledError para cancelar). Si se pasa 'hasher' (p. ej. hashlib.md5())
+    se actualiza con cada chunk, sin releer el archivo. Devuelve los bytes escritos.
+    """
+    shaper = get_shaper('download')
+    written = 0
+    try:
+        with open(path, 'r+b') as f:
+            async for chunk in client.stream_media(message):
+                # Reparto justo del ancho de banda de descarga: no se pide el siguiente chunk hasta tener turno
+                await shaper.acquire_async(path, len(chunk))
+                f.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+                written += len(chunk)
+                if progress:
+                    result = progress(written, total or written)
+                    if inspect.isawaitable(result):
+                        await result
+            # Si la pre-reserva fue mayor que lo recibido, recortar el sobrante
+            f.truncate(written)
+    finally:
+        # También si se cancela o falla: el flujo no debe quedar contado como activo
+        shaper.finish_flow(path)
+    return written
+
+
+class HashingReader:
+    """
+    Envoltorio de un archivo que calcula un hash de los bytes según se leen para subirlos.
+    Las relecturas (la subida reanudable vuelve atrás tras un chunk fallido) no se cuentan
+    dos veces; si se salta una parte sin leerla, el hash queda inválido (hexdigest() = None).
+    """
+
+    def __init__(self, f, hasher):
+        self._f = f
+        self._hasher = hasher
+        self._hashed = 0
+        self._valid = True
+
+    def read(self, size=-1):
+        position = self._f.tell()
+        data = self._f.read(size)
+        if position > self._hashed:
+            self._valid = False
+        elif position + len(data) > self._hashed:
+            self._hasher.update(data[self._hashed - position:])
+            self._hashed = position + len(data)
+        return data
+
+    def hexdigest(self):
+        """Hash de todo lo leído (None si hubo huecos o el archivo no se leyó entero)."""
+        if not self._valid or self._hashed != os.fstat(self._f.fileno()).st_size:
+            return None
+        return self._hasher.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._f.close()
+        return False
+
+
+def open_for_upload(path: str, hasher=None):
+    """
+    Abre el archivo para subirlo, indicando al kernel que se leerá de forma secuencial.
+    Con 'hasher' devuelve un HashingReader que calcula el hash durante la propia subida.
+    """
+    f = open(path, 'rb')
+    _advise(f.fileno(), 'POSIX_FADV_SEQUENTIAL')
+    return HashingReader(f, hasher) if hasher is not None else f
+
+
+def drop_page_cache(f):
+    """Indica al kernel que las páginas del archivo ya no se necesitan (después de subirlo)."""
+    _advise(f.fileno(), 'POSIX_FADV_DONTNEED')
+
+
+def cleanup_orphans(keep=()) -> int:
+    """
+    Borra los temporales huérfanos de ejecuciones anteriores (p. ej. tras un crash) en
+    todos los niveles: archivos con TEMP_PREFIX y restos '.temp' de Pyrogram.
+    Debe ejecutarse antes de empezar a procesar updates. 'keep' son rutas a conservar.
+    """
+    keep = {os.path.abspath(path) for path in keep if path}
+    removed = 0
+    for _, directory in get_tiers():
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            path = os.path.abspath(os.path.join(directory, name))
+            if path in keep or not os.path.isfile(path):
+                continue
+            if name.startswith(TEMP_PREFIX) or name.endswith(".temp"):
+                try:
+                    os.remove(path)
+                    removed += 1
+                    logger.info(f"Temporal huérfano eliminado: {path}")
+                except OSError as e:
+                    logger.warning(f"No se pudo eliminar {path}: {e}")
+    return removed
@@ -0,0 +1,12 @@
+# conftest.py (Configuración común de las pruebas)
+"""
+config.py exige las variables esenciales al importarse: se rellenan con valores de
+prueba antes de importar cualquier módulo del bot.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for _name, _value in (('API_ID', '1'), ('API_HASH', 'test'), ('BOT_TOKEN', '1:test'), ('HYDRAX_API_KEY', 'test')):
+    os.environ.setdefault(_name, _value)
@@ -0,0 +1,103 @@
+# test_admission.py (Contabilidad de DiskReservation y cola FIFO del control de admisión)
+import asyncio
+import os
+from collections import namedtuple
+
+import pytest
+
+import temp_storage
+from admission import DiskAdmissionController, InsufficientDiskSpaceError
+
+DiskUsage = namedtuple("DiskUsage", "total used free")
+MB = 1024 * 1024
+
+
+def make_controller(tmp_path, free: int, total: int = 1000 * MB, margin: int = 10 * MB):
+    controller = DiskAdmissionController(str(tmp_path), margin)
+    controller._disk_usage = lambda: DiskUsage(total, total - free, free)
+    return controller
+
+
+def test_reservation_counts_only_unwritten_bytes(tmp_path):
+    controller = make_controller(tmp_path, free=500 * MB)
+
+    async def scenario():
+        return await controller.acquire("a", 200 * MB)
+
+    reservation = asyncio.run(scenario())
+    assert controller.reserved_bytes() == 200 * MB
+    assert controller.available_bytes() == 500 * MB - 200 * MB - 10 * MB
+    reservation.update(50 * MB)
+    assert reservation.remaining == 150 * MB
+    reservation.update(20 * MB)  # El progreso nunca retrocede
+    assert reservation.remaining == 150 * MB
+    reservation.update(300 * MB)  # Ni se descuenta más de lo reservado
+    assert reservation.remaining == 0
+    reservation.release()
+    reservation.release()
+    assert controller.reserved_bytes() == 0
+    assert controller.status()['in_flight'] == 0
+
+
+def test_rejects_video_larger_than_disk(tmp_path):
+    controller = make_controller(tmp_path, free=900 * MB, total=1000 * MB)
+    with pytest.raises(InsufficientDiskSpaceError):
+        asyncio.run(controller.acquire("a", 995 * MB))
+
+
+def test_waiters_are_admitted_in_fifo_order_on_release(tmp_path):
+    controller = make_controller(tmp_path, free=400 * MB)
+    positions = []
+
+    async def scenario():
+        first = await controller.acquire("a", 300 * MB)
+        big = asyncio.create_task(controller.acquire("b", 250 * MB, on_wait=positions.append))
+        small = asyncio.create_task(controller.acquire("c", 50 * MB, on_wait=positions.append))
+        await asyncio.sleep(0)
+        # 'c' cabría, pero espera detrás de 'b' (FIFO)
+        assert not big.done() and not small.done()
+        assert controller.status()['queued'] == 2
+        first.release()
+        return await big, await small
+
+    big, small = asyncio.run(scenario())
+    assert positions == [1, 2]
+    assert (big.job_id, small.job_id) == ("b", "c")
+    assert controller.reserved_bytes() == 300 * MB
+
+
+def test_cancel_during_on_wait_leaves_no_reservation(tmp_path):
+    controller = make_controller(tmp_path, free=400 * MB)
+
+    async def scenario():
+        first = await controller.acquire("a", 300 * MB)
+        notifying = asyncio.Event()
+
+        async def slow_notice(position):
+            notifying.set()
+            await asyncio.Event().wait()  # Edición de Telegram que no termina
+
+        waiting = asyncio.create_task(controller.acquire("b", 200 * MB, on_wait=slow_notice))
+        await notifying.wait()
+        waiting.cancel()
+        # La cancelación llega con la reserva recién concedida: hay que devolverla
+        first.release()
+        await asyncio.gather(waiting, return_exceptions=True)
+        return waiting
+
+    waiting = asyncio.run(scenario())
+    assert waiting.cancelled()
+    assert controller.reserved_bytes() == 0
+    assert controller.status()['queued'] == 0 and controller.status()['in_flight'] == 0
+
+
+@pytest.mark.skipif(not hasattr(os, "posix_fallocate"), reason="posix_fallocate no disponible")
+def test_preallocated_file_is_not_counted_as_pending(tmp_path, monkeypatch):
+    monkeypatch.setattr(temp_storage, "choose_directory", lambda size: str(tmp_path))
+    monkeypatch.setattr(temp_storage.config, "TEMP_PREALLOCATE", True)
+    controller = make_controller(tmp_path, free=500 * MB)
+    reservation = asyncio.run(controller.acquire("a", 4 * MB))
+    path = temp_storage.allocate_temp_file("a", "video.mp4", 4 * MB, reservation=reservation)
+    assert os.path.getsize(path) == 4 * MB
+    assert reservation.remaining == 0
+    assert controller.reserved_bytes() == 0
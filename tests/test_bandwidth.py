@@ -0,0 +1,115 @@
+# test_bandwidth.py (Reparto WFQ del BandwidthShaper entre flujos)
+import asyncio
+import threading
+import time
+
+import pytest
+
+from bandwidth import MB, BandwidthShaper, get_shaper, set_limit_mb
+
+
+def grant_order(shaper: BandwidthShaper, requests) -> list:
+    """
+    Encola las peticiones [(flujo, bytes, peso)] con el enlace ocupado y devuelve el orden
+    en que se conceden (set_limit(0) las concede todas según su etiqueta de fin).
+    """
+    order = []
+    with shaper._cond:
+        shaper._next_free = time.monotonic() + 3600
+        for flow, nbytes, weight in requests:
+            shaper._enqueue(flow, nbytes, weight, lambda flow=flow: order.append(flow))
+    shaper.set_limit(0)
+    return order
+
+
+def test_backlogged_flow_does_not_starve_newcomer():
+    shaper = BandwidthShaper("test", rate=1 * MB)
+    order = grant_order(shaper, [("a", 1000, 1.0)] * 4 + [("b", 1000, 1.0)] * 2)
+    assert order == ["a", "b", "a", "b", "a", "a"]
+
+
+def test_weights_set_the_share():
+    shaper = BandwidthShaper("test", rate=1 * MB)
+    order = grant_order(shaper, [("heavy", 1000, 2.0)] * 6 + [("light", 1000, 1.0)] * 3)
+    # Por cada chunk de 'light' se conceden dos de 'heavy'
+    assert order[:6].count("heavy") == 4
+    assert order[:6].count("light") == 2
+
+
+def test_small_chunks_interleave_by_bytes():
+    shaper = BandwidthShaper("test", rate=1 * MB)
+    order = grant_order(shaper, [("big", 4000, 1.0)] * 2 + [("small", 1000, 1.0)] * 4)
+    # Con el mismo peso, 4 chunks de 1000 bytes equivalen a uno de 4000
+    assert order == ["small", "small", "small", "big", "small", "big"]
+
+
+def test_cancelled_waiters_are_skipped():
+    shaper = BandwidthShaper("test", rate=1 * MB)
+    order = []
+    with shaper._cond:
+        shaper._next_free = time.monotonic() + 3600
+        gone = shaper._enqueue("a", 1000, 1.0, lambda: order.append("a"))
+        shaper._enqueue("b", 1000, 1.0, lambda: order.append("b"))
+        gone.cancelled = True
+    shaper.set_limit(0)
+    assert order == ["b"]
+    assert shaper.status()['waiting_chunks'] == 0
+
+
+def test_unlimited_grants_immediately_and_counts_flows():
+    shaper = BandwidthShaper("test", rate=0)
+    shaper.acquire("a", 10 * MB)
+    assert shaper.status()['limit_bytes_per_s'] is None
+    shaper.set_limit(100 * MB)
+    shaper.acquire("a", 1000)
+    shaper.acquire("b", 1000)
+    assert shaper.status()['active_flows'] == 2
+    shaper.finish_flow("a")
+    assert shaper.status()['active_flows'] == 1
+
+
+def test_rate_limit_paces_concurrent_flows():
+    rate = 2 * MB
+    shaper = BandwidthShaper("test", rate=rate)
+    chunk = 100 * 1024
+    granted = {"a": 0, "b": 0}
+
+    def worker(flow):
+        for _ in range(5):
+            shaper.acquire(flow, chunk)
+            granted[flow] += chunk
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(flow,)) for flow in granted]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    elapsed = time.monotonic() - started
+    # El primer chunk sale al momento; los otros 9 esperan su turno en el enlace
+    assert elapsed >= 9 * chunk / rate * 0.9
+    assert granted == {"a": 5 * chunk, "b": 5 * chunk}
+
+
+def test_acquire_async_waits_for_its_turn():
+    shaper = BandwidthShaper("test", rate=1 * MB)
+
+    async def scenario():
+        started = time.monotonic()
+        for _ in range(3):
+            await shaper.acquire_async("a", 100 * 1024)
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 2 * 100 * 1024 / MB * 0.9
+
+
+def test_set_limit_mb_rejects_invalid_limits():
+    with pytest.raises(ValueError):
+        set_limit_mb("upload", float("inf"))
+    # Un negativo no se toma como "sin límite" ni cambia el límite actual
+    limit = get_shaper("upload").status()['limit_bytes_per_s']
+    with pytest.raises(ValueError):
+        set_limit_mb("upload", -5)
+    assert get_shaper("upload").status()['limit_bytes_per_s'] == limit
+    with pytest.raises(ValueError):
+        set_limit_mb("sideways", 1)
@@ -0,0 +1,66 @@
+# test_bulk_import.py (Importación masiva a Hydrax y escritura de resultados en el registro)
+import asyncio
+
+import pytest
+
+import bulk_import
+import db
+import hydrax_api
+import search_index
+
+
+@pytest.fixture(autouse=True)
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "UPLOADED_FILES_DB_PATH", str(tmp_path / "uploaded_files_db.json"))
+    monkeypatch.setattr(db, "_uploaded_files_db", None)
+    monkeypatch.setattr(search_index, "_built", True)
+    monkeypatch.setattr(search_index, "_entries", {})
+    monkeypatch.setattr(search_index, "_trigrams", {})
+    monkeypatch.setattr(search_index, "_sorted", {sort: [] for sort in search_index.SORT_KEYS})
+
+
+def test_results_are_recorded_in_serialized_batches(monkeypatch):
+    drive_ids = [f"file{number}" for number in range(30)]
+    for drive_id in drive_ids:
+        db.record_uploaded_file(drive_id, f"{drive_id}.mp4", 100)
+
+    async def fake_import(drive_id):
+        await asyncio.sleep(0.001)
+        if drive_id.endswith("7"):
+            return {'success': False, 'error': "rechazado"}
+        return {'success': True, 'slug': f"slug-{drive_id}"}
+
+    writes = []
+    writing = []
+    real_set_results = db.set_hydrax_results
+
+    def tracking_set_results(results):
+        # Nunca dos escrituras del registro a la vez
+        assert not writing
+        writing.append(True)
+        try:
+            writes.append(len(results))
+            return real_set_results(results)
+        finally:
+            writing.pop()
+
+    monkeypatch.setattr(hydrax_api, "import_to_hydrax_async", fake_import)
+    monkeypatch.setattr(db, "set_hydrax_results", tracking_set_results)
+
+    progress = asyncio.run(bulk_import.bulk_import_to_hydrax(drive_ids, concurrency=8, rate=0))
+
+    assert (progress.ok, progress.failed) == (27, 3)
+    assert sum(writes) == 30
+    entries = {entry['file_id']: entry for entry in db.get_uploaded_file_entries()}
+    for drive_id in drive_ids:
+        if drive_id.endswith("7"):
+            assert entries[drive_id]['hydrax_error'] == "rechazado"
+        else:
+            assert entries[drive_id]['hydrax_slug'] == f"slug-{drive_id}"
+
+
+def test_set_hydrax_results_counts_registered_files():
+    db.record_uploaded_file("a", "a.mp4", 1)
+    assert db.set_hydrax_results({"a": {'success': True, 'slug': "s"}, "missing": {'success': True}}) == 1
+    assert db.get_uploaded_file_entry("a")['hydrax_slug'] == "s"
+    assert db.set_hydrax_results({}) == 0
@@ -0,0 +1,116 @@
+# test_circuit_breaker.py (Transiciones closed -> open -> half_open del circuit breaker)
+import asyncio
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    """Sustituye al módulo time dentro de circuit_breaker para avanzar el reloj a mano."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker, "time", fake)
+    return fake
+
+
+def make_breaker(**overrides):
+    options = dict(failure_rate=0.5, min_calls=4, window_seconds=60, open_seconds=30, half_open_probes=1)
+    options.update(overrides)
+    return CircuitBreaker("test", **options)
+
+
+def test_stays_closed_below_min_calls(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_opens_when_failure_rate_reached(clock):
+    breaker = make_breaker()
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()  # 2 de 4 = 50%
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.check()
+    assert excinfo.value.retry_after == pytest.approx(30)
+
+
+def test_old_outcomes_leave_the_window(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 61
+    breaker.record_failure()
+    assert breaker.status()['recent_calls'] == 1
+    assert breaker.state == CLOSED
+
+
+def test_half_open_after_open_seconds_limits_probes(clock):
+    breaker = make_breaker(half_open_probes=2)
+    for _ in range(4):
+        breaker.record_failure()
+    clock.now += 29
+    assert breaker.state == OPEN
+    assert breaker.retry_after() == pytest.approx(1)
+    clock.now += 1
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_probe_success_closes_and_forgets_failures(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.status()['recent_calls'] == 0
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_probe_failure_reopens(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.status()['times_opened'] == 2
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+
+
+def test_wait_for_dependencies_fail_policy(clock, monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(circuit_breaker.config, "CIRCUIT_OPEN_POLICY", "fail")
+    breaker = circuit_breaker.get_breaker("hydrax")
+    for _ in range(max(1, breaker.min_calls)):
+        breaker.record_failure()
+    assert circuit_breaker.open_breakers() == ["hydrax"]
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(circuit_breaker.wait_for_dependencies())
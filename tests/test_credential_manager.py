@@ -0,0 +1,109 @@
+# test_credential_manager.py (Refresco anticipado y persistencia de los tokens OAuth de Drive)
+import asyncio
+import datetime
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import credential_manager
+from credential_manager import DEFAULT_ACCOUNT
+
+
+class FakeCredentials:
+    """Credenciales falsas: refresh() emite un token nuevo válido durante 'lifetime' segundos."""
+
+    def __init__(self, expires_in: float, refresh_token="refresh-1", lifetime=3600, fail=False):
+        self.token = "token-0"
+        self.refresh_token = refresh_token
+        self.expiry = credential_manager._utcnow() + datetime.timedelta(seconds=expires_in)
+        self.lifetime = lifetime
+        self.fail = fail
+        self.refreshes = 0
+
+    @property
+    def valid(self):
+        return bool(self.token) and self.expiry > credential_manager._utcnow()
+
+    def refresh(self, request):
+        time.sleep(0.05)
+        if self.fail:
+            raise RuntimeError("invalid_grant")
+        self.refreshes += 1
+        self.token = f"token-{self.refreshes}"
+        self.expiry = credential_manager._utcnow() + datetime.timedelta(seconds=self.lifetime)
+
+    def to_json(self):
+        return json.dumps({'token': self.token, 'refresh_token': self.refresh_token,
+                           'client_id': "id", 'client_secret': "secret"})
+
+
+@pytest.fixture(autouse=True)
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(credential_manager, "_credentials", {})
+    monkeypatch.setattr(credential_manager, "_locks", {})
+    monkeypatch.setattr(credential_manager, "_stats", {})
+    monkeypatch.setattr(credential_manager.config, "TOKEN_JSON_DATA", None)
+    monkeypatch.setattr(credential_manager.config, "TOKEN_JSON_PATH", str(tmp_path / "token.json"))
+    monkeypatch.setattr(credential_manager.config, "TOKEN_REFRESHED_PATH", str(tmp_path / "token_refreshed.json"))
+    monkeypatch.setattr(credential_manager.config, "DRIVE_ACCOUNT_TOKENS", {'extra': str(tmp_path / "extra.json")})
+    monkeypatch.setattr(credential_manager.config, "CREDENTIAL_REFRESH_MARGIN", 300)
+    return tmp_path
+
+
+def test_refresh_margin():
+    needs = credential_manager._needs_refresh
+    assert needs(FakeCredentials(expires_in=200), margin=300)
+    assert not needs(FakeCredentials(expires_in=400), margin=300)
+    assert needs(FakeCredentials(expires_in=-1), margin=0)
+    assert not needs(FakeCredentials(expires_in=-1, refresh_token=None), margin=0)
+
+
+def test_concurrent_callers_refresh_once_and_persist(manager):
+    creds = credential_manager._credentials[DEFAULT_ACCOUNT] = FakeCredentials(expires_in=-1)
+    threads = [threading.Thread(target=credential_manager.get_credentials) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert creds.refreshes == 1
+    token_path = manager / "token.json"
+    assert json.loads(token_path.read_text())['token'] == "token-1"
+    assert os.stat(token_path).st_mode & 0o777 == 0o600
+    assert not os.path.exists(f"{token_path}.tmp")
+    status = credential_manager.get_credential_status()['accounts'][DEFAULT_ACCOUNT]
+    assert status['refreshes'] == 1 and status['persisted_to'] == str(token_path)
+
+
+def test_background_pass_refreshes_only_due_accounts(manager, monkeypatch):
+    monkeypatch.setattr(credential_manager.config, "CREDENTIAL_CHECK_INTERVAL", 3600)
+    due = credential_manager._credentials[DEFAULT_ACCOUNT] = FakeCredentials(expires_in=100)
+    fresh = credential_manager._credentials['extra'] = FakeCredentials(expires_in=3000)
+    assert asyncio.run(credential_manager.refresh_due_credentials()) == ([DEFAULT_ACCOUNT], [])
+    assert due.refreshes == 1 and fresh.refreshes == 0
+    assert not (manager / "extra.json").exists()
+    # La próxima revisión es cuando la cuenta 'extra' entre en el margen
+    assert 2600 < credential_manager._next_check_in() <= 2700
+
+
+def test_failed_refresh_is_reported(manager):
+    credential_manager._credentials['extra'] = FakeCredentials(expires_in=100, fail=True)
+    assert asyncio.run(credential_manager.refresh_due_credentials()) == ([], ['extra'])
+    stats = credential_manager.get_credential_status()['accounts']['extra']
+    assert stats['failures'] == 1 and stats['last_error'] == "invalid_grant"
+    assert not (manager / "extra.json").exists()
+
+
+def test_env_token_uses_refreshed_copy_of_same_refresh_token(manager, monkeypatch):
+    token_data = {'token': "env", 'refresh_token': "refresh-1", 'client_id': "id", 'client_secret': "secret"}
+    monkeypatch.setattr(credential_manager.config, "TOKEN_JSON_DATA", json.dumps(token_data))
+    refreshed_path = manager / "token_refreshed.json"
+    # El token de la variable no se puede reescribir: el refrescado va a TOKEN_REFRESHED_PATH
+    assert credential_manager._token_path(DEFAULT_ACCOUNT) == str(refreshed_path)
+    refreshed_path.write_text(json.dumps(dict(token_data, token="saved")))
+    assert credential_manager._parse(DEFAULT_ACCOUNT).token == "saved"
+    # Con otro refresh_token en la variable, el guardado ya no vale
+    refreshed_path.write_text(json.dumps(dict(token_data, token="saved", refresh_token="old")))
+    assert credential_manager._parse(DEFAULT_ACCOUNT).token == "env"
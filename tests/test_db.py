@@ -0,0 +1,47 @@
+# test_db.py (Registro de archivos subidos con escrituras concurrentes desde el executor)
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import db
+import search_index
+
+
+@pytest.fixture(autouse=True)
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "UPLOADED_FILES_DB_PATH", str(tmp_path / "uploaded_files_db.json"))
+    monkeypatch.setattr(db, "_uploaded_files_db", None)
+    monkeypatch.setattr(search_index, "_built", True)
+    monkeypatch.setattr(search_index, "_entries", {})
+    monkeypatch.setattr(search_index, "_trigrams", {})
+    monkeypatch.setattr(search_index, "_sorted", {sort: [] for sort in search_index.SORT_KEYS})
+
+
+def reopen():
+    db.get_uploaded_files_db().close()
+    db._uploaded_files_db = None
+
+
+def test_concurrent_registry_writes_are_not_lost():
+    for number in range(40):
+        db.record_uploaded_file(f"old{number}", f"Viejo {number}.mp4", 100)
+
+    def import_result(number):
+        return db.set_hydrax_result(f"old{number}", {'success': True, 'slug': f"slug{number}"})
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        # Importaciones a Hydrax, altas nuevas y un borrado por lotes a la vez
+        imports = executor.map(import_result, range(40))
+        recorded = [executor.submit(db.record_uploaded_file, f"new{number}", f"Nuevo {number}.mp4", 200) for number in range(20)]
+        removed = executor.submit(db.remove_uploaded_file_records, [f"new{number}" for number in range(0, 20, 2)])
+        assert all(imports)
+        for future in recorded:
+            future.result()
+    removed.result()
+    reopen()
+
+    entries = {entry['file_id']: entry for entry in db.get_uploaded_file_entries()}
+    assert all(entries[f"old{number}"]['hydrax_slug'] == f"slug{number}" for number in range(40))
+    assert {file_id for file_id in entries if file_id.startswith("new")} >= {f"new{number}" for number in range(1, 20, 2)}
+    # El índice de /search sigue al registro, sea cual sea el orden de altas y bajas
+    assert set(search_index._entries) == set(entries)
@@ -0,0 +1,295 @@
+# test_google_drive.py (Verificación MD5 de las subidas, compartición con la carpeta pública y reparto entre cuentas)
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+import google_drive
+from google_drive import UploadChecksumError, pop_verified_checksum, upload_to_drive_async_with_progress
+
+
+class FakeUpload:
+    """Subida reanudable falsa: lee el media por chunks y reenvía el primero, como tras un error."""
+
+    def __init__(self, drive, media):
+        self.drive = drive
+        self.media = media
+        self.resumable_progress = 0
+        self.received = b""
+        self.resent = False
+
+    def next_chunk(self):
+        chunk = self.media.getbytes(self.resumable_progress, self.media.chunksize())
+        if not self.resent:
+            self.resent = True
+            chunk = self.media.getbytes(self.resumable_progress, self.media.chunksize())
+        self.received += chunk
+        self.resumable_progress += len(chunk)
+        if self.resumable_progress < self.media.size():
+            return None, None
+        return None, self.drive.finish(self.received)
+
+
+class FakeRequest:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class FakeDrive:
+    """Servicio de Drive falso. 'corrupt' es cuántas subidas seguidas devuelven un md5Checksum erróneo."""
+
+    def __init__(self, corrupt=0):
+        self.corrupt = corrupt
+        self.uploaded = []
+        self.deleted = []
+
+    def files(self):
+        return self
+
+    def create(self, body, media_body, fields=None):
+        return FakeUpload(self, media_body)
+
+    def finish(self, data):
+        file_id = f"file{len(self.uploaded) + 1}"
+        self.uploaded.append(file_id)
+        checksum = hashlib.md5(data).hexdigest()
+        if self.corrupt:
+            self.corrupt -= 1
+            checksum = hashlib.md5(data + b"!").hexdigest()
+        return {'id': file_id, 'size': str(len(data)), 'md5Checksum': checksum}
+
+    def delete(self, fileId):
+        self.deleted.append(fileId)
+        return FakeRequest(None)
+
+
+@pytest.fixture
+def video(tmp_path):
+    data = os.urandom(2 * 1024 * 1024 + 12345)
+    path = tmp_path / "video.mp4"
+    path.write_bytes(data)
+    return str(path), hashlib.md5(data).hexdigest()
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    def install(service):
+        monkeypatch.setattr(google_drive, "get_drive_service", lambda account_id=None: service)
+        monkeypatch.setattr(google_drive, "get_upload_folder_id", lambda service=None, account_id=None: None)
+        return service
+
+    monkeypatch.setattr(google_drive.config, "UPLOAD_VERIFY_CHECKSUM", True)
+    monkeypatch.setattr(google_drive.config, "UPLOAD_VERIFY_MAX_ATTEMPTS", 3)
+    return install
+
+
+def upload(path, md5=None):
+    return asyncio.run(upload_to_drive_async_with_progress(path, "video.mp4", share=False, md5=md5))
+
+
+def test_download_md5_verified_against_drive(video, drive):
+    path, md5 = video
+    service = drive(FakeDrive())
+    assert upload(path, md5=md5) == "file1"
+    assert pop_verified_checksum("file1") == md5
+    assert pop_verified_checksum("file1") is None
+    assert service.deleted == []
+
+
+def test_md5_computed_during_upload_when_download_had_none(video, drive):
+    path, md5 = video
+    drive(FakeDrive())
+    assert upload(path) == "file1"
+    # El chunk reenviado no se cuenta dos veces en el hash
+    assert pop_verified_checksum("file1") == md5
+
+
+def test_corrupt_copy_is_deleted_and_uploaded_again(video, drive):
+    path, md5 = video
+    service = drive(FakeDrive(corrupt=1))
+    assert upload(path, md5=md5) == "file2"
+    assert service.deleted == ["file1"]
+    assert pop_verified_checksum("file2") == md5
+
+
+def test_gives_up_after_max_attempts(video, drive):
+    path, md5 = video
+    service = drive(FakeDrive(corrupt=5))
+    with pytest.raises(UploadChecksumError):
+        upload(path, md5=md5)
+    assert service.uploaded == ["file1", "file2", "file3"]
+    assert service.deleted == service.uploaded
+
+
+def test_verification_disabled_uploads_once(video, drive, monkeypatch):
+    path, md5 = video
+    monkeypatch.setattr(google_drive.config, "UPLOAD_VERIFY_CHECKSUM", False)
+    service = drive(FakeDrive(corrupt=1))
+    assert upload(path, md5=md5) == "file1"
+    assert service.deleted == [] and pop_verified_checksum("file1") is None
+
+
+class FakeBatch:
+    def __init__(self, callback):
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        for request_id, request in self.requests:
+            self.callback(request_id, request.execute(), None)
+
+
+class FakeSharingDrive:
+    """Servicio de Drive falso con carpetas: archivos {id: [padres]} y permisos creados."""
+
+    def __init__(self, parents):
+        self.parents = parents
+        self.permissions_created = []
+        self.folders = {}
+
+    def files(self):
+        return self
+
+    def permissions(self):
+        return self
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(callback)
+
+    def get(self, fileId, fields=None):
+        return FakeRequest({'id': fileId, 'parents': self.parents[fileId]})
+
+    def list(self, q, pageSize=None, fields=None):
+        return FakeRequest({'files': []})
+
+    def create(self, fileId=None, body=None, fields=None, **kwargs):
+        if fileId is not None:
+            self.permissions_created.append(fileId)
+            return FakeRequest({'id': "anyoneWithLink"})
+        folder_id = f"folder-{body['name']}"
+        self.folders[folder_id] = body['parents'][0]
+        return FakeRequest({'id': folder_id})
+
+
+@pytest.fixture
+def sharing(monkeypatch):
+    monkeypatch.setattr(google_drive, "_public_root_ids", {})
+    monkeypatch.setattr(google_drive, "_folder_cache", {})
+    monkeypatch.setattr(google_drive.config, "DRIVE_API_ENDPOINT", "")
+    monkeypatch.setattr(google_drive.config, "DRIVE_PUBLIC_FOLDER_ID", "pub")
+
+    def install(mode, parents):
+        monkeypatch.setattr(google_drive.config, "DRIVE_UPLOAD_FOLDER_MODE", mode)
+        service = FakeSharingDrive(parents)
+        monkeypatch.setattr(google_drive, "get_drive_service", lambda account_id=None: service)
+        return service
+
+    return install
+
+
+def test_files_in_public_folder_are_not_shared_again(sharing, monkeypatch):
+    service = sharing("public", {'inside': ["pub"], 'outside': ["root"]})
+    assert google_drive.share_files_public(["inside", "outside"]) == {'inside': None, 'outside': None}
+    # Un permiso para la carpeta (comprobada una vez por cuenta) y otro para el archivo de fuera
+    assert service.permissions_created == ["pub", "outside"]
+    # Tras un reinicio se vuelve a deducir de Drive, sin estado del proceso anterior
+    monkeypatch.setattr(google_drive, "_public_root_ids", {})
+    google_drive.share_files_public(["inside"])
+    assert service.permissions_created == ["pub", "outside", "pub"]
+
+
+def test_dated_subfolders_inherit_public_access(sharing, monkeypatch):
+    monkeypatch.setattr(google_drive.config, "DRIVE_DATED_FOLDER_FORMAT", "2026/10")
+    service = sharing("dated", {})
+    day_folder = google_drive.get_upload_folder_id(service)
+    assert day_folder == "folder-10" and service.folders == {'folder-2026': "pub", 'folder-10': "folder-2026"}
+    service.parents.update({'dated': [day_folder], 'elsewhere': ["other"]})
+    google_drive.share_files_public(["dated", "elsewhere"])
+    assert service.permissions_created == ["pub", "elsewhere"]
+
+
+def test_without_public_folder_every_file_is_shared(sharing):
+    service = sharing("none", {'a': ["pub"], 'b': ["root"]})
+    google_drive.share_files_public(["a", "b"])
+    assert service.permissions_created == ["a", "b"]
+
+
+class FakeAccountDrive:
+    """Una cuenta de Drive falsa: archivos {id: modifiedTime}; borrar uno ajeno da 404."""
+
+    def __init__(self, files):
+        self.files_by_id = dict(files)
+        self.deleted = []
+
+    def files(self):
+        return self
+
+    def list(self, q, pageSize, fields=None, orderBy=None, pageToken=None):
+        ordered = sorted(self.files_by_id.items(), key=lambda item: item[1], reverse=True)
+        page = [{'id': file_id, 'name': file_id, 'size': "1", 'modifiedTime': modified} for file_id, modified in ordered]
+        return FakeRequest({'files': page[:pageSize], 'nextPageToken': "more" if len(page) > pageSize else None})
+
+    def delete(self, fileId):
+        from googleapiclient.errors import HttpError
+        import httplib2
+
+        if fileId not in self.files_by_id:
+            raise HttpError(httplib2.Response({'status': 404}), b"File not found")
+        del self.files_by_id[fileId]
+        self.deleted.append(fileId)
+        return FakeRequest(None)
+
+
+@pytest.fixture
+def accounts(monkeypatch):
+    services = {
+        # Fechas intercaladas: la cuenta de respaldo tiene los días impares
+        'default': FakeAccountDrive({f"d{day}": f"2026-10-{day:02d}" for day in range(2, 18, 2)}),
+        'backup': FakeAccountDrive({f"b{day}": f"2026-10-{day:02d}" for day in range(1, 17, 2)}),
+    }
+    monkeypatch.setattr(google_drive, "get_account_ids", lambda: list(services))
+    monkeypatch.setattr(google_drive, "get_drive_service", lambda account_id=None: services[account_id or 'default'])
+    monkeypatch.setattr(google_drive, "get_uploaded_file_entry", lambda file_id: None)
+    return services
+
+
+def test_account_of_routes_legacy_entries_to_the_default_account():
+    assert google_drive.account_of({'file_id': "a", 'account_id': "backup"}) == "backup"
+    assert google_drive.account_of({'file_id': "a"}) == google_drive.DEFAULT_ACCOUNT
+    assert google_drive.account_of(None) == google_drive.DEFAULT_ACCOUNT
+
+
+def test_drive_listing_merges_every_account_by_date(accounts):
+    first = asyncio.run(google_drive.list_drive_contents_async(page_number=1))
+    second = asyncio.run(google_drive.list_drive_contents_async(page_number=2))
+    listed = [item['id'] for item in first['files'] + second['files']]
+    assert listed == sorted(listed, key=lambda file_id: int(file_id[1:]), reverse=True)
+    assert len(first['files']) == 10 and first['has_more'] and len(second['files']) == 6 and not second['has_more']
+    assert {item['account_id'] for item in first['files']} == {'default', 'backup'}
+    only_backup = asyncio.run(google_drive.list_drive_contents_async(account_id="backup"))
+    assert {item['account_id'] for item in only_backup['files']} == {'backup'}
+
+
+def test_drive_delete_finds_the_owning_account(accounts, monkeypatch):
+    from googleapiclient.errors import HttpError
+
+    # Sin registro: se prueba cuenta a cuenta hasta dar con el archivo
+    assert asyncio.run(google_drive.delete_drive_file_async("b3")) == "backup"
+    assert accounts['backup'].deleted == ["b3"] and accounts['default'].deleted == []
+    # Registrado: se borra directamente en su cuenta
+    monkeypatch.setattr(google_drive, "get_uploaded_file_entry", lambda file_id: {'file_id': file_id, 'account_id': "backup"})
+    assert asyncio.run(google_drive.delete_drive_file_async("b5")) == "backup"
+    with pytest.raises(HttpError):
+        asyncio.run(google_drive.delete_drive_file_async("missing", account_id="default"))
+
+
+def test_drive_delete_all_empties_every_account(accounts):
+    asyncio.run(google_drive.delete_all_drive_files_async())
+    assert accounts['default'].files_by_id == {} and accounts['backup'].files_by_id == {}
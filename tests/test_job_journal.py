@@ -0,0 +1,117 @@
+# test_job_journal.py (Diario de trabajos: reanudación tras reinicio)
+import threading
+
+import pytest
+
+import db
+import job_journal
+from job_journal import ACTIVE, DONE, FAILED, advance, finish_job, reached, start_job
+
+
+@pytest.fixture(autouse=True)
+def journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "JOBS_DB_PATH", str(tmp_path / "jobs_db.json"))
+    monkeypatch.setattr(db, "_jobs_db", None)
+    monkeypatch.setattr(job_journal, "_pending", {})
+    yield
+    job_journal.flush()
+
+
+def restart():
+    """Simula un reinicio del proceso: escribe lo pendiente y vuelve a abrir la DB desde el archivo."""
+    job_journal.flush()
+    db.get_jobs_db().close()
+    db._jobs_db = None
+
+
+def new_job(job_id, **kwargs):
+    return start_job(job_id, chat_id=1, message_id=job_id, user_id=7, file_name=f"{job_id}.mp4", file_size=100, **kwargs)
+
+
+def test_unfinished_jobs_survive_restart_in_creation_order():
+    first = new_job(1)
+    second = new_job(2)
+    done = new_job(3)
+    advance(first, "uploaded", drive_id="drive1", temp_path="/tmp/1.mp4")
+    advance(second, "downloaded", temp_path="/tmp/2.mp4")
+    finish_job(done, DONE)
+    restart()
+
+    jobs = job_journal.get_unfinished_jobs()
+    assert [job['job_id'] for job in jobs] == [1, 2]
+    assert jobs[0]['stage'] == "uploaded" and jobs[0]['drive_id'] == "drive1"
+    assert [entry['stage'] for entry in jobs[0]['history']] == ["queued", "uploaded"]
+    assert job_journal.get_job(3)['status'] == DONE
+
+
+def test_reached_follows_stage_order():
+    job = new_job(1)
+    advance(job, "shared")
+    assert reached(job, "downloaded") and reached(job, "shared")
+    assert not reached(job, "recorded")
+    assert not reached(None, "queued")
+    # Una etapa anterior no hace retroceder el trabajo
+    advance(job, "downloaded", temp_path="/tmp/x")
+    assert job['stage'] == "shared"
+    assert job_journal.get_job(1)['temp_path'] == "/tmp/x"
+
+
+def test_reads_see_changes_not_yet_written():
+    job = new_job(1)
+    with job_journal._journal_lock:
+        # Con el escritor bloqueado, los cambios siguen en _pending
+        advance(job, "downloaded", temp_path="/tmp/1.mp4")
+        assert 1 in job_journal._pending
+    assert job_journal.get_job(1)['stage'] == "downloaded"
+    assert [job['job_id'] for job in job_journal.get_jobs_by_status(ACTIVE)] == [1]
+
+
+def test_saved_copy_is_independent_of_caller_dict():
+    job = new_job(1)
+    job['history'].append({'stage': "bogus", 'at': 0})
+    assert [entry['stage'] for entry in job_journal.get_job(1)['history']] == ["queued"]
+
+
+def test_referenced_temp_paths_only_downloaded_active_jobs():
+    downloaded = new_job(1)
+    advance(downloaded, "downloaded", temp_path="/tmp/keep.mp4")
+    uploaded = new_job(2)
+    advance(uploaded, "uploaded", temp_path="/tmp/uploaded.mp4")
+    finished = new_job(3)
+    advance(finished, "downloaded", temp_path="/tmp/done.mp4")
+    finish_job(finished, DONE)
+    assert job_journal.referenced_temp_paths() == ["/tmp/keep.mp4"]
+
+
+def test_prune_removes_old_finished_jobs_only(monkeypatch):
+    old = new_job(1)
+    finish_job(old, DONE)
+    active = new_job(2)
+    restart()
+    now = job_journal.time.time()
+    monkeypatch.setattr(job_journal.time, "time", lambda: now + 10 * 24 * 3600)
+    assert job_journal.prune_finished(max_age_seconds=3600) == 1
+    assert job_journal.get_job(1) is None
+    assert job_journal.get_job(active['job_id'])['status'] == ACTIVE
+
+
+@pytest.fixture
+def paused_writer(monkeypatch):
+    """Sin hilo escritor: los cambios quedan en _pending hasta llamar a flush()."""
+    monkeypatch.setattr(job_journal, "_writer", threading.current_thread())
+    monkeypatch.setattr(job_journal, "_pending_cond", threading.Condition())
+
+
+def test_purge_goes_by_latest_unwritten_state(paused_writer):
+    revived = new_job(1)
+    finish_job(revived, FAILED)
+    failing = new_job(2)
+    job_journal.flush()
+    # En la DB: 1 fallido y 2 activo; los cambios pendientes los invierten
+    job_journal.reactivate(revived)
+    finish_job(failing, FAILED)
+    assert job_journal.purge_jobs([1, 2]) == 1
+    job_journal.flush()
+    assert job_journal.get_job(1)['status'] == ACTIVE
+    assert job_journal.get_job(2) is None
+
@@ -0,0 +1,96 @@
+# test_logging_config.py (Muestreo de mensajes repetidos y niveles por módulo)
+import logging
+
+import pytest
+
+import logging_config
+from logging_config import SamplingFilter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(logging_config, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def captured():
+    """Registros que llegan al logger 'test_sampling' (donde se emiten los resúmenes)."""
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger = logging.getLogger("test_sampling")
+    logger.addHandler(handler)
+    logger.propagate = False
+    yield records
+    logger.removeHandler(handler)
+    logger.propagate = True
+
+
+def record(msg, args=(), level=logging.INFO, name="test_sampling"):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_burst_then_drop_ignoring_numbers(clock):
+    sampler = SamplingFilter(burst=2, window=60)
+    passed = [sampler.filter(record(f"Descargando video ({percent}%)")) for percent in (10, 20, 30, 40)]
+    assert passed == [True, True, False, False]
+    # Otro mensaje, otro nivel u otro logger tienen su propio cupo
+    assert sampler.filter(record("Subiendo a Drive"))
+    assert sampler.filter(record("Descargando video (50%)", level=logging.WARNING))
+    assert sampler.filter(record("Descargando video (50%)", name="otro"))
+
+
+def test_errors_are_never_dropped(clock):
+    sampler = SamplingFilter(burst=1, window=60)
+    assert all(sampler.filter(record("Fallo al subir %s", ("x",), level=logging.ERROR)) for _ in range(5))
+
+
+def test_disabled_with_zero_burst(clock):
+    sampler = SamplingFilter(burst=0, window=60)
+    assert all(sampler.filter(record("repetido")) for _ in range(50))
+
+
+def test_new_window_summarizes_suppressed(clock, captured):
+    sampler = SamplingFilter(burst=1, window=60)
+    for message_id in range(4):
+        sampler.filter(record(f"Mensaje {message_id} procesado"))
+    assert captured == []
+    clock.now += 61
+    assert sampler.filter(record("Mensaje 9 procesado"))
+    assert len(captured) == 1
+    summary = captured[0]
+    assert summary.levelno == logging.WARNING
+    assert summary.getMessage() == "3 mensajes similares suprimidos en 60s (último: Mensaje 3 procesado)"
+    # El resumen no pasa por el cupo de la ventana nueva
+    assert sampler.filter(summary)
+
+
+def test_parse_levels():
+    assert logging_config._parse_levels("google_drive=warning, db = DEBUG,basura,") == {
+        'google_drive': "WARNING", 'db': "DEBUG",
+    }
+    assert logging_config._parse_levels("") == {}
+
+
+def test_payload_dump_only_when_enabled(monkeypatch, captured):
+    logger = logging.getLogger("test_sampling")
+    logger.setLevel(logging.DEBUG)
+    try:
+        monkeypatch.setattr(logging_config.config, "LOG_DEBUG_PAYLOADS", False)
+        logging_config.log_payload(logger, "respuesta", {'a': 1})
+        assert captured == []
+        monkeypatch.setattr(logging_config.config, "LOG_DEBUG_PAYLOADS", True)
+        logging_config.log_payload(logger, "respuesta", "x" * 50, limit=10)
+        assert captured[0].getMessage() == "respuesta: 'xxxxxxxxx... (52 caracteres)"
+    finally:
+        logger.setLevel(logging.NOTSET)
@@ -0,0 +1,52 @@
+# test_loop_monitor.py (Identificación del manejador que bloquea el event loop)
+import asyncio
+import os
+import traceback
+
+import loop_monitor
+
+
+def frame(path, name):
+    return traceback.FrameSummary(path, 1, name)
+
+
+def project(module, name):
+    return frame(os.path.join(loop_monitor._PROJECT_DIR, f"{module}.py"), name)
+
+
+def library(package, name):
+    return frame(os.path.join(loop_monitor._ASYNCIO_DIR, os.pardir, package, "module.py"), name)
+
+
+def test_reports_outermost_handler_and_innermost_blocking_frame():
+    stack = [
+        project("main", "<module>"),
+        library("pyrogram", "run"),
+        frame(os.path.join(loop_monitor._ASYNCIO_DIR, "base_events.py"), "run_until_complete"),
+        frame(os.path.join(loop_monitor._ASYNCIO_DIR, "events.py"), "_run"),
+        library("pyrogram", "handler_worker"),
+        project("main", "handle_video"),
+        project("main", "process_video"),
+        library("requests", "post"),
+        project("hydrax_api", "import_to_hydrax"),
+        library("requests", "send"),
+    ]
+    assert loop_monitor._handler_names_from_stack(stack) == ("main.handle_video", "hydrax_api.import_to_hydrax")
+
+
+def test_monitor_frames_are_not_the_culprit():
+    stack = [frame(os.path.join(loop_monitor._ASYNCIO_DIR, "events.py"), "_run"), project("loop_monitor", "_watchdog")]
+    assert loop_monitor._handler_names_from_stack(stack) == ("desconocido", "desconocido")
+
+
+def test_real_loop_stack():
+    def blocking_call():
+        return traceback.extract_stack()
+
+    async def handler():
+        return blocking_call()
+
+    stack = asyncio.run(handler())
+    assert loop_monitor._handler_names_from_stack(stack) == (
+        "test_loop_monitor.handler", "test_loop_monitor.blocking_call",
+    )
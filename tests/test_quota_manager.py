@@ -0,0 +1,187 @@
+# test_quota_manager.py (Reparto de subidas entre cuentas, desalojo de subidas antiguas y reserva de espacio en Drive)
+import asyncio
+import time
+from collections import deque
+
+import pytest
+
+import db
+import google_drive
+import job_journal
+import quota_manager
+from job_journal import ACTIVE, RETRY_WAIT
+from quota_manager import DriveQuotaExceededError
+
+ACCOUNT = google_drive.DEFAULT_ACCOUNT
+
+
+class FakeDrive:
+    """Cuota y registro de una cuenta: borrar entradas descuenta su tamaño del uso."""
+
+    def __init__(self, limit, usage, entries=()):
+        self.limit = limit
+        self.usage = usage
+        self.entries = list(entries)
+        self.deleted = []
+
+    def get_storage_quota(self, account_id=None):
+        return {'limit': self.limit, 'usage': self.usage}
+
+    def delete_uploaded_entries(self, entries):
+        self.deleted.append([entry['file_id'] for entry in entries])
+        ids = {entry['file_id'] for entry in entries}
+        self.usage -= sum(entry.get('size') or 0 for entry in entries)
+        self.entries = [entry for entry in self.entries if entry['file_id'] not in ids]
+        return ids
+
+
+def entry(file_id, uploaded_at, size=100, account_id=None, imported=True):
+    return {'file_id': file_id, 'upload_timestamp': uploaded_at, 'size': size, 'account_id': account_id,
+            'hydrax_slug': f"slug-{file_id}" if imported else None}
+
+
+@pytest.fixture(autouse=True)
+def quota_state(monkeypatch):
+    monkeypatch.setattr(quota_manager, "_quotas", {})
+    monkeypatch.setattr(quota_manager, "_fetched_at", {})
+    monkeypatch.setattr(quota_manager, "_pending_bytes", {})
+    monkeypatch.setattr(quota_manager, "_uploads", {})
+    monkeypatch.setattr(quota_manager, "_evict_locks", {})
+    monkeypatch.setattr(quota_manager, "_stats", dict(quota_manager._stats, evictions=0, evicted_files=0, evicted_bytes=0))
+    monkeypatch.setattr(quota_manager.config, "QUOTA_MANAGER_ENABLED", True)
+    monkeypatch.setattr(quota_manager.config, "QUOTA_EVICT_ONLY_IMPORTED", True)
+    monkeypatch.setattr(quota_manager.config, "QUOTA_EVICT_THRESHOLD", 0.9)
+    monkeypatch.setattr(quota_manager.config, "QUOTA_EVICT_TARGET", 0.8)
+    monkeypatch.setattr(quota_manager.config, "QUOTA_EVICT_BATCH", 2)
+    monkeypatch.setattr(quota_manager.config, "DRIVE_DAILY_UPLOAD_LIMIT_GB", 0)
+    monkeypatch.setattr(google_drive, "get_account_ids", lambda: [ACCOUNT])
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    fake = FakeDrive(limit=1000, usage=0)
+    monkeypatch.setattr(google_drive, "get_storage_quota", fake.get_storage_quota)
+    monkeypatch.setattr(google_drive, "delete_uploaded_entries", fake.delete_uploaded_entries)
+    monkeypatch.setattr(db, "get_uploaded_file_entries", lambda: list(fake.entries))
+    monkeypatch.setattr(job_journal, "get_jobs_by_status", lambda *statuses: [])
+    return fake
+
+
+def test_eviction_candidates_skip_files_of_active_and_retrying_jobs(drive, monkeypatch):
+    drive.entries = [
+        entry("newest", 50), entry("active", 10), entry("retrying", 20), entry("not_imported", 5, imported=False),
+        entry("other_account", 1, account_id="backup"), entry("oldest", 2), entry("middle", 30),
+    ]
+    jobs = [{'status': ACTIVE, 'drive_id': "active"}, {'status': RETRY_WAIT, 'drive_id': "retrying"},
+            {'status': "completed", 'drive_id': "middle"}]
+    monkeypatch.setattr(job_journal, "get_jobs_by_status",
+                        lambda *statuses: [job for job in jobs if job['status'] in statuses])
+
+    candidates = quota_manager._eviction_candidates(ACCOUNT)
+    assert [candidate['file_id'] for candidate in candidates] == ["oldest", "middle", "newest"]
+
+    monkeypatch.setattr(quota_manager.config, "QUOTA_EVICT_ONLY_IMPORTED", False)
+    candidates = quota_manager._eviction_candidates(ACCOUNT)
+    assert [candidate['file_id'] for candidate in candidates] == ["oldest", "not_imported", "middle", "newest"]
+
+
+def test_evict_until_deletes_oldest_first_in_batches(drive):
+    drive.usage = 950
+    drive.entries = [entry(f"file{number}", number) for number in range(5, 0, -1)]
+
+    async def scenario():
+        await quota_manager.refresh_quota(ACCOUNT)
+        return await quota_manager.evict_until(ACCOUNT, 250)
+
+    freed = asyncio.run(scenario())
+    # Rondas de QUOTA_EVICT_BATCH archivos hasta cubrir lo pedido
+    assert drive.deleted == [["file1", "file2"], ["file3"]]
+    assert freed == 300
+    assert quota_manager._quotas[ACCOUNT]['usage'] == 650
+    assert quota_manager._stats['evictions'] == 2
+    assert quota_manager._stats['evicted_files'] == 3
+
+
+def test_reservation_counts_pending_bytes_until_the_upload_ends(drive):
+    seen = {}
+
+    async def upload(name, size, started, release):
+        async with quota_manager.reserve_drive_space(size) as account_id:
+            seen[name] = quota_manager._pending_bytes[account_id]
+            started.set()
+            await release.wait()
+
+    async def scenario():
+        first_started, second_started, release = asyncio.Event(), asyncio.Event(), asyncio.Event()
+        first = asyncio.create_task(upload("first", 300, first_started, release))
+        await first_started.wait()
+        # La segunda subida ve los bytes de la primera como ocupados
+        assert quota_manager.free_space(ACCOUNT) == 900 - 300
+        second = asyncio.create_task(upload("second", 200, second_started, release))
+        await second_started.wait()
+        release.set()
+        await asyncio.gather(first, second)
+
+    asyncio.run(scenario())
+    assert seen == {"first": 300, "second": 500}
+    assert quota_manager._pending_bytes[ACCOUNT] == 0
+    assert quota_manager._quotas[ACCOUNT]['usage'] == 500
+    assert quota_manager.uploaded_last_day(ACCOUNT) == 500
+
+
+def test_failed_reservation_releases_its_pending_bytes(drive):
+    drive.usage = 950
+
+    async def scenario():
+        async with quota_manager.reserve_drive_space(200):
+            pass
+
+    with pytest.raises(DriveQuotaExceededError):
+        asyncio.run(scenario())
+    assert quota_manager._pending_bytes[ACCOUNT] == 0
+    assert quota_manager.uploaded_last_day(ACCOUNT) == 0
+
+    async def failing_upload():
+        async with quota_manager.reserve_drive_space(10):
+            raise ValueError("la subida falló")
+
+    drive.usage = 0
+    quota_manager._quotas.clear()
+    with pytest.raises(ValueError):
+        asyncio.run(failing_upload())
+    assert quota_manager._pending_bytes[ACCOUNT] == 0
+    assert quota_manager.uploaded_last_day(ACCOUNT) == 0
+
+
+def test_upload_goes_to_the_account_with_most_room(monkeypatch):
+    quotas = {ACCOUNT: {'limit': 10000, 'usage': 0}, 'backup': {'limit': 1000, 'usage': 500}}
+
+    def get_storage_quota(account_id):
+        if quotas[account_id] is None:
+            raise ConnectionError("sin respuesta")
+        return dict(quotas[account_id])
+
+    monkeypatch.setattr(google_drive, "get_account_ids", lambda: [ACCOUNT, "backup"])
+    monkeypatch.setattr(google_drive, "get_storage_quota", get_storage_quota)
+    # ~1074 bytes de presupuesto diario por cuenta; la principal ya gastó 900 hoy
+    monkeypatch.setattr(quota_manager.config, "DRIVE_DAILY_UPLOAD_LIMIT_GB", 1e-6)
+    monkeypatch.setattr(quota_manager, "_uploads", {ACCOUNT: deque([(time.time(), 900)])})
+
+    def choose(size):
+        quota_manager._quotas.clear()
+        return asyncio.run(quota_manager.choose_upload_account(size))
+
+    # Más margen entre presupuesto y espacio libre en la de respaldo
+    assert choose(100) == "backup"
+    # Sin presupuesto en la principal
+    assert choose(300) == "backup"
+    # La de respaldo está casi llena: la principal aún cabe
+    quotas['backup']['usage'] = 950
+    assert choose(100) == ACCOUNT
+    # No cabe en ninguna: la de más presupuesto (ahí se desalojará)
+    assert choose(500) == "backup"
+    # Una cuenta que no responde no se elige
+    quotas['backup'] = None
+    assert choose(100) == ACCOUNT
+    with pytest.raises(DriveQuotaExceededError):
+        choose(500)
@@ -0,0 +1,159 @@
+# test_retry_queue.py (Cola persistente de reintentos: backoff, dead-letter y planificador)
+import asyncio
+import threading
+
+import pytest
+
+import db
+import job_journal
+import retry_queue
+from job_journal import ACTIVE, DEAD, RETRY_WAIT, start_job
+
+
+@pytest.fixture(autouse=True)
+def journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "JOBS_DB_PATH", str(tmp_path / "jobs_db.json"))
+    monkeypatch.setattr(db, "_jobs_db", None)
+    monkeypatch.setattr(job_journal, "_pending", {})
+    monkeypatch.setattr(job_journal.config, "RETRY_BASE_DELAY", 60.0)
+    monkeypatch.setattr(job_journal.config, "RETRY_MAX_DELAY", 600.0)
+    monkeypatch.setattr(job_journal.config, "RETRY_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(retry_queue, "_running", set())
+    monkeypatch.setattr(retry_queue, "_counts", {'waiting': 0, 'dead': 0})
+    yield
+    job_journal.flush()
+
+
+def restart():
+    """Simula un reinicio del proceso: escribe lo pendiente y vuelve a abrir la DB desde el archivo."""
+    job_journal.flush()
+    db.get_jobs_db().close()
+    db._jobs_db = None
+
+
+def new_job(job_id):
+    return start_job(job_id, chat_id=1, message_id=job_id, user_id=7, file_name=f"{job_id}.mp4", file_size=100)
+
+
+def failed_job(job_id, failures=1, overdue=10):
+    """Trabajo en la cola de reintentos (o en dead-letter) que venció hace 'overdue' segundos."""
+    job = new_job(job_id)
+    for _ in range(failures):
+        job_journal.schedule_retry(job, "fallo")
+    if job['status'] == RETRY_WAIT:
+        job['next_retry_at'] = job_journal.time.time() - overdue
+        job_journal._save(job)
+    return job
+
+
+def run_scheduler(monkeypatch, concurrency=2, breakers=()):
+    """Da una vuelta al planificador y devuelve los trabajos que reanudó (con su estado al reanudarlos)."""
+    monkeypatch.setattr(retry_queue.config, "RETRY_CONCURRENCY", concurrency)
+    monkeypatch.setattr(retry_queue.config, "RETRY_POLL_INTERVAL", 3600)
+    monkeypatch.setattr(retry_queue, "open_breakers", lambda: list(breakers))
+    resumed = []
+
+    async def resume(job):
+        resumed.append((job['job_id'], job_journal.get_job(job['job_id'])['status']))
+        await asyncio.sleep(0.2)
+
+    checked = threading.Event()
+    refresh_counts = retry_queue._refresh_counts
+
+    def refresh_and_signal():
+        refresh_counts()
+        checked.set()
+
+    monkeypatch.setattr(retry_queue, "_refresh_counts", refresh_and_signal)
+
+    async def scenario():
+        monkeypatch.setattr(retry_queue, "_resume", resume)
+        monkeypatch.setattr(retry_queue, "_wakeup", asyncio.Event())
+        task = asyncio.create_task(retry_queue._scheduler_loop())
+        # Tras la primera revisión (los reintentos ya lanzados), antes de que terminen
+        await asyncio.get_running_loop().run_in_executor(None, checked.wait, 5)
+        status = retry_queue.get_retry_status()
+        task.cancel()
+        while retry_queue._running:
+            await asyncio.sleep(0.01)
+        return status
+
+    return resumed, asyncio.run(scenario())
+
+
+def test_retry_delay_doubles_up_to_cap_with_jitter():
+    for attempts, expected in ((1, 60), (2, 120), (3, 240), (4, 480), (5, 600), (12, 600)):
+        for _ in range(20):
+            assert expected * 0.9 <= job_journal.retry_delay(attempts) <= expected * 1.1
+
+
+def test_schedule_retry_then_dead_letter():
+    job = new_job(1)
+    for attempt in range(1, 4):
+        assert job_journal.schedule_retry(job, f"fallo {attempt}") == RETRY_WAIT
+        assert job['attempts'] == attempt
+        assert job['next_retry_at'] > job_journal.time.time()
+    assert job_journal.schedule_retry(job, "fallo 4") == DEAD
+    restart()
+    dead = job_journal.get_jobs_by_status(DEAD)
+    assert [(job['job_id'], job['error'], job['next_retry_at']) for job in dead] == [(1, "fallo 4", None)]
+    assert job_journal.get_unfinished_jobs() == []
+
+
+def test_due_retries_most_overdue_first():
+    jobs = [new_job(job_id) for job_id in (1, 2, 3)]
+    for job in jobs:
+        job_journal.schedule_retry(job, "fallo")
+    now = job_journal.time.time()
+    jobs[0]['next_retry_at'] = now - 10
+    jobs[1]['next_retry_at'] = now + 3600
+    jobs[2]['next_retry_at'] = now - 100
+    for job in jobs:
+        job_journal._save(job)
+    assert [job['job_id'] for job in job_journal.get_due_retries(now)] == [3, 1]
+
+
+def test_requeue_and_reactivate():
+    job = new_job(1)
+    for _ in range(4):
+        job_journal.schedule_retry(job, "fallo")
+    assert job['status'] == DEAD
+    assert job_journal.requeue(2) is None
+    requeued = job_journal.requeue(1)
+    assert requeued['status'] == RETRY_WAIT and requeued['attempts'] == 0
+    assert [due['job_id'] for due in job_journal.get_due_retries()] == [1]
+    job_journal.reactivate(requeued)
+    assert job_journal.get_job(1)['status'] == ACTIVE
+    assert job_journal.requeue(1) is None  # Un trabajo activo no se reencola
+
+
+def test_purge_does_not_resurrect_pending_writes():
+    job = new_job(1)
+    for _ in range(4):
+        job_journal.schedule_retry(job, "fallo")
+    with job_journal._journal_lock:
+        job_journal._save(job)  # Cambio aún sin escribir cuando se purga
+    assert job_journal.purge_jobs() >= 0
+    job_journal.flush()
+    assert job_journal.get_job(1) is None
+
+
+def test_scheduler_resumes_due_jobs_up_to_concurrency(monkeypatch):
+    failed_job(1, overdue=10)
+    failed_job(2, overdue=100)
+    failed_job(3, overdue=50)
+    failed_job(4, overdue=-3600)   # Aún no le toca
+    failed_job(5, failures=4)      # Dead-letter: no se reintenta
+    resumed, status = run_scheduler(monkeypatch, concurrency=2)
+    # Los más atrasados primero, ya reactivados al reanudarlos
+    assert resumed == [(2, ACTIVE), (3, ACTIVE)]
+    assert status['running'] == 2 and status['dead'] == 1
+    assert retry_queue._running == set()
+
+
+def test_scheduler_waits_while_a_breaker_is_open(monkeypatch):
+    failed_job(1)
+    resumed, status = run_scheduler(monkeypatch, breakers=["hydrax"])
+    assert resumed == []
+    assert job_journal.get_job(1)['status'] == RETRY_WAIT
+    assert status['running'] == 0
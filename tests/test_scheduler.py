@@ -0,0 +1,133 @@
+# test_scheduler.py (Orden del planificador: round-robin entre usuarios, SJF, carril rápido y envejecimiento)
+import asyncio
+
+import scheduler
+from scheduler import FAST, GENERAL, FairScheduler
+
+
+def run_jobs(sched: FairScheduler, jobs) -> list:
+    """
+    Con el único turno ocupado, encola 'jobs' [(job_id, user_id, size)] y va liberando el
+    turno de uno en uno. Devuelve el orden en que los trabajos recibieron turno.
+    """
+    order = []
+
+    async def scenario():
+        slot = await sched.acquire("busy", "owner", 10)
+        tasks = []
+        for job_id, user_id, size in jobs:
+            tasks.append(asyncio.create_task(sched.acquire(job_id, user_id, size)))
+            await asyncio.sleep(0)
+        for _ in jobs:
+            slot.release()
+            await asyncio.sleep(0)
+            slot = next(task.result() for task in tasks if task.done() and task.result().job_id not in order)
+            order.append(slot.job_id)
+
+    asyncio.run(scenario())
+    return order
+
+
+def test_round_robin_between_users():
+    sched = FairScheduler(slots=1, fast_slots=0, fast_max_bytes=0, aging_seconds=3600)
+    jobs = [(f"a{i}", "alice", 100) for i in range(4)] + [("b0", "bob", 100), ("b1", "bob", 100)]
+    assert run_jobs(sched, jobs) == ["a0", "b0", "a1", "b1", "a2", "a3"]
+
+
+def test_shortest_job_first_within_user():
+    sched = FairScheduler(slots=1, fast_slots=0, fast_max_bytes=0, aging_seconds=3600)
+    jobs = [("big", "alice", 2000), ("small", "alice", 10), ("mid", "alice", 500), ("unknown", "alice", None)]
+    assert run_jobs(sched, jobs) == ["small", "mid", "big", "unknown"]
+
+
+def test_aged_job_goes_first(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(scheduler.time, "monotonic", lambda: now[0])
+    sched = FairScheduler(slots=1, fast_slots=0, fast_max_bytes=0, aging_seconds=60)
+
+    async def scenario():
+        running = await sched.acquire("running", "owner", 1)
+        old_big = asyncio.create_task(sched.acquire("old_big", "alice", 5000))
+        await asyncio.sleep(0)
+        now[0] += 61
+        new_small = asyncio.create_task(sched.acquire("new_small", "alice", 1))
+        await asyncio.sleep(0)
+        running.release()
+        await asyncio.sleep(0)
+        return old_big.done(), new_small.done()
+
+    assert asyncio.run(scenario()) == (True, False)
+    assert sched.status()['granted_aged'] == 1
+
+
+def test_fast_lane_only_for_small_jobs():
+    sched = FairScheduler(slots=1, fast_slots=1, fast_max_bytes=100, aging_seconds=3600)
+
+    async def scenario():
+        general = await sched.acquire("big1", "alice", 1000)
+        big2 = asyncio.create_task(sched.acquire("big2", "alice", 1000))
+        small = asyncio.create_task(sched.acquire("small", "bob", 50))
+        await asyncio.sleep(0)
+        assert not big2.done()
+        assert small.done() and small.result().lane == FAST
+        lanes = {'big1': general.lane}
+        general.release()
+        await asyncio.sleep(0)
+        lanes['big2'] = big2.result().lane
+        return lanes
+
+    assert asyncio.run(scenario()) == {'big1': GENERAL, 'big2': GENERAL}
+
+
+def test_no_cap_grants_immediately():
+    sched = FairScheduler(slots=0, fast_slots=2, fast_max_bytes=100, aging_seconds=3600)
+
+    async def scenario():
+        return [await asyncio.wait_for(sched.acquire(i, "alice", 10), 1) for i in range(20)]
+
+    slots = asyncio.run(scenario())
+    assert all(slot.lane == GENERAL for slot in slots)
+    assert sched.status()['running'] == {GENERAL: 20, FAST: 0}
+    assert sched.status()['slots'] is None
+
+
+def test_cancelled_waiter_leaves_queue():
+    sched = FairScheduler(slots=1, fast_slots=0, fast_max_bytes=0, aging_seconds=3600)
+
+    async def scenario():
+        running = await sched.acquire("running", "alice", 1)
+        waiting = asyncio.create_task(sched.acquire("waiting", "bob", 1))
+        await asyncio.sleep(0)
+        assert sched.waiting() == 1
+        waiting.cancel()
+        await asyncio.sleep(0)
+        assert sched.waiting() == 0
+        running.release()
+        return sched.status()['running'][GENERAL]
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_cancel_during_on_wait_leaves_queue_and_frees_slot():
+    sched = FairScheduler(slots=1, fast_slots=0, fast_max_bytes=0, aging_seconds=3600)
+    on_wait_started = None
+
+    async def slow_on_wait(waiting):
+        on_wait_started.set()
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        nonlocal on_wait_started
+        on_wait_started = asyncio.Event()
+        running = await sched.acquire("running", "alice", 1)
+        waiting = asyncio.create_task(sched.acquire("waiting", "bob", 1, on_wait=slow_on_wait))
+        await on_wait_started.wait()
+        # El turno llega mientras on_wait (p. ej. el aviso al usuario) sigue en curso
+        running.release()
+        assert waiting.done() is False and sched.status()['running'][GENERAL] == 1
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        return sched.waiting(), sched.status()['running'][GENERAL]
+
+    assert asyncio.run(scenario()) == (0, 0)
+
@@ -0,0 +1,103 @@
+# test_search_index.py (Búsqueda por trigramas y páginas ordenadas del índice del registro)
+import threading
+
+import pytest
+
+import db
+import search_index
+
+
+@pytest.fixture(autouse=True)
+def empty_index(monkeypatch):
+    monkeypatch.setattr(search_index, "_built", True)
+    monkeypatch.setattr(search_index, "_entries", {})
+    monkeypatch.setattr(search_index, "_trigrams", {})
+    monkeypatch.setattr(search_index, "_sorted", {sort: [] for sort in search_index.SORT_KEYS})
+
+
+def add(file_id, name, uploaded_at, size=0):
+    search_index.index_file({'file_id': file_id, 'original_name': name, 'upload_timestamp': uploaded_at, 'size': size})
+
+
+def found(query, limit=10):
+    total, entries = search_index.search(query, limit)
+    return total, [entry['file_id'] for entry in entries]
+
+
+def test_normalize_ignores_case_accents_and_signs():
+    assert search_index.normalize("Capítulo_01 - ÑANDÚ.mp4") == "capitulo 01 nandu mp4"
+
+
+def test_all_terms_required_most_recent_first():
+    add("a", "Serie Capítulo 1.mp4", 100)
+    add("b", "Serie capitulo 2.mp4", 300)
+    add("c", "Otra serie.mp4", 200)
+    assert found("CAPITULO serie") == (2, ["b", "a"])
+    assert found("serie") == (3, ["b", "c", "a"])
+    assert found("serie", limit=1) == (3, ["b"])
+
+
+def test_short_terms_checked_as_substrings():
+    add("a", "Show ep 1.mkv", 100)
+    add("b", "Show ep 12.mkv", 200)
+    add("c", "Show ep 2.mkv", 300)
+    assert found("show 1") == (2, ["b", "a"])
+    assert found("ep 2") == (2, ["c", "b"])
+
+
+def test_trigrams_out_of_order_do_not_match():
+    # "abcab" tiene los trigramas de "cabc" pero no la subcadena
+    add("a", "abcab", 100)
+    assert found("cabc") == (0, [])
+    assert found("bca") == (1, ["a"])
+
+
+def test_reindex_and_unindex_update_results():
+    add("a", "Película vieja", 100)
+    add("a", "Documental nuevo", 100)
+    assert found("pelicula") == (0, [])
+    assert found("documental") == (1, ["a"])
+    search_index.unindex_files(["a"])
+    assert found("documental") == (0, [])
+    assert search_index._trigrams == {}
+
+
+def test_page_sorted_both_directions():
+    add("a", "beta", 300, size=10)
+    add("b", "Álfa", 100, size=30)
+    add("c", "gamma", 200, size=20)
+    ids = lambda rows: [row['file_id'] for row in rows[1]]
+    assert ids(search_index.page('time', True, 1, 2)) == ["a", "c"]
+    assert ids(search_index.page('time', True, 2, 2)) == ["b"]
+    assert ids(search_index.page('name', False, 1, 3)) == ["b", "a", "c"]
+    assert ids(search_index.page('size', True, 1, 3)) == ["b", "c", "a"]
+    with pytest.raises(ValueError):
+        search_index.page('color')
+
+
+def test_files_recorded_while_the_index_builds_are_not_lost(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "UPLOADED_FILES_DB_PATH", str(tmp_path / "uploaded_files_db.json"))
+    monkeypatch.setattr(db, "_uploaded_files_db", None)
+    db.record_uploaded_file("old", "Viejo.mp4", 100)
+    db.record_uploaded_file("gone", "Borrado.mp4", 100)
+    monkeypatch.setattr(search_index, "_built", False)
+    read_entries = db.get_uploaded_file_entries
+
+    def slow_read():
+        # Un alta y una baja llegan justo después de leer el registro para construir
+        entries = read_entries()
+        writers = [
+            threading.Thread(target=db.record_uploaded_file, args=("new", "Nuevo.mp4", 100)),
+            threading.Thread(target=db.remove_uploaded_file_record, args=("gone",)),
+        ]
+        for writer in writers:
+            writer.start()
+            writer.join(timeout=0.3)
+        slow_read.writers = writers
+        return entries
+
+    monkeypatch.setattr(db, "get_uploaded_file_entries", slow_read)
+    found("x")
+    for writer in slow_read.writers:
+        writer.join()
+    assert set(search_index._entries) == {"old", "new"}
@@ -0,0 +1,93 @@
+# test_singleflight.py (Coalescencia de consultas con single_flight y antirrebote con Debouncer)
+import asyncio
+
+import pytest
+
+import singleflight
+from singleflight import Debouncer, single_flight
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(singleflight, "_inflight", {})
+    monkeypatch.setattr(singleflight, "_stats", {'executions': 0, 'coalesced': 0})
+
+
+def test_concurrent_calls_share_one_execution():
+    calls = []
+
+    async def query():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "resultado"
+
+    async def scenario():
+        return await asyncio.gather(*(single_flight("k", query) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["resultado"] * 5
+    assert len(calls) == 1
+    assert singleflight.get_singleflight_status() == {'in_flight': 0, 'executions': 1, 'coalesced': 4}
+
+
+def test_different_keys_run_separately():
+    async def scenario():
+        return await asyncio.gather(single_flight("a", lambda: asyncio.sleep(0, "a")),
+                                    single_flight("b", lambda: asyncio.sleep(0, "b")))
+
+    assert asyncio.run(scenario()) == ["a", "b"]
+    assert singleflight._stats['executions'] == 2
+
+
+def test_exception_reaches_every_caller_and_key_is_freed():
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("Drive caído")
+
+    async def scenario():
+        results = await asyncio.gather(single_flight("k", failing), single_flight("k", failing),
+                                       return_exceptions=True)
+        again = await single_flight("k", lambda: asyncio.sleep(0, "ok"))
+        return results, again
+
+    results, again = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert again == "ok"
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def query():
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def scenario():
+        leader = asyncio.create_task(single_flight("k", query))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(single_flight("k", query))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == 42
+    assert singleflight._inflight == {}
+
+
+def test_accepts_awaitables_other_than_coroutines():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        return await single_flight("executor", lambda: loop.run_in_executor(None, sum, [1, 2, 3]))
+
+    assert asyncio.run(scenario()) == 6
+
+
+def test_debouncer_skips_repeats_within_window(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(singleflight.time, "monotonic", lambda: now[0])
+    debouncer = Debouncer(window=1.0)
+    assert not debouncer.should_skip(("chat", 1))
+    assert debouncer.should_skip(("chat", 1))
+    assert not debouncer.should_skip(("chat", 2))
+    now[0] += 1.0
+    assert not debouncer.should_skip(("chat", 1))
+    assert debouncer.should_skip(("chat", 1))
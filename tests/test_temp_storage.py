@@ -0,0 +1,156 @@
+# test_temp_storage.py (Niveles de almacenamiento temporal, pre-reserva y limpieza de huérfanos)
+import asyncio
+import hashlib
+import os
+import threading
+
+import pytest
+
+import temp_storage
+
+MB = 1024 * 1024
+
+
+class FakeClient:
+    """Cliente de Pyrogram mínimo: stream_media() entrega los chunks indicados."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def stream_media(self, message):
+        for chunk in self.chunks:
+            yield chunk
+
+
+@pytest.fixture
+def tiers(tmp_path, monkeypatch):
+    small, big = tmp_path / "ram", tmp_path / "disk"
+    monkeypatch.setattr(temp_storage.config, "TEMP_STORAGE_TIERS", f"*:{big}, 5242880:{small}, bogus, x:{tmp_path}")
+    monkeypatch.setattr(temp_storage.config, "TEMP_PREALLOCATE", True)
+    return str(small), str(big)
+
+
+def test_tiers_sorted_with_catch_all_last(tiers):
+    small, big = tiers
+    assert temp_storage.get_tiers() == [(5 * MB, small), (None, big)]
+    assert temp_storage.choose_directory(5 * MB) == small
+    assert temp_storage.choose_directory(5 * MB + 1) == big
+    assert temp_storage.choose_directory(None) == small
+
+
+@pytest.mark.skipif(not hasattr(os, "posix_fallocate"), reason="posix_fallocate no disponible")
+def test_allocate_preallocates_in_chosen_tier(tiers):
+    small, big = tiers
+    path = temp_storage.allocate_temp_file(42, "../Capítulo: 1?.mp4", 8 * MB)
+    assert os.path.dirname(path) == os.path.abspath(big)
+    assert os.path.basename(path).startswith(f"{temp_storage.TEMP_PREFIX}42_")
+    assert "/" not in os.path.basename(path)[len(temp_storage.TEMP_PREFIX):]
+    stat = os.stat(path)
+    assert stat.st_size == 8 * MB
+    # Los bloques ya están reservados en disco, no es un archivo disperso
+    assert stat.st_blocks * 512 >= 8 * MB
+
+
+def test_allocate_without_fallocate_support_still_creates_file(tiers, monkeypatch):
+    def unsupported(fd, offset, length):
+        raise OSError(95, "Operation not supported")
+
+    monkeypatch.setattr(temp_storage.os, "posix_fallocate", unsupported, raising=False)
+    path = temp_storage.allocate_temp_file(1, "video.mp4", 1 * MB)
+    assert os.path.getsize(path) == 0
+
+
+def test_async_allocation_runs_off_the_loop(tiers, monkeypatch):
+    loop_thread = threading.get_ident()
+    threads = []
+
+    def fake_fallocate(fd, offset, length):
+        threads.append(threading.get_ident())
+        os.ftruncate(fd, length)
+
+    monkeypatch.setattr(temp_storage.os, "posix_fallocate", fake_fallocate, raising=False)
+    path = asyncio.run(temp_storage.allocate_temp_file_async(1, "video.mp4", 1 * MB))
+    assert os.path.getsize(path) == 1 * MB
+    assert threads and threads[0] != loop_thread
+
+
+def test_cancelled_async_allocation_removes_file(tiers, monkeypatch):
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_fallocate(fd, offset, length):
+        started.set()
+        finish.wait(5)  # Emulación de glibc escribiendo ceros
+
+    monkeypatch.setattr(temp_storage.os, "posix_fallocate", slow_fallocate, raising=False)
+
+    async def scenario():
+        task = asyncio.create_task(temp_storage.allocate_temp_file_async(1, "video.mp4", 1 * MB))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        finish.set()
+        await asyncio.sleep(0.1)
+        return task
+
+    assert asyncio.run(scenario()).cancelled()
+    assert [name for _, directory in temp_storage.get_tiers() if os.path.isdir(directory)
+            for name in os.listdir(directory)] == []
+
+def test_stream_truncates_unused_preallocation(tiers):
+    path = temp_storage.allocate_temp_file(1, "video.mp4", 1 * MB)
+    progress = []
+    client = FakeClient([b"a" * 1000, b"b" * 500])
+    written = asyncio.run(temp_storage.stream_media_to_file(
+        client, None, path, 1 * MB, progress=lambda current, total: progress.append((current, total))
+    ))
+    assert written == 1500
+    assert progress == [(1000, 1 * MB), (1500, 1 * MB)]
+    with open(path, 'rb') as f:
+        assert f.read() == b"a" * 1000 + b"b" * 500
+
+
+def test_stream_hashes_chunks_as_they_arrive(tiers):
+    path = temp_storage.allocate_temp_file(1, "video.mp4", 3000)
+    hasher = hashlib.md5()
+    chunks = [os.urandom(1000) for _ in range(3)]
+    asyncio.run(temp_storage.stream_media_to_file(FakeClient(chunks), None, path, 3000, hasher=hasher))
+    assert hasher.hexdigest() == hashlib.md5(b"".join(chunks)).hexdigest()
+
+
+def test_upload_reader_hashes_resent_chunks_once(tmp_path):
+    data = os.urandom(3000)
+    path = tmp_path / "video.mp4"
+    path.write_bytes(data)
+    with temp_storage.open_for_upload(str(path), hasher=hashlib.md5()) as reader:
+        reader.read(1000)
+        # La subida reanudable vuelve atrás y reenvía el chunk fallido
+        reader.seek(500)
+        reader.read(1000)
+        assert reader.hexdigest() is None  # Aún no se leyó entero
+        reader.read()
+        assert reader.hexdigest() == hashlib.md5(data).hexdigest()
+
+
+def test_upload_reader_with_gap_has_no_hash(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(os.urandom(3000))
+    with temp_storage.open_for_upload(str(path), hasher=hashlib.md5()) as reader:
+        reader.read(1000)
+        reader.seek(2000)
+        reader.read()
+        assert reader.hexdigest() is None
+
+
+def test_cleanup_removes_only_own_orphans(tiers):
+    small, big = tiers
+    os.makedirs(small)
+    os.makedirs(big)
+    kept = temp_storage.allocate_temp_file(1, "resume.mp4", 0)
+    orphan = temp_storage.allocate_temp_file(2, "crash.mp4", 10)
+    pyrogram_part = os.path.join(small, "video.mp4.temp")
+    foreign = os.path.join(big, "notas.txt")
+    for path in (pyrogram_part, foreign):
+        open(path, 'w').close()
+    assert temp_storage.cleanup_orphans(keep=[kept]) == 2
+    assert os.path.exists(kept) and os.path.exists(foreign)
+    assert not os.path.exists(orphan) and not os.path.exists(pyrogram_part)
@@ -0,0 +1,73 @@
+# test_tracing.py (Ventanas de /stats y percentiles del histograma de trazas)
+import math
+import time
+
+import pytest
+
+import tracing
+
+
+@pytest.mark.parametrize("text, seconds", [
+    ("90", 90),
+    ("15m", 900),
+    ("1h", 3600),
+    (" 2D ", 172800),
+    ("1.5h", 5400),
+])
+def test_parse_window_units(text, seconds):
+    assert tracing.parse_window(text) == seconds
+
+
+@pytest.mark.parametrize("text", ["0", "0m", "-5m", "0.5", "nan", "infh", "", "abc", "5x"])
+def test_parse_window_rejects_non_positive_and_invalid(text):
+    with pytest.raises(ValueError):
+        tracing.parse_window(text)
+
+
+def test_max_window_is_longest_configured(monkeypatch):
+    monkeypatch.setattr(tracing.config, "STATS_WINDOWS", "15m, 1h,bogus,6h")
+    assert tracing.max_window_seconds() == 6 * 3600
+
+
+def test_configured_windows_default_when_all_invalid(monkeypatch):
+    monkeypatch.setattr(tracing.config, "STATS_WINDOWS", "0,-1h")
+    assert tracing.configured_windows() == [("1h", 3600)]
+
+
+def test_bucket_upper_bound_covers_duration():
+    for duration in (0.5, 1.0, 7.3, 250.0, 12_345.0):
+        index = tracing._bucket_index(duration)
+        assert tracing._bucket_upper_ms(index) >= duration
+        if index > 0:
+            assert tracing._bucket_upper_ms(index - 1) < duration
+
+
+def test_percentile_from_counts_nearest_rank():
+    counts = [0] * tracing._BUCKET_COUNT
+    counts[2] = 50   # 50 muestras en la cubeta 2
+    counts[10] = 45  # 45 en la 10
+    counts[20] = 5   # 5 en la 20
+    total = sum(counts)
+    assert tracing._percentile_from_counts(counts, total, 50) == tracing._bucket_upper_ms(2)
+    assert tracing._percentile_from_counts(counts, total, 95) == tracing._bucket_upper_ms(10)
+    assert tracing._percentile_from_counts(counts, total, 96) == tracing._bucket_upper_ms(20)
+    assert tracing._percentile_from_counts(counts, total, 99) == tracing._bucket_upper_ms(20)
+
+
+def test_percentile_from_counts_empty():
+    assert tracing._percentile_from_counts([0] * tracing._BUCKET_COUNT, 0, 99) == 0.0
+
+
+def test_stage_stats_from_recorded_spans(monkeypatch):
+    monkeypatch.setattr(tracing, "_write_record", lambda record: None)
+    monkeypatch.setattr(tracing, "_minute_buckets", {})
+    now = time.time()
+    for i in range(100):
+        tracing.record_span(i, "upload", now - (i + 1) / 1000.0, now, nbytes=1000)
+    stats = tracing.get_stage_stats(3600)["upload"]
+    assert stats["count"] == 100
+    assert stats["bytes"] == 100_000
+    # p50 = 50 ms y p99 = 99 ms, con el error de una cubeta logarítmica (factor 1.2)
+    assert 50 <= stats["p50_ms"] < 50 * tracing._BUCKET_FACTOR
+    assert 99 <= stats["p99_ms"] < 99 * tracing._BUCKET_FACTOR
+    assert math.isclose(stats["bytes_per_s"], 100_000 / (sum(range(1, 101)) / 1000.0), rel_tol=1e-3)
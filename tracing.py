@@ -0,0 +1,277 @@
+# tracing.py (Spans por trabajo, log de trazas con rotación y estadísticas incrementales)
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Etapas conocidas del pipeline, en el orden en que se muestran en /stats
+STAGES = ("download", "upload", "share", "db_record", "hydrax_import", "total")
+
+# --- Histograma logarítmico para percentiles ---
+# Cada cubeta i cubre duraciones hasta _BUCKET_BASE_MS * _BUCKET_FACTOR**i milisegundos.
+_BUCKET_BASE_MS = 1.0
+_BUCKET_FACTOR = 1.2
+_BUCKET_COUNT = 120  # ~23 horas como límite superior
+
+_BUCKET_SECONDS = 60  # Granularidad temporal de las estadísticas (1 minuto)
+
+_log_lock = threading.Lock()
+_log_file = None
+
+_stats_lock = threading.Lock()
+# {stage: {minute: {'counts': [...], 'n': int, 'errors': int, 'bytes': int, 'busy_ms': float}}}
+_minute_buckets = {}
+_history_loaded = False
+
+
+def parse_window(text: str) -> int:
+    """Convierte una ventana como '15m', '1h' o '2d' en segundos (ValueError si no es positiva)."""
+    text = text.strip().lower()
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    if text and text[-1] in units:
+        value = float(text[:-1]) * units[text[-1]]
+    else:
+        value = float(text)
+    if not math.isfinite(value) or int(value) <= 0:
+        raise ValueError(f"La ventana debe ser de al menos 1 segundo: '{text}'")
+    return int(value)
+
+
+def configured_windows() -> list:
+    """Devuelve las ventanas configuradas en STATS_WINDOWS como [(etiqueta, segundos), ...]."""
+    windows = []
+    for part in config.STATS_WINDOWS.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            windows.append((part, parse_window(part)))
+        except ValueError:
+            logger.warning(f"Ventana inválida en STATS_WINDOWS ignorada: '{part}'")
+    return windows or [("1h", 3600)]
+
+
+def max_window_seconds() -> int:
+    """Historial que se conserva en memoria: la mayor ventana de STATS_WINDOWS."""
+    return max(seconds for _, seconds in configured_windows())
+
+
+def _bucket_index(duration_ms: float) -> int:
+    if duration_ms <= _BUCKET_BASE_MS:
+        return 0
+    index = int(math.ceil(math.log(duration_ms / _BUCKET_BASE_MS, _BUCKET_FACTOR)))
+    return min(index, _BUCKET_COUNT - 1)
+
+
+def _bucket_upper_ms(index: int) -> float:
+    return _BUCKET_BASE_MS * (_BUCKET_FACTOR ** index)
+
+
+# --- Log de trazas (append-only con rotación) ---
+
+def _rotate_log():
+    """Rota el log: traces.jsonl -> traces.jsonl.1 -> ... -> traces.jsonl.N (se descarta el más antiguo)."""
+    global _log_file
+    if _log_file:
+        _log_file.close()
+        _log_file = None
+    path = config.TRACE_LOG_PATH
+    for i in range(config.TRACE_LOG_BACKUPS, 0, -1):
+        src = f"{path}.{i - 1}" if i > 1 else path
+        dst = f"{path}.{i}"
+        if os.path.exists(src):
+            os.replace(src, dst)
+    if config.TRACE_LOG_BACKUPS <= 0 and os.path.exists(path):
+        os.remove(path)
+
+
+def _write_record(record: dict):
+    """Añade un registro al log de trazas, rotándolo si supera TRACE_LOG_MAX_BYTES."""
+    global _log_file
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    try:
+        with _log_lock:
+            if _log_file is None:
+                _log_file = open(config.TRACE_LOG_PATH, 'a', encoding='utf-8')
+            if _log_file.tell() + len(line) > config.TRACE_LOG_MAX_BYTES:
+                _rotate_log()
+                _log_file = open(config.TRACE_LOG_PATH, 'a', encoding='utf-8')
+            _log_file.write(line)
+            _log_file.flush()
+    except Exception as e:
+        # Las trazas nunca deben romper el procesamiento de un video
+        logger.error(f"Error al escribir en el log de trazas: {e}")
+
+
+# --- Agregación incremental ---
+
+def _aggregate(record: dict):
+    """Incorpora un span a las cubetas por minuto y descarta las que quedan fuera de la ventana máxima."""
+    stage = record['stage']
+    minute = int(record['end'] // _BUCKET_SECONDS)
+    oldest_minute = int((time.time() - max_window_seconds()) // _BUCKET_SECONDS)
+    if minute < oldest_minute:
+        return
+    with _stats_lock:
+        per_stage = _minute_buckets.setdefault(stage, {})
+        bucket = per_stage.get(minute)
+        if bucket is None:
+            bucket = per_stage[minute] = {'counts': [0] * _BUCKET_COUNT, 'n': 0, 'errors': 0, 'bytes': 0, 'busy_ms': 0.0}
+        if record.get('ok', True):
+            bucket['counts'][_bucket_index(record['duration_ms'])] += 1
+            bucket['n'] += 1
+            bucket['bytes'] += record.get('bytes') or 0
+            bucket['busy_ms'] += record['duration_ms']
+        else:
+            bucket['errors'] += 1
+        for old_minute in [m for m in per_stage if m < oldest_minute]:
+            del per_stage[old_minute]
+
+
+def load_recent_history():
+    """
+    Carga una sola vez las trazas recientes del log actual para que /stats
+    tenga datos tras un reinicio. Después, todo se actualiza de forma incremental.
+    """
+    global _history_loaded
+    if _history_loaded:
+        return
+    _history_loaded = True
+    oldest = time.time() - max_window_seconds()
+    paths = [f"{config.TRACE_LOG_PATH}.{i}" for i in range(config.TRACE_LOG_BACKUPS, 0, -1)] + [config.TRACE_LOG_PATH]
+    loaded = 0
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if record.get('end', 0) >= oldest and 'stage' in record:
+                        _aggregate(record)
+                        loaded += 1
+        except Exception as e:
+            logger.error(f"Error al cargar el historial de trazas desde {path}: {e}")
+    logger.info(f"Historial cargado ({loaded} spans recientes).")
+
+
+def record_span(job_id, stage: str, start: float, end: float, ok: bool = True, nbytes: int = None, **attrs):
+    """Registra un span terminado: lo escribe en el log y lo agrega a las estadísticas."""
+    record = {
+        'job': job_id,
+        'stage': stage,
+        'start': round(start, 3),
+        'end': round(end, 3),
+        'duration_ms': round((end - start) * 1000.0, 3),
+        'ok': ok,
+    }
+    if nbytes is not None:
+        record['bytes'] = int(nbytes)
+    record.update(attrs)
+    _write_record(record)
+    _aggregate(record)
+
+
+class JobTrace:
+    """Agrupa los spans de un trabajo (un video) bajo un mismo identificador."""
+
+    def __init__(self, job_id, **attrs):
+        self.job_id = job_id
+        self.attrs = attrs
+        self.start = time.time()
+        self._finished = False
+
+    @contextmanager
+    def span(self, stage: str, nbytes: int = None):
+        """
+        Mide una etapa. El dict devuelto permite fijar los bytes al final:
+            with trace.span("download") as s:
+                ...
+                s['bytes'] = tamaño
+        """
+        info = {'bytes': nbytes}
+        start = time.time()
+        ok = True
+        try:
+            yield info
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            record_span(self.job_id, stage, start, time.time(), ok=ok, nbytes=info.get('bytes'), **self.attrs)
+
+    def finish(self, status: str = "ok", nbytes: int = None):
+        """Registra el span 'total' del trabajo (del video recibido al slug)."""
+        if self._finished:
+            return
+        self._finished = True
+        record_span(self.job_id, "total", self.start, time.time(), ok=(status == "ok"), nbytes=nbytes, status=status, **self.attrs)
+
+
+def span_or_null(trace, stage: str, nbytes: int = None):
+    """Devuelve trace.span(...) o un contexto vacío si no hay traza (llamadas sin instrumentar)."""
+    if trace is None:
+        return nullcontext({'bytes': nbytes})
+    return trace.span(stage, nbytes=nbytes)
+
+
+# --- Consultas para /stats ---
+
+def _percentile_from_counts(counts: list, total: int, pct: float) -> float:
+    """Estima el percentil (en ms) a partir del histograma logarítmico."""
+    if total == 0:
+        return 0.0
+    target = max(1, int(math.ceil(total * pct / 100.0)))
+    running = 0
+    for index, count in enumerate(counts):
+        running += count
+        if running >= target:
+            return _bucket_upper_ms(index)
+    return _bucket_upper_ms(len(counts) - 1)
+
+
+def get_stage_stats(window_seconds: int) -> dict:
+    """
+    Calcula p50/p95/p99, conteos y throughput por etapa dentro de la ventana,
+    combinando las cubetas por minuto (sin releer el log).
+    """
+    oldest_minute = int((time.time() - window_seconds) // _BUCKET_SECONDS)
+    result = {}
+    with _stats_lock:
+        for stage, per_stage in _minute_buckets.items():
+            counts = [0] * _BUCKET_COUNT
+            n = errors = total_bytes = 0
+            busy_ms = 0.0
+            for minute, bucket in per_stage.items():
+                if minute < oldest_minute:
+                    continue
+                for i, c in enumerate(bucket['counts']):
+                    if c:
+                        counts[i] += c
+                n += bucket['n']
+                errors += bucket['errors']
+                total_bytes += bucket['bytes']
+                busy_ms += bucket['busy_ms']
+            if n == 0 and errors == 0:
+                continue
+            result[stage] = {
+                'count': n,
+                'errors': errors,
+                'p50_ms': _percentile_from_counts(counts, n, 50),
+                'p95_ms': _percentile_from_counts(counts, n, 95),
+                'p99_ms': _percentile_from_counts(counts, n, 99),
+                'bytes': total_bytes,
+                # Velocidad media mientras la etapa está activa
+                'bytes_per_s': (total_bytes / (busy_ms / 1000.0)) if busy_ms > 0 else 0.0,
+            }
+    return result
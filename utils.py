@@ -1,8 +1,11 @@
 # utils.py (Versión corregida y optimizada)
 import asyncio
+import logging
 import time
 from pyrogram.errors import FloodWait, MessageNotModified
 
+logger = logging.getLogger(__name__)
+
 # Variable global para rastrear el último FloodWait y su espera asociada
 _last_flood_wait = {"until": 0, "delay": 0}
 
@@ -22,11 +25,11 @@ async def _handle_flood_wait(e: FloodWait, action_name: str):
     if _last_flood_wait["until"] >= time.time() and _last_flood_wait["delay"] >= delay:
         remaining_delay = _last_flood_wait["until"] - time.time()
         if remaining_delay > 0:
-            print(f"Evitando FloodWait para '{action_name}': Esperando {remaining_delay:.1f}s restantes del FloodWait anterior.")
+            logger.warning(f"Evitando FloodWait para '{action_name}': Esperando {remaining_delay:.1f}s restantes del FloodWait anterior.")
             await asyncio.sleep(remaining_delay + 1) # +1 para asegurar
             return True # Indica que se esperó por un FloodWait previo
 
-    print(f"FloodWait detectado para '{action_name}': Esperando {delay} segundos.")
+    logger.warning(f"FloodWait detectado para '{action_name}': Esperando {delay} segundos.")
     _last_flood_wait = {"until": wait_until, "delay": delay}
     await asyncio.sleep(delay)
     return False # Indica que se esperó el FloodWait actual
@@ -62,7 +65,7 @@ async def safe_edit_message(message, text: str, **kwargs):
                 _last_progress_message[key] = message_content
                 return result
             except Exception as e2:
-                 print(f"Error al editar mensaje después de FloodWait: {e2}")
+                 logger.error(f"Error al editar mensaje después de FloodWait: {e2}")
                  raise # Relanzar si falla el reintento
         else:
             # Si esperamos por uno previo, intentar de nuevo
@@ -76,7 +79,7 @@ async def safe_edit_message(message, text: str, **kwargs):
         _last_progress_message[key] = message_content # Marcarlo como "enviado" para evitar futuros intentos
         return message
     except Exception as e: # Capturar otros errores
-         print(f"Error inesperado al editar mensaje: {e}")
+         logger.error(f"Error inesperado al editar mensaje: {e}")
          raise
 
 async def safe_send_message(client, chat_id, text: str, **kwargs):
@@ -90,12 +93,12 @@ async def safe_send_message(client, chat_id, text: str, **kwargs):
             try:
                 return await client.send_message(chat_id, text, **kwargs)
             except Exception as e2:
-                 print(f"Error al enviar mensaje después de FloodWait: {e2}")
+                 logger.error(f"Error al enviar mensaje después de FloodWait: {e2}")
                  raise
         else:
              return await client.send_message(chat_id, text, **kwargs)
     except Exception as e:
-         print(f"Error inesperado al enviar mensaje: {e}")
+         logger.error(f"Error inesperado al enviar mensaje: {e}")
          raise
 
 async def safe_reply_message(message, text: str, **kwargs):
@@ -109,12 +112,12 @@ async def safe_reply_message(message, text: str, **kwargs):
             try:
                 return await message.reply_text(text, **kwargs)
             except Exception as e2:
-                 print(f"Error al responder mensaje después de FloodWait: {e2}")
+                 logger.error(f"Error al responder mensaje después de FloodWait: {e2}")
                  raise
         else:
              return await message.reply_text(text, **kwargs)
     except Exception as e:
-         print(f"Error inesperado al responder mensaje: {e}")
+         logger.error(f"Error inesperado al responder mensaje: {e}")
          raise
 
 async def safe_delete_message(message):
@@ -128,11 +131,11 @@ async def safe_delete_message(message):
             try:
                  return await message.delete()
             except Exception as e2:
-                 print(f"Error al borrar mensaje después de FloodWait (puede ya estar borrado): {e2}")
+                 logger.warning(f"Error al borrar mensaje después de FloodWait (puede ya estar borrado): {e2}")
                  # No relanzar error al borrar, es común que falle si ya se borró
         # Si esperamos, asumimos que el mensaje ya no existe o se borrará pronto
     except Exception as e:
-         print(f"Error inesperado al borrar mensaje (puede ya estar borrado): {e}")
+         logger.warning(f"Error inesperado al borrar mensaje (puede ya estar borrado): {e}")
          # No relanzar error al borrar
 
 async def safe_delete_file(file_path: str):
@@ -141,6 +144,6 @@ async def safe_delete_file(file_path: str):
     try:
         if os.path.exists(file_path):
             os.remove(file_path)
-            print(f"Archivo eliminado: {file_path}")
+            logger.info(f"Archivo eliminado: {file_path}")
     except Exception as e:
-        print(f"Error al eliminar archivo {file_path}: {e}")
+        logger.error(f"Error al eliminar archivo {file_path}: {e}")
@@ -0,0 +1,92 @@
+# warmup.py (Pre-calentamiento en segundo plano tras el arranque del cliente)
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Estado de cada componente: 'pending' | 'ready' | 'error: <mensaje>'
+_readiness = {
+    'db': 'pending',
+    'credentials': 'pending',
+    'drive_service': 'pending',
+    'drive_account': 'pending',
+    'hydrax': 'pending',
+}
+_durations = {}
+_started_at = None
+_finished_at = None
+_warmup_task = None
+
+
+def get_readiness() -> dict:
+    """Devuelve el estado de pre-calentamiento por componente (para /metrics, /ready y /ping)."""
+    return {
+        'ready': is_ready(),
+        'components': dict(_readiness),
+        'durations_ms': dict(_durations),
+        'total_ms': round((_finished_at - _started_at) * 1000.0, 1) if _finished_at and _started_at else None,
+    }
+
+
+def is_ready() -> bool:
+    return all(state == 'ready' for state in _readiness.values())
+
+
+async def _warm(name: str, func):
+    """Ejecuta un paso bloqueante en el executor y registra su estado y duración."""
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        await loop.run_in_executor(None, func)
+        _readiness[name] = 'ready'
+    except Exception as e:
+        _readiness[name] = f"error: {e}"
+        logger.error(f"❌ Error al pre-calentar '{name}': {e}")
+    finally:
+        _durations[name] = round((time.perf_counter() - started) * 1000.0, 1)
+
+
+async def _warm_drive():
+    """Credenciales -> servicio de Drive -> información de la cuenta (cada paso depende del anterior)."""
+    import google_drive
+    await _warm('credentials', google_drive.load_all_credentials)
+    if _readiness['credentials'] != 'ready':
+        _readiness['drive_service'] = _readiness['drive_account'] = 'error: sin credenciales'
+        return
+    await _warm('drive_service', google_drive.get_drive_service)
+    await _warm('drive_account', google_drive.get_drive_account_email)
+
+
+def _warm_db():
+    import db
+    db.get_process_db()
+    db.get_uploaded_files_db()
+
+
+def _warm_hydrax():
+    import hydrax_api
+    hydrax_api.warm_up_connection()
+
+
+async def prewarm():
+    """Pre-calienta concurrentemente DB, Drive (credenciales, servicio, cuenta) y la conexión con Hydrax."""
+    global _started_at, _finished_at
+    _started_at = time.perf_counter()
+    logger.info("Iniciando pre-calentamiento en segundo plano...")
+    await asyncio.gather(
+        _warm('db', _warm_db),
+        _warm_drive(),
+        _warm('hydrax', _warm_hydrax),
+    )
+    _finished_at = time.perf_counter()
+    state = "✅ listo" if is_ready() else "⚠️ parcial"
+    logger.info(f"Pre-calentamiento {state} en {(_finished_at - _started_at) * 1000.0:.0f}ms: {_readiness}")
+
+
+def start_prewarm():
+    """Lanza prewarm() como tarea de fondo en el loop actual (idempotente)."""
+    global _warmup_task
+    if _warmup_task is None:
+        _warmup_task = asyncio.get_running_loop().create_task(prewarm())
+    return _warmup_task